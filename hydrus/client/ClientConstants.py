@@ -156,6 +156,16 @@ similar_files_pixel_dupes_string_lookup = {
     SIMILAR_FILES_PIXEL_DUPES_EXCLUDED : 'must not be pixel dupes'
 }
 
+SIMILAR_FILES_SEARCH_ENGINE_VPTREE = 0
+SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY = 1
+SIMILAR_FILES_SEARCH_ENGINE_MULTI_INDEX = 2
+
+similar_files_search_engine_string_lookup = {
+    SIMILAR_FILES_SEARCH_ENGINE_VPTREE : 'vp-tree (low memory, stored in the database)',
+    SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY : 'bit array (fast, held in memory)',
+    SIMILAR_FILES_SEARCH_ENGINE_MULTI_INDEX : 'multi-index (fast at small distances, stored in the database)'
+}
+
 IDLE_NOT_ON_SHUTDOWN = 0
 IDLE_ON_SHUTDOWN = 1
 IDLE_ON_SHUTDOWN_ASK_FIRST = 2
@@ -22,6 +22,7 @@ from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusThreading
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetworking
+from hydrus.core.networking import HydrusServerThreadPools
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientDaemons
@@ -335,11 +336,24 @@ class Controller( ClientControllerInterface.ClientControllerInterface, HydrusCon
         self.CallToThread( do_it, job_status )
         
     
+    def _SetThreadPoolLimits( self ):
+        
+        for name in ( HydrusServerThreadPools.THREAD_POOL_METADATA, HydrusServerThreadPools.THREAD_POOL_FILES, HydrusServerThreadPools.THREAD_POOL_WRITES, HydrusServerThreadPools.THREAD_POOL_RENDERING ):
+            
+            max_threads = self.new_options.GetInteger( 'client_api_thread_pool_{}_max_threads'.format( name ) )
+            max_queue_depth = self.new_options.GetInteger( 'client_api_thread_pool_{}_max_queue_depth'.format( name ) )
+            
+            HydrusServerThreadPools.SetThreadPoolLimits( name, max_threads, max_queue_depth )
+            
+        
+    
     def _ShutdownManagers( self ):
         
         self.database_maintenance_manager.Shutdown()
         self.files_maintenance_manager.Shutdown()
         
+        self.file_import_worker_pool.Shutdown()
+        
         self.quick_download_manager.Shutdown()
         
         managers = [ self.subscriptions_manager, self.tag_display_maintenance_manager ]
@@ -1024,10 +1038,15 @@ class Controller( ClientControllerInterface.ClientControllerInterface, HydrusCon
                 
             
         
+        self.db.SetNumReadReplicas( self.new_options.GetInteger( 'db_read_replicas' ) )
+        
+        self._SetThreadPoolLimits()
+        
         self.frame_splash_status.SetSubtext( 'image caches' )
         
         self._caches[ 'images' ] = ClientCaches.ImageRendererCache( self )
         self._caches[ 'image_tiles' ] = ClientCaches.ImageTileCache( self )
+        self._caches[ 'encoded_images' ] = ClientCaches.EncodedImageCache( self )
         self._caches[ 'thumbnail' ] = ClientCaches.ThumbnailCache( self )
         
         self.frame_splash_status.SetText( 'initialising managers' )
@@ -1228,6 +1247,7 @@ class Controller( ClientControllerInterface.ClientControllerInterface, HydrusCon
         self._managers[ 'undo' ] = ClientManagers.UndoManager( self )
         
         self.sub( self, 'ToClipboard', 'clipboard' )
+        self.sub( self, 'NotifyNewOptions', 'notify_new_options' )
         
     
     def InitView( self ):
@@ -1270,6 +1290,10 @@ class Controller( ClientControllerInterface.ClientControllerInterface, HydrusCon
         
         self.files_maintenance_manager = ClientFiles.FilesMaintenanceManager( self )
         
+        from hydrus.client.importing import ClientImportFiles
+        
+        self.file_import_worker_pool = ClientImportFiles.FileImportWorkerPool()
+        
         from hydrus.client import ClientDBMaintenanceManager
         
         self.database_maintenance_manager = ClientDBMaintenanceManager.DatabaseMaintenanceManager( self )
@@ -1486,6 +1510,13 @@ class Controller( ClientControllerInterface.ClientControllerInterface, HydrusCon
         QP.CallAfter( do_gui_refs, self.gui )
         
     
+    def NotifyNewOptions( self ):
+        
+        self.db.SetNumReadReplicas( self.new_options.GetInteger( 'db_read_replicas' ) )
+        
+        self._SetThreadPoolLimits()
+        
+    
     def PageAlive( self, page_key ):
         
         with self._page_key_lock:
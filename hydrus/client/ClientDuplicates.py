@@ -583,6 +583,7 @@ class DuplicatesManager( object ):
         self._refresh_maintenance_numbers = True
         
         self._currently_doing_potentials_search = False
+        self._potentials_search_progress = None
         
         self._lock = threading.Lock()
         
@@ -616,6 +617,14 @@ class DuplicatesManager( object ):
             
         
     
+    def GetPotentialsSearchProgress( self ):
+        
+        with self._lock:
+            
+            return self._potentials_search_progress
+            
+        
+    
     def RefreshMaintenanceNumbers( self ):
         
         with self._lock:
@@ -719,6 +728,9 @@ class DuplicatesManager( object ):
             
             still_work_to_do = True
             
+            search_started = HydrusTime.GetNowPrecise()
+            num_done_this_search = 0
+            
             while still_work_to_do:
                 
                 search_distance = CG.client_controller.new_options.GetInteger( 'similar_files_duplicate_pairs_search_distance' )
@@ -754,7 +766,18 @@ class DuplicatesManager( object ):
                         
                     
                 
-                text = 'searching: {}'.format( HydrusData.ConvertValueRangeToPrettyString( num_searched_estimate, total_num_files ) )
+                num_done_this_search += num_done
+                
+                files_per_second = num_done_this_search / max( HydrusTime.GetNowPrecise() - search_started, 0.001 )
+                
+                with self._lock:
+                    
+                    self._potentials_search_progress = ( num_searched_estimate, total_num_files, files_per_second )
+                    
+                
+                CG.client_controller.pub( 'new_similar_files_maintenance_numbers' )
+                
+                text = 'searching: {} ({} files/s)'.format( HydrusData.ConvertValueRangeToPrettyString( num_searched_estimate, total_num_files ), HydrusData.ToHumanInt( int( files_per_second ) ) )
                 job_status.SetStatusText( text )
                 job_status.SetVariable( 'popup_gauge_1', ( num_searched_estimate, total_num_files ) )
                 
@@ -777,6 +800,7 @@ class DuplicatesManager( object ):
             with self._lock:
                 
                 self._currently_doing_potentials_search = False
+                self._potentials_search_progress = None
                 
             
             self.RefreshMaintenanceNumbers()
@@ -59,6 +59,7 @@ REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF = 20
 REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD = 21
 REGENERATE_FILE_DATA_JOB_BLURHASH = 22
 REGENERATE_FILE_DATA_JOB_FILE_HAS_TRANSPARENCY = 23
+REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX = 24
 
 regen_file_enum_to_str_lookup = {
     REGENERATE_FILE_DATA_JOB_FILE_METADATA : 'regenerate file metadata',
@@ -84,7 +85,8 @@ regen_file_enum_to_str_lookup = {
     REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA : 'determine if the file has non-EXIF human-readable embedded metadata',
     REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE : 'determine if the file has an icc profile',
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH : 'regenerate pixel hashes',
-    REGENERATE_FILE_DATA_JOB_BLURHASH: 'regenerate blurhash'
+    REGENERATE_FILE_DATA_JOB_BLURHASH: 'regenerate blurhash',
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX : 'regenerate video keyframe index'
 }
 
 regen_file_enum_to_description_lookup = {
@@ -143,7 +145,8 @@ All missing/Incorrect files will also have their hashes, tags, and URLs exported
     REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA : 'This loads the file to see if it has non-EXIF human-readable metadata, which can be shown in the media viewer and searched with "system:image has human-readable embedded metadata".',
     REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE : 'This loads the file to see if it has an ICC profile, which is used in "system:has icc profile" search.',
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH : 'This generates a fast unique identifier for the pixels in a still image, which is used in duplicate pixel searches.',
-    REGENERATE_FILE_DATA_JOB_BLURHASH: 'This generates a very small version of the file\'s thumbnail that can be used as a placeholder while the thumbnail loads.'
+    REGENERATE_FILE_DATA_JOB_BLURHASH: 'This generates a very small version of the file\'s thumbnail that can be used as a placeholder while the thumbnail loads.',
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX : 'This records the timestamps of a video\'s keyframes, which lets the media viewer and thumbnail generation seek straight to them rather than decoding from an earlier point.'
 }
 
 NORMALISED_BIG_JOB_WEIGHT = 100
@@ -172,7 +175,8 @@ regen_file_enum_to_job_weight_lookup = {
     REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA : 25,
     REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE : 25,
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH : 100,
-    REGENERATE_FILE_DATA_JOB_BLURHASH: 15
+    REGENERATE_FILE_DATA_JOB_BLURHASH: 15,
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX : 25
 }
 
 regen_file_enum_to_overruled_jobs = {
@@ -199,7 +203,8 @@ regen_file_enum_to_overruled_jobs = {
     REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA : [],
     REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE : [],
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH : [],
-    REGENERATE_FILE_DATA_JOB_BLURHASH: []
+    REGENERATE_FILE_DATA_JOB_BLURHASH: [],
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX : []
 }
 
 ALL_REGEN_JOBS_IN_RUN_ORDER = [
@@ -216,6 +221,7 @@ ALL_REGEN_JOBS_IN_RUN_ORDER = [
     REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL,
     REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL,
     REGENERATE_FILE_DATA_JOB_BLURHASH,
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX,
     REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA,
     REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP,
     REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS,
@@ -244,6 +250,7 @@ ALL_REGEN_JOBS_IN_HUMAN_ORDER = [
     REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL,
     REGENERATE_FILE_DATA_JOB_BLURHASH,
     REGENERATE_FILE_DATA_JOB_PIXEL_HASH,
+    REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX,
     REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA,
     REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP,
     REGENERATE_FILE_DATA_JOB_OTHER_HASHES,
@@ -599,7 +606,7 @@ class ClientFilesManager( object ):
         return subfolder.GetFilePath( f'{hash_encoded}.thumbnail' )
         
     
-    def _GenerateThumbnailBytes( self, file_path, media ):
+    def _GenerateThumbnailBytes( self, file_path, media, keyframe_timestamps_us = None ):
         
         hash = media.GetHash()
         mime = media.GetMime()
@@ -617,7 +624,7 @@ class ClientFilesManager( object ):
         
         try:
             
-            thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( file_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in )
+            thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( file_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in, keyframe_timestamps_us = keyframe_timestamps_us )
             
         except Exception as e:
             
@@ -1736,6 +1743,14 @@ class ClientFilesManager( object ):
             return
             
         
+        keyframe_timestamps_us = None
+        
+        if mime in HC.VIDEO:
+            
+            # get this before we take the lock--a db read can wait a long time, and file storage writers would be stuck behind us
+            keyframe_timestamps_us = self._controller.Read( 'keyframe_timestamps', hash )
+            
+        
         with self._file_storage_rwlock.read:
             
             file_path = self._GenerateExpectedFilePath( hash, mime )
@@ -1745,7 +1760,7 @@ class ClientFilesManager( object ):
                 raise HydrusExceptions.FileMissingException( 'The thumbnail for file ' + hash.hex() + ' could not be regenerated from the original file because the original file is missing! This event could indicate hard drive corruption. Please check everything is ok.')
                 
             
-            thumbnail_bytes = self._GenerateThumbnailBytes( file_path, media )
+            thumbnail_bytes = self._GenerateThumbnailBytes( file_path, media, keyframe_timestamps_us = keyframe_timestamps_us )
             
         
         with self._file_storage_rwlock.write:
@@ -1879,7 +1894,7 @@ def HasHumanReadableEmbeddedMetadata( path, mime ):
     return has_human_readable_embedded_metadata
     
 
-def HasTransparency( path, mime, duration = None, num_frames = None, resolution = None ):
+def HasTransparency( path, mime, duration = None, num_frames = None, resolution = None, numpy_image = None ):
     
     if mime not in HC.MIMES_THAT_WE_CAN_CHECK_FOR_TRANSPARENCY:
         
@@ -1890,7 +1905,10 @@ def HasTransparency( path, mime, duration = None, num_frames = None, resolution
         
         if mime in HC.IMAGES:
             
-            numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+            if numpy_image is None:
+                
+                numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+                
             
             return HydrusImageColours.NumPyImageHasUsefulAlphaChannel( numpy_image )
             
@@ -2601,6 +2619,35 @@ class FilesMaintenanceManager( object ):
             
         
     
+    def _RegenKeyframeIndex( self, media_result ):
+        
+        hash = media_result.GetHash()
+        mime = media_result.GetMime()
+        
+        if mime not in HC.VIDEO:
+            
+            return None
+            
+        
+        try:
+            
+            path = self._controller.client_files_manager.GetFilePath( hash, mime )
+            
+        except HydrusExceptions.FileMissingException:
+            
+            return None
+            
+        
+        try:
+            
+            return HydrusVideoHandling.GetKeyframeTimestampsUS( path )
+            
+        except HydrusExceptions.DamagedOrUnusualFileException:
+            
+            return None
+            
+        
+    
     def _RegenPixelHash( self, media_result ):
         
         hash = media_result.GetHash()
@@ -2837,6 +2884,10 @@ class FilesMaintenanceManager( object ):
                             
                             additional_data = self._RegenBlurhash( media_result )
                             
+                        elif job_type == REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX:
+                            
+                            additional_data = self._RegenKeyframeIndex( media_result )
+                            
                         elif job_type in (
                             REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD,
                             REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD,
@@ -28,14 +28,25 @@ def DiscardBlankPerceptualHashes( perceptual_hashes ):
     return perceptual_hashes
     
 
-def GenerateNumPyImage( path, mime ):
+def GenerateHalfSizeNumPyImage( numpy_image ):
     
-    force_pil = CG.client_controller.new_options.GetBoolean( 'load_images_with_pil' )
+    ( height, width ) = numpy_image.shape[:2]
     
-    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil )
+    return cv2.resize( numpy_image, ( max( 1, width // 2 ), max( 1, height // 2 ) ), interpolation = cv2.INTER_AREA )
     
 
-def GenerateShapePerceptualHashes( path, mime ):
+def GenerateNumPyImage( path, mime, target_resolution = None, force_pil = None ):
+    
+    # a worker process has no controller, so it has to be told
+    if force_pil is None:
+        
+        force_pil = CG.client_controller.new_options.GetBoolean( 'load_images_with_pil' )
+        
+    
+    return HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil, target_resolution = target_resolution )
+    
+
+def GenerateShapePerceptualHashes( path, mime, numpy_image = None, force_pil = None ):
     
     if HG.phash_generation_report_mode:
         
@@ -44,7 +55,10 @@ def GenerateShapePerceptualHashes( path, mime ):
     
     try:
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = GenerateNumPyImage( path, mime, force_pil = force_pil )
+            
         
         return GenerateShapePerceptualHashesNumPy( numpy_image )
         
@@ -420,6 +420,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'suggested_tags_width' ] = 300
         
         self._dictionary[ 'integers' ][ 'similar_files_duplicate_pairs_search_distance' ] = 0
+        self._dictionary[ 'integers' ][ 'similar_files_search_engine' ] = CC.SIMILAR_FILES_SEARCH_ENGINE_VPTREE
         
         self._dictionary[ 'integers' ][ 'default_new_page_goes' ] = CC.NEW_PAGE_GOES_FAR_RIGHT
         
@@ -469,6 +470,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         self._dictionary[ 'integers' ][ 'video_thumbnail_percentage_in' ] = 35
         
+        self._dictionary[ 'integers' ][ 'file_import_worker_processes' ] = 0
+        
         self._dictionary[ 'integers' ][ 'global_audio_volume' ] = 70
         self._dictionary[ 'integers' ][ 'media_viewer_audio_volume' ] = 70
         self._dictionary[ 'integers' ][ 'preview_audio_volume' ] = 70
@@ -487,10 +490,22 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'thumbnail_cache_size' ] = 1024 * 1024 * 32
         self._dictionary[ 'integers' ][ 'image_cache_size' ] = 1024 * 1024 * 384
         self._dictionary[ 'integers' ][ 'image_tile_cache_size' ] = 1024 * 1024 * 256
+        self._dictionary[ 'integers' ][ 'encoded_image_cache_size' ] = 1024 * 1024 * 64
         
         self._dictionary[ 'integers' ][ 'thumbnail_cache_timeout' ] = 86400
+        self._dictionary[ 'integers' ][ 'thumbnail_waterfall_workers' ] = 4
         self._dictionary[ 'integers' ][ 'image_cache_timeout' ] = 600
         self._dictionary[ 'integers' ][ 'image_tile_cache_timeout' ] = 300
+        self._dictionary[ 'integers' ][ 'encoded_image_cache_timeout' ] = 1200
+        
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_metadata_max_threads' ] = 8
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_metadata_max_queue_depth' ] = 64
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_files_max_threads' ] = 8
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_files_max_queue_depth' ] = 256
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_writes_max_threads' ] = 2
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_writes_max_queue_depth' ] = 32
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_rendering_max_threads' ] = 2
+        self._dictionary[ 'integers' ][ 'client_api_thread_pool_rendering_max_queue_depth' ] = 16
         
         self._dictionary[ 'integers' ][ 'image_cache_storage_limit_percentage' ] = 25
         self._dictionary[ 'integers' ][ 'image_cache_prefetch_limit_percentage' ] = 10
@@ -499,6 +514,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'media_viewer_prefetch_num_previous' ] = 2
         self._dictionary[ 'integers' ][ 'media_viewer_prefetch_num_next' ] = 3
         
+        self._dictionary[ 'integers' ][ 'db_read_replicas' ] = 0
+        
         self._dictionary[ 'integers' ][ 'thumbnail_border' ] = 1
         self._dictionary[ 'integers' ][ 'thumbnail_margin' ] = 2
         
@@ -579,6 +596,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         
         self._dictionary[ 'noneable_integers' ][ 'forced_search_limit' ] = None
         
+        self._dictionary[ 'noneable_integers' ][ 'thumbnail_disk_cache_size' ] = None
+        
         self._dictionary[ 'noneable_integers' ][ 'num_recent_tags' ] = 20
         
         self._dictionary[ 'noneable_integers' ][ 'duplicate_background_switch_intensity_a' ] = 0
@@ -1,8 +1,10 @@
+import math
 import os
 import numpy
 import threading
 import time
 import typing
+import weakref
 
 from qtpy import QtCore as QC
 from qtpy import QtGui as QG
@@ -23,6 +25,27 @@ from hydrus.client import ClientImageHandling
 from hydrus.client import ClientVideoHandling
 from hydrus.client.caches import ClientCachesBase
 
+MIN_PYRAMID_LEVEL_DIMENSION = 64
+
+def GetImageRendererDecodeReduction( media, target_resolution ) -> int:
+    
+    # if we only need to show a jpeg small, we can decode it at 1/2, 1/4, or 1/8 size
+    
+    if target_resolution is None or media.GetMime() != HC.IMAGE_JPEG:
+        
+        return 1
+        
+    
+    resolution = media.GetResolution()
+    
+    if None in resolution:
+        
+        return 1
+        
+    
+    return HydrusImageHandling.GetDecodeReduction( resolution, target_resolution )
+    
+
 def FrameIndexOutOfRange( index, range_start, range_end ):
     
     before_start = index < range_start
@@ -82,13 +105,18 @@ def GenerateHydrusBitmapFromPILImage( pil_image, compressed = True ):
 
 class ImageRenderer( ClientCachesBase.CacheableObject ):
     
-    def __init__( self, media, this_is_for_metadata_alone = False ):
+    def __init__( self, media, this_is_for_metadata_alone = False, target_resolution = None ):
         
         ClientCachesBase.CacheableObject.__init__( self )
         
         self._numpy_image = None
         self._render_failed = False
         self._is_ready = False
+        self._ready_event = threading.Event()
+        
+        # mip-map levels of 1/2, 1/4, 1/8... size, made as zoomed-out views ask for them
+        self._pyramid = []
+        self._pyramid_lock = threading.Lock()
         
         self._hash = media.GetHash()
         self._mime = media.GetMime()
@@ -108,6 +136,10 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         
         self._this_is_for_metadata_alone = this_is_for_metadata_alone
         
+        # a renderer made for a known smaller size holds a reduced decode, which all clip rects are scaled into
+        self._target_resolution = target_resolution
+        self._decode_reduction = GetImageRendererDecodeReduction( media, target_resolution )
+        
         CG.client_controller.CallToThread( self._Initialise )
 
 
@@ -127,6 +159,27 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         clip_width = clip_size.width()
         clip_height = clip_size.height()
         
+        zoom = max( target_resolution.width() / clip_width, target_resolution.height() / clip_height )
+        
+        numpy_image_zoom = zoom * self._decode_reduction
+        
+        if numpy_image_zoom <= 0.5:
+            
+            # resampling a big region of a huge image for every tile is slow, so start from a smaller copy that is still bigger than we need
+            
+            pyramid_level = self._GetPyramidLevel( numpy_image_zoom )
+            
+            if pyramid_level is not None:
+                
+                return self._GetNumPyImageFromPyramidLevel( pyramid_level, clip_rect, target_resolution )
+                
+            
+        
+        if self._decode_reduction > 1:
+            
+            return self._GetNumPyImageFromPyramidLevel( self._numpy_image, clip_rect, target_resolution )
+            
+        
         ( my_width, my_height ) = self._resolution
         
         my_full_rect = QC.QRect( 0, 0, my_width, my_height )
@@ -238,6 +291,91 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         return result
         
     
+    def _GetNumPyImageFromPyramidLevel( self, pyramid_level: numpy.ndarray, clip_rect: QC.QRect, target_resolution: QC.QSize ):
+        
+        ( full_width, full_height ) = self._resolution
+        ( level_height, level_width ) = pyramid_level.shape[:2]
+        
+        x_factor = level_width / full_width
+        y_factor = level_height / full_height
+        
+        level_x = clip_rect.x() * x_factor
+        level_y = clip_rect.y() * y_factor
+        level_clip_width = clip_rect.width() * x_factor
+        level_clip_height = clip_rect.height() * y_factor
+        
+        # the clip does not usually land on whole pixels of the level, so we resize the whole pixels around it and crop the target out of that
+        
+        x = int( level_x )
+        y = int( level_y )
+        
+        source = pyramid_level[ y : min( level_height, math.ceil( level_y + level_clip_height ) ), x : min( level_width, math.ceil( level_x + level_clip_width ) ) ]
+        
+        ( source_height, source_width ) = source.shape[:2]
+        
+        target_width = target_resolution.width()
+        target_height = target_resolution.height()
+        
+        x_zoom = target_width / level_clip_width
+        y_zoom = target_height / level_clip_height
+        
+        resized_width = max( target_width, round( source_width * x_zoom ) )
+        resized_height = max( target_height, round( source_height * y_zoom ) )
+        
+        result = ClientImageHandling.ResizeNumPyImageForMediaViewer( self._mime, source, ( resized_width, resized_height ) )
+        
+        x = min( round( ( level_x - x ) * x_zoom ), resized_width - target_width )
+        y = min( round( ( level_y - y ) * y_zoom ), resized_height - target_height )
+        
+        result = result[ y : y + target_height, x : x + target_width ]
+        
+        if not result.data.c_contiguous:
+            
+            result = result.copy()
+            
+        
+        return result
+        
+    
+    def _GetPyramidLevel( self, zoom: float ) -> typing.Optional[ numpy.ndarray ]:
+        
+        # the smallest level that is still at least as big as the zoom wants, so the final resize is always a shrink
+        
+        with self._pyramid_lock:
+            
+            pyramid_level = None
+            level_zoom = 1.0
+            
+            for level_index in range( 32 ):
+                
+                level_zoom /= 2
+                
+                if level_zoom < zoom:
+                    
+                    break
+                    
+                
+                if level_index == len( self._pyramid ):
+                    
+                    previous_level = self._numpy_image if pyramid_level is None else pyramid_level
+                    
+                    ( height, width ) = previous_level.shape[:2]
+                    
+                    if min( width, height ) // 2 < MIN_PYRAMID_LEVEL_DIMENSION:
+                        
+                        break
+                        
+                    
+                    self._pyramid.append( ClientImageHandling.GenerateHalfSizeNumPyImage( previous_level ) )
+                    
+                
+                pyramid_level = self._pyramid[ level_index ]
+                
+            
+            return pyramid_level
+            
+        
+    
     def _Initialise( self ):
         
         # do this here so we are off the main thread and can wait
@@ -247,12 +385,14 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         
         try:
             
-            self._numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime )
+            self._numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime, target_resolution = self._target_resolution )
             
         except Exception as e:
             
             self._numpy_image = self._InitialiseErrorImage( e )
             
+            self._decode_reduction = 1
+            
             self._render_failed = True
             
             HydrusData.Print( 'Problem rendering image at "{}"! Error follows:'.format( self._path ) )
@@ -262,6 +402,8 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         
         self._is_ready = True
         
+        self._ready_event.set()
+        
         if not self._this_is_for_metadata_alone:
             
             # TODO: Move this error code to a nice button or something
@@ -282,7 +424,8 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
             CG.client_controller.Write( 'file_maintenance_add_jobs_hashes', { self._hash }, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_METADATA )
             '''
             
-            if not self._render_failed:
+            # a reduced decode is rounded however the decoder likes, so we can only check full ones
+            if not self._render_failed and self._decode_reduction == 1:
                 
                 my_resolution_size = QC.QSize( self._resolution[0], self._resolution[1] )
                 my_numpy_size = QC.QSize( self._numpy_image.shape[1], self._numpy_image.shape[0] )
@@ -354,11 +497,11 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
             
             ( width, height ) = self._resolution
             
-            return width * height * 3
+            return ( width // self._decode_reduction ) * ( height // self._decode_reduction ) * 3
             
         else:
             
-            return self._numpy_image.nbytes
+            return self._numpy_image.nbytes + sum( ( pyramid_level.nbytes for pyramid_level in self._pyramid ) )
             
         
     
@@ -481,6 +624,11 @@ class ImageRenderer( ClientCachesBase.CacheableObject ):
         return self._render_failed
         
     
+    def WaitUntilReady( self, timeout = None ) -> bool:
+        
+        return self._ready_event.wait( timeout )
+        
+    
 
 class ImageTile( ClientCachesBase.CacheableObject ):
     
@@ -500,6 +648,22 @@ class ImageTile( ClientCachesBase.CacheableObject ):
         return self._num_bytes
         
     
+class EncodedImage( ClientCachesBase.CacheableObject ):
+    
+    def __init__( self, mime: int, encoded_bytes: bytes ):
+        
+        ClientCachesBase.CacheableObject.__init__( self )
+        
+        self.mime = mime
+        self.encoded_bytes = encoded_bytes
+        
+    
+    def GetEstimatedMemoryFootprint( self ):
+        
+        return len( self.encoded_bytes )
+        
+    
+
 class RasterContainer( object ):
     
     def __init__( self, media, target_resolution = None ):
@@ -560,6 +724,8 @@ class RasterContainerVideo( RasterContainer ):
         self._frames = {}
         self._durations = []
         
+        self._keyframe_index = None
+        
         self._buffer_start_index = -1
         self._buffer_end_index = -1
         
@@ -616,6 +782,9 @@ class RasterContainerVideo( RasterContainer ):
         self._num_frames_backwards = frame_buffer_length * 2 // 3
         self._num_frames_forwards = frame_buffer_length // 3
         
+        # enough for a full buffer, plus the frame in flight as the oldest is evicted
+        self._num_frame_buffers = min( frame_buffer_length, num_frames_in_video ) + 2
+        
         self._lock = threading.Lock()
         
         self._last_index_rendered = -1
@@ -749,6 +918,14 @@ class RasterContainerVideo( RasterContainer ):
                     self._buffer_start_index = ideal_buffer_start_index
                     self._buffer_end_index = ideal_buffer_end_index
                     
+                    if self._keyframe_index is not None:
+                        
+                        # ffmpeg has to decode from the keyframe before the ideal frame anyway, so if that is later than our ideal start, start there and get to the ideal frame sooner
+                        # the buffer fills back in behind as we play on
+                        
+                        self._buffer_start_index = max( self._buffer_start_index, self._keyframe_index.GetKeyframeIndexAtOrBefore( self._ideal_next_frame ) )
+                        
+                    
                 else:
                     
                     # we can get to our desired position, but should we move the start and beginning on a bit?
@@ -903,7 +1080,22 @@ class RasterContainerVideo( RasterContainer ):
                 self._times_to_play_animation = HydrusAnimationHandling.GetTimesToPlayAPNG( self._path )
                 
             
-            self._renderer = HydrusVideoHandling.VideoRendererFFMPEG( self._path, mime, duration, num_frames_in_video, self._target_resolution )
+            keyframe_timestamps_us = None
+            
+            if mime in HC.VIDEO:
+                
+                keyframe_timestamps_us = CG.client_controller.Read( 'keyframe_timestamps', self._media.GetHash() )
+                
+            
+            self._renderer = HydrusVideoHandling.VideoRendererFFMPEG( self._path, mime, duration, num_frames_in_video, self._target_resolution, num_frame_buffers = self._num_frame_buffers, keyframe_timestamps_us = keyframe_timestamps_us )
+            
+            if keyframe_timestamps_us is not None and duration is not None and duration > 0 and num_frames_in_video is not None and num_frames_in_video > 0:
+                
+                with self._lock:
+                    
+                    self._keyframe_index = HydrusVideoHandling.KeyframeIndex( keyframe_timestamps_us, duration, num_frames_in_video )
+                    
+                
             
         
         # give ui a chance to draw a blank frame rather than hard-charge right into CPUland
@@ -1010,10 +1202,19 @@ class RasterContainerVideo( RasterContainer ):
                     should_save_frame = not self._HasFrame( frame_index )
                     
                 
+                renderer_recycles_frame_buffers = isinstance( renderer, HydrusVideoHandling.VideoRendererFFMPEG )
+                
                 if should_save_frame:
                     
                     frame = GenerateHydrusBitmapFromNumPyImage( numpy_image, compressed = False )
                     
+                    if renderer_recycles_frame_buffers:
+                        
+                        # the bitmap wraps the renderer's buffer without a copy. leaving our buffer is not enough to recycle it, since the canvas may be halfway through drawing it
+                        # so it goes back to the renderer only once nothing at all refers to the frame
+                        weakref.finalize( frame, renderer.ReleaseFrameBuffer, numpy_image )
+                        
+                    
                     with self._lock:
                         
                         self._frames[ frame_index ] = frame
@@ -1021,6 +1222,10 @@ class RasterContainerVideo( RasterContainer ):
                         self._MaintainBuffer()
                         
                     
+                elif renderer_recycles_frame_buffers:
+                    
+                    renderer.ReleaseFrameBuffer( numpy_image )
+                    
                 
                 with self._lock:
                     
@@ -1,3 +1,5 @@
+import collections
+import concurrent.futures
 import hashlib
 import json
 import os
@@ -1599,6 +1601,92 @@ class ServiceRestricted( ServiceRemote ):
             
         
     
+class RepositoryUpdateLoader( object ):
+    
+    # reading and decoding an update is mostly zlib and json, which the db thread does not need to wait on
+    # so we load the next couple on workers while the current one is written
+    # a decoded update is many times the size of its file, and there is no cheap way to measure it, so memory is bounded by count
+    # counting loading as well as loaded, we never hold more than this many updates beyond the one being processed
+    
+    MAX_NUM_UPDATES_AHEAD = 2
+    
+    def __init__( self, update_hashes_and_mimes ):
+        
+        self._update_hashes_and_mimes = list( update_hashes_and_mimes )
+        
+        self._next_index = 0
+        self._pending = collections.deque()
+        
+        self._executor = concurrent.futures.ThreadPoolExecutor( max_workers = 2, thread_name_prefix = 'repository update loader' )
+        
+    
+    def _LoadUpdate( self, update_hash, mime ):
+        
+        update_path = CG.client_controller.client_files_manager.GetFilePath( update_hash, mime )
+        
+        with open( update_path, 'rb' ) as f:
+            
+            update_network_bytes = f.read()
+            
+        
+        try:
+            
+            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
+            
+        except Exception as e:
+            
+            raise HydrusExceptions.SerialisationException( str( e ) )
+            
+        
+        return update
+        
+    
+    def _TopUp( self ):
+        
+        while self._next_index < len( self._update_hashes_and_mimes ) and len( self._pending ) < self.MAX_NUM_UPDATES_AHEAD:
+            
+            ( update_hash, mime ) = self._update_hashes_and_mimes[ self._next_index ]
+            
+            self._next_index += 1
+            
+            self._pending.append( ( update_hash, self._executor.submit( self._LoadUpdate, update_hash, mime ) ) )
+            
+        
+    
+    def GetUpdate( self, update_hash ):
+        
+        """
+        Returns the decoded update. Raises FileMissingException if the file is not there, or SerialisationException if it would not decode.
+        """
+        
+        self._TopUp()
+        
+        if len( self._pending ) == 0 or self._pending[0][0] != update_hash:
+            
+            raise Exception( 'Repository update {} was asked for out of order!'.format( update_hash.hex() ) )
+            
+        
+        ( update_hash, future ) = self._pending.popleft()
+        
+        # this one is off the books now, so there is room for another while we wait on it
+        self._TopUp()
+        
+        return future.result()
+        
+    
+    def Shutdown( self ):
+        
+        for ( update_hash, future ) in self._pending:
+            
+            future.cancel()
+            
+        
+        self._pending.clear()
+        
+        self._executor.shutdown( wait = False )
+        
+    
+
 class ServiceRepository( ServiceRestricted ):
     
     def __init__( self, service_key, service_type, name, dictionary = None ):
@@ -1882,7 +1970,28 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash } )
+                        # servers that know the columnar binary form will send it, older ones ignore the flag and send the legacy form
+                        update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash, 'binary' : 1 } )
+                        
+                        if update_network_string.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_MAGIC ):
+                            
+                            # the update hash is of the legacy form, so we rebuild that and check it like any other. it is also what we store, so file maintenance can check it later
+                            
+                            try:
+                                
+                                update_network_string = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_string ).DumpToNetworkBytes()
+                                
+                            except HydrusExceptions.SerialisationException:
+                                
+                                update_network_string = None
+                                
+                            
+                            if update_network_string is None or hashlib.sha256( update_network_string ).digest() != update_hash:
+                                
+                                # it was damaged, or the server's copy was made in a way we cannot rebuild exactly, so we get it as it is
+                                update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash } )
+                                
+                            
                         
                     except HydrusExceptions.CancelledException as e:
                         
@@ -1918,7 +2027,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update = HydrusSerialisable.CreateFromNetworkBytes( update_network_string )
+                        update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_string )
                         
                     except Exception as e:
                         
@@ -2010,6 +2119,8 @@ class ServiceRepository( ServiceRestricted ):
         
         work_done = False
         
+        update_loader = None
+        
         try:
             
             job_status = ClientThreading.JobStatus( cancellable = True, maintenance_mode = maintenance_mode, stop_time = stop_time )
@@ -2046,6 +2157,11 @@ class ServiceRepository( ServiceRestricted ):
             did_definition_analyze = False
             did_content_analyze = False
             
+            update_hashes_and_mimes = [ ( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS ) for ( definition_hash, content_types ) in definition_hashes_and_content_types ]
+            update_hashes_and_mimes.extend( ( ( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) for ( content_hash, content_types ) in content_hashes_and_content_types ) )
+            
+            update_loader = RepositoryUpdateLoader( update_hashes_and_mimes )
+            
             definition_start_time = HydrusTime.GetNowPrecise()
             
             try:
@@ -2065,7 +2181,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_path = CG.client_controller.client_files_manager.GetFilePath( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS )
+                        definition_update = update_loader.GetUpdate( definition_hash )
                         
                     except HydrusExceptions.FileMissingException:
                         
@@ -2073,17 +2189,7 @@ class ServiceRepository( ServiceRestricted ):
                         
                         raise Exception( 'An unusual error has occured during repository processing: a definition update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. I recommend you run _database->maintenance->clear/fix orphan file records_ too. Please then permit file maintenance under _database->file maintenance->manage scheduled jobs_ to finish its new work, which should fix this, before unpausing your repository.'.format( definition_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        definition_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
-                    except:
+                    except HydrusExceptions.SerialisationException:
                         
                         CG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD )
                         
@@ -2194,7 +2300,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_path = CG.client_controller.client_files_manager.GetFilePath( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT )
+                        content_update = update_loader.GetUpdate( content_hash )
                         
                     except HydrusExceptions.FileMissingException:
                         
@@ -2202,17 +2308,7 @@ class ServiceRepository( ServiceRestricted ):
                         
                         raise Exception( 'An unusual error has occured during repository processing: a content update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. I recommend you run _database->maintenance->clear/fix orphan file records_ too. Please then permit file maintenance under _database->file maintenance->manage scheduled jobs_ to finish its new work, which should fix this, before unpausing your repository.'.format( content_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        content_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
-                    except:
+                    except HydrusExceptions.SerialisationException:
                         
                         CG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD )
                         
@@ -2346,6 +2442,11 @@ class ServiceRepository( ServiceRestricted ):
             
         finally:
             
+            if update_loader is not None:
+                
+                update_loader.Shutdown()
+                
+            
             if work_done:
                 
                 with self._lock:
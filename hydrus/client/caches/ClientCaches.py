@@ -1,8 +1,12 @@
 import collections
+import concurrent.futures
 import json
+import mmap
 import os
+import struct
 import threading
 import time
+import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
@@ -23,6 +27,13 @@ from hydrus.client import ClientRendering
 from hydrus.client import ClientThreading
 from hydrus.client.caches import ClientCachesBase
 
+RENDERING_CACHE_NAMES = ( 'thumbnail', 'images', 'image_tiles', 'encoded_images' )
+
+def GetRenderingDataCaches( controller ) -> list:
+    
+    return [ controller.GetCache( name ).GetDataCache() for name in RENDERING_CACHE_NAMES ]
+    
+
 class LocalBooruCache( object ):
     
     def __init__( self, controller ):
@@ -280,6 +291,58 @@ class ParsingCache( object ):
             
         
     
+class EncodedImageCache( object ):
+    
+    def __init__( self, controller ):
+        
+        self._controller = controller
+        
+        cache_size = self._controller.new_options.GetInteger( 'encoded_image_cache_size' )
+        cache_timeout = self._controller.new_options.GetInteger( 'encoded_image_cache_timeout' )
+        
+        self._data_cache = ClientCachesBase.DataCache( self._controller, 'encoded image cache', cache_size, timeout = cache_timeout )
+        
+        self._controller.sub( self, 'NotifyNewOptions', 'notify_new_options' )
+        
+    
+    def AddEncodedImage( self, hash, target_resolution, mime, quality, encoded_image: ClientRendering.EncodedImage ):
+        
+        key = ( hash, target_resolution, mime, quality )
+        
+        # a single enormous png should not flush everything else
+        
+        if encoded_image.GetEstimatedMemoryFootprint() < self._data_cache.GetSizeLimit() // 4:
+            
+            self._data_cache.AddData( key, encoded_image )
+            
+        
+    
+    def Clear( self ):
+        
+        self._data_cache.Clear()
+        
+    
+    def GetDataCache( self ) -> ClientCachesBase.DataCache:
+        
+        return self._data_cache
+        
+    
+    def GetEncodedImage( self, hash, target_resolution, mime, quality ) -> typing.Optional[ ClientRendering.EncodedImage ]:
+        
+        key = ( hash, target_resolution, mime, quality )
+        
+        return self._data_cache.GetIfHasData( key )
+        
+    
+    def NotifyNewOptions( self ):
+        
+        cache_size = self._controller.new_options.GetInteger( 'encoded_image_cache_size' )
+        cache_timeout = self._controller.new_options.GetInteger( 'encoded_image_cache_timeout' )
+        
+        self._data_cache.SetCacheSizeAndTimeout( cache_size, cache_timeout )
+        
+    
+
 class ImageRendererCache( object ):
     
     def __init__( self, controller ):
@@ -299,7 +362,12 @@ class ImageRendererCache( object ):
         self._data_cache.Clear()
         
     
-    def GetImageRenderer( self, media ):
+    def GetDataCache( self ) -> ClientCachesBase.DataCache:
+        
+        return self._data_cache
+        
+    
+    def GetImageRenderer( self, media, target_resolution = None ):
         
         hash = media.GetHash()
         
@@ -309,7 +377,25 @@ class ImageRendererCache( object ):
         
         if result is None:
             
-            image_renderer = ClientRendering.ImageRenderer( media )
+            # a full renderer is good for any size, but if we don't have one and only need something small, a reduced decode is much quicker
+            
+            decode_reduction = ClientRendering.GetImageRendererDecodeReduction( media, target_resolution )
+            
+            if decode_reduction > 1:
+                
+                key = ( hash, decode_reduction )
+                
+                result = self._data_cache.GetIfHasData( key )
+                
+            else:
+                
+                target_resolution = None
+                
+            
+        
+        if result is None:
+            
+            image_renderer = ClientRendering.ImageRenderer( media, target_resolution = target_resolution )
             
             # we are no longer going to let big lads flush the whole cache. they can render on demand
             
@@ -377,6 +463,11 @@ class ImageTileCache( object ):
         self._data_cache.Clear()
         
     
+    def GetDataCache( self ) -> ClientCachesBase.DataCache:
+        
+        return self._data_cache
+        
+    
     def GetTile( self, image_renderer: ClientRendering.ImageRenderer, media, clip_rect, target_resolution ):
         
         hash = media.GetHash()
@@ -417,6 +508,289 @@ class ImageTileCache( object ):
         self._data_cache.SetCacheSizeAndTimeout( cache_size, cache_timeout )
         
     
+class ThumbnailDiskCache( object ):
+    
+    # a second-level cache under the thumbnail memory cache
+    # it stores thumbnails already decoded and scaled to the current thumbnail settings as raw pixels in one append-only pack file, read back through mmap, so a cold thumbnail needs no jpeg/png decode
+    # the pack header records the thumbnail settings it was built for. if they change, we start again
+    # a record with no pixels is a tombstone. when the pack outgrows its size limit, we start again
+    
+    PACK_HEADER = struct.Struct( '>8sIIIII' )
+    RECORD_HEADER = struct.Struct( '>32sIIBI' )
+    
+    PACK_MAGIC = b'HYTHPACK'
+    PACK_VERSION = 1
+    
+    def __init__( self, path, size_limit, thumbnail_settings ):
+        
+        self._path = path
+        self._size_limit = size_limit
+        self._thumbnail_settings = thumbnail_settings
+        
+        self._lock = threading.Lock()
+        
+        self._file = None
+        self._mmap = None
+        self._file_size = 0
+        
+        self._hashes_to_records = {}
+        
+        self._InitialiseFile()
+        
+    
+    def _CloseMMap( self ):
+        
+        if self._mmap is not None:
+            
+            self._mmap.close()
+            
+            self._mmap = None
+            
+        
+    
+    def _GetMMap( self, needed_size ):
+        
+        if self._mmap is None or len( self._mmap ) < needed_size:
+            
+            self._CloseMMap()
+            
+            self._mmap = mmap.mmap( self._file.fileno(), 0, access = mmap.ACCESS_READ )
+            
+        
+        return self._mmap
+        
+    
+    def _InitialiseFile( self ):
+        
+        if os.path.exists( self._path ):
+            
+            self._file = open( self._path, 'r+b' )
+            
+            try:
+                
+                self._LoadIndex()
+                
+                return
+                
+            except Exception as e:
+                
+                HydrusData.Print( 'The decoded thumbnail cache at "{}" was not loadable, so it is being reset. The error was: {}'.format( self._path, e ) )
+                
+            
+        else:
+            
+            self._file = open( self._path, 'w+b' )
+            
+        
+        self._Reset()
+        
+    
+    def _LoadIndex( self ):
+        
+        self._file.seek( 0, os.SEEK_END )
+        
+        file_size = self._file.tell()
+        
+        if file_size < self.PACK_HEADER.size:
+            
+            raise Exception( 'Pack file was truncated.' )
+            
+        
+        pack_mmap = mmap.mmap( self._file.fileno(), 0, access = mmap.ACCESS_READ )
+        
+        try:
+            
+            ( magic, version, bounding_width, bounding_height, scale_type, dpr_percent ) = self.PACK_HEADER.unpack_from( pack_mmap, 0 )
+            
+            if magic != self.PACK_MAGIC or version != self.PACK_VERSION:
+                
+                raise Exception( 'Pack file header was not understood.' )
+                
+            
+            if ( bounding_width, bounding_height, scale_type, dpr_percent ) != self._thumbnail_settings:
+                
+                raise Exception( 'Pack file was for different thumbnail settings.' )
+                
+            
+            hashes_to_records = {}
+            
+            offset = self.PACK_HEADER.size
+            
+            while offset + self.RECORD_HEADER.size <= file_size:
+                
+                ( hash, width, height, depth, data_length ) = self.RECORD_HEADER.unpack_from( pack_mmap, offset )
+                
+                data_offset = offset + self.RECORD_HEADER.size
+                
+                if data_offset + data_length > file_size:
+                    
+                    # the last write did not finish
+                    break
+                    
+                
+                if data_length == 0:
+                    
+                    hashes_to_records.pop( hash, None )
+                    
+                else:
+                    
+                    hashes_to_records[ hash ] = ( data_offset, data_length, width, height, depth )
+                    
+                
+                offset = data_offset + data_length
+                
+            
+        finally:
+            
+            pack_mmap.close()
+            
+        
+        if offset < file_size:
+            
+            self._file.truncate( offset )
+            
+        
+        self._file_size = offset
+        self._hashes_to_records = hashes_to_records
+        
+    
+    def _Reset( self ):
+        
+        self._CloseMMap()
+        
+        self._hashes_to_records = {}
+        
+        ( bounding_width, bounding_height, scale_type, dpr_percent ) = self._thumbnail_settings
+        
+        self._file.seek( 0 )
+        self._file.truncate()
+        self._file.write( self.PACK_HEADER.pack( self.PACK_MAGIC, self.PACK_VERSION, bounding_width, bounding_height, scale_type, dpr_percent ) )
+        self._file.flush()
+        
+        self._file_size = self.PACK_HEADER.size
+        
+    
+    def _WriteRecord( self, hash, width, height, depth, data ):
+        
+        self._file.seek( self._file_size )
+        
+        self._file.write( self.RECORD_HEADER.pack( hash, width, height, depth, len( data ) ) )
+        self._file.write( data )
+        
+        self._file.flush()
+        
+        data_offset = self._file_size + self.RECORD_HEADER.size
+        
+        self._file_size = data_offset + len( data )
+        
+        return data_offset
+        
+    
+    def Clear( self ):
+        
+        with self._lock:
+            
+            self._Reset()
+            
+        
+    
+    def Close( self ):
+        
+        with self._lock:
+            
+            self._CloseMMap()
+            
+            self._file.close()
+            
+        
+    
+    def DeleteThumbnails( self, hashes ):
+        
+        with self._lock:
+            
+            for hash in hashes:
+                
+                if hash in self._hashes_to_records:
+                    
+                    del self._hashes_to_records[ hash ]
+                    
+                    self._WriteRecord( hash, 0, 0, 0, b'' )
+                    
+                
+            
+        
+    
+    def GetThumbnail( self, hash ):
+        
+        with self._lock:
+            
+            if hash not in self._hashes_to_records:
+                
+                return None
+                
+            
+            ( data_offset, data_length, width, height, depth ) = self._hashes_to_records[ hash ]
+            
+            pack_mmap = self._GetMMap( data_offset + data_length )
+            
+            data = pack_mmap[ data_offset : data_offset + data_length ]
+            
+            return ( ( width, height ), depth, data )
+            
+        
+    
+    def SetSizeLimit( self, size_limit ):
+        
+        with self._lock:
+            
+            self._size_limit = size_limit
+            
+            if self._file_size > self._size_limit:
+                
+                self._Reset()
+                
+            
+        
+    
+    def SetThumbnailSettings( self, thumbnail_settings ):
+        
+        with self._lock:
+            
+            if thumbnail_settings != self._thumbnail_settings:
+                
+                self._thumbnail_settings = thumbnail_settings
+                
+                self._Reset()
+                
+            
+        
+    
+    def StoreThumbnail( self, hash, numpy_image ):
+        
+        ( height, width, depth ) = numpy_image.shape
+        
+        if depth not in ( 3, 4 ) or numpy_image.dtype != 'uint8':
+            
+            return
+            
+        
+        data = numpy_image.tobytes()
+        
+        with self._lock:
+            
+            if self._file_size + self.RECORD_HEADER.size + len( data ) > self._size_limit:
+                
+                # simple and cheap. the hot thumbs will be back soon enough
+                self._Reset()
+                
+            
+            data_offset = self._WriteRecord( hash, width, height, depth, data )
+            
+            self._hashes_to_records[ hash ] = ( data_offset, len( data ), width, height, depth )
+            
+        
+    
+
 class ThumbnailCache( object ):
     
     def __init__( self, controller ):
@@ -448,8 +822,17 @@ class ThumbnailCache( object ):
         
         self._waterfall_event = threading.Event()
         
+        self._num_waterfall_workers = 1
+        self._waterfall_executor = None
+        
+        self._UpdateWaterfallWorkers()
+        
         self._special_thumbs = {}
         
+        self._disk_cache = None
+        
+        self._UpdateDiskCache()
+        
         self.Clear()
         
         self._controller.CallToThreadLongRunning( self.MainLoop )
@@ -502,6 +885,20 @@ class ThumbnailCache( object ):
         
         hash = display_media.GetHash()
         
+        disk_cache = self._disk_cache
+        
+        if disk_cache is not None:
+            
+            result = disk_cache.GetThumbnail( hash )
+            
+            if result is not None:
+                
+                ( size, depth, data ) = result
+                
+                return ClientRendering.HydrusBitmap( data, size, depth )
+                
+            
+        
         locations_manager = display_media.GetLocationsManager()
         
         try:
@@ -609,6 +1006,17 @@ class ThumbnailCache( object ):
                     
                 
             
+        elif disk_cache is not None:
+            
+            try:
+                
+                disk_cache.StoreThumbnail( hash, numpy_image )
+                
+            except Exception as e:
+                
+                HydrusData.Print( 'Could not write thumbnail {} to the decoded thumbnail cache: {}'.format( hash.hex(), e ) )
+                
+            
         
         hydrus_bitmap = ClientRendering.GenerateHydrusBitmapFromNumPyImage( numpy_image )
         
@@ -747,6 +1155,15 @@ class ThumbnailCache( object ):
         self._delayed_regeneration_queue.sort( key = sort_regen, reverse = True )
         
     
+    def _GetThumbnailSettings( self ):
+        
+        ( bounding_width, bounding_height ) = self._controller.options[ 'thumbnail_dimensions' ]
+        thumbnail_scale_type = self._controller.new_options.GetInteger( 'thumbnail_scale_type' )
+        thumbnail_dpr_percent = self._controller.new_options.GetInteger( 'thumbnail_dpr_percent' )
+        
+        return ( bounding_width, bounding_height, thumbnail_scale_type, thumbnail_dpr_percent )
+        
+    
     def _ShouldBeAbleToProvideThumb( self, media ):
         
         locations_manager = media.GetLocationsManager()
@@ -758,6 +1175,80 @@ class ThumbnailCache( object ):
         return we_have_file or we_should_have_thumb or we_have_blurhash
         
     
+    def _UpdateDiskCache( self ):
+        
+        size_limit = self._controller.new_options.GetNoneableInteger( 'thumbnail_disk_cache_size' )
+        
+        path = os.path.join( self._controller.db_dir, 'client_thumbnails.pack' )
+        
+        if size_limit is None:
+            
+            if self._disk_cache is not None:
+                
+                disk_cache = self._disk_cache
+                
+                self._disk_cache = None
+                
+                disk_cache.Close()
+                
+            
+            if os.path.exists( path ):
+                
+                try:
+                    
+                    os.remove( path )
+                    
+                except Exception as e:
+                    
+                    HydrusData.Print( 'Could not delete the decoded thumbnail cache: {}'.format( e ) )
+                    
+                
+            
+        else:
+            
+            if self._disk_cache is None:
+                
+                try:
+                    
+                    self._disk_cache = ThumbnailDiskCache( path, size_limit, self._GetThumbnailSettings() )
+                    
+                except Exception as e:
+                    
+                    HydrusData.ShowText( 'Could not open the decoded thumbnail cache at "{}"! It will be off for this session. The error was: {}'.format( path, e ) )
+                    
+                
+            else:
+                
+                self._disk_cache.SetSizeLimit( size_limit )
+                
+            
+        
+    
+    def _UpdateWaterfallWorkers( self ):
+        
+        num_waterfall_workers = max( 1, self._controller.new_options.GetInteger( 'thumbnail_waterfall_workers' ) )
+        
+        if num_waterfall_workers == self._num_waterfall_workers:
+            
+            return
+            
+        
+        if self._waterfall_executor is not None:
+            
+            # anything still running finishes on the old executor
+            self._waterfall_executor.shutdown( wait = False )
+            
+            self._waterfall_executor = None
+            
+        
+        self._num_waterfall_workers = num_waterfall_workers
+        
+        if self._num_waterfall_workers > 1:
+            
+            self._waterfall_executor = concurrent.futures.ThreadPoolExecutor( max_workers = self._num_waterfall_workers, thread_name_prefix = 'thumbnail waterfall' )
+            
+        
+    
     def CancelWaterfall( self, page_key: bytes, medias: list ):
         
         with self._lock:
@@ -791,6 +1282,11 @@ class ThumbnailCache( object ):
             
             self._special_thumbs = {}
             
+            if self._disk_cache is not None:
+                
+                self._disk_cache.SetThumbnailSettings( self._GetThumbnailSettings() )
+                
+            
             bounding_dimensions = self._controller.options[ 'thumbnail_dimensions' ]
             thumbnail_scale_type = self._controller.new_options.GetInteger( 'thumbnail_scale_type' )
             thumbnail_dpr_percent = CG.client_controller.new_options.GetInteger( 'thumbnail_dpr_percent' )
@@ -828,6 +1324,11 @@ class ThumbnailCache( object ):
                 self._data_cache.DeleteData( hash )
                 
             
+            if self._disk_cache is not None:
+                
+                self._disk_cache.DeleteThumbnails( hashes )
+                
+            
         
     
     def WaitUntilFree( self ):
@@ -848,6 +1349,11 @@ class ThumbnailCache( object ):
             
         
     
+    def GetDataCache( self ) -> ClientCachesBase.DataCache:
+        
+        return self._data_cache
+        
+    
     def GetThumbnail( self, media ):
         
         display_media = media.GetDisplayMedia()
@@ -944,6 +1450,13 @@ class ThumbnailCache( object ):
         
         self._data_cache.SetCacheSizeAndTimeout( cache_size, cache_timeout )
         
+        with self._lock:
+            
+            self._UpdateDiskCache()
+            
+            self._UpdateWaterfallWorkers()
+            
+        
         allow_blurhash_fallback = self._controller.new_options.GetBoolean( 'allow_blurhash_fallback' )
         
         if allow_blurhash_fallback != self._allow_blurhash_fallback:
@@ -994,33 +1507,76 @@ class ThumbnailCache( object ):
             
             while not HydrusTime.TimeHasPassedPrecise( stop_time ) and num_done <= max_at_once:
                 
+                # we only pop one batch at a time, so a CancelWaterfall still catches everything we have not started
+                
                 with self._lock:
                     
-                    if len( self._waterfall_queue ) == 0:
+                    waterfall_executor = self._waterfall_executor
+                    
+                    batch = []
+                    
+                    while len( self._waterfall_queue ) > 0 and len( batch ) < self._num_waterfall_workers:
                         
-                        break
+                        result = self._waterfall_queue.pop()
+                        
+                        self._waterfall_queue_quick.discard( result )
+                        
+                        batch.append( result )
                         
-                    
-                    result = self._waterfall_queue.pop()
                     
                     if len( self._waterfall_queue ) == 0:
                         
                         self._waterfall_queue_empty_event.set()
                         
                     
-                    self._waterfall_queue_quick.discard( result )
+                
+                if len( batch ) == 0:
+                    
+                    break
                     
                 
-                ( page_key, media ) = result
+                batch = [ ( page_key, media ) for ( page_key, media ) in batch if media.GetDisplayMedia() is not None ]
                 
-                if media.GetDisplayMedia() is not None:
+                if waterfall_executor is None or len( batch ) < 2:
+                    
+                    for ( page_key, media ) in batch:
+                        
+                        self.GetThumbnail( media )
+                        
                     
-                    self.GetThumbnail( media )
+                else:
+                    
+                    # PIL and numpy let go of the GIL for most of a decode and resize, so the batch really does happen in parallel
+                    
+                    try:
+                        
+                        futures = [ waterfall_executor.submit( self.GetThumbnail, media ) for ( page_key, media ) in batch ]
+                        
+                    except RuntimeError:
+                        
+                        # the executor was swapped out under us by an options change
+                        
+                        futures = []
+                        
+                        for ( page_key, media ) in batch:
+                            
+                            self.GetThumbnail( media )
+                            
+                        
+                    
+                    # result() rather than wait(), so an error in a worker comes up here just like it would from the serial path
+                    for future in futures:
+                        
+                        future.result()
+                        
+                    
+                
+                for ( page_key, media ) in batch:
                     
                     page_keys_to_rendered_medias[ page_key ].append( media )
                     
                 
-                num_done += 1
+                num_done += len( batch )
                 
             
             if len( page_keys_to_rendered_medias ) > 0:
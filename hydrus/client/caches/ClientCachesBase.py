@@ -6,6 +6,9 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTime
 
+# how far back we look when calculating bytes/s churn
+CHURN_WINDOW = 60
+
 class CacheableObject( object ):
     
     def GetEstimatedMemoryFootprint( self ) -> int:
@@ -30,6 +33,8 @@ class DataCache( object ):
         
         self._lock = threading.Lock()
         
+        self._InitialiseMetrics()
+        
         self._controller.sub( self, 'MaintainCache', 'memory_maintenance_pulse' )
         
     
@@ -56,9 +61,60 @@ class DataCache( object ):
         
         ( deletee_key, last_access_time ) = self._keys_fifo.popitem( last = False )
         
+        if deletee_key in self._keys_to_data:
+            
+            ( data, size_estimate ) = self._keys_to_data[ deletee_key ]
+            
+            self._num_evictions += 1
+            self._num_bytes_evicted += size_estimate
+            
+            self._RecordChurn( size_estimate )
+            
+        
         self._Delete( deletee_key )
         
     
+    def _EnforceSizeLimit( self, protected_key = None ):
+        
+        # we do this on every add and resize, not just the maintenance pulse, so we never sit far over budget
+        
+        while self._total_estimated_memory_footprint > self._cache_size and len( self._keys_fifo ) > 0:
+            
+            ( oldest_key, last_access_time ) = next( iter( self._keys_fifo.items() ) )
+            
+            if oldest_key == protected_key:
+                
+                if len( self._keys_fifo ) == 1:
+                    
+                    break
+                    
+                
+                # the protected key is the only thing we are guaranteed to want right now, so shuffle it to the back
+                self._TouchKey( oldest_key )
+                
+                continue
+                
+            
+            self._DeleteItem()
+            
+        
+    
+    def _GetChurnBytesPerSecond( self ) -> float:
+        
+        self._PruneChurn()
+        
+        if len( self._recent_churn ) == 0:
+            
+            return 0.0
+            
+        
+        total_bytes = sum( ( num_bytes for ( timestamp, num_bytes ) in self._recent_churn ) )
+        
+        period = min( CHURN_WINDOW, max( 1.0, HydrusTime.GetNowFloat() - self._metrics_start_time ) )
+        
+        return total_bytes / period
+        
+    
     def _GetData( self, key ) -> CacheableObject:
         
         if key not in self._keys_to_data:
@@ -78,10 +134,48 @@ class DataCache( object ):
             
             self._keys_to_data[ key ] = ( data, new_estimate )
             
+            if new_estimate > size_estimate:
+                
+                self._EnforceSizeLimit( protected_key = key )
+                
+            
         
         return data
         
     
+    def _InitialiseMetrics( self ):
+        
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
+        self._num_bytes_added = 0
+        self._num_bytes_evicted = 0
+        
+        self._recent_churn = collections.deque()
+        
+        self._metrics_start_time = HydrusTime.GetNowFloat()
+        
+    
+    def _PruneChurn( self ):
+        
+        cutoff = HydrusTime.GetNowFloat() - CHURN_WINDOW
+        
+        while len( self._recent_churn ) > 0 and self._recent_churn[0][0] < cutoff:
+            
+            self._recent_churn.popleft()
+            
+        
+    
+    def _RecordChurn( self, num_bytes ):
+        
+        self._recent_churn.append( ( HydrusTime.GetNowFloat(), num_bytes ) )
+        
+        if len( self._recent_churn ) > 4096:
+            
+            self._PruneChurn()
+            
+        
+    
     def _TouchKey( self, key ):
         
         # have to delete first, rather than overwriting, so the ordereddict updates its internal order
@@ -110,19 +204,20 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
-                while self._total_estimated_memory_footprint > self._cache_size:
-                    
-                    self._DeleteItem()
-                    
-                
                 size_estimate = data.GetEstimatedMemoryFootprint()
                 
                 self._keys_to_data[ key ] = ( data, size_estimate )
                 
                 self._total_estimated_memory_footprint += size_estimate
                 
+                self._num_bytes_added += size_estimate
+                
+                self._RecordChurn( size_estimate )
+                
                 self._TouchKey( key )
                 
+                self._EnforceSizeLimit( protected_key = key )
+                
                 if HG.cache_report_mode:
                     
                     HydrusData.ShowText(
@@ -160,15 +255,57 @@ class DataCache( object ):
             
             if key in self._keys_to_data:
                 
+                self._num_hits += 1
+                
                 return self._GetData( key )
                 
             else:
                 
+                self._num_misses += 1
+                
                 return None
                 
             
         
     
+    def GetMetrics( self ) -> dict:
+        
+        with self._lock:
+            
+            num_lookups = self._num_hits + self._num_misses
+            
+            if num_lookups == 0:
+                
+                hit_rate = 0.0
+                
+            else:
+                
+                hit_rate = self._num_hits / num_lookups
+                
+            
+            return {
+                'name' : self._name,
+                'size_limit' : self._cache_size,
+                'size' : self._total_estimated_memory_footprint,
+                'num_items' : len( self._keys_to_data ),
+                'timeout' : self._timeout,
+                'num_hits' : self._num_hits,
+                'num_misses' : self._num_misses,
+                'hit_rate' : hit_rate,
+                'num_evictions' : self._num_evictions,
+                'num_bytes_added' : self._num_bytes_added,
+                'num_bytes_evicted' : self._num_bytes_evicted,
+                'churn_bytes_per_second' : self._GetChurnBytesPerSecond(),
+                'metrics_period' : HydrusTime.GetNowFloat() - self._metrics_start_time
+            }
+            
+        
+    
+    def GetName( self ) -> str:
+        
+        return self._name
+        
+    
     def GetSizeLimit( self ) -> int:
         
         with self._lock:
@@ -189,10 +326,9 @@ class DataCache( object ):
         
         with self._lock:
             
-            while self._total_estimated_memory_footprint > self._cache_size:
-                
-                self._DeleteItem()
-                
+            self._EnforceSizeLimit()
+            
+            self._PruneChurn()
             
             while True:
                 
@@ -217,6 +353,14 @@ class DataCache( object ):
             
         
     
+    def ResetMetrics( self ):
+        
+        with self._lock:
+            
+            self._InitialiseMetrics()
+            
+        
+    
     def SetCacheSizeAndTimeout( self, cache_size, timeout ) -> None:
         
         with self._lock:
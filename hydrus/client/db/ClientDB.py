@@ -1,4 +1,5 @@
 import collections
+import copy
 import hashlib
 import itertools    
 import math
@@ -15,6 +16,7 @@ from qtpy import QtWidgets as QW
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusDB
+from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusLists
@@ -227,6 +229,9 @@ class DB( HydrusDB.HydrusDB ):
     
     READ_WRITE_ACTIONS = [ 'service_info', 'system_predicates', 'missing_thumbnail_hashes' ]
     
+    # these can go to a read-only connection when one is free, so a slow search does not hold up everything else. if they turn out to need a write, they fall back to the main connection
+    READ_REPLICA_ACTIONS = { 'autocomplete_predicates', 'file_hashes', 'file_query_ids', 'hash_ids_to_hashes', 'media_result', 'media_results', 'media_results_from_ids' }
+    
     def __init__( self, controller: ClientControllerInterface.ClientControllerInterface, db_dir, db_name ):
         
         self._initial_messages = []
@@ -2510,6 +2515,31 @@ class DB( HydrusDB.HydrusDB ):
         return file_info_managers
         
     
+    def _GenerateReadReplica( self, cursor: sqlite3.Cursor, temporary_integer_table_name_cache: HydrusDBBase.TemporaryIntegerTableNameCache ):
+        
+        # a replica is this db looking through its own connection with its own fresh set of modules, so none of their in-memory caches are shared with the main thread
+        # the media result cache is shared. it has its own lock, is kept up to date by pubsub, and the main loop does not write while a replica is working
+        
+        read_replica = copy.copy( self )
+        
+        read_replica._SetCursor( cursor )
+        read_replica._temporary_integer_table_name_cache = temporary_integer_table_name_cache
+        
+        # nothing here ever commits, this is just somewhere for the modules to put their rollback hooks and pubsubs
+        read_replica._cursor_transaction_wrapper = HydrusDBBase.DBCursorTransactionWrapper( cursor, HG.db_transaction_commit_period )
+        
+        read_replica._modules = []
+        
+        read_replica._LoadModules()
+        
+        for module in read_replica._modules:
+            
+            module.SetTemporaryIntegerTableNameCache( temporary_integer_table_name_cache )
+            
+        
+        return read_replica
+        
+    
     def _GetBonedStats( self, file_search_context: ClientSearch.FileSearchContext = None, job_status = None ):
         
         if job_status is None:
@@ -3625,6 +3655,13 @@ class DB( HydrusDB.HydrusDB ):
         return ( storage_tag_data, display_tag_data )
         
     
+    def _GetKeyframeTimestampsUS( self, hash ) -> typing.Optional[ typing.List[ int ] ]:
+        
+        hash_id = self.modules_hashes_local_cache.GetHashId( hash )
+        
+        return self.modules_files_metadata_basic.GetKeyframeTimestampsUS( hash_id )
+        
+    
     def _GetMaintenanceDue( self, stop_time ):
         
         jobs_to_do = []
@@ -4934,6 +4971,11 @@ class DB( HydrusDB.HydrusDB ):
             self.modules_files_metadata_basic.SetHasICCProfile( hash_id, file_import_job.HasICCProfile() )
             self.modules_files_metadata_basic.SetBlurhash( hash_id, file_import_job.GetBlurhash() )
             
+            if mime in HC.VIDEO:
+                
+                self.modules_files_maintenance_queue.AddJobs( { hash_id }, ClientFiles.REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX )
+                
+            
             #
             
             file_modified_timestamp_ms = file_import_job.GetFileModifiedTimestampMS()
@@ -5006,9 +5048,16 @@ class DB( HydrusDB.HydrusDB ):
     
     def _ImportUpdate( self, update_network_bytes, update_hash, mime ):
         
+        # file maintenance checks update files against their hash, so anything else would be thrown away and fetched again forever
+        
+        if hashlib.sha256( update_network_bytes ).digest() != update_hash:
+            
+            raise Exception( 'The update ' + update_hash.hex() + ' did not match its hash!' )
+            
+        
         try:
             
-            HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
             
         except:
             
@@ -5251,7 +5300,7 @@ class DB( HydrusDB.HydrusDB ):
         
         #
         
-        self.modules_similar_files = ClientDBSimilarFiles.ClientDBSimilarFiles( self._c, self.modules_services, self.modules_files_storage )
+        self.modules_similar_files = ClientDBSimilarFiles.ClientDBSimilarFiles( self._c, self._cursor_transaction_wrapper, self.modules_services, self.modules_files_storage )
         
         self._modules.append( self.modules_similar_files )
         
@@ -5601,6 +5650,25 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _NormaliseRepositoryMappingsChunk( self, service_id, chunk ):
+        
+        # one round of normalisation for the whole chunk
+        
+        all_service_tag_ids = set()
+        all_service_hash_ids = set()
+        
+        for ( service_tag_id, service_hash_ids ) in chunk:
+            
+            all_service_tag_ids.add( service_tag_id )
+            all_service_hash_ids.update( service_hash_ids )
+            
+        
+        service_tag_ids_to_tag_ids = self.modules_repositories.NormaliseServiceTagIdsToTagIds( service_id, all_service_tag_ids )
+        service_hash_ids_to_hash_ids = self.modules_repositories.NormaliseServiceHashIdsToHashIds( service_id, all_service_hash_ids )
+        
+        return ( service_tag_ids_to_tag_ids, service_hash_ids_to_hash_ids )
+        
+    
     def _PerceptualHashesResetSearchFromHashes( self, hashes ):
         
         hash_ids = self.modules_hashes_local_cache.GetHashIds( hashes )
@@ -5615,50 +5683,86 @@ class DB( HydrusDB.HydrusDB ):
         num_done = 0
         still_work_to_do = True
         
-        group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+        # we search in blocks so the similar files search can walk its index for the whole block at once
+        # we start small and then size the next block to fit how fast we are going and how much time we have left
+        block_size = 10
         
-        while len( group_of_hash_ids ) > 0:
+        group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( block_size ) )
         
+        while len( group_of_hash_ids ) > 0:
+            
             text = 'searching potential duplicates: {}'.format( HydrusData.ToHumanInt( num_done ) )
             
             CG.client_controller.frame_splash_status.SetSubtext( text )
             
-            for ( i, hash_id ) in enumerate( group_of_hash_ids ):
+            if work_time_float is not None and HydrusTime.TimeHasPassedFloat( time_started_float + work_time_float ):
                 
-                if work_time_float is not None and HydrusTime.TimeHasPassedFloat( time_started_float + work_time_float ):
-                    
-                    return ( still_work_to_do, num_done )
-                    
+                return ( still_work_to_do, num_done )
                 
-                if job_status is not None:
-                    
-                    ( i_paused, should_stop ) = job_status.WaitIfNeeded()
-                    
-                    if should_stop:
-                        
-                        return ( still_work_to_do, num_done )
-                        
-                    
+            
+            if job_status is not None:
                 
-                should_stop = CG.client_controller.ShouldStopThisWork( maintenance_mode, stop_time = stop_time )
+                ( i_paused, should_stop ) = job_status.WaitIfNeeded()
                 
                 if should_stop:
                     
                     return ( still_work_to_do, num_done )
                     
                 
-                media_id = self.modules_files_duplicates.GetMediaId( hash_id )
+            
+            should_stop = CG.client_controller.ShouldStopThisWork( maintenance_mode, stop_time = stop_time )
+            
+            if should_stop:
+                
+                return ( still_work_to_do, num_done )
+                
+            
+            hash_ids_to_similar_hash_ids_and_distances = self.modules_similar_files.SearchFiles( group_of_hash_ids, search_distance )
+            
+            # resolve every media_id the block touches in one go, rather than a lookup per file and per result
+            all_hash_ids = set( hash_ids_to_similar_hash_ids_and_distances.keys() )
+            
+            for similar_hash_ids_and_distances in hash_ids_to_similar_hash_ids_and_distances.values():
+                
+                all_hash_ids.update( ( duplicate_hash_id for ( duplicate_hash_id, distance ) in similar_hash_ids_and_distances ) )
                 
-                potential_duplicate_media_ids_and_distances = [ ( self.modules_files_duplicates.GetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in self.modules_similar_files.SearchFile( hash_id, search_distance ) if duplicate_hash_id != hash_id ]
+            
+            hash_ids_to_media_ids = self.modules_files_duplicates.GetHashIdsToMediaIds( all_hash_ids )
+            
+            media_ids_to_potential_duplicate_media_ids_and_distances = collections.defaultdict( list )
+            
+            for ( hash_id, similar_hash_ids_and_distances ) in hash_ids_to_similar_hash_ids_and_distances.items():
                 
-                self.modules_files_duplicates.AddPotentialDuplicates( media_id, potential_duplicate_media_ids_and_distances )
+                media_id = hash_ids_to_media_ids[ hash_id ]
                 
-                self._Execute( 'UPDATE shape_search_cache SET searched_distance = ? WHERE hash_id = ?;', ( search_distance, hash_id ) )
+                potential_duplicate_media_ids_and_distances = [ ( hash_ids_to_media_ids[ duplicate_hash_id ], distance ) for ( duplicate_hash_id, distance ) in similar_hash_ids_and_distances if duplicate_hash_id != hash_id ]
                 
-                num_done += 1
+                media_ids_to_potential_duplicate_media_ids_and_distances[ media_id ].extend( potential_duplicate_media_ids_and_distances )
                 
             
-            group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+            self.modules_files_duplicates.AddPotentialDuplicatesMany( media_ids_to_potential_duplicate_media_ids_and_distances )
+            
+            with self._MakeTemporaryIntegerTable( group_of_hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+                
+                self._Execute( 'UPDATE shape_search_cache SET searched_distance = ? WHERE hash_id IN ( SELECT hash_id FROM {} );'.format( temp_hash_ids_table_name ), ( search_distance, ) )
+                
+            
+            num_done += len( group_of_hash_ids )
+            
+            if work_time_float is None:
+                
+                block_size = 4096
+                
+            else:
+                
+                time_per_file = ( HydrusTime.GetNowFloat() - time_started_float ) / num_done
+                
+                time_left = ( time_started_float + work_time_float ) - HydrusTime.GetNowFloat()
+                
+                block_size = max( 1, min( 4096, int( time_left / max( time_per_file, 0.0001 ) ) ) )
+                
+            
+            group_of_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( block_size ) )
             
         
         still_work_to_do = False
@@ -6446,9 +6550,11 @@ class DB( HydrusDB.HydrusDB ):
                     files_info_rows = []
                     files_rows = []
                     
+                    service_hash_ids_to_hash_ids = self.modules_repositories.NormaliseServiceHashIdsToHashIds( service_id, [ row[0] for row in chunk ] )
+                    
                     for ( service_hash_id, size, mime, timestamp, width, height, duration, num_frames, num_words ) in chunk:
                         
-                        hash_id = self.modules_repositories.NormaliseServiceHashId( service_id, service_hash_id )
+                        hash_id = service_hash_ids_to_hash_ids[ service_hash_id ]
                         
                         files_info_rows.append( ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) )
                         
@@ -6512,12 +6618,12 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows = 0
                     
-                    # yo, I can save time if I merge these ids so we only have one round of normalisation
+                    ( service_tag_ids_to_tag_ids, service_hash_ids_to_hash_ids ) = self._NormaliseRepositoryMappingsChunk( service_id, chunk )
                     
                     for ( service_tag_id, service_hash_ids ) in chunk:
                         
-                        tag_id = self.modules_repositories.NormaliseServiceTagId( service_id, service_tag_id )
-                        hash_ids = self.modules_repositories.NormaliseServiceHashIds( service_id, service_hash_ids )
+                        tag_id = service_tag_ids_to_tag_ids[ service_tag_id ]
+                        hash_ids = { service_hash_ids_to_hash_ids[ service_hash_id ] for service_hash_id in service_hash_ids }
                         
                         mappings_ids.append( ( tag_id, hash_ids ) )
                         
@@ -6549,10 +6655,12 @@ class DB( HydrusDB.HydrusDB ):
                     
                     num_rows = 0
                     
+                    ( service_tag_ids_to_tag_ids, service_hash_ids_to_hash_ids ) = self._NormaliseRepositoryMappingsChunk( service_id, chunk )
+                    
                     for ( service_tag_id, service_hash_ids ) in chunk:
                         
-                        tag_id = self.modules_repositories.NormaliseServiceTagId( service_id, service_tag_id )
-                        hash_ids = self.modules_repositories.NormaliseServiceHashIds( service_id, service_hash_ids )
+                        tag_id = service_tag_ids_to_tag_ids[ service_tag_id ]
+                        hash_ids = { service_hash_ids_to_hash_ids[ service_hash_id ] for service_hash_id in service_hash_ids }
                         
                         deleted_mappings_ids.append( ( tag_id, hash_ids ) )
                         
@@ -6785,6 +6893,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'ideal_client_files_locations': result = self.modules_files_physical_storage.GetIdealClientFilesLocations( *args, **kwargs )
         elif action == 'inbox_hashes': result = self._FilterInboxHashes( *args, **kwargs )
         elif action == 'is_an_orphan': result = self._IsAnOrphan( *args, **kwargs )
+        elif action == 'keyframe_timestamps': result = self._GetKeyframeTimestampsUS( *args, **kwargs )
         elif action == 'last_shutdown_work_time': result = self.modules_db_maintenance.GetLastShutdownWorkTime( *args, **kwargs )
         elif action == 'local_booru_share_keys': result = self.modules_serialisable.GetYAMLDumpNames( ClientDBSerialisable.YAML_DUMP_ID_LOCAL_BOORU )
         elif action == 'local_booru_share': result = self.modules_serialisable.GetYAMLDump( ClientDBSerialisable.YAML_DUMP_ID_LOCAL_BOORU, *args, **kwargs )
@@ -6817,6 +6926,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'service_id': result = self.modules_services.GetServiceId( *args, **kwargs )
         elif action == 'services': result = self.modules_services.GetServices( *args, **kwargs )
         elif action == 'similar_files_maintenance_status': result = self.modules_similar_files.GetMaintenanceStatus( *args, **kwargs )
+        elif action == 'similar_files_search_benchmark': result = self.modules_similar_files.GetSearchEngineBenchmark( *args, **kwargs )
         elif action == 'related_tags': result = self._GetRelatedTags( *args, **kwargs )
         elif action == 'tag_display_application': result = self.modules_tag_display.GetApplication( *args, **kwargs )
         elif action == 'tag_display_maintenance_status': result = self._CacheTagDisplayGetApplicationStatusNumbers( *args, **kwargs )
@@ -6835,6 +6945,16 @@ class DB( HydrusDB.HydrusDB ):
         return result
         
     
+    def _ReadFromReadReplica( self, read_replica, action, *args, **kwargs ):
+        
+        if action not in self.READ_REPLICA_ACTIONS:
+            
+            raise Exception( 'db read replica received an unknown read command: ' + action )
+            
+        
+        return read_replica._Read( action, *args, **kwargs )
+        
+    
     def _RecoverFromMissingDefinitions( self, content_type ):
         
         # this is not finished, but basics are there
@@ -10260,6 +10380,52 @@ class DB( HydrusDB.HydrusDB ):
                 
             
         
+        if version == 564:
+            
+            try:
+                
+                self._controller.frame_splash_status.SetSubtext( 'generating similar files multi-index' )
+                
+                self._Execute( 'CREATE TABLE IF NOT EXISTS main.shape_perceptual_hash_multi_index ( block_substring INTEGER, phash_id INTEGER, PRIMARY KEY ( block_substring, phash_id ) ) WITHOUT ROWID;' )
+                
+                self.modules_similar_files.RegenerateMultiIndex()
+                
+            except Exception as e:
+                
+                HydrusData.PrintException( e )
+                
+                message = 'Trying to generate the new similar files multi-index failed! It is not needed unless you turn it on, but you might like to run _database->regenerate->similar files multi-index_ yourself when you have some time. The error was written to the log--hydev would be interested in seeing it.'
+                
+                self.pub_initial_message( message )
+                
+            
+        
+        if version == 565:
+            
+            try:
+                
+                self._controller.frame_splash_status.SetSubtext( f'scheduling some maintenance work' )
+                
+                self._Execute( 'CREATE TABLE IF NOT EXISTS main.file_keyframe_indices ( hash_id INTEGER PRIMARY KEY, keyframe_timestamps BLOB );' )
+                
+                all_local_hash_ids = self.modules_files_storage.GetCurrentHashIdsList( self.modules_services.combined_local_file_service_id )
+                
+                with self._MakeTemporaryIntegerTable( all_local_hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+                    
+                    hash_ids = self._STS( self._Execute( f'SELECT hash_id FROM {temp_hash_ids_table_name} CROSS JOIN files_info USING ( hash_id ) WHERE mime IN {HydrusData.SplayListForDB( HC.VIDEO )};' ) )
+                    self.modules_files_maintenance_queue.AddJobs( hash_ids, ClientFiles.REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX )
+                    
+                
+            except Exception as e:
+                
+                HydrusData.PrintException( e )
+                
+                message = 'Some file updates failed to schedule! This is not super important, but hydev would be interested in seeing the error that was printed to the log.'
+                
+                self.pub_initial_message( message )
+                
+            
+        
         self._controller.frame_splash_status.SetTitleText( 'updated db to v{}'.format( HydrusData.ToHumanInt( version + 1 ) ) )
         
         self._Execute( 'UPDATE version SET version = ?;', ( version + 1, ) )
@@ -10783,6 +10949,7 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'regenerate_local_hash_cache': self._RegenerateLocalHashCache( *args, **kwargs )
         elif action == 'regenerate_local_tag_cache': self._RegenerateLocalTagCache( *args, **kwargs )
         elif action == 'regenerate_similar_files': self.modules_similar_files.RegenerateTree( *args, **kwargs )
+        elif action == 'regenerate_similar_files_multi_index': self.modules_similar_files.RegenerateMultiIndex( *args, **kwargs )
         elif action == 'regenerate_searchable_subtag_maps': self._RegenerateTagCacheSearchableSubtagMaps( *args, **kwargs )
         elif action == 'regenerate_tag_cache': self._RegenerateTagCache( *args, **kwargs )
         elif action == 'regenerate_tag_display_mappings_cache': self._RegenerateTagDisplayMappingsCache( *args, **kwargs )
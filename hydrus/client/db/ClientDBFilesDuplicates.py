@@ -188,37 +188,55 @@ class ClientDBFilesDuplicates( ClientDBModule.ClientDBModule ):
     
     def AddPotentialDuplicates( self, media_id, potential_duplicate_media_ids_and_distances ):
         
-        inserts = []
+        self.AddPotentialDuplicatesMany( { media_id : potential_duplicate_media_ids_and_distances } )
         
-        for ( potential_duplicate_media_id, distance ) in potential_duplicate_media_ids_and_distances:
+    
+    def AddPotentialDuplicatesMany( self, media_ids_to_potential_duplicate_media_ids_and_distances ):
+        
+        pairs_to_distances = {}
+        
+        for ( media_id, potential_duplicate_media_ids_and_distances ) in media_ids_to_potential_duplicate_media_ids_and_distances.items():
             
-            if potential_duplicate_media_id == media_id: # already duplicates!
+            for ( potential_duplicate_media_id, distance ) in potential_duplicate_media_ids_and_distances:
                 
-                continue
+                if potential_duplicate_media_id == media_id: # already duplicates!
+                    
+                    continue
+                    
                 
-            
-            if self.MediasAreFalsePositive( media_id, potential_duplicate_media_id ):
+                smaller_media_id = min( media_id, potential_duplicate_media_id )
+                larger_media_id = max( media_id, potential_duplicate_media_id )
                 
-                continue
+                pair = ( smaller_media_id, larger_media_id )
                 
-            
-            if self.MediasAreConfirmedAlternates( media_id, potential_duplicate_media_id ):
+                if pair in pairs_to_distances:
+                    
+                    # a batch will usually find each pair from both ends
+                    pairs_to_distances[ pair ] = min( distance, pairs_to_distances[ pair ] )
+                    
+                    continue
+                    
                 
-                continue
+                if self.MediasAreFalsePositive( media_id, potential_duplicate_media_id ):
+                    
+                    continue
+                    
+                
+                if self.MediasAreConfirmedAlternates( media_id, potential_duplicate_media_id ):
+                    
+                    continue
+                    
+                
+                # if they are alternates with different alt label and index, do not add
+                # however this _could_ be folded into areconfirmedalts on the setalt event--any other alt with diff label/index also gets added
+                
+                pairs_to_distances[ pair ] = distance
                 
-            
-            # if they are alternates with different alt label and index, do not add
-            # however this _could_ be folded into areconfirmedalts on the setalt event--any other alt with diff label/index also gets added
-            
-            smaller_media_id = min( media_id, potential_duplicate_media_id )
-            larger_media_id = max( media_id, potential_duplicate_media_id )
-            
-            inserts.append( ( smaller_media_id, larger_media_id, distance ) )
             
         
-        if len( inserts ) > 0:
+        if len( pairs_to_distances ) > 0:
             
-            self._ExecuteMany( 'INSERT OR IGNORE INTO potential_duplicate_pairs ( smaller_media_id, larger_media_id, distance ) VALUES ( ?, ?, ? );', inserts )
+            self._ExecuteMany( 'INSERT OR IGNORE INTO potential_duplicate_pairs ( smaller_media_id, larger_media_id, distance ) VALUES ( ?, ?, ? );', ( ( smaller_media_id, larger_media_id, distance ) for ( ( smaller_media_id, larger_media_id ), distance ) in pairs_to_distances.items() ) )
             
         
     
@@ -971,6 +989,24 @@ class ClientDBFilesDuplicates( ClientDBModule.ClientDBModule ):
         return hash_ids
         
     
+    def GetHashIdsToMediaIds( self, hash_ids ):
+        
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
+            
+            hash_ids_to_media_ids = dict( self._Execute( 'SELECT hash_id, media_id FROM {} CROSS JOIN duplicate_file_members USING ( hash_id );'.format( temp_hash_ids_table_name ) ) )
+            
+        
+        for hash_id in hash_ids:
+            
+            if hash_id not in hash_ids_to_media_ids:
+                
+                hash_ids_to_media_ids[ hash_id ] = self.GetMediaId( hash_id )
+                
+            
+        
+        return hash_ids_to_media_ids
+        
+    
     def GetKingHashId( self, media_id ):
         
         ( king_hash_id, ) = self._Execute( 'SELECT king_hash_id FROM duplicate_files WHERE media_id = ?;', ( media_id, ) ).fetchone()
@@ -96,6 +96,11 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
                         self.modules_files_maintenance_queue.AddJobs( { hash_id }, ClientFiles.REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL )
                         
                     
+                    if mime in HC.VIDEO and original_mime not in HC.VIDEO:
+                        
+                        self.modules_files_maintenance_queue.AddJobs( { hash_id }, ClientFiles.REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX )
+                        
+                    
                 elif job_type == ClientFiles.REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
                     
                     ( md5, sha1, sha512 ) = additional_data
@@ -234,6 +239,12 @@ class ClientDBFilesMaintenance( ClientDBModule.ClientDBModule ):
                     
                     new_file_info.add( ( hash_id, hash ) )
                     
+                elif job_type == ClientFiles.REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX:
+                    
+                    keyframe_timestamps_us = additional_data
+                    
+                    self.modules_files_metadata_basic.SetKeyframeTimestampsUS( hash_id, keyframe_timestamps_us )
+                    
                 
             
             job_types_to_delete = [ job_type ]
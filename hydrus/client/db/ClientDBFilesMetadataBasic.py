@@ -1,4 +1,5 @@
 import sqlite3
+import struct
 import typing
 
 from hydrus.core import HydrusConstants as HC
@@ -42,7 +43,8 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
             'main.has_exif' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY );', 505 ),
             'main.has_human_readable_embedded_metadata' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY );', 505 ),
             'main.has_transparency' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY );', 552 ),
-            'external_master.blurhashes' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY, blurhash TEXT );', 545 )
+            'external_master.blurhashes' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY, blurhash TEXT );', 545 ),
+            'main.file_keyframe_indices' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY, keyframe_timestamps BLOB );', 566 )
         }
         
     
@@ -141,6 +143,21 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
         return has_transparency_hash_ids
         
     
+    def GetKeyframeTimestampsUS( self, hash_id: int ) -> typing.Optional[ typing.List[ int ] ]:
+        
+        result = self._Execute( 'SELECT keyframe_timestamps FROM file_keyframe_indices WHERE hash_id = ?;', ( hash_id, ) ).fetchone()
+        
+        if result is None:
+            
+            return None
+            
+        
+        ( keyframe_timestamps, ) = result
+        
+        # packed as little-endian unsigned 64-bit microseconds
+        return list( struct.unpack( '<{}Q'.format( len( keyframe_timestamps ) // 8 ), keyframe_timestamps ) )
+        
+    
     def GetMime( self, hash_id: int ) -> int:
         
         result = self._Execute( 'SELECT mime FROM files_info WHERE hash_id = ?;', ( hash_id, ) ).fetchone()
@@ -197,7 +214,8 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
                 ( 'has_human_readable_embedded_metadata', 'hash_id' ),
                 ( 'has_icc_profile', 'hash_id' ),
                 ( 'has_transparency', 'hash_id' ),
-                ( 'blurhashes', 'hash_id' )
+                ( 'blurhashes', 'hash_id' ),
+                ( 'file_keyframe_indices', 'hash_id' )
             ]
             
         
@@ -295,6 +313,13 @@ class ClientDBFilesMetadataBasic( ClientDBModule.ClientDBModule ):
             
         
     
+    def SetKeyframeTimestampsUS( self, hash_id: int, keyframe_timestamps_us: typing.Collection[ int ] ):
+        
+        keyframe_timestamps = struct.pack( '<{}Q'.format( len( keyframe_timestamps_us ) ), *keyframe_timestamps_us )
+        
+        self._Execute( 'REPLACE INTO file_keyframe_indices ( hash_id, keyframe_timestamps ) VALUES ( ?, ? );', ( hash_id, sqlite3.Binary( keyframe_timestamps ) ) )
+        
+    
     def SetBlurhash( self, hash_id: int, blurhash: str ):
         
         self._Execute('INSERT OR REPLACE INTO blurhashes ( hash_id, blurhash ) VALUES ( ?, ?);', ( hash_id, blurhash ) )
@@ -1401,11 +1401,9 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             
             all_similar_hash_ids = set()
             
-            for similar_to_hash in similar_to_hashes:
-                
-                hash_id = self.modules_hashes_local_cache.GetHashId( similar_to_hash )
-                
-                similar_hash_ids_and_distances = self.modules_similar_files.SearchFile( hash_id, max_hamming )
+            similar_to_hash_ids = self.modules_hashes_local_cache.GetHashIds( similar_to_hashes )
+            
+            for similar_hash_ids_and_distances in self.modules_similar_files.SearchFiles( similar_to_hash_ids, max_hamming ).values():
                 
                 similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
                 
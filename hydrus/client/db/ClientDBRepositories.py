@@ -1,3 +1,4 @@
+import array
 import collections
 import itertools
 import os
@@ -61,6 +62,90 @@ def GenerateRepositoryUpdatesTableNames( service_id: int ):
     return ( repository_updates_table_name, repository_unregistered_updates_table_name, repository_updates_processed_table_name )
     
 
+class RepositoryDefinitionIdCache( object ):
+    
+    # repository ids are dense integers counting up from 1, so rather than a dict we keep fixed-size pages of a flat array, with 0 meaning 'not cached'
+    # pages are dropped oldest-first when we have too many, which bounds us at max_num_pages * PAGE_SIZE * 8 bytes
+    
+    PAGE_SIZE = 4096
+    
+    def __init__( self, max_num_pages = 1024 ):
+        
+        self._max_num_pages = max_num_pages
+        
+        self._pages = collections.OrderedDict()
+        
+    
+    def Clear( self ):
+        
+        self._pages = collections.OrderedDict()
+        
+    
+    def GetLocalIds( self, service_definition_ids ):
+        
+        service_definition_ids_to_local_ids = {}
+        missing_service_definition_ids = set()
+        
+        used_page_indices = set()
+        
+        for service_definition_id in service_definition_ids:
+            
+            ( page_index, offset ) = divmod( service_definition_id, self.PAGE_SIZE )
+            
+            page = self._pages.get( page_index, None )
+            
+            if page is not None:
+                
+                local_id = page[ offset ]
+                
+                if local_id != 0:
+                    
+                    service_definition_ids_to_local_ids[ service_definition_id ] = local_id
+                    
+                    used_page_indices.add( page_index )
+                    
+                    continue
+                    
+                
+            
+            missing_service_definition_ids.add( service_definition_id )
+            
+        
+        for page_index in used_page_indices:
+            
+            self._pages.move_to_end( page_index )
+            
+        
+        return ( service_definition_ids_to_local_ids, missing_service_definition_ids )
+        
+    
+    def SetLocalIds( self, service_definition_ids_to_local_ids ):
+        
+        for ( service_definition_id, local_id ) in service_definition_ids_to_local_ids.items():
+            
+            ( page_index, offset ) = divmod( service_definition_id, self.PAGE_SIZE )
+            
+            if page_index in self._pages:
+                
+                page = self._pages[ page_index ]
+                
+            else:
+                
+                page = array.array( 'q', [ 0 ] ) * self.PAGE_SIZE
+                
+                self._pages[ page_index ] = page
+                
+            
+            page[ offset ] = local_id
+            
+        
+        while len( self._pages ) > self._max_num_pages:
+            
+            self._pages.popitem( last = False )
+            
+        
+    
+
 class ClientDBRepositories( ClientDBModule.ClientDBModule ):
     
     def __init__(
@@ -91,6 +176,27 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
         
         self._service_ids_to_content_types_to_outstanding_local_processing = collections.defaultdict( dict )
         
+        self._service_ids_and_content_types_to_definition_id_caches = {}
+        
+        # a rolled-back transaction may have added definitions that are now gone, and their new local ids could be handed out again to something else
+        self._cursor_transaction_wrapper.AddRollbackCallable( self._ClearAllDefinitionIdCaches )
+        
+    
+    def _ClearAllDefinitionIdCaches( self ):
+        
+        self._service_ids_and_content_types_to_definition_id_caches = {}
+        
+    
+    def _ClearDefinitionIdCaches( self, service_id ):
+        
+        for content_type in ( HC.CONTENT_TYPE_HASH, HC.CONTENT_TYPE_TAG ):
+            
+            if ( service_id, content_type ) in self._service_ids_and_content_types_to_definition_id_caches:
+                
+                del self._service_ids_and_content_types_to_definition_id_caches[ ( service_id, content_type ) ]
+                
+            
+        
     
     def _ClearOutstandingWorkCache( self, service_id, content_type = None ):
         
@@ -112,6 +218,18 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
             
         
     
+    def _GetDefinitionIdCache( self, service_id, content_type ) -> RepositoryDefinitionIdCache:
+        
+        key = ( service_id, content_type )
+        
+        if key not in self._service_ids_and_content_types_to_definition_id_caches:
+            
+            self._service_ids_and_content_types_to_definition_id_caches[ key ] = RepositoryDefinitionIdCache()
+            
+        
+        return self._service_ids_and_content_types_to_definition_id_caches[ key ]
+        
+    
     def _GetServiceIndexGenerationDict( self, service_id ) -> dict:
         
         ( repository_updates_table_name, repository_unregistered_updates_table_name, repository_updates_processed_table_name ) = GenerateRepositoryUpdatesTableNames( service_id )
@@ -175,6 +293,46 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
         raise Exception( message )
         
     
+    def _NormaliseServiceDefinitionIds( self, service_id, content_type, service_definition_ids ):
+        
+        definition_id_cache = self._GetDefinitionIdCache( service_id, content_type )
+        
+        ( service_definition_ids_to_local_ids, missing_service_definition_ids ) = definition_id_cache.GetLocalIds( service_definition_ids )
+        
+        if len( missing_service_definition_ids ) > 0:
+            
+            if content_type == HC.CONTENT_TYPE_HASH:
+                
+                table_name = GenerateRepositoryFileDefinitionTableName( service_id )
+                ( service_column_name, local_column_name ) = ( 'service_hash_id', 'hash_id' )
+                
+            else:
+                
+                table_name = GenerateRepositoryTagDefinitionTableName( service_id )
+                ( service_column_name, local_column_name ) = ( 'service_tag_id', 'tag_id' )
+                
+            
+            with self._MakeTemporaryIntegerTable( missing_service_definition_ids, service_column_name ) as temp_table_name:
+                
+                # temp service ids to lookup
+                fetched_service_definition_ids_to_local_ids = dict( self._Execute( 'SELECT {}, {} FROM {} CROSS JOIN {} USING ( {} );'.format( service_column_name, local_column_name, temp_table_name, table_name, service_column_name ) ) )
+                
+            
+            if len( fetched_service_definition_ids_to_local_ids ) != len( missing_service_definition_ids ):
+                
+                bad_service_definition_ids = sorted( missing_service_definition_ids.difference( fetched_service_definition_ids_to_local_ids.keys() ) )
+                
+                self._HandleCriticalRepositoryDefinitionError( service_id, local_column_name + 's', bad_service_definition_ids )
+                
+            
+            definition_id_cache.SetLocalIds( fetched_service_definition_ids_to_local_ids )
+            
+            service_definition_ids_to_local_ids.update( fetched_service_definition_ids_to_local_ids )
+            
+        
+        return service_definition_ids_to_local_ids
+        
+    
     def _RegisterLocalUpdates( self, service_id, hash_ids = None ):
         
         # this function takes anything in 'unregistered', sees what is local, and figures out the correct 'content types' for those hash ids in the 'processed' table. converting unknown/bad hash_ids to correct and ready to process
@@ -322,6 +480,7 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
         self.modules_db_maintenance.DeferredDropTable( tag_id_map_table_name )
         
         self._ClearOutstandingWorkCache( service_id )
+        self._ClearDefinitionIdCaches( service_id )
         
     
     def DoOutstandingUpdateRegistration( self ):
@@ -547,67 +706,37 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
     
     def NormaliseServiceHashId( self, service_id: int, service_hash_id: int ) -> int:
         
-        hash_id_map_table_name = GenerateRepositoryFileDefinitionTableName( service_id )
-        
-        result = self._Execute( 'SELECT hash_id FROM {} WHERE service_hash_id = ?;'.format( hash_id_map_table_name ), ( service_hash_id, ) ).fetchone()
+        service_hash_ids_to_hash_ids = self._NormaliseServiceDefinitionIds( service_id, HC.CONTENT_TYPE_HASH, ( service_hash_id, ) )
         
-        if result is None:
-            
-            self._HandleCriticalRepositoryDefinitionError( service_id, 'hash_id', service_hash_id )
-            
-        
-        ( hash_id, ) = result
-        
-        return hash_id
+        return service_hash_ids_to_hash_ids[ service_hash_id ]
         
     
     def NormaliseServiceHashIds( self, service_id: int, service_hash_ids: typing.Collection[ int ] ) -> typing.Set[ int ]:
         
-        hash_id_map_table_name = GenerateRepositoryFileDefinitionTableName( service_id )
-        
-        with self._MakeTemporaryIntegerTable( service_hash_ids, 'service_hash_id' ) as temp_table_name:
-            
-            # temp service hashes to lookup
-            hash_ids_potentially_dupes = self._STL( self._Execute( 'SELECT hash_id FROM {} CROSS JOIN {} USING ( service_hash_id );'.format( temp_table_name, hash_id_map_table_name ) ) )
-            
-        
         # every service_id can only exist once, but technically a hash_id could be mapped to two service_ids
-        if len( hash_ids_potentially_dupes ) != len( service_hash_ids ):
-            
-            bad_service_hash_ids = []
-            
-            for service_hash_id in service_hash_ids:
-                
-                result = self._Execute( 'SELECT hash_id FROM {} WHERE service_hash_id = ?;'.format( hash_id_map_table_name ), ( service_hash_id, ) ).fetchone()
-                
-                if result is None:
-                    
-                    bad_service_hash_ids.append( service_hash_id )
-                    
-                
-            
-            self._HandleCriticalRepositoryDefinitionError( service_id, 'hash_ids', bad_service_hash_ids )
-            
         
-        hash_ids = set( hash_ids_potentially_dupes )
+        service_hash_ids_to_hash_ids = self._NormaliseServiceDefinitionIds( service_id, HC.CONTENT_TYPE_HASH, service_hash_ids )
+        
+        hash_ids = set( service_hash_ids_to_hash_ids.values() )
         
         return hash_ids
         
     
-    def NormaliseServiceTagId( self, service_id: int, service_tag_id: int ) -> int:
+    def NormaliseServiceHashIdsToHashIds( self, service_id: int, service_hash_ids: typing.Collection[ int ] ) -> typing.Dict[ int, int ]:
         
-        tag_id_map_table_name = GenerateRepositoryTagDefinitionTableName( service_id )
+        return self._NormaliseServiceDefinitionIds( service_id, HC.CONTENT_TYPE_HASH, service_hash_ids )
         
-        result = self._Execute( 'SELECT tag_id FROM {} WHERE service_tag_id = ?;'.format( tag_id_map_table_name ), ( service_tag_id, ) ).fetchone()
+    
+    def NormaliseServiceTagId( self, service_id: int, service_tag_id: int ) -> int:
         
-        if result is None:
-            
-            self._HandleCriticalRepositoryDefinitionError( service_id, 'tag_id', service_tag_id )
-            
+        service_tag_ids_to_tag_ids = self._NormaliseServiceDefinitionIds( service_id, HC.CONTENT_TYPE_TAG, ( service_tag_id, ) )
         
-        ( tag_id, ) = result
+        return service_tag_ids_to_tag_ids[ service_tag_id ]
         
-        return tag_id
+    
+    def NormaliseServiceTagIdsToTagIds( self, service_id: int, service_tag_ids: typing.Collection[ int ] ) -> typing.Dict[ int, int ]:
+        
+        return self._NormaliseServiceDefinitionIds( service_id, HC.CONTENT_TYPE_TAG, service_tag_ids )
         
     
     def NotifyUpdatesChanged( self, hash_ids ):
@@ -642,6 +771,9 @@ class ClientDBRepositories( ClientDBModule.ClientDBModule ):
         
         ( hash_id_map_table_name, tag_id_map_table_name ) = GenerateRepositoryDefinitionTableNames( service_id )
         
+        # these REPLACE existing rows, so anything we have cached may now be wrong
+        self._ClearDefinitionIdCaches( service_id )
+        
         num_rows_processed = 0
         
         if 'service_hash_ids_to_hashes' in definition_iterator_dict:
@@ -1,33 +1,323 @@
 import collections
+import itertools
+import numpy
 import random
 import sqlite3
+import struct
 import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusLists
 from hydrus.core import HydrusTime
 
+from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientGlobals as CG
 from hydrus.client import ClientThreading
 from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBServices
 
+POPCOUNT_LOOKUP = numpy.array( [ bin( i ).count( '1' ) for i in range( 256 ) ], dtype = numpy.uint8 )
+
+# the most memory GetHammingDistances and the match test after it can have live at once, per ( search, phash ) pair
+# 8 for the uint64 xor, 8 for the per-byte popcount lookup on older numpy, 1 for the uint8 distance, and 1 for the bool mask of matches
+HAMMING_DISTANCE_BYTES_PER_COMPARISON = 8 + 8 + 1 + 1
+
+HAMMING_DISTANCE_CHUNK_BYTES = 64 * 1024 * 1024
+
+def GetHammingDistances( perceptual_hashes: numpy.ndarray, search_perceptual_hashes: numpy.ndarray ) -> numpy.ndarray:
+    
+    # returns a ( num_searches, num_perceptual_hashes ) array
+    
+    xors = numpy.bitwise_xor( perceptual_hashes[ numpy.newaxis, : ], search_perceptual_hashes[ :, numpy.newaxis ] )
+    
+    if hasattr( numpy, 'bitwise_count' ):
+        
+        # numpy 2.0+, uses the hardware popcount
+        return numpy.bitwise_count( xors )
+        
+    
+    return POPCOUNT_LOOKUP[ xors.view( numpy.uint8 ) ].reshape( xors.shape + ( 8, ) ).sum( axis = -1, dtype = numpy.uint8 )
+    
+
+# multi-index hashing: the 64-bit phash is split into four 16-bit blocks, each indexed separately
+# by the pigeonhole principle, two phashes within distance r must share at least one block that differs by no more than r // 4 bits
+# so we can find every candidate with a handful of indexed lookups and then check the full distance on just those
+
+MULTI_INDEX_NUM_BLOCKS = 4
+MULTI_INDEX_BLOCK_BITS = 16
+
+# beyond this, each block needs 2,517+ probes and the candidate lists get large, so the tree is the better tool
+MULTI_INDEX_MAX_SEARCH_RADIUS = 11
+
+MULTI_INDEX_MAX_FLIPS_TO_FLIP_MASKS = {}
+
+def GetMultiIndexBlockSubstrings( perceptual_hash: bytes ) -> typing.List[ int ]:
+    
+    if len( perceptual_hash ) != 8:
+        
+        return []
+        
+    
+    # we tag each block with its block index in the high bits, so all four indices can sit in the same table
+    
+    blocks = struct.unpack( '>4H', perceptual_hash )
+    
+    return [ ( block_index << MULTI_INDEX_BLOCK_BITS ) | block for ( block_index, block ) in enumerate( blocks ) ]
+    
+
+def GetMultiIndexFlipMasks( max_flips: int ) -> typing.List[ int ]:
+    
+    if max_flips not in MULTI_INDEX_MAX_FLIPS_TO_FLIP_MASKS:
+        
+        flip_masks = []
+        
+        for num_flips in range( max_flips + 1 ):
+            
+            for bits in itertools.combinations( range( MULTI_INDEX_BLOCK_BITS ), num_flips ):
+                
+                flip_masks.append( sum( 1 << bit for bit in bits ) )
+                
+            
+        
+        MULTI_INDEX_MAX_FLIPS_TO_FLIP_MASKS[ max_flips ] = flip_masks
+        
+    
+    return MULTI_INDEX_MAX_FLIPS_TO_FLIP_MASKS[ max_flips ]
+    
+
+def GetMultiIndexProbes( perceptual_hash: bytes, search_radius: int ) -> typing.Set[ int ]:
+    
+    flip_masks = GetMultiIndexFlipMasks( search_radius // MULTI_INDEX_NUM_BLOCKS )
+    
+    probes = set()
+    
+    for block_substring in GetMultiIndexBlockSubstrings( perceptual_hash ):
+        
+        # the masks only touch the low 16 bits, so the block index tag is preserved
+        probes.update( ( block_substring ^ flip_mask for flip_mask in flip_masks ) )
+        
+    
+    return probes
+    
+
+class PerceptualHashBitArrayIndex( object ):
+    
+    def __init__( self ):
+        
+        # these are kept sorted by perceptual_hash_id so we can do membership tests with searchsorted
+        # they have spare capacity at the end, so appending new ids is usually cheap
+        
+        self._num_perceptual_hashes = 0
+        
+        self._perceptual_hash_ids = numpy.zeros( 0, dtype = numpy.int64 )
+        self._perceptual_hashes = numpy.zeros( 0, dtype = numpy.uint64 )
+        
+    
+    def __len__( self ):
+        
+        return self._num_perceptual_hashes
+        
+    
+    def _EnsureCapacity( self, num_needed: int ):
+        
+        if num_needed <= len( self._perceptual_hash_ids ):
+            
+            return
+            
+        
+        new_capacity = max( num_needed, len( self._perceptual_hash_ids ) * 2, 1024 )
+        
+        n = self._num_perceptual_hashes
+        
+        new_perceptual_hash_ids = numpy.zeros( new_capacity, dtype = numpy.int64 )
+        new_perceptual_hashes = numpy.zeros( new_capacity, dtype = numpy.uint64 )
+        
+        new_perceptual_hash_ids[ : n ] = self._perceptual_hash_ids[ : n ]
+        new_perceptual_hashes[ : n ] = self._perceptual_hashes[ : n ]
+        
+        self._perceptual_hash_ids = new_perceptual_hash_ids
+        self._perceptual_hashes = new_perceptual_hashes
+        
+    
+    def _GetPresentMask( self, perceptual_hash_ids: numpy.ndarray ) -> numpy.ndarray:
+        
+        n = self._num_perceptual_hashes
+        
+        if n == 0:
+            
+            return numpy.zeros( len( perceptual_hash_ids ), dtype = bool )
+            
+        
+        current_perceptual_hash_ids = self._perceptual_hash_ids[ : n ]
+        
+        positions = numpy.searchsorted( current_perceptual_hash_ids, perceptual_hash_ids ).clip( max = n - 1 )
+        
+        return current_perceptual_hash_ids[ positions ] == perceptual_hash_ids
+        
+    
+    def AddPerceptualHashes( self, rows: typing.Collection[ typing.Tuple[ int, bytes ] ] ):
+        
+        rows = [ ( perceptual_hash_id, perceptual_hash ) for ( perceptual_hash_id, perceptual_hash ) in rows if len( perceptual_hash ) == 8 ]
+        
+        if len( rows ) == 0:
+            
+            return
+            
+        
+        perceptual_hash_ids = numpy.array( [ perceptual_hash_id for ( perceptual_hash_id, perceptual_hash ) in rows ], dtype = numpy.int64 )
+        perceptual_hashes = numpy.frombuffer( b''.join( ( perceptual_hash for ( perceptual_hash_id, perceptual_hash ) in rows ) ), dtype = '>u8' ).astype( numpy.uint64 )
+        
+        ( perceptual_hash_ids, unique_indices ) = numpy.unique( perceptual_hash_ids, return_index = True )
+        perceptual_hashes = perceptual_hashes[ unique_indices ]
+        
+        is_new = numpy.logical_not( self._GetPresentMask( perceptual_hash_ids ) )
+        
+        perceptual_hash_ids = perceptual_hash_ids[ is_new ]
+        perceptual_hashes = perceptual_hashes[ is_new ]
+        
+        num_new = len( perceptual_hash_ids )
+        
+        if num_new == 0:
+            
+            return
+            
+        
+        n = self._num_perceptual_hashes
+        
+        if n == 0 or perceptual_hash_ids[0] > self._perceptual_hash_ids[ n - 1 ]:
+            
+            # the normal case--brand new perceptual hashes get the largest ids, so we can just append
+            
+            self._EnsureCapacity( n + num_new )
+            
+            self._perceptual_hash_ids[ n : n + num_new ] = perceptual_hash_ids
+            self._perceptual_hashes[ n : n + num_new ] = perceptual_hashes
+            
+            self._num_perceptual_hashes += num_new
+            
+        else:
+            
+            all_perceptual_hash_ids = numpy.concatenate( ( self._perceptual_hash_ids[ : n ], perceptual_hash_ids ) )
+            all_perceptual_hashes = numpy.concatenate( ( self._perceptual_hashes[ : n ], perceptual_hashes ) )
+            
+            order = numpy.argsort( all_perceptual_hash_ids, kind = 'stable' )
+            
+            self._perceptual_hash_ids = all_perceptual_hash_ids[ order ]
+            self._perceptual_hashes = all_perceptual_hashes[ order ]
+            
+            self._num_perceptual_hashes = len( self._perceptual_hash_ids )
+            
+        
+    
+    def GetEstimatedMemoryFootprint( self ) -> int:
+        
+        return self._perceptual_hash_ids.nbytes + self._perceptual_hashes.nbytes
+        
+    
+    def RemovePerceptualHashIds( self, perceptual_hash_ids: typing.Collection[ int ] ):
+        
+        n = self._num_perceptual_hashes
+        
+        if n == 0 or len( perceptual_hash_ids ) == 0:
+            
+            return
+            
+        
+        perceptual_hash_ids = numpy.fromiter( perceptual_hash_ids, dtype = numpy.int64 )
+        
+        keep = numpy.logical_not( numpy.isin( self._perceptual_hash_ids[ : n ], perceptual_hash_ids ) )
+        
+        if keep.all():
+            
+            return
+            
+        
+        kept_perceptual_hash_ids = self._perceptual_hash_ids[ : n ][ keep ]
+        kept_perceptual_hashes = self._perceptual_hashes[ : n ][ keep ]
+        
+        num_kept = len( kept_perceptual_hash_ids )
+        
+        self._perceptual_hash_ids[ : num_kept ] = kept_perceptual_hash_ids
+        self._perceptual_hashes[ : num_kept ] = kept_perceptual_hashes
+        
+        self._num_perceptual_hashes = num_kept
+        
+    
+    def Search( self, search_perceptual_hash: bytes, max_hamming_distance: int ) -> typing.Dict[ int, int ]:
+        
+        ( result, ) = self.SearchMany( ( search_perceptual_hash, ), max_hamming_distance )
+        
+        return result
+        
+    
+    def SearchMany( self, search_perceptual_hashes: typing.Sequence[ bytes ], max_hamming_distance: int ) -> typing.List[ typing.Dict[ int, int ] ]:
+        
+        results = [ {} for search_perceptual_hash in search_perceptual_hashes ]
+        
+        n = self._num_perceptual_hashes
+        
+        valid_indices = [ i for ( i, search_perceptual_hash ) in enumerate( search_perceptual_hashes ) if len( search_perceptual_hash ) == 8 ]
+        
+        if n == 0 or len( valid_indices ) == 0:
+            
+            return results
+            
+        
+        search_perceptual_hash_ints = numpy.array( [ struct.unpack( '!Q', search_perceptual_hashes[ i ] )[0] for i in valid_indices ], dtype = numpy.uint64 )
+        
+        perceptual_hash_ids = self._perceptual_hash_ids[ : n ]
+        perceptual_hashes = self._perceptual_hashes[ : n ]
+        
+        # we compare several searches against the whole array at once, but we don't want a giant distance matrix, so keep each chunk, temporaries included, to about 64MB
+        num_searches_per_chunk = max( 1, HAMMING_DISTANCE_CHUNK_BYTES // ( n * HAMMING_DISTANCE_BYTES_PER_COMPARISON ) )
+        
+        for chunk_start in range( 0, len( valid_indices ), num_searches_per_chunk ):
+            
+            chunk_search_perceptual_hash_ints = search_perceptual_hash_ints[ chunk_start : chunk_start + num_searches_per_chunk ]
+            
+            distances = GetHammingDistances( perceptual_hashes, chunk_search_perceptual_hash_ints )
+            
+            ( search_indices, matching_indices ) = numpy.nonzero( distances <= max_hamming_distance )
+            
+            for ( search_index, perceptual_hash_id, distance ) in zip( search_indices.tolist(), perceptual_hash_ids[ matching_indices ].tolist(), distances[ search_indices, matching_indices ].tolist() ):
+                
+                results[ valid_indices[ chunk_start + search_index ] ][ perceptual_hash_id ] = distance
+                
+            
+        
+        return results
+        
+    
+
 class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
-    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage ):
+    def __init__( self, cursor: sqlite3.Cursor, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper, modules_services: ClientDBServices.ClientDBMasterServices, modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage ):
         
         self.modules_services = modules_services
         self.modules_files_storage = modules_files_storage
         
         ClientDBModule.ClientDBModule.__init__( self, 'client similar files', cursor )
         
+        self._cursor_transaction_wrapper = cursor_transaction_wrapper
+        
         self._perceptual_hash_id_to_vp_tree_node_cache = {}
         self._non_vp_treed_perceptual_hash_ids = set()
         self._root_node_perceptual_hash_id = None
         
+        self._perceptual_hash_bit_array_index = None
+        
+        # a rolled-back transaction may have added or removed phashes or rearranged the tree, so none of this can be trusted afterwards
+        self._cursor_transaction_wrapper.AddRollbackCallable( self._ClearCaches )
+        
+    
+    def _AddMultiIndexRows( self, perceptual_hash_ids_and_perceptual_hashes: typing.Iterable[ typing.Tuple[ int, bytes ] ] ):
+        
+        self._ExecuteMany( 'INSERT OR IGNORE INTO shape_perceptual_hash_multi_index ( block_substring, phash_id ) VALUES ( ?, ? );', ( ( block_substring, perceptual_hash_id ) for ( perceptual_hash_id, perceptual_hash ) in perceptual_hash_ids_and_perceptual_hashes for block_substring in GetMultiIndexBlockSubstrings( perceptual_hash ) ) )
+        
     
     def _AddLeaf( self, perceptual_hash_id, perceptual_hash ):
         
@@ -119,6 +409,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         self._ClearPerceptualHashesFromVPTreeNodeCache( ( perceptual_hash_id, ) )
         
     
+    def _DeleteMultiIndexRows( self, perceptual_hash_ids_and_perceptual_hashes: typing.Iterable[ typing.Tuple[ int, bytes ] ] ):
+        
+        self._ExecuteMany( 'DELETE FROM shape_perceptual_hash_multi_index WHERE block_substring = ? AND phash_id = ?;', ( ( block_substring, perceptual_hash_id ) for ( perceptual_hash_id, perceptual_hash ) in perceptual_hash_ids_and_perceptual_hashes for block_substring in GetMultiIndexBlockSubstrings( perceptual_hash ) ) )
+        
+    
     def _GenerateBranch( self, job_status, parent_id, perceptual_hash_id, perceptual_hash, children ):
         
         process_queue = collections.deque()
@@ -244,12 +539,33 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             'external_master.shape_perceptual_hashes' : ( 'CREATE TABLE IF NOT EXISTS {} ( phash_id INTEGER PRIMARY KEY, phash BLOB_BYTES UNIQUE );', 451 ),
             'external_master.shape_perceptual_hash_map' : ( 'CREATE TABLE IF NOT EXISTS {} ( phash_id INTEGER, hash_id INTEGER, PRIMARY KEY ( phash_id, hash_id ) );', 451 ),
             'main.shape_vptree' : ( 'CREATE TABLE IF NOT EXISTS {} ( phash_id INTEGER PRIMARY KEY, parent_id INTEGER, radius INTEGER, inner_id INTEGER, inner_population INTEGER, outer_id INTEGER, outer_population INTEGER );', 536 ),
+            'main.shape_perceptual_hash_multi_index' : ( 'CREATE TABLE IF NOT EXISTS {} ( block_substring INTEGER, phash_id INTEGER, PRIMARY KEY ( block_substring, phash_id ) ) WITHOUT ROWID;', 565 ),
             'main.shape_maintenance_branch_regen' : ( 'CREATE TABLE IF NOT EXISTS {} ( phash_id INTEGER PRIMARY KEY );', 536 ),
             'main.shape_search_cache' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER PRIMARY KEY, searched_distance INTEGER );', 451 ),
             'main.pixel_hash_map' : ( 'CREATE TABLE IF NOT EXISTS {} ( hash_id INTEGER, pixel_hash_id INTEGER, PRIMARY KEY ( hash_id, pixel_hash_id ) );', 465 )
         }
         
     
+    def _GetPerceptualHashBitArrayIndex( self ) -> PerceptualHashBitArrayIndex:
+        
+        if self._perceptual_hash_bit_array_index is None:
+            
+            self._perceptual_hash_bit_array_index = PerceptualHashBitArrayIndex()
+            
+            # only the perceptual hashes that still belong to a file, so orphans awaiting a branch regen are not matched
+            rows = self._Execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes WHERE EXISTS ( SELECT 1 FROM shape_perceptual_hash_map WHERE shape_perceptual_hash_map.phash_id = shape_perceptual_hashes.phash_id );' ).fetchall()
+            
+            self._perceptual_hash_bit_array_index.AddPerceptualHashes( rows )
+            
+            if HG.db_report_mode:
+                
+                HydrusData.ShowText( 'Similar files bit array index loaded {} perceptual hashes, using {}.'.format( HydrusData.ToHumanInt( len( self._perceptual_hash_bit_array_index ) ), HydrusData.ToHumanBytes( self._perceptual_hash_bit_array_index.GetEstimatedMemoryFootprint() ) ) )
+                
+            
+        
+        return self._perceptual_hash_bit_array_index
+        
+    
     def _GetPerceptualHashes( self, perceptual_hash_ids: typing.Collection[ int ] ) -> typing.Set[ bytes ]:
         
         with self._MakeTemporaryIntegerTable( perceptual_hash_ids, 'phash_id' ) as temp_table_name:
@@ -277,6 +593,8 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self._AddLeaf( perceptual_hash_id, perceptual_hash )
             
+            self._AddMultiIndexRows( ( ( perceptual_hash_id, perceptual_hash ), ) )
+            
         else:
             
             ( perceptual_hash_id, ) = result
@@ -308,6 +626,73 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def _GetSimilarHashIdsToDistances( self, search_rows: typing.Sequence[ typing.Tuple[ typing.Any, bytes ] ], search_radius: int ) -> typing.Dict[ typing.Any, typing.Dict[ int, int ] ]:
+        
+        if len( search_rows ) == 0:
+            
+            return {}
+            
+        
+        search_engine = CG.client_controller.new_options.GetInteger( 'similar_files_search_engine' )
+        
+        if search_engine != CC.SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY:
+            
+            # user may have switched back, so let's not hang on to all that memory
+            self._perceptual_hash_bit_array_index = None
+            
+        
+        if search_engine == CC.SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY:
+            
+            search_keys_to_similar_perceptual_hash_ids_to_distances = self._SearchPerceptualHashesBitArray( search_rows, search_radius )
+            
+        elif search_engine == CC.SIMILAR_FILES_SEARCH_ENGINE_MULTI_INDEX:
+            
+            search_keys_to_similar_perceptual_hash_ids_to_distances = self._SearchPerceptualHashesMultiIndex( search_rows, search_radius )
+            
+        else:
+            
+            search_keys_to_similar_perceptual_hash_ids_to_distances = self._SearchPerceptualHashesVPTree( search_rows, search_radius )
+            
+        
+        # so, now we have perceptual_hash_ids and distances. let's map that to actual files.
+        # files can have multiple perceptual_hashes, and perceptual_hashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
+        
+        all_similar_perceptual_hash_ids = set()
+        
+        for similar_perceptual_hash_ids_to_distances in search_keys_to_similar_perceptual_hash_ids_to_distances.values():
+            
+            all_similar_perceptual_hash_ids.update( similar_perceptual_hash_ids_to_distances.keys() )
+            
+        
+        with self._MakeTemporaryIntegerTable( all_similar_perceptual_hash_ids, 'phash_id' ) as temp_table_name:
+            
+            # temp perceptual_hashes to hash map
+            similar_perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        search_keys_to_similar_hash_ids_to_distances = {}
+        
+        for ( search_key, similar_perceptual_hash_ids_to_distances ) in search_keys_to_similar_perceptual_hash_ids_to_distances.items():
+            
+            similar_hash_ids_to_distances = {}
+            
+            for ( perceptual_hash_id, distance ) in similar_perceptual_hash_ids_to_distances.items():
+                
+                for hash_id in similar_perceptual_hash_ids_to_hash_ids[ perceptual_hash_id ]:
+                    
+                    if hash_id not in similar_hash_ids_to_distances or distance < similar_hash_ids_to_distances[ hash_id ]:
+                        
+                        similar_hash_ids_to_distances[ hash_id ] = distance
+                        
+                    
+                
+            
+            search_keys_to_similar_hash_ids_to_distances[ search_key ] = similar_hash_ids_to_distances
+            
+        
+        return search_keys_to_similar_hash_ids_to_distances
+        
+    
     def _PopBestRootNode( self, node_rows ):
         
         if len( node_rows ) == 1:
@@ -444,6 +829,8 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         
         self._ExecuteMany( 'DELETE FROM shape_perceptual_hashes WHERE phash_id = ?;', ( ( p_id, ) for p_id in orphan_perceptual_hash_ids ) )
         
+        self._DeleteMultiIndexRows( [ row for row in unbalanced_nodes if row[0] in orphan_perceptual_hash_ids ] )
+        
         useful_nodes = [ row for row in unbalanced_nodes if row[0] in useful_perceptual_hash_ids ]
         
         useful_population = len( useful_nodes )
@@ -495,6 +882,15 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def _ClearCaches( self ):
+        
+        self._perceptual_hash_id_to_vp_tree_node_cache = {}
+        self._non_vp_treed_perceptual_hash_ids = set()
+        self._root_node_perceptual_hash_id = None
+        
+        self._perceptual_hash_bit_array_index = None
+        
+    
     def _ClearPerceptualHashesFromVPTreeNodeCache( self, perceptual_hash_ids: typing.Collection[ int ] ):
         
         for perceptual_hash_id in perceptual_hash_ids:
@@ -520,6 +916,238 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             self.RegenerateTree()
             
         
+        if 'main.shape_perceptual_hash_multi_index' in repopulate_table_names:
+            
+            self.RegenerateMultiIndex()
+            
+        
+    
+    def _SearchPerceptualHashesBitArray( self, search_rows: typing.Sequence[ typing.Tuple[ typing.Any, bytes ] ], search_radius: int, search_stats: typing.Optional[ collections.Counter ] = None ) -> typing.Dict[ typing.Any, typing.Dict[ int, int ] ]:
+        
+        perceptual_hash_bit_array_index = self._GetPerceptualHashBitArrayIndex()
+        
+        search_keys_to_similar_perceptual_hash_ids_to_distances = collections.defaultdict( dict )
+        
+        results = perceptual_hash_bit_array_index.SearchMany( [ search_perceptual_hash for ( search_key, search_perceptual_hash ) in search_rows ], search_radius )
+        
+        for ( ( search_key, search_perceptual_hash ), result ) in zip( search_rows, results ):
+            
+            similar_perceptual_hash_ids_to_distances = search_keys_to_similar_perceptual_hash_ids_to_distances[ search_key ]
+            
+            for ( perceptual_hash_id, distance ) in result.items():
+                
+                if perceptual_hash_id not in similar_perceptual_hash_ids_to_distances or distance < similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ]:
+                    
+                    similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ] = distance
+                    
+                
+            
+        
+        if search_stats is not None:
+            
+            search_stats[ 'hashes compared' ] += len( perceptual_hash_bit_array_index ) * len( search_rows )
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search compared against {} perceptual hashes {} times.'.format( HydrusData.ToHumanInt( len( perceptual_hash_bit_array_index ) ), HydrusData.ToHumanInt( len( search_rows ) ) ) )
+            
+        
+        return search_keys_to_similar_perceptual_hash_ids_to_distances
+        
+    
+    def _SearchPerceptualHashesMultiIndex( self, search_rows: typing.Sequence[ typing.Tuple[ typing.Any, bytes ] ], search_radius: int, search_stats: typing.Optional[ collections.Counter ] = None ) -> typing.Dict[ typing.Any, typing.Dict[ int, int ] ]:
+        
+        if search_radius > MULTI_INDEX_MAX_SEARCH_RADIUS:
+            
+            return self._SearchPerceptualHashesVPTree( search_rows, search_radius, search_stats = search_stats )
+            
+        
+        search_rows_and_probes = [ ( search_key, search_perceptual_hash, GetMultiIndexProbes( search_perceptual_hash, search_radius ) ) for ( search_key, search_perceptual_hash ) in search_rows ]
+        
+        all_probes = set()
+        
+        for ( search_key, search_perceptual_hash, probes ) in search_rows_and_probes:
+            
+            all_probes.update( probes )
+            
+        
+        with self._MakeTemporaryIntegerTable( all_probes, 'block_substring' ) as temp_table_name:
+            
+            # temp block substrings to multi-index to perceptual hashes
+            rows = self._Execute( 'SELECT block_substring, phash_id, phash FROM {} CROSS JOIN shape_perceptual_hash_multi_index USING ( block_substring ) CROSS JOIN shape_perceptual_hashes USING ( phash_id );'.format( temp_table_name ) ).fetchall()
+            
+        
+        block_substrings_to_candidates = HydrusData.BuildKeyToListDict( ( ( block_substring, ( perceptual_hash_id, perceptual_hash ) ) for ( block_substring, perceptual_hash_id, perceptual_hash ) in rows ) )
+        
+        search_keys_to_similar_perceptual_hash_ids_to_distances = collections.defaultdict( dict )
+        
+        num_candidates = 0
+        
+        for ( search_key, search_perceptual_hash, probes ) in search_rows_and_probes:
+            
+            # a candidate may match on more than one block, so we collapse them before checking the full distance
+            candidate_perceptual_hash_ids_to_perceptual_hashes = {}
+            
+            for probe in probes:
+                
+                if probe in block_substrings_to_candidates:
+                    
+                    candidate_perceptual_hash_ids_to_perceptual_hashes.update( block_substrings_to_candidates[ probe ] )
+                    
+                
+            
+            num_candidates += len( candidate_perceptual_hash_ids_to_perceptual_hashes )
+            
+            similar_perceptual_hash_ids_to_distances = search_keys_to_similar_perceptual_hash_ids_to_distances[ search_key ]
+            
+            for ( perceptual_hash_id, perceptual_hash ) in candidate_perceptual_hash_ids_to_perceptual_hashes.items():
+                
+                distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, perceptual_hash )
+                
+                if distance <= search_radius:
+                    
+                    if perceptual_hash_id not in similar_perceptual_hash_ids_to_distances or distance < similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ]:
+                        
+                        similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ] = distance
+                        
+                    
+                
+            
+        
+        if search_stats is not None:
+            
+            search_stats[ 'index lookups' ] += len( all_probes )
+            search_stats[ 'index rows touched' ] += len( rows )
+            search_stats[ 'candidates checked' ] += num_candidates
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search made {} multi-index lookups, touching {} rows and checking {} candidates.'.format( HydrusData.ToHumanInt( len( all_probes ) ), HydrusData.ToHumanInt( len( rows ) ), HydrusData.ToHumanInt( num_candidates ) ) )
+            
+        
+        return search_keys_to_similar_perceptual_hash_ids_to_distances
+        
+    
+    def _SearchPerceptualHashesVPTree( self, search_rows: typing.Sequence[ typing.Tuple[ typing.Any, bytes ] ], search_radius: int, search_stats: typing.Optional[ collections.Counter ] = None ) -> typing.Dict[ typing.Any, typing.Dict[ int, int ] ]:
+        
+        if self._root_node_perceptual_hash_id is None:
+            
+            top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
+            
+            if top_node_result is None:
+                
+                return {}
+                
+            
+            ( self._root_node_perceptual_hash_id, ) = top_node_result
+            
+        
+        search_keys_to_similar_perceptual_hash_ids_to_distances = collections.defaultdict( dict )
+        
+        num_cycles = 0
+        total_nodes_searched = 0
+        
+        # we walk the tree for all the searches at once, one level at a time, so every level's nodes are fetched from the db in one go
+        
+        next_potentials = [ ( self._root_node_perceptual_hash_id, search_key, search_perceptual_hash ) for ( search_key, search_perceptual_hash ) in search_rows ]
+        
+        while len( next_potentials ) > 0:
+            
+            current_potentials = next_potentials
+            next_potentials = []
+            
+            num_cycles += 1
+            total_nodes_searched += len( current_potentials )
+            
+            # this is no longer an iterable inside the main node SELECT because it was causing crashes on linux!!
+            # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching perceptual_hashes it presumably was still hanging on to
+            # the crash was in sqlite code, again presumably on subsequent fetch
+            # adding a fake delay in seemed to fix it also. guess it was some memory maintenance buffer/bytes thing
+            # anyway, we now just get the whole lot of results first and then work on the whole lot
+            # UPDATE: we moved to a cache finally, so the iteration danger is less worrying, but leaving the above up anyway
+            
+            self._TryToPopulatePerceptualHashToVPTreeNodeCache( { node_perceptual_hash_id for ( node_perceptual_hash_id, search_key, search_perceptual_hash ) in current_potentials } )
+            
+            for ( node_perceptual_hash_id, search_key, search_perceptual_hash ) in current_potentials:
+                
+                if node_perceptual_hash_id not in self._perceptual_hash_id_to_vp_tree_node_cache:
+                    
+                    # something crazy happened, probably a broken tree branch, move on
+                    continue
+                    
+                
+                ( node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) = self._perceptual_hash_id_to_vp_tree_node_cache[ node_perceptual_hash_id ]
+                
+                # first check the node itself--is it similar?
+                
+                node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
+                
+                if node_hamming_distance <= search_radius:
+                    
+                    similar_perceptual_hash_ids_to_distances = search_keys_to_similar_perceptual_hash_ids_to_distances[ search_key ]
+                    
+                    if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
+                        
+                        current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
+                        
+                        similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
+                        
+                    else:
+                        
+                        similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
+                        
+                    
+                
+                # now how about its children--where should we search next?
+                
+                if node_radius is not None:
+                    
+                    # we have two spheres--node and search--their centers separated by node_hamming_distance
+                    # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
+                    # there are four possibles:
+                    # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
+                    # (----N---(-)-S--)      intersects with both
+                    # (----N-(--S-)-)        intersects with both
+                    # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
+                    
+                    if inner_perceptual_hash_id is not None:
+                        
+                        spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
+                        
+                        if not spheres_disjoint: # i.e. they intersect at some point
+                            
+                            next_potentials.append( ( inner_perceptual_hash_id, search_key, search_perceptual_hash ) )
+                            
+                        
+                    
+                    if outer_perceptual_hash_id is not None:
+                        
+                        search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
+                        
+                        if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
+                            
+                            next_potentials.append( ( outer_perceptual_hash_id, search_key, search_perceptual_hash ) )
+                            
+                        
+                    
+                
+            
+        
+        if search_stats is not None:
+            
+            search_stats[ 'nodes touched' ] += total_nodes_searched
+            search_stats[ 'cycles' ] += num_cycles
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusData.ToHumanInt( total_nodes_searched ), HydrusData.ToHumanInt( num_cycles ) ) )
+            
+        
+        return search_keys_to_similar_perceptual_hash_ids_to_distances
+        
     
     def _TryToPopulatePerceptualHashToVPTreeNodeCache( self, perceptual_hash_ids: typing.Collection[ int ] ):
         
@@ -571,13 +1199,20 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
     def AssociatePerceptualHashes( self, hash_id, perceptual_hashes ):
         
-        perceptual_hash_ids = set()
+        perceptual_hash_ids_and_perceptual_hashes = []
         
         for perceptual_hash in perceptual_hashes:
             
             perceptual_hash_id = self._GetPerceptualHashId( perceptual_hash )
             
-            perceptual_hash_ids.add( perceptual_hash_id )
+            perceptual_hash_ids_and_perceptual_hashes.append( ( perceptual_hash_id, perceptual_hash ) )
+            
+        
+        perceptual_hash_ids = { perceptual_hash_id for ( perceptual_hash_id, perceptual_hash ) in perceptual_hash_ids_and_perceptual_hashes }
+        
+        if self._perceptual_hash_bit_array_index is not None:
+            
+            self._perceptual_hash_bit_array_index.AddPerceptualHashes( perceptual_hash_ids_and_perceptual_hashes )
             
         
         self._ExecuteMany( 'INSERT OR IGNORE INTO shape_perceptual_hash_map ( phash_id, hash_id ) VALUES ( ?, ? );', ( ( perceptual_hash_id, hash_id ) for perceptual_hash_id in perceptual_hash_ids ) )
@@ -605,6 +1240,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         
         self._ExecuteMany( 'INSERT OR IGNORE INTO shape_maintenance_branch_regen ( phash_id ) VALUES ( ? );', ( ( perceptual_hash_id, ) for perceptual_hash_id in useless_perceptual_hash_ids ) )
         
+        if self._perceptual_hash_bit_array_index is not None:
+            
+            self._perceptual_hash_bit_array_index.RemovePerceptualHashIds( useless_perceptual_hash_ids )
+            
+        
     
     def FileIsInSystem( self, hash_id ):
         
@@ -625,6 +1265,70 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return dict( self._Execute( f'SELECT {hash_ids_table_name}.hash_id, hash FROM {hash_ids_table_name} CROSS JOIN pixel_hash_map ON ( {hash_ids_table_name}.hash_id = pixel_hash_map.hash_id ) CROSS JOIN hashes ON ( pixel_hash_map.pixel_hash_id = hashes.hash_id );' ) )
         
     
+    def GetSearchEngineBenchmark( self, num_samples = 100, search_distances = ( 0, 2, 4, 8 ) ) -> str:
+        
+        # only the perceptual hashes that still belong to a file, so we are searching for something real
+        sample_perceptual_hashes = self._STL( self._Execute( 'SELECT phash FROM shape_perceptual_hashes WHERE EXISTS ( SELECT 1 FROM shape_perceptual_hash_map WHERE shape_perceptual_hash_map.phash_id = shape_perceptual_hashes.phash_id ) ORDER BY RANDOM() LIMIT ?;', ( num_samples, ) ) )
+        
+        if len( sample_perceptual_hashes ) == 0:
+            
+            return 'No perceptual hashes to benchmark with!'
+            
+        
+        search_rows = list( enumerate( sample_perceptual_hashes ) )
+        
+        search_engines = [
+            ( 'vp-tree', self._SearchPerceptualHashesVPTree ),
+            ( 'multi-index', self._SearchPerceptualHashesMultiIndex ),
+            ( 'bit array', self._SearchPerceptualHashesBitArray )
+        ]
+        
+        lines = [ 'Similar files search benchmark, searching for {} perceptual hashes:'.format( HydrusData.ToHumanInt( len( search_rows ) ) ) ]
+        
+        for search_distance in search_distances:
+            
+            lines.append( '' )
+            lines.append( 'distance {}:'.format( search_distance ) )
+            
+            canonical_results = None
+            
+            for ( name, search_method ) in search_engines:
+                
+                search_stats = collections.Counter()
+                
+                time_started = HydrusTime.GetNowPrecise()
+                
+                search_keys_to_similar_perceptual_hash_ids_to_distances = search_method( search_rows, search_distance, search_stats = search_stats )
+                
+                time_took = HydrusTime.GetNowPrecise() - time_started
+                
+                results = { ( search_key, perceptual_hash_id, distance ) for ( search_key, similar_perceptual_hash_ids_to_distances ) in search_keys_to_similar_perceptual_hash_ids_to_distances.items() for ( perceptual_hash_id, distance ) in similar_perceptual_hash_ids_to_distances.items() }
+                
+                stats_text = ', '.join( '{} {}'.format( HydrusData.ToHumanInt( count ), stat_name ) for ( stat_name, count ) in search_stats.items() )
+                
+                line = '{}: {:.1f}ms, {} results, {}'.format( name, time_took * 1000, HydrusData.ToHumanInt( len( results ) ), stats_text )
+                
+                if canonical_results is None:
+                    
+                    canonical_results = results
+                    
+                elif results != canonical_results:
+                    
+                    line += ' - results differ from the first engine!'
+                    
+                
+                lines.append( line )
+                
+            
+        
+        if CG.client_controller.new_options.GetInteger( 'similar_files_search_engine' ) != CC.SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY:
+            
+            self._perceptual_hash_bit_array_index = None
+            
+        
+        return '\n'.join( lines )
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> typing.List[ typing.Tuple[ str, str ] ]:
         
         if content_type == HC.CONTENT_TYPE_HASH:
@@ -738,6 +1442,45 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return False
         
     
+    def RegenerateMultiIndex( self ):
+        
+        job_status = ClientThreading.JobStatus()
+        
+        try:
+            
+            job_status.SetStatusTitle( 'regenerating similar files multi-index' )
+            
+            CG.client_controller.pub( 'modal_message', job_status )
+            
+            self._Execute( 'DELETE FROM shape_perceptual_hash_multi_index;' )
+            
+            all_nodes = self._Execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes;' ).fetchall()
+            
+            num_to_do = len( all_nodes )
+            num_done = 0
+            
+            for chunk in HydrusLists.SplitListIntoChunks( all_nodes, 10000 ):
+                
+                text = 'indexing perceptual hashes - ' + HydrusData.ConvertValueRangeToPrettyString( num_done, num_to_do )
+                
+                CG.client_controller.frame_splash_status.SetSubtext( text )
+                job_status.SetStatusText( text )
+                job_status.SetVariable( 'popup_gauge_1', ( num_done, num_to_do ) )
+                
+                self._AddMultiIndexRows( chunk )
+                
+                num_done += len( chunk )
+                
+            
+        finally:
+            
+            job_status.SetStatusText( 'done!' )
+            job_status.DeleteVariable( 'popup_gauge_1' )
+            
+            job_status.FinishAndDismiss( 5 )
+            
+        
+    
     def RegenerateTree( self ):
         
         job_status = ClientThreading.JobStatus()
@@ -758,9 +1501,7 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self._Execute( 'DELETE FROM shape_vptree;' )
             
-            self._perceptual_hash_id_to_vp_tree_node_cache = {}
-            self._non_vp_treed_perceptual_hash_ids = set()
-            self._root_node_perceptual_hash_id = None
+            self._ClearCaches()
             
             all_nodes = self._Execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes;' ).fetchall()
             
@@ -788,33 +1529,62 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
     def SearchFile( self, hash_id: int, max_hamming_distance: int ) -> typing.List:
         
-        similar_hash_ids_and_distances = [ ( hash_id, 0 ) ]
+        return self.SearchFiles( ( hash_id, ), max_hamming_distance )[ hash_id ]
+        
+    
+    def SearchFiles( self, hash_ids: typing.Collection[ int ], max_hamming_distance: int ) -> typing.Dict[ int, typing.List[ typing.Tuple[ int, int ] ] ]:
         
-        pixel_hash_id = self._GetPixelHashId( hash_id )
+        # every file matches itself
+        hash_ids_to_similar_hash_ids_to_distances = { hash_id : { hash_id : 0 } for hash_id in hash_ids }
         
-        if pixel_hash_id is not None:
+        if len( hash_ids_to_similar_hash_ids_to_distances ) == 0:
             
-            similar_hash_ids_and_distances.extend( self.SearchPixelHashes( ( pixel_hash_id, ) ) )
+            return {}
             
         
-        if max_hamming_distance == 0:
+        with self._MakeTemporaryIntegerTable( hash_ids_to_similar_hash_ids_to_distances.keys(), 'hash_id' ) as temp_table_name:
             
-            exact_match_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_perceptual_hash_map WHERE phash_id IN ( SELECT phash_id FROM shape_perceptual_hash_map WHERE hash_id = ? );', ( hash_id, ) ) )
+            # temp hashes to pixel hashes to pixel dupes
+            rows = self._Execute( f'SELECT {temp_table_name}.hash_id, pixel_dupes.hash_id FROM {temp_table_name} CROSS JOIN pixel_hash_map ON ( {temp_table_name}.hash_id = pixel_hash_map.hash_id ) CROSS JOIN pixel_hash_map AS pixel_dupes ON ( pixel_hash_map.pixel_hash_id = pixel_dupes.pixel_hash_id );' ).fetchall()
             
-            similar_hash_ids_and_distances.extend( [ ( exact_match_hash_id, 0 ) for exact_match_hash_id in exact_match_hash_ids ] )
+            for ( hash_id, pixel_dupe_hash_id ) in rows:
+                
+                hash_ids_to_similar_hash_ids_to_distances[ hash_id ][ pixel_dupe_hash_id ] = 0
+                
             
-        else:
+            if max_hamming_distance == 0:
+                
+                # temp hashes to perceptual hashes to exact matches
+                rows = self._Execute( f'SELECT {temp_table_name}.hash_id, exact_matches.hash_id FROM {temp_table_name} CROSS JOIN shape_perceptual_hash_map ON ( {temp_table_name}.hash_id = shape_perceptual_hash_map.hash_id ) CROSS JOIN shape_perceptual_hash_map AS exact_matches ON ( shape_perceptual_hash_map.phash_id = exact_matches.phash_id );' ).fetchall()
+                
+                for ( hash_id, exact_match_hash_id ) in rows:
+                    
+                    hash_ids_to_similar_hash_ids_to_distances[ hash_id ][ exact_match_hash_id ] = 0
+                    
+                
+                search_rows = []
+                
+            else:
+                
+                # temp hashes to perceptual hashes
+                search_rows = self._Execute( f'SELECT {temp_table_name}.hash_id, phash FROM {temp_table_name} CROSS JOIN shape_perceptual_hash_map ON ( {temp_table_name}.hash_id = shape_perceptual_hash_map.hash_id ) CROSS JOIN shape_perceptual_hashes ON ( shape_perceptual_hash_map.phash_id = shape_perceptual_hashes.phash_id );' ).fetchall()
+                
             
-            perceptual_hash_ids = self._GetPerceptualHashIdsFromHashId( hash_id )
+        
+        for ( hash_id, similar_hash_ids_to_distances ) in self._GetSimilarHashIdsToDistances( search_rows, max_hamming_distance ).items():
             
-            perceptual_hashes = self._GetPerceptualHashes( perceptual_hash_ids )
+            our_similar_hash_ids_to_distances = hash_ids_to_similar_hash_ids_to_distances[ hash_id ]
             
-            similar_hash_ids_and_distances.extend( self.SearchPerceptualHashes( perceptual_hashes, max_hamming_distance ) )
+            for ( similar_hash_id, distance ) in similar_hash_ids_to_distances.items():
+                
+                if similar_hash_id not in our_similar_hash_ids_to_distances or distance < our_similar_hash_ids_to_distances[ similar_hash_id ]:
+                    
+                    our_similar_hash_ids_to_distances[ similar_hash_id ] = distance
+                    
+                
             
         
-        similar_hash_ids_and_distances = HydrusData.DedupeList( similar_hash_ids_and_distances )
-        
-        return similar_hash_ids_and_distances
+        return { hash_id : list( similar_hash_ids_to_distances.items() ) for ( hash_id, similar_hash_ids_to_distances ) in hash_ids_to_similar_hash_ids_to_distances.items() }
         
     
     def SearchPixelHashes( self, search_pixel_hash_ids: typing.Collection[ int ] ):
@@ -868,151 +1638,12 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         else:
             
-            search_radius = max_hamming_distance
-            
-            if self._root_node_perceptual_hash_id is None:
-                
-                top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
-                
-                if top_node_result is None:
-                    
-                    return similar_hash_ids_and_distances
-                    
-                
-                ( self._root_node_perceptual_hash_id, ) = top_node_result
-                
-            
-            similar_perceptual_hash_ids_to_distances = {}
-            
-            num_cycles = 0
-            total_nodes_searched = 0
+            search_keys_to_similar_hash_ids_to_distances = self._GetSimilarHashIdsToDistances( [ ( None, search_perceptual_hash ) for search_perceptual_hash in search_perceptual_hashes ], max_hamming_distance )
             
-            for search_perceptual_hash in search_perceptual_hashes:
+            if None in search_keys_to_similar_hash_ids_to_distances:
                 
-                next_potentials = [ self._root_node_perceptual_hash_id ]
+                similar_hash_ids_and_distances.extend( search_keys_to_similar_hash_ids_to_distances[ None ].items() )
                 
-                while len( next_potentials ) > 0:
-                    
-                    current_potentials = next_potentials
-                    next_potentials = []
-                    
-                    num_cycles += 1
-                    total_nodes_searched += len( current_potentials )
-                    
-                    # this is no longer an iterable inside the main node SELECT because it was causing crashes on linux!!
-                    # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching perceptual_hashes it presumably was still hanging on to
-                    # the crash was in sqlite code, again presumably on subsequent fetch
-                    # adding a fake delay in seemed to fix it also. guess it was some memory maintenance buffer/bytes thing
-                    # anyway, we now just get the whole lot of results first and then work on the whole lot
-                    # UPDATE: we moved to a cache finally, so the iteration danger is less worrying, but leaving the above up anyway
-                    
-                    self._TryToPopulatePerceptualHashToVPTreeNodeCache( current_potentials )
-                    
-                    for node_perceptual_hash_id in current_potentials:
-                        
-                        if node_perceptual_hash_id not in self._perceptual_hash_id_to_vp_tree_node_cache:
-                            
-                            # something crazy happened, probably a broken tree branch, move on
-                            continue
-                            
-                        
-                        ( node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) = self._perceptual_hash_id_to_vp_tree_node_cache[ node_perceptual_hash_id ]
-                        
-                        # first check the node itself--is it similar?
-                        
-                        node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
-                        
-                        if node_hamming_distance <= search_radius:
-                            
-                            if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
-                                
-                                current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
-                                
-                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
-                                
-                            else:
-                                
-                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
-                                
-                            
-                        
-                        # now how about its children--where should we search next?
-                        
-                        if node_radius is not None:
-                            
-                            # we have two spheres--node and search--their centers separated by node_hamming_distance
-                            # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
-                            # there are four possibles:
-                            # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
-                            # (----N---(-)-S--)      intersects with both
-                            # (----N-(--S-)-)        intersects with both
-                            # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
-                            
-                            if inner_perceptual_hash_id is not None:
-                                
-                                spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
-                                
-                                if not spheres_disjoint: # i.e. they intersect at some point
-                                    
-                                    next_potentials.append( inner_perceptual_hash_id )
-                                    
-                                
-                            
-                            if outer_perceptual_hash_id is not None:
-                                
-                                search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
-                                
-                                if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
-                                    
-                                    next_potentials.append( outer_perceptual_hash_id )
-                                    
-                                
-                            
-                        
-                    
-                
-            
-            if HG.db_report_mode:
-                
-                HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusData.ToHumanInt( total_nodes_searched ), HydrusData.ToHumanInt( num_cycles ) ) )
-                
-            
-            # so, now we have perceptual_hash_ids and distances. let's map that to actual files.
-            # files can have multiple perceptual_hashes, and perceptual_hashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
-            
-            similar_perceptual_hash_ids = list( similar_perceptual_hash_ids_to_distances.keys() )
-            
-            with self._MakeTemporaryIntegerTable( similar_perceptual_hash_ids, 'phash_id' ) as temp_table_name:
-                
-                # temp perceptual_hashes to hash map
-                similar_perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
-                
-            
-            similar_hash_ids_to_distances = {}
-            
-            for ( perceptual_hash_id, hash_ids ) in similar_perceptual_hash_ids_to_hash_ids.items():
-                
-                distance = similar_perceptual_hash_ids_to_distances[ perceptual_hash_id ]
-                
-                for hash_id in hash_ids:
-                    
-                    if hash_id not in similar_hash_ids_to_distances:
-                        
-                        similar_hash_ids_to_distances[ hash_id ] = distance
-                        
-                    else:
-                        
-                        current_distance = similar_hash_ids_to_distances[ hash_id ]
-                        
-                        if distance < current_distance:
-                            
-                            similar_hash_ids_to_distances[ hash_id ] = distance
-                            
-                        
-                    
-                
-            
-            similar_hash_ids_and_distances.extend( similar_hash_ids_to_distances.items() )
             
         
         similar_hash_ids_and_distances = HydrusData.DedupeList( similar_hash_ids_and_distances )
@@ -1718,6 +1718,18 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         HydrusMemory.PrintCurrentMemoryUse( ( QW.QWidget, ) )
         
     
+    def _DebugRunSimilarFilesSearchBenchmark( self ):
+        
+        def do_it():
+            
+            text = self._controller.Read( 'similar_files_search_benchmark' )
+            
+            HydrusData.ShowText( text )
+            
+        
+        self._controller.CallToThread( do_it )
+        
+    
     def _DebugShowScheduledJobs( self ):
         
         self._controller.DebugShowScheduledJobs()
@@ -2112,7 +2124,7 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
                         
                         try:
                             
-                            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+                            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
                             
                         except:
                             
@@ -3239,6 +3251,7 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         ClientGUIMenus.AppendSeparator( regen_submenu )
         
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'service info numbers', 'Delete all cached service info like total number of mappings or files, in case it has become desynchronised. Some parts of the gui may be laggy immediately after this as these numbers are recalculated.', self._DeleteServiceInfo )
+        ClientGUIMenus.AppendMenuItem( regen_submenu, 'similar files multi-index', 'Delete and recreate the similar files multi-index.', self._RegenerateSimilarFilesMultiIndex )
         ClientGUIMenus.AppendMenuItem( regen_submenu, 'similar files search tree', 'Delete and recreate the similar files search tree.', self._RegenerateSimilarFilesTree )
         
         ClientGUIMenus.AppendMenu( menu, regen_submenu, 'regenerate' )
@@ -3469,6 +3482,7 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         ClientGUIMenus.AppendMenuCheckItem( data_actions, 'db ui-hang relief mode', 'Have UI-synchronised database jobs process pending Qt events while they wait.', HG.db_ui_hang_relief_mode, self._SwitchBoolean, 'db_ui_hang_relief_mode' )
         ClientGUIMenus.AppendMenuItem( data_actions, 'review threads', 'Show current threads and what they are doing.', self._ReviewThreads )
         ClientGUIMenus.AppendMenuItem( data_actions, 'show scheduled jobs', 'Print some information about the currently scheduled jobs log.', self._DebugShowScheduledJobs )
+        ClientGUIMenus.AppendMenuItem( data_actions, 'similar files search benchmark', 'Compare how the similar files search engines perform on a sample of your files.', self._DebugRunSimilarFilesSearchBenchmark )
         ClientGUIMenus.AppendMenuItem( data_actions, 'subscription manager snapshot', 'Have the subscription system show what it is doing.', self._controller.subscriptions_manager.ShowSnapshot )
         ClientGUIMenus.AppendMenuItem( data_actions, 'flush log', 'Command the log to write any buffered contents to hard drive.', HydrusData.DebugPrint, 'Flushing log' )
         ClientGUIMenus.AppendMenuItem( data_actions, 'enable truncated image loading', 'Enable the truncated image loading to test out broken jpegs.', self._EnableLoadTruncatedImages )
@@ -3483,6 +3497,7 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         ClientGUIMenus.AppendMenuItem( memory_actions, 'run slow memory maintenance', 'Tell all the slow caches to maintain themselves.', self._controller.MaintainMemorySlow )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear all rendering caches', 'Tell the image rendering system to forget all current images, tiles, and thumbs. This will often free up a bunch of memory immediately.', self._controller.ClearCaches )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear thumbnail cache', 'Tell the thumbnail cache to forget everything and redraw all current thumbs.', self._controller.pub, 'reset_thumbnail_cache' )
+        ClientGUIMenus.AppendMenuItem( memory_actions, 'review rendering cache metrics', 'Show how full the thumbnail, image, and image tile caches are and how often they hit.', self._ReviewDataCacheMetrics )
         
         if HydrusMemory.PYMPLER_OK:
             
@@ -5363,6 +5378,22 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
             
         
     
+    def _RegenerateSimilarFilesMultiIndex( self ):
+        
+        message = 'This will delete and then recreate the similar files multi-index. This is useful if you use the multi-index search engine and it seems to be missing files.'
+        message += os.linesep * 2
+        message += 'If you have a lot of files, it can take a little while, during which the gui may hang.'
+        message += os.linesep * 2
+        message += 'If you do not have a specific reason to run this, it is pointless.'
+        
+        ( result, was_cancelled ) = ClientGUIDialogsQuick.GetYesNo( self, message, yes_label = 'do it', no_label = 'forget it', check_for_cancelled = True )
+        
+        if result == QW.QDialog.Accepted:
+            
+            self._controller.Write( 'regenerate_similar_files_multi_index' )
+            
+        
+    
     def _RegenerateSimilarFilesTree( self ):
         
         message = 'This will delete and then recreate the similar files search tree. This is useful if it has somehow become unbalanced and similar files searches are running slow.'
@@ -5624,6 +5655,15 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         frame.SetPanel( panel )
         
     
+    def _ReviewDataCacheMetrics( self ):
+        
+        frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'review rendering cache metrics' )
+        
+        panel = ClientGUIScrolledPanelsReview.ReviewDataCacheMetrics( frame, self._controller )
+        
+        frame.SetPanel( panel )
+        
+    
     def _ReviewDeferredDeleteTableData( self ):
         
         frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'review deferred delete data' )
@@ -1853,6 +1853,16 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            performance_panel = ClientGUICommon.StaticBox( self, 'performance' )
+            
+            self._file_import_worker_processes = ClientGUICommon.BetterSpinBox( performance_panel, min = 0, max = 64 )
+            tt = 'If set above 0, hard drive imports will send the CPU-heavy part of importing images, animations, and videos (decoding, thumbnails, similar files data) to this many background processes, working on several files at once. Database work still happens one file at a time. If you have a lot of cores and are importing many files from a fast drive, try setting this to your number of cores. Set to 0 to do everything in the importer\'s thread, as before.'
+            self._file_import_worker_processes.setToolTip( tt )
+            
+            self._file_import_worker_processes.setValue( self._new_options.GetInteger( 'file_import_worker_processes' ) )
+            
+            #
+            
             rows = []
             
             rows.append( ( 'For \'quiet\' import contexts: import folders, subscriptions, Client API:', self._quiet_fios ) )
@@ -1862,11 +1872,20 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             default_fios.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
             
+            rows = []
+            
+            rows.append( ( 'Worker processes for hard drive imports:', self._file_import_worker_processes ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( performance_panel, rows )
+            
+            performance_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
             #
             
             vbox = QP.VBoxLayout()
             
             QP.AddToLayout( vbox, default_fios, CC.FLAGS_EXPAND_PERPENDICULAR )
+            QP.AddToLayout( vbox, performance_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
             vbox.addStretch( 1 )
             
             self.setLayout( vbox )
@@ -1877,6 +1896,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetDefaultFileImportOptions( FileImportOptions.IMPORT_TYPE_QUIET, self._quiet_fios.GetFileImportOptions() )
             self._new_options.SetDefaultFileImportOptions( FileImportOptions.IMPORT_TYPE_LOUD, self._loud_fios.GetFileImportOptions() )
             
+            self._new_options.SetInteger( 'file_import_worker_processes', self._file_import_worker_processes.value() )
+            
         
     
     class _MaintenanceAndProcessingPanel( QW.QWidget ):
@@ -2008,6 +2029,16 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._maintain_similar_files_duplicate_pairs_during_idle = QW.QCheckBox( self._duplicates_panel )
             
+            self._similar_files_search_engine = ClientGUICommon.BetterChoice( self._duplicates_panel )
+            
+            for engine in ( CC.SIMILAR_FILES_SEARCH_ENGINE_VPTREE, CC.SIMILAR_FILES_SEARCH_ENGINE_MULTI_INDEX, CC.SIMILAR_FILES_SEARCH_ENGINE_BIT_ARRAY ):
+                
+                self._similar_files_search_engine.addItem( CC.similar_files_search_engine_string_lookup[ engine ], engine )
+                
+            
+            tt = 'The vp-tree walks a search tree stored in the database and uses very little memory. The bit array loads every perceptual hash into memory (about 16 bytes per hash) and compares them all at once, which is much faster on large clients. The multi-index looks up pieces of each perceptual hash in an index stored in the database, which is very fast for the small search distances most people use, but falls back to the vp-tree for distances above 11.'
+            self._similar_files_search_engine.setToolTip( tt )
+            
             self._potential_duplicates_search_work_time = ClientGUITime.TimeDeltaCtrl( self._duplicates_panel, min = 0.1, seconds = True, milliseconds = True )
             tt = 'DO NOT CHANGE UNLESS YOU KNOW WHAT YOU ARE DOING. Potential search operates on a work-rest cycle. This setting determines how long it should work for in each work packet. Actual work time will normally be a little larger than this, and on large databases the minimum work time may be upwards of several seconds.'
             self._potential_duplicates_search_work_time.setToolTip( tt )
@@ -2097,6 +2128,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._tag_display_processing_rest_percentage_work_hard.setValue( self._new_options.GetInteger( 'tag_display_processing_rest_percentage_work_hard' ) )
             
             self._maintain_similar_files_duplicate_pairs_during_idle.setChecked( self._new_options.GetBoolean( 'maintain_similar_files_duplicate_pairs_during_idle' ) )
+            self._similar_files_search_engine.SetValue( self._new_options.GetInteger( 'similar_files_search_engine' ) )
             self._potential_duplicates_search_work_time.SetValue( self._new_options.GetInteger( 'potential_duplicates_search_work_time_ms' ) / 1000 )
             self._potential_duplicates_search_rest_percentage.setValue( self._new_options.GetInteger( 'potential_duplicates_search_rest_percentage' ) )
             
@@ -2237,6 +2269,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows = []
             
             rows.append( ( 'Search for potential duplicates in idle time/shutdown: ', self._maintain_similar_files_duplicate_pairs_during_idle ) )
+            rows.append( ( 'Similar files search engine: ', self._similar_files_search_engine ) )
             rows.append( ( '"Idle" ideal work packet time: ', self._potential_duplicates_search_work_time ) )
             rows.append( ( '"Idle" rest time percentage: ', self._potential_duplicates_search_rest_percentage ) )
             
@@ -2366,6 +2399,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'tag_display_processing_rest_percentage_work_hard', self._tag_display_processing_rest_percentage_work_hard.value() )
             
             self._new_options.SetBoolean( 'maintain_similar_files_duplicate_pairs_during_idle', self._maintain_similar_files_duplicate_pairs_during_idle.isChecked() )
+            self._new_options.SetInteger( 'similar_files_search_engine', self._similar_files_search_engine.GetValue() )
             self._new_options.SetInteger( 'potential_duplicates_search_work_time_ms', int( self._potential_duplicates_search_work_time.GetValue() * 1000 ) )
             self._new_options.SetInteger( 'potential_duplicates_search_rest_percentage', self._potential_duplicates_search_rest_percentage.value() )
             
@@ -3389,6 +3423,20 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._thumbnail_cache_timeout.setToolTip( tt )
             
+            self._thumbnail_disk_cache_size = ClientGUIControls.NoneableBytesControl( thumbnail_cache_panel, initial_value = 1024 * 1024 * 1024, none_label = 'off' )
+            
+            tt = 'If set, thumbnails that fall out of the memory cache are also saved, already decoded and scaled, to a single file in your database directory. Loading them back is then just a quick disk read with no jpeg/png decode, which helps scrolling through big pages of files you have not looked at in a while.'
+            tt += os.linesep * 2
+            tt += 'Most thumbnails are RGB, so each costs roughly [width x height x 3] on disk. When the file hits this size, it is cleared and starts again. It is also cleared whenever you change the thumbnail size.'
+            
+            self._thumbnail_disk_cache_size.setToolTip( tt )
+            
+            self._thumbnail_waterfall_workers = ClientGUICommon.BetterSpinBox( thumbnail_cache_panel, min = 1, max = 32 )
+            
+            tt = 'When a page of thumbnails needs loading, this many are loaded from disk and decoded at once. If you are on an SSD and have some CPU cores spare, more is faster. On a slow HDD, more can just make the drive seek back and forth.'
+            
+            self._thumbnail_waterfall_workers.setToolTip( tt )
+            
             image_cache_panel = ClientGUICommon.StaticBox( self, 'image cache' )
             
             self._image_cache_size = ClientGUIControls.BytesControl( image_cache_panel )
@@ -3471,6 +3519,35 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._ideal_tile_dimension.setToolTip( tt )
             
+            encoded_image_cache_panel = ClientGUICommon.StaticBox( self, 'client api encoded image cache' )
+            
+            self._encoded_image_cache_size = ClientGUIControls.BytesControl( encoded_image_cache_panel )
+            
+            tt = 'When the Client API is asked to render an image, the resized and encoded png/jpeg/webp is cached here so repeat requests for the same file, size, and format are served without rendering again.'
+            
+            self._encoded_image_cache_size.setToolTip( tt )
+            
+            self._encoded_image_cache_timeout = ClientGUITime.TimeDeltaButton( encoded_image_cache_panel, min = 300, hours = True, minutes = True )
+            
+            tt = 'The amount of not-accessed time after which an encoded image will naturally be removed from the cache.'
+            
+            self._encoded_image_cache_timeout.setToolTip( tt )
+            
+            client_api_thread_pools_panel = ClientGUICommon.StaticBox( self, 'client api thread pools' )
+            
+            self._client_api_thread_pool_controls = {}
+            
+            for name in ( 'metadata', 'files', 'writes', 'rendering' ):
+                
+                max_threads = ClientGUICommon.BetterSpinBox( client_api_thread_pools_panel, min = 1, max = 64 )
+                max_queue_depth = ClientGUICommon.BetterSpinBox( client_api_thread_pools_panel, min = 0, max = 65536 )
+                
+                max_threads.setToolTip( 'How many requests of this sort the Client API will work on at once.' )
+                max_queue_depth.setToolTip( 'How many more requests of this sort may wait for a free thread. Beyond this, new requests get a 503 and should try again later.' )
+                
+                self._client_api_thread_pool_controls[ name ] = ( max_threads, max_queue_depth )
+                
+            
             #
             
             buffer_panel = ClientGUICommon.StaticBox( self, 'video buffer' )
@@ -3482,13 +3559,36 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            database_panel = ClientGUICommon.StaticBox( self, 'database' )
+            
+            self._db_read_replicas = ClientGUICommon.BetterSpinBox( database_panel, min = 0, max = 8 )
+            
+            tt = 'If set, this many extra read-only connections to the database are opened, and file searches, tag autocomplete and media result loading can be run on them while the main connection is busy with some other slow read. Anything that writes still goes through the main connection, and these reads wait for it, so this helps most when you are opening several big searches at once.'
+            tt += os.linesep * 2
+            tt += 'This needs the default WAL journalling. It has no effect if you launched with a different journal mode.'
+            
+            self._db_read_replicas.setToolTip( tt )
+            
+            #
+            
             self._thumbnail_cache_size.SetValue( self._new_options.GetInteger( 'thumbnail_cache_size' ) )
             self._image_cache_size.SetValue( self._new_options.GetInteger( 'image_cache_size' ) )
             self._image_tile_cache_size.SetValue( self._new_options.GetInteger( 'image_tile_cache_size' ) )
+            self._encoded_image_cache_size.SetValue( self._new_options.GetInteger( 'encoded_image_cache_size' ) )
             
             self._thumbnail_cache_timeout.SetValue( self._new_options.GetInteger( 'thumbnail_cache_timeout' ) )
             self._image_cache_timeout.SetValue( self._new_options.GetInteger( 'image_cache_timeout' ) )
             self._image_tile_cache_timeout.SetValue( self._new_options.GetInteger( 'image_tile_cache_timeout' ) )
+            self._encoded_image_cache_timeout.SetValue( self._new_options.GetInteger( 'encoded_image_cache_timeout' ) )
+            
+            for ( name, ( max_threads, max_queue_depth ) ) in self._client_api_thread_pool_controls.items():
+                
+                max_threads.setValue( self._new_options.GetInteger( 'client_api_thread_pool_{}_max_threads'.format( name ) ) )
+                max_queue_depth.setValue( self._new_options.GetInteger( 'client_api_thread_pool_{}_max_queue_depth'.format( name ) ) )
+                
+            
+            self._thumbnail_disk_cache_size.SetValue( self._new_options.GetNoneableInteger( 'thumbnail_disk_cache_size' ) )
+            self._thumbnail_waterfall_workers.setValue( self._new_options.GetInteger( 'thumbnail_waterfall_workers' ) )
             
             self._ideal_tile_dimension.setValue( self._new_options.GetInteger( 'ideal_tile_dimension' ) )
             
@@ -3501,6 +3601,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._image_cache_storage_limit_percentage.setValue( self._new_options.GetInteger( 'image_cache_storage_limit_percentage' ) )
             self._image_cache_prefetch_limit_percentage.setValue( self._new_options.GetInteger( 'image_cache_prefetch_limit_percentage' ) )
             
+            self._db_read_replicas.setValue( self._new_options.GetInteger( 'db_read_replicas' ) )
+            
             #
             
             vbox = QP.VBoxLayout()
@@ -3555,6 +3657,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             rows.append( ( 'Memory reserved for thumbnail cache:', thumbnails_sizer ) )
             rows.append( ( 'Thumbnail cache timeout:', self._thumbnail_cache_timeout ) )
+            rows.append( ( 'Disk cache for decoded thumbnails:', self._thumbnail_disk_cache_size ) )
+            rows.append( ( 'Thumbnails to load at once:', self._thumbnail_waterfall_workers ) )
             
             gridbox = ClientGUICommon.WrapInGrid( thumbnail_cache_panel, rows )
             
@@ -3613,6 +3717,43 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            rows = []
+            
+            rows.append( ( 'Memory reserved for encoded image cache:', self._encoded_image_cache_size ) )
+            rows.append( ( 'Encoded image cache timeout:', self._encoded_image_cache_timeout ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( encoded_image_cache_panel, rows )
+            
+            encoded_image_cache_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
+            QP.AddToLayout( vbox, encoded_image_cache_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            #
+            
+            text = 'Slow Client API requests like file imports and renders get their own limited pools of threads, so a flood of them cannot hold up quick metadata requests.'
+            
+            st = ClientGUICommon.BetterStaticText( client_api_thread_pools_panel, text )
+            
+            st.setWordWrap( True )
+            
+            client_api_thread_pools_panel.Add( st, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            rows = []
+            
+            for ( name, ( max_threads, max_queue_depth ) ) in self._client_api_thread_pool_controls.items():
+                
+                rows.append( ( '{} requests - max threads:'.format( name ), max_threads ) )
+                rows.append( ( '{} requests - max queue depth:'.format( name ), max_queue_depth ) )
+                
+            
+            gridbox = ClientGUICommon.WrapInGrid( client_api_thread_pools_panel, rows )
+            
+            client_api_thread_pools_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
+            QP.AddToLayout( vbox, client_api_thread_pools_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            #
+            
             text = 'This old option does not apply to mpv! It only applies to the native hydrus animation renderer!'
             text += os.linesep
             text += 'Hydrus video rendering is CPU intensive.'
@@ -3641,6 +3782,18 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            rows = []
+            
+            rows.append( ( 'Read-only database connections:', self._db_read_replicas ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( database_panel, rows )
+            
+            database_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
+            QP.AddToLayout( vbox, database_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            #
+            
             vbox.addStretch( 1 )
             
             self.setLayout( vbox )
@@ -3758,10 +3911,21 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'thumbnail_cache_size', self._thumbnail_cache_size.GetValue() )
             self._new_options.SetInteger( 'image_cache_size', self._image_cache_size.GetValue() )
             self._new_options.SetInteger( 'image_tile_cache_size', self._image_tile_cache_size.GetValue() )
+            self._new_options.SetInteger( 'encoded_image_cache_size', self._encoded_image_cache_size.GetValue() )
             
             self._new_options.SetInteger( 'thumbnail_cache_timeout', self._thumbnail_cache_timeout.GetValue() )
             self._new_options.SetInteger( 'image_cache_timeout', self._image_cache_timeout.GetValue() )
             self._new_options.SetInteger( 'image_tile_cache_timeout', self._image_tile_cache_timeout.GetValue() )
+            self._new_options.SetInteger( 'encoded_image_cache_timeout', self._encoded_image_cache_timeout.GetValue() )
+            
+            for ( name, ( max_threads, max_queue_depth ) ) in self._client_api_thread_pool_controls.items():
+                
+                self._new_options.SetInteger( 'client_api_thread_pool_{}_max_threads'.format( name ), max_threads.value() )
+                self._new_options.SetInteger( 'client_api_thread_pool_{}_max_queue_depth'.format( name ), max_queue_depth.value() )
+                
+            
+            self._new_options.SetNoneableInteger( 'thumbnail_disk_cache_size', self._thumbnail_disk_cache_size.GetValue() )
+            self._new_options.SetInteger( 'thumbnail_waterfall_workers', self._thumbnail_waterfall_workers.value() )
             
             self._new_options.SetInteger( 'ideal_tile_dimension', self._ideal_tile_dimension.value() )
             
@@ -3772,6 +3936,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'image_cache_storage_limit_percentage', self._image_cache_storage_limit_percentage.value() )
             self._new_options.SetInteger( 'image_cache_prefetch_limit_percentage', self._image_cache_prefetch_limit_percentage.value() )
             
+            self._new_options.SetInteger( 'db_read_replicas', self._db_read_replicas.value() )
+            
             self._new_options.SetInteger( 'video_buffer_size', self._video_buffer_size.GetValue() )
             
         
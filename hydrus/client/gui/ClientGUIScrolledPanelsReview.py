@@ -36,6 +36,7 @@ from hydrus.client import ClientFilesPhysical
 from hydrus.client import ClientRendering
 from hydrus.client import ClientSerialisable
 from hydrus.client import ClientThreading
+from hydrus.client.caches import ClientCaches
 from hydrus.client.gui import ClientGUIAsync
 from hydrus.client.gui import ClientGUICharts
 from hydrus.client.gui import ClientGUIDialogsMessage
@@ -4277,6 +4278,95 @@ class ThreadsPanel( QW.QWidget ):
         
     
 
+class ReviewDataCacheMetrics( ClientGUIScrolledPanels.ReviewPanel ):
+    
+    def __init__( self, parent, controller ):
+        
+        ClientGUIScrolledPanels.ReviewPanel.__init__( self, parent )
+        
+        self._controller = controller
+        
+        self._names_to_metrics = {}
+        
+        #
+        
+        info_message = 'These are the rendering caches and how well they are doing since the client booted or the counters were last reset. A cache with a low hit rate and high churn is too small for how you use it. Churn is bytes added and evicted per second over the last minute.'
+        
+        st = ClientGUICommon.BetterStaticText( self, label = info_message )
+        
+        st.setWordWrap( True )
+        
+        self._list_ctrl_panel = ClientGUIListCtrl.BetterListCtrlPanel( self )
+        
+        self._list_ctrl = ClientGUIListCtrl.BetterListCtrl( self._list_ctrl_panel, CGLC.COLUMN_LIST_DATA_CACHE_METRICS.ID, 6, self._ConvertNameToListCtrlTuples )
+        
+        self._list_ctrl_panel.SetListCtrl( self._list_ctrl )
+        
+        self._list_ctrl_panel.AddButton( 'refresh', self._RefreshSnapshot )
+        self._list_ctrl_panel.AddButton( 'reset counters', self._ResetCounters )
+        
+        #
+        
+        self._RefreshSnapshot()
+        
+        self._list_ctrl.Sort()
+        
+        #
+        
+        vbox = QP.VBoxLayout()
+        
+        QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.widget().setLayout( vbox )
+        
+    
+    def _ConvertNameToListCtrlTuples( self, name ):
+        
+        metrics = self._names_to_metrics[ name ]
+        
+        num_items = metrics[ 'num_items' ]
+        size = metrics[ 'size' ]
+        size_limit = metrics[ 'size_limit' ]
+        hit_rate = metrics[ 'hit_rate' ]
+        num_hits = metrics[ 'num_hits' ]
+        num_misses = metrics[ 'num_misses' ]
+        num_evictions = metrics[ 'num_evictions' ]
+        churn = metrics[ 'churn_bytes_per_second' ]
+        
+        pretty_name = name
+        pretty_num_items = HydrusData.ToHumanInt( num_items )
+        pretty_size = HydrusData.ConvertValueRangeToBytes( size, size_limit )
+        pretty_hit_rate = HydrusData.ConvertFloatToPercentage( hit_rate )
+        pretty_num_hits = HydrusData.ToHumanInt( num_hits )
+        pretty_num_misses = HydrusData.ToHumanInt( num_misses )
+        pretty_num_evictions = HydrusData.ToHumanInt( num_evictions )
+        pretty_churn = '{}/s'.format( HydrusData.ToHumanBytes( churn ) )
+        
+        display_tuple = ( pretty_name, pretty_num_items, pretty_size, pretty_hit_rate, pretty_num_hits, pretty_num_misses, pretty_num_evictions, pretty_churn )
+        sort_tuple = ( name, num_items, size, hit_rate, num_hits, num_misses, num_evictions, churn )
+        
+        return ( display_tuple, sort_tuple )
+        
+    
+    def _RefreshSnapshot( self ):
+        
+        self._names_to_metrics = { metrics[ 'name' ] : metrics for metrics in ( data_cache.GetMetrics() for data_cache in ClientCaches.GetRenderingDataCaches( self._controller ) ) }
+        
+        self._list_ctrl.SetData( list( self._names_to_metrics.keys() ) )
+        
+    
+    def _ResetCounters( self ):
+        
+        for data_cache in ClientCaches.GetRenderingDataCaches( self._controller ):
+            
+            data_cache.ResetMetrics()
+            
+        
+        self._RefreshSnapshot()
+        
+    
+
 class ReviewDeferredDeleteTableData( ClientGUIScrolledPanels.ReviewPanel ):
     
     def __init__( self, parent, controller ):
@@ -1564,3 +1564,30 @@ register_column_type( COLUMN_LIST_DEFERRED_DELETE_TABLE_DATA.ID, COLUMN_LIST_DEF
 register_column_type( COLUMN_LIST_DEFERRED_DELETE_TABLE_DATA.ID, COLUMN_LIST_DEFERRED_DELETE_TABLE_DATA.ROWS, 'num rows', False, 12, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_DEFERRED_DELETE_TABLE_DATA.ID ] = ( COLUMN_LIST_DEFERRED_DELETE_TABLE_DATA.NAME, True )
+
+class COLUMN_LIST_DATA_CACHE_METRICS( COLUMN_LIST_DEFINITION ):
+    
+    ID = 73
+    
+    NAME = 0
+    NUM_ITEMS = 1
+    SIZE = 2
+    HIT_RATE = 3
+    HITS = 4
+    MISSES = 5
+    EVICTIONS = 6
+    CHURN = 7
+    
+
+column_list_type_name_lookup[ COLUMN_LIST_DATA_CACHE_METRICS.ID ] = 'data cache metrics'
+
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.NAME, 'name', False, 20, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.NUM_ITEMS, 'items', False, 8, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.SIZE, 'size', False, 20, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.HIT_RATE, 'hit rate', False, 9, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.HITS, 'hits', False, 9, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.MISSES, 'misses', False, 9, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.EVICTIONS, 'evictions', False, 9, True )
+register_column_type( COLUMN_LIST_DATA_CACHE_METRICS.ID, COLUMN_LIST_DATA_CACHE_METRICS.CHURN, 'churn', False, 12, True )
+
+default_column_list_sort_lookup[ COLUMN_LIST_DATA_CACHE_METRICS.ID ] = ( COLUMN_LIST_DATA_CACHE_METRICS.NAME, True )
@@ -981,7 +981,17 @@ class ManagementPanelDuplicateFilter( ManagementPanel ):
         
         self._search_button.setEnabled( we_can_start_work )
         
-        if not_all_files_searched:
+        potentials_search_progress = self._duplicates_manager.GetPotentialsSearchProgress()
+        
+        if self._potential_file_search_currently_happening and potentials_search_progress is not None:
+            
+            ( num_searched_estimate, total_num_files_estimate, files_per_second ) = potentials_search_progress
+            
+            self._num_searched.SetValue( 'Searching: {} files at this distance, {} files/s.'.format( HydrusData.ConvertValueRangeToPrettyString( num_searched_estimate, total_num_files_estimate ), HydrusData.ToHumanInt( int( files_per_second ) ) ), num_searched_estimate, total_num_files_estimate )
+            
+            page_name = 'preparation (working)'
+            
+        elif not_all_files_searched:
             
             if num_searched == 0:
                 
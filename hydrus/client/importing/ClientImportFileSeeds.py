@@ -326,6 +326,22 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return lookup_url
         
     
+    def _SetPathImportErrorStatus( self, e: Exception ):
+        
+        if isinstance( e, HydrusExceptions.VetoException ):
+            
+            self.SetStatus( CC.STATUS_VETOED, note = str( e ) )
+            
+        elif isinstance( e, HydrusExceptions.UnsupportedFileException ):
+            
+            self.SetStatus( CC.STATUS_ERROR, note = str( e ) )
+            
+        else:
+            
+            self.SetStatus( CC.STATUS_ERROR, exception = e )
+            
+        
+    
     def _SetupNoteImportOptions( self, given_note_import_options: NoteImportOptions.NoteImportOptions ) -> NoteImportOptions.NoteImportOptions:
         
         if given_note_import_options.IsDefault():
@@ -655,6 +671,9 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
             network_job.SetFileImportOptions( file_import_options )
             
+            # we hash as the chunks come in, so the import does not have to read the whole file again just to see if we already have it
+            network_job.SetHashWhileDownloading( True )
+            
             CG.client_controller.network_engine.AddJob( network_job )
             
             with network_job_presentation_context_factory( network_job ) as njpc:
@@ -735,7 +754,7 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
             status_hook( 'importing file' )
             
-            self.Import( temp_path, file_import_options, status_hook = status_hook )
+            self.Import( temp_path, file_import_options, status_hook = status_hook, all_hashes = network_job.GetDownloadedFileHashes() )
             
         finally:
             
@@ -997,14 +1016,45 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return self.GetHash() is not None
         
     
-    def Import( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, status_hook = None ):
+    def FinishPathImport( self, file_seed_cache: "FileSeedCache", path_import, status_hook = None ):
+        
+        if path_import is not None:
+            
+            ( file_import_options, file_import_job, os_file_handle, temp_path ) = path_import
+            
+            try:
+                
+                try:
+                    
+                    file_import_status = file_import_job.FinishWork( status_hook = status_hook )
+                    
+                    self.SetStatus( file_import_status.status, note = file_import_status.note )
+                    self.SetHash( file_import_status.hash )
+                    
+                finally:
+                    
+                    HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
+                    
+                
+                self.WriteContentUpdates( file_import_options = file_import_options )
+                
+            except Exception as e:
+                
+                self._SetPathImportErrorStatus( e )
+                
+            
+        
+        file_seed_cache.NotifyFileSeedsUpdated( ( self, ) )
+        
+    
+    def Import( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, status_hook = None, all_hashes = None ):
         
         if file_import_options.IsDefault():
             
             file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
             
         
-        file_import_job = ClientImportFiles.FileImportJob( temp_path, file_import_options )
+        file_import_job = ClientImportFiles.FileImportJob( temp_path, file_import_options, all_hashes = all_hashes )
         
         file_import_status = file_import_job.DoWork( status_hook = status_hook )
         
@@ -1014,56 +1064,9 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
     
     def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int, status_hook = None ):
         
-        try:
-            
-            file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, loud_or_quiet )
-            
-            if self.file_seed_type != FILE_SEED_TYPE_HDD:
-                
-                raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
-                
-            
-            path = self.file_seed_data
-            
-            if not os.path.exists( path ):
-                
-                raise HydrusExceptions.VetoException( 'Source file does not exist!' )
-                
-            
-            ( os_file_handle, temp_path ) = HydrusTemp.GetTempPath()
-            
-            try:
-                
-                if status_hook is not None:
-                    
-                    status_hook( 'copying file to temp location' )
-                    
-                
-                HydrusPaths.MirrorFile( path, temp_path )
-                
-                self.Import( temp_path, file_import_options, status_hook = status_hook )
-                
-            finally:
-                
-                HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
-                
-            
-            self.WriteContentUpdates( file_import_options = file_import_options )
-            
-        except HydrusExceptions.VetoException as e:
-            
-            self.SetStatus( CC.STATUS_VETOED, note = str( e ) )
-            
-        except HydrusExceptions.UnsupportedFileException as e:
-            
-            self.SetStatus( CC.STATUS_ERROR, note = str( e ) )
-            
-        except Exception as e:
-            
-            self.SetStatus( CC.STATUS_ERROR, exception = e )
-            
+        path_import = self.StartPathImport( file_import_options, loud_or_quiet, status_hook = status_hook )
         
-        file_seed_cache.NotifyFileSeedsUpdated( ( self, ) )
+        self.FinishPathImport( file_seed_cache, path_import, status_hook = status_hook )
         
     
     def IsAPostURL( self ):
@@ -1285,6 +1288,59 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return presentation_import_options.ShouldPresentHashAndStatus( self.GetHash(), self.status, should_check_location = should_check_location )
         
     
+    def StartPathImport( self, file_import_options: FileImportOptions.FileImportOptions, loud_or_quiet: int, status_hook = None, file_import_worker_pool: typing.Optional[ ClientImportFiles.FileImportWorkerPool ] = None ):
+        
+        # the returned path import goes to FinishPathImport, which cleans up the temp path
+        # if there is a worker pool, the metadata generation will be running in the background until then
+        
+        try:
+            
+            file_import_options = FileImportOptions.GetRealFileImportOptions( file_import_options, loud_or_quiet )
+            
+            if self.file_seed_type != FILE_SEED_TYPE_HDD:
+                
+                raise HydrusExceptions.VetoException( 'Attempted to import as a path, but I do not think I am a path!' )
+                
+            
+            path = self.file_seed_data
+            
+            if not os.path.exists( path ):
+                
+                raise HydrusExceptions.VetoException( 'Source file does not exist!' )
+                
+            
+            ( os_file_handle, temp_path ) = HydrusTemp.GetTempPath()
+            
+            try:
+                
+                if status_hook is not None:
+                    
+                    status_hook( 'copying file to temp location' )
+                    
+                
+                HydrusPaths.MirrorFile( path, temp_path )
+                
+                file_import_job = ClientImportFiles.FileImportJob( temp_path, file_import_options )
+                
+                file_import_job.StartWork( status_hook = status_hook, file_import_worker_pool = file_import_worker_pool )
+                
+            except:
+                
+                HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
+                
+                raise
+                
+            
+            return ( file_import_options, file_import_job, os_file_handle, temp_path )
+            
+        except Exception as e:
+            
+            self._SetPathImportErrorStatus( e )
+            
+            return None
+            
+        
+    
     def WorksInNewSystem( self ):
         
         if self.file_seed_type == FILE_SEED_TYPE_URL:
@@ -2987,6 +3043,39 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetNextFileSeeds( self, status: int, num_wanted: int ) -> typing.List[ FileSeed ]:
+        
+        with self._lock:
+            
+            file_seed = self._GetNextFileSeed( status )
+            
+            if file_seed is None:
+                
+                return []
+                
+            
+            next_file_seeds = [ file_seed ]
+            
+            file_seeds_to_indices = self._GetFileSeedsToIndices()
+            
+            index = file_seeds_to_indices[ file_seed ] + 1
+            
+            while len( next_file_seeds ) < num_wanted and index < len( self._file_seeds ):
+                
+                file_seed = self._file_seeds[ index ]
+                
+                if file_seed.status == status:
+                    
+                    next_file_seeds.append( file_seed )
+                    
+                
+                index += 1
+                
+            
+            return next_file_seeds
+            
+        
+    
     def GetNumNewFilesSince( self, since: int ):
         
         num_files = 0
@@ -1,3 +1,8 @@
+import concurrent.futures
+import multiprocessing
+import threading
+import typing
+
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
@@ -104,9 +109,260 @@ def CheckFileImportStatus( file_import_status: FileImportStatus ) -> FileImportS
     
     return file_import_status
     
+# these do not need Qt or the controller to generate their import info, so they can go to a worker process
+MIMES_WE_CAN_GENERATE_INFO_FOR_IN_A_WORKER_PROCESS = set( HC.IMAGES ).union( HC.ANIMATIONS ).union( HC.VIDEO )
+
+def GenerateImportInfo( temp_path: str, mime: int, thumbnail_settings, force_pil: bool, extra_description = None, status_hook = None ):
+    
+    # this does all the CPU-heavy work of an import. it does not talk to the controller, so it can run in a worker process
+    # that means every option it needs, including for any fallback path, has to come in as a parameter
+    
+    file_info = HydrusFileHandling.GetFileInfo( temp_path, mime = mime )
+    
+    ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = file_info
+    
+    if HG.file_import_report_mode:
+        
+        HydrusData.ShowText( 'File import job file info: {}'.format( file_info ) )
+        
+    
+    # a static image is decoded once here and shared by the thumbnail, perceptual hash, transparency, and pixel hash generation below
+    # if this fails, they get a None and have a go themselves, with their normal error handling
+    
+    numpy_image = None
+    
+    if mime in HC.IMAGES:
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job decoding image' )
+            
+        
+        try:
+            
+            numpy_image = HydrusImageHandling.GenerateNumPyImage( temp_path, mime, force_pil = force_pil )
+            
+        except Exception as e:
+            
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job could not decode the image, so each step will have a go itself:' )
+                HydrusData.ShowException( e )
+                
+            
+        
+    
+    thumbnail_bytes = None
+    blurhash = None
+    
+    if mime in HC.MIMES_WITH_THUMBNAILS:
+        
+        if status_hook is not None:
+            
+            status_hook( 'generating thumbnail' )
+            
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job generating thumbnail' )
+            
+        
+        ( bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent, percentage_in ) = thumbnail_settings
+        
+        target_resolution = HydrusImageHandling.GetThumbnailResolution( ( width, height ), bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent )
+        
+        thumbnail_numpy = HydrusFileHandling.GenerateThumbnailNumPy( temp_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in, extra_description = extra_description, numpy_image = numpy_image )
+        
+        # this guy handles almost all his own exceptions now, so no need for clever catching. if it fails, we are prob talking an I/O failure, which is not a 'thumbnail failed' error
+        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromNumPy( thumbnail_numpy )
+        
+        try:
+            
+            blurhash = HydrusBlurhash.GetBlurhashFromNumPy( thumbnail_numpy )
+            
+        except:
+            
+            pass
+            
+        
+    
+    perceptual_hashes = None
+    
+    if mime in HC.FILES_THAT_HAVE_PERCEPTUAL_HASH:
+        
+        if status_hook is not None:
+            
+            status_hook( 'generating similar files metadata' )
+            
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job generating perceptual_hashes' )
+            
+        
+        perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( temp_path, mime, numpy_image = numpy_image, force_pil = force_pil )
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job generated {} perceptual_hashes: {}'.format( len( perceptual_hashes ), [ perceptual_hash.hex() for perceptual_hash in perceptual_hashes ] ) )
+            
+        
+    
+    has_transparency = ClientFiles.HasTransparency( temp_path, mime, duration = duration, num_frames = num_frames, resolution = ( width, height ), numpy_image = numpy_image )
+    
+    has_exif = False
+    
+    raw_pil_image = None
+    
+    if mime in HC.FILES_THAT_CAN_HAVE_EXIF:
+        
+        try:
+            
+            if raw_pil_image is None:
+                
+                raw_pil_image = HydrusImageOpening.RawOpenPILImage( temp_path )
+                
+            
+            has_exif = HydrusImageMetadata.HasEXIF( raw_pil_image )
+            
+        except:
+            
+            pass
+            
+        
+    
+    has_human_readable_embedded_metadata = ClientFiles.HasHumanReadableEmbeddedMetadata( temp_path, mime )
+    
+    has_icc_profile = False
+    
+    if mime in HC.FILES_THAT_CAN_HAVE_ICC_PROFILE:
+        
+        try:
+            
+            if mime == HC.APPLICATION_PSD:
+                
+                has_icc_profile = HydrusPSDHandling.PSDHasICCProfile( temp_path )
+                
+            else:
+                
+                if raw_pil_image is None:
+                    
+                    raw_pil_image = HydrusImageOpening.RawOpenPILImage( temp_path )
+                    
+                
+                has_icc_profile = HydrusImageMetadata.HasICCProfile( raw_pil_image )
+                
+            
+        except:
+            
+            pass
+            
+        
+    
+    pixel_hash = None
+    
+    if mime in HC.FILES_THAT_CAN_HAVE_PIXEL_HASH and duration is None:
+        
+        try:
+            
+            pixel_hash = HydrusImageHandling.GetImagePixelHash( temp_path, mime, numpy_image = numpy_image )
+            
+        except:
+            
+            pass
+            
+        
+    
+    return ( file_info, thumbnail_bytes, blurhash, perceptual_hashes, has_transparency, has_exif, has_human_readable_embedded_metadata, has_icc_profile, pixel_hash )
+    
+
+class FileImportWorkerPool( object ):
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._executor = None
+        self._num_workers = 0
+        
+    
+    def _DropExecutor( self ):
+        
+        if self._executor is not None:
+            
+            self._executor.shutdown( wait = False, cancel_futures = True )
+            
+            self._executor = None
+            
+        
+    
+    def _GetExecutor( self, num_workers: int ) -> concurrent.futures.ProcessPoolExecutor:
+        
+        if self._executor is not None and num_workers != self._num_workers:
+            
+            # user changed the option, so let's spin up a new pool. any jobs on the old one will finish first
+            self._executor.shutdown( wait = False )
+            
+            self._executor = None
+            
+        
+        if self._executor is None:
+            
+            # spawn, not fork--we do not want to copy a process full of Qt and db threads
+            self._executor = concurrent.futures.ProcessPoolExecutor( max_workers = num_workers, mp_context = multiprocessing.get_context( 'spawn' ) )
+            
+            self._num_workers = num_workers
+            
+        
+        return self._executor
+        
+    
+    def GetNumWorkers( self ) -> int:
+        
+        return CG.client_controller.new_options.GetInteger( 'file_import_worker_processes' )
+        
+    
+    def IsActive( self ) -> bool:
+        
+        return self.GetNumWorkers() > 0
+        
+    
+    def Shutdown( self ):
+        
+        with self._lock:
+            
+            self._DropExecutor()
+            
+        
+    
+    def SubmitGenerateImportInfo( self, temp_path: str, mime: int, thumbnail_settings, force_pil: bool, extra_description = None ) -> concurrent.futures.Future:
+        
+        with self._lock:
+            
+            try:
+                
+                executor = self._GetExecutor( self.GetNumWorkers() )
+                
+                return executor.submit( GenerateImportInfo, temp_path, mime, thumbnail_settings, force_pil, extra_description = extra_description )
+                
+            except concurrent.futures.BrokenExecutor:
+                
+                # a worker died, maybe segfaulting on a bad file, and the whole pool is dead with it. start a fresh one
+                HydrusData.Print( 'The file import worker pool broke, so it is being restarted.' )
+                
+                self._DropExecutor()
+                
+                executor = self._GetExecutor( self.GetNumWorkers() )
+                
+                return executor.submit( GenerateImportInfo, temp_path, mime, thumbnail_settings, force_pil, extra_description = extra_description )
+                
+            
+        
+    
+
 class FileImportJob( object ):
     
-    def __init__( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions ):
+    def __init__( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, all_hashes = None ):
         
         if HG.file_import_report_mode:
             
@@ -121,6 +377,9 @@ class FileImportJob( object ):
         self._temp_path = temp_path
         self._file_import_options = file_import_options
         
+        # ( sha256, md5, sha1, sha512 ) if the caller already knows them, e.g. from hashing a download as it came in
+        self._all_hashes = all_hashes
+        
         self._pre_import_file_status = FileImportStatus.STATICGetUnknownStatus()
         self._post_import_file_status = FileImportStatus.STATICGetUnknownStatus()
         
@@ -136,6 +395,39 @@ class FileImportJob( object ):
         self._file_modified_timestamp_ms = None
         self._blurhash = None
         
+        self._import_info_future = None
+        self._import_info_args = None
+        
+    
+    def _SetImportInfo( self, import_info ):
+        
+        ( self._file_info, self._thumbnail_bytes, self._blurhash, self._perceptual_hashes, self._has_transparency, self._has_exif, self._has_human_readable_embedded_metadata, self._has_icc_profile, self._pixel_hash ) = import_info
+        
+    
+    def _WaitForImportInfo( self ):
+        
+        if self._import_info_future is not None:
+            
+            import_info_future = self._import_info_future
+            
+            self._import_info_future = None
+            
+            try:
+                
+                # any exception from the worker is raised here, just as if we had done the work ourselves
+                import_info = import_info_future.result()
+                
+            except concurrent.futures.BrokenExecutor:
+                
+                # the worker died under us, which may not be this file's fault. we'll do it ourselves
+                HydrusData.Print( 'A file import worker process died, so this job is falling back to doing its work in-process.' )
+                
+                import_info = GenerateImportInfo( self._temp_path, *self._import_info_args )
+                
+            
+            self._SetImportInfo( import_info )
+            
+        
     
     def CheckIsGoodToImport( self ):
         
@@ -151,16 +443,16 @@ class FileImportJob( object ):
     
     def DoWork( self, status_hook = None ) -> FileImportStatus:
         
-        if HG.file_import_report_mode:
-            
-            HydrusData.ShowText( 'File import job starting work.' )
-            
+        self.StartWork( status_hook = status_hook )
         
-        self.GeneratePreImportHashAndStatus( status_hook = status_hook )
+        return self.FinishWork( status_hook = status_hook )
+        
+    
+    def FinishWork( self, status_hook = None ) -> FileImportStatus:
         
         if self._pre_import_file_status.ShouldImport( self._file_import_options ):
             
-            self.GenerateInfo( status_hook = status_hook )
+            self._WaitForImportInfo()
             
             try:
                 
@@ -254,7 +546,17 @@ class FileImportJob( object ):
             status_hook( 'calculating hash' )
             
         
-        hash = HydrusFileHandling.GetHashFromPath( self._temp_path )
+        if self._all_hashes is None:
+            
+            # we get the extra hashes in the same read, so GenerateInfo does not have to go back to disk for them
+            ( hash, md5, sha1, sha512 ) = HydrusFileHandling.GetAllHashesFromPath( self._temp_path )
+            
+        else:
+            
+            ( hash, md5, sha1, sha512 ) = self._all_hashes
+            
+        
+        self._extra_hashes = ( md5, sha1, sha512 )
         
         if HG.file_import_report_mode:
             
@@ -281,7 +583,7 @@ class FileImportJob( object ):
             
         
     
-    def GenerateInfo( self, status_hook = None ):
+    def GenerateInfo( self, status_hook = None, file_import_worker_pool: typing.Optional[ FileImportWorkerPool ] = None ):
         
         if self._pre_import_file_status.mime is None:
             
@@ -304,8 +606,6 @@ class FileImportJob( object ):
             HydrusData.ShowText( 'File import job mime: {}'.format( HC.mime_string_lookup[ mime ] ) )
             
         
-        new_options = CG.client_controller.new_options
-        
         if mime in HC.DECOMPRESSION_BOMB_IMAGES and not self._file_import_options.AllowsDecompressionBombs():
             
             if HG.file_import_report_mode:
@@ -324,162 +624,56 @@ class FileImportJob( object ):
                 
             
         
-        if status_hook is not None:
-            
-            status_hook( 'generating file metadata' )
-            
-        
-        self._file_info = HydrusFileHandling.GetFileInfo( self._temp_path, mime = mime )
-        
-        ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = self._file_info
-        
-        if HG.file_import_report_mode:
-            
-            HydrusData.ShowText( 'File import job file info: {}'.format( self._file_info ) )
-            
-        
-        if mime in HC.MIMES_WITH_THUMBNAILS:
-            
-            if status_hook is not None:
-                
-                status_hook( 'generating thumbnail' )
-                
+        if self._extra_hashes is None:
             
             if HG.file_import_report_mode:
                 
-                HydrusData.ShowText( 'File import job generating thumbnail' )
-                
-            
-            bounding_dimensions = CG.client_controller.options[ 'thumbnail_dimensions' ]
-            thumbnail_scale_type = CG.client_controller.new_options.GetInteger( 'thumbnail_scale_type' )
-            thumbnail_dpr_percent = CG.client_controller.new_options.GetInteger( 'thumbnail_dpr_percent' )
-            
-            target_resolution = HydrusImageHandling.GetThumbnailResolution( ( width, height ), bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent )
-            
-            percentage_in = CG.client_controller.new_options.GetInteger( 'video_thumbnail_percentage_in' )
-            
-            extra_description = f'File with hash "{self.GetHash().hex()}".'
-            
-            thumbnail_numpy = HydrusFileHandling.GenerateThumbnailNumPy( self._temp_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in, extra_description = extra_description )
-
-            # this guy handles almost all his own exceptions now, so no need for clever catching. if it fails, we are prob talking an I/O failure, which is not a 'thumbnail failed' error
-            self._thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromNumPy( thumbnail_numpy )
-            
-            try:
-                
-                self._blurhash = HydrusBlurhash.GetBlurhashFromNumPy( thumbnail_numpy )
+                HydrusData.ShowText( 'File import job generating other hashes' )
                 
-            except:
-                
-                pass
-                
-            
-
-        
-        if mime in HC.FILES_THAT_HAVE_PERCEPTUAL_HASH:
             
             if status_hook is not None:
                 
-                status_hook( 'generating similar files metadata' )
-                
-            
-            if HG.file_import_report_mode:
-                
-                HydrusData.ShowText( 'File import job generating perceptual_hashes' )
+                status_hook( 'generating additional hashes' )
                 
             
-            self._perceptual_hashes = ClientImageHandling.GenerateShapePerceptualHashes( self._temp_path, mime )
-            
-            if HG.file_import_report_mode:
-                
-                HydrusData.ShowText( 'File import job generated {} perceptual_hashes: {}'.format( len( self._perceptual_hashes ), [ perceptual_hash.hex() for perceptual_hash in self._perceptual_hashes ] ) )
-                
+            self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
             
         
-        if HG.file_import_report_mode:
-            
-            HydrusData.ShowText( 'File import job generating other hashes' )
-            
-        
-        if status_hook is not None:
-            
-            status_hook( 'generating additional hashes' )
-            
+        self._file_modified_timestamp_ms = HydrusFileHandling.GetFileModifiedTimestampMS( self._temp_path )
         
-        self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
+        new_options = CG.client_controller.new_options
         
-        #
+        bounding_dimensions = CG.client_controller.options[ 'thumbnail_dimensions' ]
+        thumbnail_scale_type = new_options.GetInteger( 'thumbnail_scale_type' )
+        thumbnail_dpr_percent = new_options.GetInteger( 'thumbnail_dpr_percent' )
+        percentage_in = new_options.GetInteger( 'video_thumbnail_percentage_in' )
         
-        self._has_transparency = ClientFiles.HasTransparency( self._temp_path, mime, duration = duration, num_frames = num_frames, resolution = ( width, height ) )
+        thumbnail_settings = ( bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent, percentage_in )
         
-        has_exif = False
+        force_pil = new_options.GetBoolean( 'load_images_with_pil' )
         
-        raw_pil_image = None
+        extra_description = f'File with hash "{self.GetHash().hex()}".'
         
-        if mime in HC.FILES_THAT_CAN_HAVE_EXIF:
+        if file_import_worker_pool is not None and mime in MIMES_WE_CAN_GENERATE_INFO_FOR_IN_A_WORKER_PROCESS:
             
-            try:
-                
-                if raw_pil_image is None:
-                    
-                    raw_pil_image = HydrusImageOpening.RawOpenPILImage( self._temp_path )
-                    
-                
-                has_exif = HydrusImageMetadata.HasEXIF( raw_pil_image )
-                
-            except:
+            if HG.file_import_report_mode:
                 
-                pass
+                HydrusData.ShowText( 'File import job sending metadata generation to a worker process' )
                 
             
-        
-        self._has_exif = has_exif
-        
-        self._has_human_readable_embedded_metadata = ClientFiles.HasHumanReadableEmbeddedMetadata( self._temp_path, mime )
-        
-        has_icc_profile = False
-        
-        if mime in HC.FILES_THAT_CAN_HAVE_ICC_PROFILE:
+            self._import_info_args = ( mime, thumbnail_settings, force_pil, extra_description )
             
-            try:
-                
-                if mime == HC.APPLICATION_PSD:
-                    
-                    has_icc_profile = HydrusPSDHandling.PSDHasICCProfile( self._temp_path )
-                    
-                else:
-                    
-                    if raw_pil_image is None:
-                        
-                        raw_pil_image = HydrusImageOpening.RawOpenPILImage( self._temp_path )
-                        
-                    
-                    has_icc_profile = HydrusImageMetadata.HasICCProfile( raw_pil_image )
-                    
-                
-            except:
-                
-                pass
-                
+            self._import_info_future = file_import_worker_pool.SubmitGenerateImportInfo( self._temp_path, mime, thumbnail_settings, force_pil, extra_description = extra_description )
             
-        
-        self._has_icc_profile = has_icc_profile
-        
-        #
-        
-        if mime in HC.FILES_THAT_CAN_HAVE_PIXEL_HASH and duration is None:
+        else:
             
-            try:
-                
-                self._pixel_hash = HydrusImageHandling.GetImagePixelHash( self._temp_path, mime )
-                
-            except:
+            if status_hook is not None:
                 
-                pass
+                status_hook( 'generating file metadata' )
                 
             
-        
-        self._file_modified_timestamp_ms = HydrusFileHandling.GetFileModifiedTimestampMS( self._temp_path )
+            self._SetImportInfo( GenerateImportInfo( self._temp_path, mime, thumbnail_settings, force_pil, extra_description = extra_description, status_hook = status_hook ) )
+            
         
     
     def GetExtraHashes( self ):
@@ -559,3 +753,20 @@ class FileImportJob( object ):
             
         
     
+    def StartWork( self, status_hook = None, file_import_worker_pool: typing.Optional[ FileImportWorkerPool ] = None ):
+        
+        # with a worker pool, the heavy metadata generation is now happening in another process, and FinishWork will wait on it
+        
+        if HG.file_import_report_mode:
+            
+            HydrusData.ShowText( 'File import job starting work.' )
+            
+        
+        self.GeneratePreImportHashAndStatus( status_hook = status_hook )
+        
+        if self._pre_import_file_status.ShouldImport( self._file_import_options ):
+            
+            self.GenerateInfo( status_hook = status_hook, file_import_worker_pool = file_import_worker_pool )
+            
+        
+    
@@ -110,6 +110,76 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
         CG.client_controller.sub( self, 'NotifyFileSeedsUpdated', 'file_seed_cache_file_seeds_updated' )
         
     
+    def _ActionImportedFileSeed( self, file_seed: ClientImportFileSeeds.FileSeed ):
+        
+        path = file_seed.file_seed_data
+        
+        if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+            
+            if len( self._metadata_routers ) > 0:
+                
+                hash = file_seed.GetHash()
+                
+                media_result = CG.client_controller.Read( 'media_result', hash )
+                
+                for router in self._metadata_routers:
+                    
+                    try:
+                        
+                        router.Work( media_result, file_seed.file_seed_data )
+                        
+                    except Exception as e:
+                        
+                        HydrusData.ShowText( 'Trying to run metadata routing on the file "{}" threw an error!'.format( file_seed.file_seed_data ) )
+                        HydrusData.ShowException( e )
+                        
+                    
+                
+            
+            real_presentation_import_options = FileImportOptions.GetRealPresentationImportOptions( self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
+            
+            if file_seed.ShouldPresent( real_presentation_import_options ):
+                
+                file_seed.PresentToPage( self._page_key )
+                
+            
+            if self._delete_after_success:
+                
+                try:
+                    
+                    ClientPaths.DeletePath( path )
+                    
+                except Exception as e:
+                    
+                    HydrusData.ShowText( 'While attempting to delete {}, the following error occurred:'.format( path ) )
+                    HydrusData.ShowException( e )
+                    
+                
+                possible_sidecar_paths = set()
+                
+                for router in self._metadata_routers:
+                    
+                    possible_sidecar_paths.update( router.GetPossibleImporterSidecarPaths( path ) )
+                    
+                
+                for possible_sidecar_path in possible_sidecar_paths:
+                    
+                    if os.path.exists( possible_sidecar_path ):
+                        
+                        try:
+                            
+                            ClientPaths.DeletePath( possible_sidecar_path )
+                            
+                        except Exception as e:
+                            
+                            HydrusData.ShowText( 'While attempting to delete {}, the following error occurred:'.format( possible_sidecar_path ) )
+                            HydrusData.ShowException( e )
+                            
+                        
+                    
+            
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_file_seed_cache = self._file_seed_cache.GetSerialisableTuple()
@@ -176,14 +246,23 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     def _WorkOnFiles( self ):
         
-        file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+        file_import_worker_pool = None
+        num_to_do = 1
         
-        if file_seed is None:
+        if CG.client_controller.file_import_worker_pool.IsActive():
             
-            return
+            file_import_worker_pool = CG.client_controller.file_import_worker_pool
+            
+            # twice as many as the workers, so they have something to chew on while we wait on the first few
+            num_to_do = file_import_worker_pool.GetNumWorkers() * 2
             
         
-        path = file_seed.file_seed_data
+        file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, num_to_do )
+        
+        if len( file_seeds ) == 0:
+            
+            return
+            
         
         with self._lock:
             
@@ -198,71 +277,44 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD, status_hook = status_hook )
-        
-        if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+        if file_import_worker_pool is None:
             
-            if len( self._metadata_routers ) > 0:
-                
-                hash = file_seed.GetHash()
+            for file_seed in file_seeds:
                 
-                media_result = CG.client_controller.Read( 'media_result', hash )
+                file_seed.ImportPath( self._file_seed_cache, self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD, status_hook = status_hook )
                 
-                for router in self._metadata_routers:
-                    
-                    try:
-                        
-                        router.Work( media_result, file_seed.file_seed_data )
-                        
-                    except Exception as e:
-                        
-                        HydrusData.ShowText( 'Trying to run metadata routing on the file "{}" threw an error!'.format( file_seed.file_seed_data ) )
-                        HydrusData.ShowException( e )
-                        
-                    
+                self._ActionImportedFileSeed( file_seed )
                 
             
-            real_presentation_import_options = FileImportOptions.GetRealPresentationImportOptions( self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD )
+        else:
             
-            if file_seed.ShouldPresent( real_presentation_import_options ):
-                
-                file_seed.PresentToPage( self._page_key )
-                
+            # the reading and hashing happen here, the heavy metadata generation in the worker processes, and then we commit to the db one at a time, in order
             
-            if self._delete_after_success:
+            path_imports = []
+            
+            for file_seed in file_seeds:
                 
-                try:
+                # if the user pauses or we are shutting down, we stop starting new ones, but we still finish what the workers already have
+                
+                with self._lock:
                     
-                    ClientPaths.DeletePath( path )
+                    paused = self._paused
                     
-                except Exception as e:
+                
+                if paused or HG.started_shutdown:
                     
-                    HydrusData.ShowText( 'While attempting to delete {}, the following error occurred:'.format( path ) )
-                    HydrusData.ShowException( e )
+                    break
                     
                 
-                possible_sidecar_paths = set()
+                path_imports.append( file_seed.StartPathImport( self._file_import_options, FileImportOptions.IMPORT_TYPE_LOUD, status_hook = status_hook, file_import_worker_pool = file_import_worker_pool ) )
                 
-                for router in self._metadata_routers:
-                    
-                    possible_sidecar_paths.update( router.GetPossibleImporterSidecarPaths( path ) )
-                    
+            
+            for ( file_seed, path_import ) in zip( file_seeds, path_imports ):
+                
+                file_seed.FinishPathImport( self._file_seed_cache, path_import, status_hook = status_hook )
+                
+                self._ActionImportedFileSeed( file_seed )
                 
-                for possible_sidecar_path in possible_sidecar_paths:
-                    
-                    if os.path.exists( possible_sidecar_path ):
-                        
-                        try:
-                            
-                            ClientPaths.DeletePath( possible_sidecar_path )
-                            
-                        except Exception as e:
-                            
-                            HydrusData.ShowText( 'While attempting to delete {}, the following error occurred:'.format( possible_sidecar_path ) )
-                            HydrusData.ShowException( e )
-                            
-                        
-                    
             
         
         with self._lock:
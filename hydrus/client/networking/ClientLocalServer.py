@@ -122,6 +122,9 @@ class HydrusServiceClientAPI( HydrusClientService ):
         manage_database.putChild( b'lock_on', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOn( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_off', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOff( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'get_client_options', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetClientOptions( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_cache_metrics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetCacheMetrics( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_request_metrics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetRequestMetrics( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_thread_pool_metrics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetThreadPoolMetrics( self._service, self._client_requests_domain ) )
         
         manage_file_relationships = NoResource()
         
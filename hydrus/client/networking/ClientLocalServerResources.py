@@ -25,6 +25,7 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusLists
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusTemp
@@ -32,8 +33,10 @@ from hydrus.core import HydrusTime
 from hydrus.core.files import HydrusFileHandling
 from hydrus.core.files.images import HydrusImageHandling
 from hydrus.core.networking import HydrusNetworkVariableHandling
+from hydrus.core.networking import HydrusServerMetrics
 from hydrus.core.networking import HydrusServerRequest
 from hydrus.core.networking import HydrusServerResources
+from hydrus.core.networking import HydrusServerThreadPools
 
 from hydrus.client import ClientAPI
 from hydrus.client import ClientOptions
@@ -71,13 +74,17 @@ LOCAL_BOORU_JSON_BYTE_LIST_PARAMS = set()
 
 # if a variable name isn't defined here, a GET with it won't work
 
-CLIENT_API_INT_PARAMS = { 'file_id', 'file_sort_type', 'potentials_search_type', 'pixel_duplicates', 'max_hamming_distance', 'max_num_pairs' }
+CLIENT_API_INT_PARAMS = { 'file_id', 'file_sort_type', 'potentials_search_type', 'pixel_duplicates', 'max_hamming_distance', 'max_num_pairs', 'width', 'height', 'render_format', 'render_quality' }
 CLIENT_API_BYTE_PARAMS = { 'hash', 'destination_page_key', 'page_key', 'service_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key', 'file_service_key', 'deleted_file_service_key', 'tag_service_key', 'tag_service_key_1', 'tag_service_key_2', 'rating_service_key', 'job_status_key' }
 CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain', 'search', 'service_name', 'reason', 'tag_display_type', 'source_hash_type', 'desired_hash_type' }
-CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'tags', 'tags_1', 'tags_2', 'file_ids', 'download', 'only_return_identifiers', 'only_return_basic_information', 'include_blurhash', 'create_new_file_ids', 'detailed_url_information', 'hide_service_keys_tags', 'simple', 'file_sort_asc', 'return_hashes', 'return_file_ids', 'include_notes', 'include_milliseconds', 'include_services_object', 'notes', 'note_names', 'doublecheck_file_system', 'only_in_view' }
+CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'tags', 'tags_1', 'tags_2', 'file_ids', 'download', 'only_return_identifiers', 'only_return_basic_information', 'include_blurhash', 'create_new_file_ids', 'detailed_url_information', 'hide_service_keys_tags', 'simple', 'file_sort_asc', 'return_hashes', 'return_file_ids', 'include_notes', 'include_milliseconds', 'include_services_object', 'notes', 'note_names', 'doublecheck_file_system', 'only_in_view', 'stream' }
 CLIENT_API_JSON_BYTE_LIST_PARAMS = { 'file_service_keys', 'deleted_file_service_keys', 'hashes' }
 CLIENT_API_JSON_BYTE_DICT_PARAMS = { 'service_keys_to_tags', 'service_keys_to_actions_to_tags', 'service_keys_to_additional_tags' }
 
+# when streaming a response, how many rows we fetch and write at a time
+CLIENT_API_STREAM_METADATA_BLOCK_SIZE = 256
+CLIENT_API_STREAM_ID_BLOCK_SIZE = 4096
+
 LEGACY_CLIENT_API_SERVICE_NAME_STRING_PARAMS = { 'file_service_name', 'tag_service_name' }
 CLIENT_API_STRING_PARAMS.update( LEGACY_CLIENT_API_SERVICE_NAME_STRING_PARAMS )
 
@@ -119,6 +126,58 @@ def Dumps( data, mime ):
         return json.dumps( data )
         
     
+
+def DumpsJSONStream( data: dict, keys_and_row_chunks ):
+    
+    # yields the same json document Dumps would, but the given list values are written a chunk of rows at a time
+    # the row chunks can be lazy, so a big response starts going out quickly and never sits in memory whole
+    
+    data = dict( data )
+    
+    if 'version' not in data:
+        
+        data[ 'version' ] = HC.CLIENT_API_VERSION
+        
+    
+    if 'hydrus_version' not in data:
+        
+        data[ 'hydrus_version' ] = HC.SOFTWARE_VERSION
+        
+    
+    # chop off the closing brace, we'll add our lists and then put it back
+    yield bytes( json.dumps( data )[ : -1 ], 'utf-8' )
+    
+    for ( key, row_chunks ) in keys_and_row_chunks:
+        
+        yield bytes( ', {}: ['.format( json.dumps( key ) ), 'utf-8' )
+        
+        first_chunk = True
+        
+        for rows in row_chunks:
+            
+            if len( rows ) == 0:
+                
+                continue
+                
+            
+            text = ', '.join( ( json.dumps( row ) for row in rows ) )
+            
+            if not first_chunk:
+                
+                text = ', ' + text
+                
+            
+            first_chunk = False
+            
+            yield bytes( text, 'utf-8' )
+            
+        
+        yield b']'
+        
+    
+    yield b'}'
+    
+
 def CheckHashLength( hashes, hash_type = 'sha256' ):
     
     if len( hashes ) == 0:
@@ -1010,6 +1069,8 @@ class HydrusResourceBooru( HydrusServerResources.HydrusResource ):
     
 class HydrusResourceBooruFile( HydrusResourceBooru ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         share_key = request.parsed_request_args[ 'share_key' ]
@@ -1032,7 +1093,7 @@ class HydrusResourceBooruFile( HydrusResourceBooru ):
             raise HydrusExceptions.NotFoundException( 'Could not find that file!' )
             
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, is_attachment = is_attachment )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, is_attachment = is_attachment, etag = hash.hex() )
         
         return response_context
         
@@ -1212,6 +1273,8 @@ class HydrusResourceBooruPage( HydrusResourceBooru ):
     
 class HydrusResourceBooruThumbnail( HydrusResourceBooru ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         share_key = request.parsed_request_args.GetValue( 'share_key', bytes )
@@ -1251,7 +1314,7 @@ class HydrusResourceBooruThumbnail( HydrusResourceBooru ):
         
         response_mime = HydrusFileHandling.GetThumbnailMime( path )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = response_mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = response_mime, path = path, etag = HydrusServerResources.GenerateETagForDerivedFile( hash, path ) )
         
         return response_context
         
@@ -1702,6 +1765,8 @@ class HydrusResourceClientAPIRestrictedAddFiles( HydrusResourceClientAPIRestrict
 
 class HydrusResourceClientAPIRestrictedAddFilesAddFile( HydrusResourceClientAPIRestrictedAddFiles ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_WRITES
+    
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         if not hasattr( request, 'temp_file_info' ):
@@ -1874,6 +1939,8 @@ class HydrusResourceClientAPIRestrictedAddFilesUndeleteFiles( HydrusResourceClie
     
 class HydrusResourceClientAPIRestrictedAddFilesGenerateHashes( HydrusResourceClientAPIRestrictedAddFiles ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_WRITES
+    
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         if not hasattr( request, 'temp_file_info' ):
@@ -2244,6 +2311,8 @@ class HydrusResourceClientAPIRestrictedAddTagsAddTags( HydrusResourceClientAPIRe
 
 class HydrusResourceClientAPIRestrictedAddTagsSearchTags( HydrusResourceClientAPIRestrictedAddTags ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_METADATA
+    
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         # this doesn't need 'add tags' atm. I was going to add it, but I'm not sure it is actually appropriate
@@ -2330,6 +2399,8 @@ class HydrusResourceClientAPIRestrictedAddTagsSearchTags( HydrusResourceClientAP
 
 class HydrusResourceClientAPIRestrictedAddTagsGetTagSiblingsParents( HydrusResourceClientAPIRestrictedAddTags ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_METADATA
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         tags = request.parsed_request_args.GetValue( 'tags', list, expected_list_type = str )
@@ -2926,6 +2997,8 @@ class HydrusResourceClientAPIRestrictedEditTimesSetTime( HydrusResourceClientAPI
 
 class HydrusResourceClientAPIRestrictedGetFiles( HydrusResourceClientAPIRestricted ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_METADATA
+    
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         request.client_api_permissions.CheckPermission( ClientAPI.CLIENT_API_PERMISSION_SEARCH_FILES )
@@ -3002,6 +3075,39 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         
         request.client_api_permissions.SetLastSearchResults( hash_ids )
         
+        stream = request.parsed_request_args.GetValue( 'stream', bool, default_value = False )
+        
+        if stream and request.preferred_mime == HC.APPLICATION_JSON:
+            
+            def hash_chunks():
+                
+                for block_of_hash_ids in HydrusLists.SplitListIntoChunks( hash_ids, CLIENT_API_STREAM_ID_BLOCK_SIZE ):
+                    
+                    block_hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hash_ids = block_of_hash_ids )
+                    
+                    yield [ block_hash_ids_to_hashes[ hash_id ].hex() for hash_id in block_of_hash_ids ]
+                    
+                
+            
+            keys_and_row_chunks = []
+            
+            if return_hashes:
+                
+                keys_and_row_chunks.append( ( 'hashes', hash_chunks() ) )
+                
+            
+            if return_file_ids:
+                
+                keys_and_row_chunks.append( ( 'file_ids', HydrusLists.SplitListIntoChunks( list( hash_ids ), CLIENT_API_STREAM_ID_BLOCK_SIZE ) ) )
+                
+            
+            body_generator = DumpsJSONStream( {}, keys_and_row_chunks )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = request.preferred_mime, body_generator = body_generator )
+            
+            return response_context
+            
+        
         body_dict = {}
         
         if return_hashes:
@@ -3026,6 +3132,8 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
     
 class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         try:
@@ -3075,13 +3183,15 @@ class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIR
         
         is_attachment = request.parsed_request_args.GetValue( 'download', bool, default_value = False )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, is_attachment = is_attachment )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, is_attachment = is_attachment, etag = hash.hex() )
         
         return response_context
         
 
 class HydrusResourceClientAPIRestrictedGetFilesGetRenderedFile( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_RENDERING
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         try:
@@ -3119,25 +3229,88 @@ class HydrusResourceClientAPIRestrictedGetFilesGetRenderedFile( HydrusResourceCl
             raise HydrusExceptions.BadRequestException('Requested file is not an image!')
             
         
-        renderer: ClientRendering.ImageRenderer = CG.client_controller.GetCache( 'images' ).GetImageRenderer( media_result )
+        render_format = request.parsed_request_args.GetValue( 'render_format', int, default_value = HC.IMAGE_PNG )
+        
+        if render_format not in ( HC.IMAGE_PNG, HC.IMAGE_JPEG, HC.IMAGE_WEBP ):
+            
+            raise HydrusExceptions.BadRequestException( 'Sorry, I can only render to png, jpeg, or webp!' )
+            
+        
+        render_quality = request.parsed_request_args.GetValueOrNone( 'render_quality', int )
         
-        while not renderer.IsReady():
+        if render_quality is not None:
+            
+            max_quality = 9 if render_format == HC.IMAGE_PNG else 100
             
-            if request.disconnected:
+            if not 0 <= render_quality <= max_quality:
                 
-                return
+                raise HydrusExceptions.BadRequestException( 'The render_quality for that format needs to be between 0 and {}!'.format( max_quality ) )
                 
             
-            time.sleep( 0.1 )
+        
+        target_resolution = None
+        
+        if 'width' in request.parsed_request_args or 'height' in request.parsed_request_args:
             
-
-        numpy_image = renderer.GetNumPyImage()
+            width = request.parsed_request_args.GetValueOrNone( 'width', int )
+            height = request.parsed_request_args.GetValueOrNone( 'height', int )
+            
+            if width is None or height is None:
+                
+                raise HydrusExceptions.BadRequestException( 'Please include both width and height, or neither!' )
+                
+            
+            if width < 1 or height < 1:
+                
+                raise HydrusExceptions.BadRequestException( 'The width and height must be positive!' )
+                
+            
+            # no scaling up. a huge size would be a huge allocation, and a huge result would push everything else out of the encoded image cache
+            ( file_width, file_height ) = media_result.GetResolution()
+            
+            if width > file_width or height > file_height:
+                
+                raise HydrusExceptions.BadRequestException( 'Sorry, the width and height cannot be larger than the file\'s own resolution, which is {}x{}!'.format( file_width, file_height ) )
+                
+            
+            target_resolution = ( width, height )
+            
+        
+        hash = media_result.GetHash()
         
-        body = HydrusImageHandling.GeneratePNGBytesNumPy( numpy_image )
+        encoded_image_cache = CG.client_controller.GetCache( 'encoded_images' )
+        
+        encoded_image = encoded_image_cache.GetEncodedImage( hash, target_resolution, render_format, render_quality )
+        
+        if encoded_image is None:
+            
+            renderer: ClientRendering.ImageRenderer = CG.client_controller.GetCache( 'images' ).GetImageRenderer( media_result, target_resolution = target_resolution )
+            
+            while not renderer.WaitUntilReady( timeout = 1.0 ):
+                
+                if request.disconnected:
+                    
+                    return
+                    
+                
+            
+            numpy_image = renderer.GetNumPyImage()
+            
+            if target_resolution is not None:
+                
+                numpy_image = ClientImageHandling.ResizeNumPyImageForMediaViewer( media_result.GetMime(), numpy_image, target_resolution )
+                
+            
+            body = HydrusImageHandling.GenerateImageBytesNumPy( numpy_image, render_format, quality = render_quality )
+            
+            encoded_image = ClientRendering.EncodedImage( render_format, body )
+            
+            encoded_image_cache.AddEncodedImage( hash, target_resolution, render_format, render_quality, encoded_image )
+            
         
         is_attachment = request.parsed_request_args.GetValue( 'download', bool, default_value = False )
-
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.IMAGE_PNG, body = body, is_attachment = is_attachment, max_age = 86400 * 365 )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = encoded_image.mime, body = encoded_image.encoded_bytes, is_attachment = is_attachment, max_age = 86400 * 365 )
         
         return response_context
         
@@ -3213,7 +3386,7 @@ def AddMissingHashToFileMetadata( metadata: list, hash: bytes ):
 
 class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClientAPIRestrictedGetFiles ):
     
-    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+    def _GetMetadataRows( self, request: HydrusServerRequest.HydrusRequest, hashes, hashes_to_hash_ids ):
         
         only_return_identifiers = request.parsed_request_args.GetValue( 'only_return_identifiers', bool, default_value = False )
         only_return_basic_information = request.parsed_request_args.GetValue( 'only_return_basic_information', bool, default_value = False )
@@ -3221,8 +3394,6 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
         detailed_url_information = request.parsed_request_args.GetValue( 'detailed_url_information', bool, default_value = False )
         include_notes = request.parsed_request_args.GetValue( 'include_notes', bool, default_value = False )
         include_milliseconds = request.parsed_request_args.GetValue( 'include_milliseconds', bool, default_value = False )
-        include_services_object = request.parsed_request_args.GetValue( 'include_services_object', bool, default_value = True )
-        create_new_file_ids = request.parsed_request_args.GetValue( 'create_new_file_ids', bool, default_value = False )
         include_blurhash = request.parsed_request_args.GetValue( 'include_blurhash', bool, default_value = False )
         
         if include_milliseconds:
@@ -3234,17 +3405,7 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
             time_converter = HydrusTime.SecondiseMS
             
         
-        hashes = ParseHashes( request )
-        
-        hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hashes = hashes, create_new_hash_ids = create_new_file_ids )
-        
-        hashes_to_hash_ids = { hash : hash_id for ( hash_id, hash ) in hash_ids_to_hashes.items() }
-        
-        hash_ids = set( hash_ids_to_hashes.keys() )
-        
-        request.client_api_permissions.CheckPermissionToSeeFiles( hash_ids )
-        
-        body_dict = {}
+        hash_ids = { hashes_to_hash_ids[ hash ] for hash in hashes if hash in hashes_to_hash_ids }
         
         metadata = []
         
@@ -3579,14 +3740,53 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
                 
             
         
-        body_dict[ 'metadata' ] = metadata
+        return metadata
+        
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        include_services_object = request.parsed_request_args.GetValue( 'include_services_object', bool, default_value = True )
+        create_new_file_ids = request.parsed_request_args.GetValue( 'create_new_file_ids', bool, default_value = False )
+        stream = request.parsed_request_args.GetValue( 'stream', bool, default_value = False )
+        
+        hashes = ParseHashes( request )
+        
+        hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hashes = hashes, create_new_hash_ids = create_new_file_ids )
+        
+        hashes_to_hash_ids = { hash : hash_id for ( hash_id, hash ) in hash_ids_to_hashes.items() }
+        
+        hash_ids = set( hash_ids_to_hashes.keys() )
+        
+        request.client_api_permissions.CheckPermissionToSeeFiles( hash_ids )
+        
+        body_dict = {}
+        
+        mime = request.preferred_mime
+        
+        if stream and mime == HC.APPLICATION_JSON:
+            
+            if include_services_object:
+                
+                body_dict[ 'services' ] = GetServicesDict()
+                
+            
+            # the metadata is fetched and written a block at a time as the response goes out
+            metadata_chunks = ( self._GetMetadataRows( request, block_of_hashes, hashes_to_hash_ids ) for block_of_hashes in HydrusLists.SplitListIntoChunks( hashes, CLIENT_API_STREAM_METADATA_BLOCK_SIZE ) )
+            
+            body_generator = DumpsJSONStream( body_dict, [ ( 'metadata', metadata_chunks ) ] )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body_generator = body_generator )
+            
+            return response_context
+            
+        
+        body_dict[ 'metadata' ] = self._GetMetadataRows( request, hashes, hashes_to_hash_ids )
         
         if include_services_object:
             
             body_dict[ 'services' ] = GetServicesDict()
             
         
-        mime = request.preferred_mime
         body = Dumps( body_dict, mime )
         
         response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
@@ -3597,6 +3797,8 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
 
 class HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         try:
@@ -3653,7 +3855,7 @@ class HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( HydrusResourceClien
         
         response_mime = HydrusFileHandling.GetThumbnailMime( path )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = response_mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = response_mime, path = path, etag = HydrusServerResources.GenerateETagForDerivedFile( media_result.GetHash(), path ) )
         
         return response_context
         
@@ -4180,6 +4382,52 @@ class HydrusResourceClientAPIRestrictedManageDatabaseGetClientOptions( HydrusRes
         
     
 
+class HydrusResourceClientAPIRestrictedManageDatabaseGetCacheMetrics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        from hydrus.client.caches import ClientCaches
+        
+        cache_metrics = [ data_cache.GetMetrics() for data_cache in ClientCaches.GetRenderingDataCaches( CG.client_controller ) ]
+        
+        body_dict = { 'cache_metrics' : cache_metrics }
+        
+        mime = request.preferred_mime
+        body = Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
+
+class HydrusResourceClientAPIRestrictedManageDatabaseGetRequestMetrics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        body = HydrusServerMetrics.GetPrometheusText()
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.TEXT_PLAIN, body = body )
+        
+        return response_context
+        
+    
+
+class HydrusResourceClientAPIRestrictedManageDatabaseGetThreadPoolMetrics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        body_dict = { 'thread_pool_metrics' : HydrusServerThreadPools.GetThreadPoolMetrics() }
+        
+        mime = request.preferred_mime
+        body = Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
+
 class HydrusResourceClientAPIRestrictedManageFileRelationships( HydrusResourceClientAPIRestricted ):
     
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
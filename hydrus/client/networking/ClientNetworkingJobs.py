@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import io
 import os
 import typing
@@ -242,6 +243,9 @@ class NetworkJob( object ):
         self._num_bytes_expected_in_this_range_chunk = None
         self._number_of_concurrent_empty_chunks = 0
         
+        self._hash_while_downloading = False
+        self._download_hashers = None
+        
         self._file_import_options = None
         
         self._network_contexts = self._GenerateNetworkContexts()
@@ -553,6 +557,14 @@ class NetworkJob( object ):
             
             stream_dest.write( chunk )
             
+            if self._download_hashers is not None:
+                
+                for hasher in self._download_hashers:
+                    
+                    hasher.update( chunk )
+                    
+                
+            
             # get the raw bytes read, not the length of the chunk, as there may be transfer-encoding (chunked, gzip etc...)
             total_bytes_read_in_this_response = response.raw.tell()
             
@@ -703,6 +715,8 @@ class NetworkJob( object ):
         self._num_bytes_read_is_accurate = True
         self._number_of_concurrent_empty_chunks = 0
         
+        self._download_hashers = None
+        
     
     def _ResetForAnotherConnectionAttempt( self ):
         
@@ -1264,6 +1278,21 @@ class NetworkJob( object ):
             
         
     
+    def GetDownloadedFileHashes( self ):
+        
+        # ( sha256, md5, sha1, sha512 ) of what we wrote to the temp path, or None if we weren't asked to hash or the download didn't finish
+        
+        with self._lock:
+            
+            if self._download_hashers is None or not self._is_done or self._is_cancelled or self._error_exception is not None:
+                
+                return None
+                
+            
+            return tuple( ( hasher.digest() for hasher in self._download_hashers ) )
+            
+        
+    
     def GetErrorException( self ):
         
         with self._lock:
@@ -1513,6 +1542,14 @@ class NetworkJob( object ):
             
         
     
+    def SetHashWhileDownloading( self, hash_while_downloading: bool ):
+        
+        with self._lock:
+            
+            self._hash_while_downloading = hash_while_downloading
+            
+        
+    
     def SetStatus( self, text: str ):
         
         with self._lock:
@@ -1582,6 +1619,12 @@ class NetworkJob( object ):
                             
                             stream_dest = open( self._temp_path, 'wb' )
                             
+                            if self._hash_while_downloading:
+                                
+                                # the file is written from the start here, and any ranged parts after are appended in order, so these see exactly what ends up on disk
+                                self._download_hashers = ( hashlib.sha256(), hashlib.md5(), hashlib.sha1(), hashlib.sha512() )
+                                
+                            
                         
                         try:
                             
@@ -1,5 +1,8 @@
+import typing
 import zlib
 
+from hydrus.core import HydrusExceptions
+
 LZ4_OK = False
 
 try:
@@ -13,10 +16,27 @@ except: # ImportError wasn't enough here as Linux went up the shoot with a __ver
     
     pass # this is no big deal
     
+COMPRESSION_CODEC_ZLIB = 0
+COMPRESSION_CODEC_LZ4 = 1
+
 def CompressBytesToBytes( obj_bytes: bytes ) -> bytes:
     
     return zlib.compress( obj_bytes, 9 )
     
+def CompressBytesToCodecBytes( obj_bytes: bytes ) -> typing.Tuple[ int, bytes ]:
+    
+    # for when we record which codec we used, so the other end does not have to guess
+    # this is for stuff we compress once and decompress many times, so it is worth the slower lz4 mode. decompression is just as fast
+    
+    if LZ4_OK:
+        
+        return ( COMPRESSION_CODEC_LZ4, lz4.block.compress( obj_bytes, mode = 'high_compression' ) )
+        
+    else:
+        
+        return ( COMPRESSION_CODEC_ZLIB, zlib.compress( obj_bytes, 1 ) )
+        
+    
 def CompressFastBytesToBytes( obj_bytes: bytes ) -> bytes:
     
     if LZ4_OK:
@@ -54,6 +74,40 @@ def DecompressBytesToBytes( compressed_bytes: bytes ) -> bytes:
     
     return obj_bytes
     
+def DecompressCodecBytesToBytes( codec: int, compressed_bytes: bytes ) -> bytes:
+    
+    if codec == COMPRESSION_CODEC_ZLIB:
+        
+        try:
+            
+            return zlib.decompress( compressed_bytes )
+            
+        except zlib.error as e:
+            
+            raise HydrusExceptions.SerialisationException( 'Could not decompress this data: {}'.format( e ) )
+            
+        
+    elif codec == COMPRESSION_CODEC_LZ4:
+        
+        if not LZ4_OK:
+            
+            raise HydrusExceptions.SerialisationException( 'This data was compressed with lz4, but lz4 is not available! Please install it.' )
+            
+        
+        try:
+            
+            return lz4.block.decompress( compressed_bytes )
+            
+        except lz4.block.LZ4BlockError as e:
+            
+            raise HydrusExceptions.SerialisationException( 'Could not decompress this data: {}'.format( e ) )
+            
+        
+    else:
+        
+        raise HydrusExceptions.SerialisationException( 'Did not understand compression codec {}!'.format( codec ) )
+        
+    
 def DecompressBytesToString( compressed_bytes: bytes ) -> str:
     
     obj_bytes = DecompressBytesToBytes( compressed_bytes )
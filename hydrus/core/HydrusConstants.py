@@ -105,8 +105,8 @@ options = {}
 # Misc
 
 NETWORK_VERSION = 20
-SOFTWARE_VERSION = 564
-CLIENT_API_VERSION = 61
+SOFTWARE_VERSION = 566
+CLIENT_API_VERSION = 64
 
 SERVER_THUMBNAIL_DIMENSIONS = ( 200, 200 )
 
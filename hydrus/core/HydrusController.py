@@ -16,6 +16,7 @@ from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
 from hydrus.core.interfaces import HydrusControllerInterface
 from hydrus.core.networking import HydrusNATPunch
+from hydrus.core.networking import HydrusServerMetrics
 
 class HydrusController( HydrusControllerInterface.HydrusControllerInterface ):
     
@@ -200,7 +201,16 @@ class HydrusController( HydrusControllerInterface.HydrusControllerInterface ):
     
     def _Read( self, action, *args, **kwargs ):
         
-        result = self.db.Read( action, *args, **kwargs )
+        started = HydrusTime.GetNowPrecise()
+        
+        try:
+            
+            result = self.db.Read( action, *args, **kwargs )
+            
+        finally:
+            
+            HydrusServerMetrics.ReportDBWaitTime( HydrusTime.GetNowPrecise() - started )
+            
         
         return result
         
@@ -241,7 +251,16 @@ class HydrusController( HydrusControllerInterface.HydrusControllerInterface ):
     
     def _Write( self, action, synchronous, *args, **kwargs ):
         
-        result = self.db.Write( action, synchronous, *args, **kwargs )
+        started = HydrusTime.GetNowPrecise()
+        
+        try:
+            
+            result = self.db.Write( action, synchronous, *args, **kwargs )
+            
+        finally:
+            
+            HydrusServerMetrics.ReportDBWaitTime( HydrusTime.GetNowPrecise() - started )
+            
         
         return result
         
@@ -1,7 +1,9 @@
 import collections
 import os
+import pathlib
 import queue
 import sqlite3
+import threading
 import traceback
 import time
 
@@ -132,6 +134,7 @@ def VacuumDB( db_path ):
 class HydrusDB( HydrusDBBase.DBBase ):
     
     READ_WRITE_ACTIONS = []
+    READ_REPLICA_ACTIONS = set()
     UPDATE_WAIT = 2
     
     def __init__( self, controller: HydrusControllerInterface.HydrusControllerInterface, db_dir, db_name ):
@@ -200,6 +203,20 @@ class HydrusDB( HydrusDBBase.DBBase ):
         
         self._jobs = queue.Queue()
         
+        self._read_replica_jobs = queue.Queue()
+        self._read_replica_lock = threading.Lock()
+        self._read_replica_job_finished = threading.Condition( self._read_replica_lock )
+        self._num_read_replicas = 0
+        self._running_read_replica_indices = set()
+        
+        # these are only touched under the read replica lock
+        # write jobs put on the main queue and not yet finished, including the one being worked
+        self._num_main_loop_write_jobs_outstanding = 0
+        # read jobs given to the replicas and not yet finished. the main loop will not start a write while there are any
+        self._num_read_replica_jobs_outstanding = 0
+        # goes up every time a write finishes, so replicas know when their in-memory caches may be out of date
+        self._write_generation = 0
+        
         self._currently_doing_job = False
         self._current_status = ''
         self._current_job_name = ''
@@ -398,6 +415,11 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return HydrusData.JobDatabase( job_type, synchronous, action, *args, **kwargs )
         
     
+    def _GenerateReadReplica( self, cursor: sqlite3.Cursor, temporary_integer_table_name_cache: HydrusDBBase.TemporaryIntegerTableNameCache ):
+        
+        raise NotImplementedError()
+        
+    
     def _GetPossibleAdditionalDBFilenames( self ):
         
         return [ self._ssl_cert_filename, self._ssl_key_filename ]
@@ -572,6 +594,48 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
         
     
+    def _InitReadReplicaConnection( self ):
+        
+        # WAL lets these read the last committed state while the main connection holds its write transaction
+        
+        def read_only_uri( path ):
+            
+            return pathlib.Path( path ).absolute().as_uri() + '?mode=ro'
+            
+        
+        db_path = os.path.join( self._db_dir, self._db_filenames[ 'main' ] )
+        
+        db = sqlite3.connect( read_only_uri( db_path ), uri = True, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
+        
+        c = db.cursor()
+        
+        for ( name, filename ) in self._db_filenames.items():
+            
+            if name == 'main':
+                
+                continue
+                
+            
+            c.execute( 'ATTACH ? AS ' + name + ';', ( read_only_uri( os.path.join( self._db_dir, filename ) ), ) )
+            
+        
+        c.execute( 'ATTACH ":memory:" AS mem;' )
+        
+        if HG.no_db_temp_files:
+            
+            c.execute( 'PRAGMA temp_store = 2;' )
+            
+        
+        db_names = [ name for ( index, name, path ) in c.execute( 'PRAGMA database_list;' ) if name not in ( 'mem', 'temp' ) ]
+        
+        for db_name in db_names:
+            
+            c.execute( 'PRAGMA {}.cache_size = -{};'.format( db_name, HG.db_cache_size * 1024 ) )
+            
+        
+        return ( db, c )
+        
+    
     def _InitExternalDatabases( self ):
         
         pass
@@ -664,11 +728,29 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
         
     
+    def _PutMainLoopJob( self, job ):
+        
+        with self._read_replica_lock:
+            
+            if job.GetType() != 'read':
+                
+                self._num_main_loop_write_jobs_outstanding += 1
+                
+            
+            self._jobs.put( job )
+            
+        
+    
     def _Read( self, action, *args, **kwargs ):
         
         raise NotImplementedError()
         
     
+    def _ReadFromReadReplica( self, read_replica, action, *args, **kwargs ):
+        
+        raise NotImplementedError()
+        
+    
     def _RepairDB( self, version ):
         
         for module in self._modules:
@@ -677,6 +759,151 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
         
     
+    def _ReadReplicaLoop( self, index ):
+        
+        db = None
+        c = None
+        read_replica = None
+        read_replica_write_generation = None
+        
+        temporary_integer_table_name_cache = HydrusDBBase.TemporaryIntegerTableNameCache( register_instance = False )
+        
+        try:
+            
+            while True:
+                
+                with self._read_replica_lock:
+                    
+                    if index >= self._num_read_replicas or self._local_shutdown or HG.model_shutdown:
+                        
+                        self._running_read_replica_indices.discard( index )
+                        
+                        if len( self._running_read_replica_indices ) == 0:
+                            
+                            # nothing left to serve these, so the main loop gets them
+                            
+                            while not self._read_replica_jobs.empty():
+                                
+                                self._jobs.put( self._read_replica_jobs.get() )
+                                
+                                self._num_read_replica_jobs_outstanding -= 1
+                                
+                            
+                            self._read_replica_job_finished.notify_all()
+                            
+                        
+                        break
+                        
+                    
+                
+                if self._pause_and_disconnect:
+                    
+                    if db is not None:
+                        
+                        c.close()
+                        db.close()
+                        
+                        ( db, c, read_replica ) = ( None, None, None )
+                        
+                    
+                    time.sleep( 1 )
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    job = self._read_replica_jobs.get( timeout = 1 )
+                    
+                except queue.Empty:
+                    
+                    continue
+                    
+                
+                ( action, args, kwargs ) = job.GetCallableTuple()
+                
+                with self._read_replica_lock:
+                    
+                    write_generation = self._write_generation
+                    
+                
+                try:
+                    
+                    if db is None:
+                        
+                        ( db, c ) = self._InitReadReplicaConnection()
+                        
+                        temporary_integer_table_name_cache.Clear()
+                        
+                        read_replica = None
+                        
+                    
+                    if read_replica is None or read_replica_write_generation != write_generation:
+                        
+                        # these are our own module objects on our own cursor, so no in-memory cache is shared with the main thread
+                        # a write may have changed what those caches should hold, so after one we start them fresh
+                        read_replica = self._GenerateReadReplica( c, temporary_integer_table_name_cache )
+                        read_replica_write_generation = write_generation
+                        
+                    
+                    # one read transaction per job, so the whole job sees one consistent snapshot
+                    c.execute( 'BEGIN DEFERRED;' )
+                    
+                    try:
+                        
+                        result = self._ReadFromReadReplica( read_replica, action, *args, **kwargs )
+                        
+                        # commit, not rollback, so any mem temp tables the name cache knows about stay put
+                        c.execute( 'COMMIT;' )
+                        
+                    except:
+                        
+                        c.execute( 'ROLLBACK;' )
+                        
+                        temporary_integer_table_name_cache.Clear()
+                        
+                        raise
+                        
+                    
+                    job.PutResult( result )
+                    
+                except sqlite3.OperationalError as e:
+                    
+                    if 'readonly' in str( e ):
+                        
+                        # this job wanted to write something, maybe a new definition, so it has to go through the main connection after all
+                        self._PutMainLoopJob( job )
+                        
+                    else:
+                        
+                        self._ManageDBError( job, e )
+                        
+                    
+                except Exception as e:
+                    
+                    self._ManageDBError( job, e )
+                    
+                finally:
+                    
+                    with self._read_replica_lock:
+                        
+                        self._num_read_replica_jobs_outstanding -= 1
+                        
+                        self._read_replica_job_finished.notify_all()
+                        
+                    
+                
+            
+        finally:
+            
+            if db is not None:
+                
+                c.close()
+                db.close()
+                
+            
+        
+    
     def _ReportOverupdatedDB( self, version ):
         
         pass
@@ -782,7 +1009,12 @@ class HydrusDB( HydrusDBBase.DBBase ):
     
     def LoopIsFinished( self ):
         
-        return self._loop_finished
+        with self._read_replica_lock:
+            
+            read_replicas_finished = len( self._running_read_replica_indices ) == 0
+            
+        
+        return self._loop_finished and read_replicas_finished
         
     
     def JobsQueueEmpty( self ):
@@ -817,7 +1049,28 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 
                 job = self._jobs.get( timeout = 1 )
                 
-                self._currently_doing_job = True
+                is_write_job = job.GetType() != 'read'
+                
+                with self._read_replica_lock:
+                    
+                    if is_write_job:
+                        
+                        # a replica read has to see the db as it was when it was asked for, and its results go into caches we share, so we let any running ones finish first
+                        while self._num_read_replica_jobs_outstanding > 0:
+                            
+                            self._read_replica_job_finished.wait( 1 )
+                            
+                        
+                    
+                    self._currently_doing_job = True
+                    
+                
+                if not is_write_job and self._num_read_replicas > 0 and self._cursor_transaction_wrapper.InTransactionWithWrites():
+                    
+                    # replicas only see committed data, so commit now rather than hold them up for as long as this read takes
+                    self._cursor_transaction_wrapper.CommitAndBegin()
+                    
+                
                 self._current_job_name = job.ToString()
                 
                 self.publish_status_update()
@@ -853,19 +1106,32 @@ class HydrusDB( HydrusDBBase.DBBase ):
                         raise
                         
                     
-                    self._jobs.put( job ) # couldn't lock db; put job back on queue
+                    self._PutMainLoopJob( job ) # couldn't lock db; put job back on queue
                     
                     time.sleep( 5 )
                     
                 
-                self._currently_doing_job = False
+                with self._read_replica_lock:
+                    
+                    self._currently_doing_job = False
+                    
+                    if is_write_job:
+                        
+                        self._num_main_loop_write_jobs_outstanding -= 1
+                        self._write_generation += 1
+                        
+                    
+                
                 self._current_job_name = ''
                 
                 self.publish_status_update()
                 
             except queue.Empty:
                 
-                if self._cursor_transaction_wrapper.TimeToCommit():
+                # if we have read replicas, they can only take jobs while we have nothing uncommitted, so we commit writes as soon as we are idle
+                commit_for_read_replicas = self._num_read_replicas > 0 and self._cursor_transaction_wrapper.InTransactionWithWrites()
+                
+                if self._cursor_transaction_wrapper.TimeToCommit() or commit_for_read_replicas:
                     
                     self._cursor_transaction_wrapper.CommitAndBegin()
                     
@@ -923,7 +1189,35 @@ class HydrusDB( HydrusDBBase.DBBase ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        use_read_replica = False
+        
+        if action in self.READ_REPLICA_ACTIONS and self._num_read_replicas > 0:
+            
+            with self._read_replica_lock:
+                
+                # a replica only sees committed data, so if the main loop has a write queued, in progress, or uncommitted, we have to wait in line behind it
+                # if it is only busy with reads, say a slow search, a replica sees just what it would, so we can go around it
+                # write jobs are counted when they are put on the queue and uncounted only once they are done, so there is no gap between a job leaving the queue and it starting work
+                
+                cursor_transaction_wrapper = self._cursor_transaction_wrapper
+                
+                main_loop_has_no_writes = self._num_main_loop_write_jobs_outstanding == 0 and cursor_transaction_wrapper is not None and not cursor_transaction_wrapper.InTransactionWithWrites()
+                
+                use_read_replica = len( self._running_read_replica_indices ) > 0 and not self._pause_and_disconnect and main_loop_has_no_writes
+                
+                if use_read_replica:
+                    
+                    self._num_read_replica_jobs_outstanding += 1
+                    
+                    self._read_replica_jobs.put( job )
+                    
+                
+            
+        
+        if not use_read_replica:
+            
+            self._PutMainLoopJob( job )
+            
         
         return job.GetResult()
         
@@ -933,6 +1227,31 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return self._ready_to_serve_requests
         
     
+    def SetNumReadReplicas( self, num_read_replicas ):
+        
+        if num_read_replicas > 0 and HG.db_journal_mode != 'WAL':
+            
+            HydrusData.Print( 'Read-only database connections need WAL journalling, so they will not be used.' )
+            
+            num_read_replicas = 0
+            
+        
+        with self._read_replica_lock:
+            
+            self._num_read_replicas = num_read_replicas
+            
+            for index in range( num_read_replicas ):
+                
+                if index not in self._running_read_replica_indices:
+                    
+                    self._running_read_replica_indices.add( index )
+                    
+                    self._controller.CallToThreadLongRunning( self._ReadReplicaLoop, index )
+                    
+                
+            
+        
+    
     def Shutdown( self ):
         
         self._local_shutdown = True
@@ -949,7 +1268,7 @@ class HydrusDB( HydrusDBBase.DBBase ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        self._PutMainLoopJob( job )
         
         if synchronous: return job.GetResult()
         
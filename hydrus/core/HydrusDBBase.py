@@ -1,4 +1,5 @@
 import collections
+import json
 import typing
 
 import psutil
@@ -75,6 +76,43 @@ def CheckHasSpaceForDBTransaction( db_dir, num_bytes ):
         
     
 
+# under this, executemany is fine. over it, handing sqlite one big json array is about three times faster
+BULK_INTEGER_INSERT_THRESHOLD = 256
+
+JSON_EACH_AVAILABLE = None
+
+def CanBulkInsertIntegers( cursor: sqlite3.Cursor ):
+    
+    global JSON_EACH_AVAILABLE
+    
+    if JSON_EACH_AVAILABLE is None:
+        
+        try:
+            
+            cursor.execute( 'SELECT value FROM json_each( ? );', ( '[1]', ) ).fetchall()
+            
+            JSON_EACH_AVAILABLE = True
+            
+        except sqlite3.OperationalError:
+            
+            JSON_EACH_AVAILABLE = False
+            
+        
+    
+    return JSON_EACH_AVAILABLE
+    
+
+def InsertIntegers( cursor: sqlite3.Cursor, table_name, column_name, integers ):
+    
+    cursor.executemany( 'INSERT INTO {} ( {} ) VALUES ( ? );'.format( table_name, column_name ), ( ( i, ) for i in integers ) )
+    
+
+def InsertIntegersBulk( cursor: sqlite3.Cursor, table_name, column_name, integers ):
+    
+    # one bound parameter, unpacked by sqlite, rather than a python->sqlite round trip for every row
+    cursor.execute( 'INSERT INTO {} ( {} ) SELECT value FROM json_each( ? );'.format( table_name, column_name ), ( json.dumps( list( integers ) ), ) )
+    
+
 def ReadFromCancellableCursor( cursor, largest_group_size, cancelled_hook = None ):
     
     if cancelled_hook is None:
@@ -117,9 +155,12 @@ class TemporaryIntegerTableNameCache( object ):
     
     my_instance = None
     
-    def __init__( self ):
+    def __init__( self, register_instance = True ):
         
-        TemporaryIntegerTableNameCache.my_instance = self
+        if register_instance:
+            
+            TemporaryIntegerTableNameCache.my_instance = self
+            
         
         self._column_names_to_table_names = collections.defaultdict( collections.deque )
         self._column_names_counter = collections.Counter()
@@ -175,18 +216,24 @@ class TemporaryIntegerTableNameCache( object ):
     
 class TemporaryIntegerTable( object ):
     
-    def __init__( self, cursor: sqlite3.Cursor, integer_iterable, column_name ):
+    def __init__( self, cursor: sqlite3.Cursor, integer_iterable, column_name, temporary_integer_table_name_cache: typing.Optional[ TemporaryIntegerTableNameCache ] = None ):
         
         if not isinstance( integer_iterable, set ):
             
             integer_iterable = set( integer_iterable )
             
         
+        if temporary_integer_table_name_cache is None:
+            
+            temporary_integer_table_name_cache = TemporaryIntegerTableNameCache.instance()
+            
+        
         self._cursor = cursor
         self._integer_iterable = integer_iterable
         self._column_name = column_name
+        self._temporary_integer_table_name_cache = temporary_integer_table_name_cache
         
-        ( self._initialised, self._table_name ) = TemporaryIntegerTableNameCache.instance().GetName( self._column_name )
+        ( self._initialised, self._table_name ) = self._temporary_integer_table_name_cache.GetName( self._column_name )
         
     
     def __enter__( self ):
@@ -196,7 +243,22 @@ class TemporaryIntegerTable( object ):
             self._cursor.execute( 'CREATE TABLE IF NOT EXISTS {} ( {} INTEGER PRIMARY KEY );'.format( self._table_name, self._column_name ) )
             
         
-        self._cursor.executemany( 'INSERT INTO {} ( {} ) VALUES ( ? );'.format( self._table_name, self._column_name ), ( ( i, ) for i in self._integer_iterable ) )
+        if len( self._integer_iterable ) >= BULK_INTEGER_INSERT_THRESHOLD and CanBulkInsertIntegers( self._cursor ):
+            
+            try:
+                
+                InsertIntegersBulk( self._cursor, self._table_name, self._column_name, self._integer_iterable )
+                
+                return self._table_name
+                
+            except sqlite3.OperationalError:
+                
+                # json too big for SQLITE_MAX_LENGTH or similar, so we do it the old way
+                pass
+                
+            
+        
+        InsertIntegers( self._cursor, self._table_name, self._column_name, self._integer_iterable )
         
         return self._table_name
         
@@ -205,7 +267,7 @@ class TemporaryIntegerTable( object ):
         
         self._cursor.execute( 'DELETE FROM {};'.format( self._table_name ) )
         
-        TemporaryIntegerTableNameCache.instance().ReleaseName( self._column_name, self._table_name )
+        self._temporary_integer_table_name_cache.ReleaseName( self._column_name, self._table_name )
         
         return False
         
@@ -216,6 +278,9 @@ class DBBase( object ):
         
         self._c = None
         
+        # None means the global one. a read replica's modules have their own, since their temp tables live on a different connection
+        self._temporary_integer_table_name_cache = None
+        
     
     def _AnalyzeTempTable( self, temp_table_name ):
         
@@ -445,7 +510,7 @@ class DBBase( object ):
     
     def _MakeTemporaryIntegerTable( self, integer_iterable, column_name ):
         
-        return TemporaryIntegerTable( self._c, integer_iterable, column_name )
+        return TemporaryIntegerTable( self._c, integer_iterable, column_name, temporary_integer_table_name_cache = self._temporary_integer_table_name_cache )
         
     
     def _SetCursor( self, c: sqlite3.Cursor ):
@@ -528,6 +593,8 @@ class DBCursorTransactionWrapper( DBBase ):
         
         self._pubsubs = []
         
+        self._rollback_callables = []
+        
     
     def _ZeroJournal( self ):
     
@@ -554,6 +621,13 @@ class DBCursorTransactionWrapper( DBBase ):
             
         
     
+    def AddRollbackCallable( self, call ):
+        
+        # for modules with in-memory caches that may hold something only this transaction wrote
+        
+        self._rollback_callables.append( call )
+        
+    
     def BeginImmediate( self ):
         
         if not self._in_transaction:
@@ -647,6 +721,11 @@ class DBCursorTransactionWrapper( DBBase ):
         return self._in_transaction
         
     
+    def InTransactionWithWrites( self ):
+        
+        return self._in_transaction and self._transaction_contains_writes
+        
+    
     def NotifyWriteOccuring( self ):
         
         self._transaction_contains_writes = True
@@ -674,6 +753,11 @@ class DBCursorTransactionWrapper( DBBase ):
             # any temp int tables created in this lad will be rolled back, so 'initialised' can't be trusted. just reset, no big deal
             TemporaryIntegerTableNameCache.instance().Clear()
             
+            for call in self._rollback_callables:
+                
+                call()
+                
+            
             # still in transaction
             # transaction may no longer contain writes, but it isn't important to figure out that it doesn't
             
@@ -298,3 +298,9 @@ class HydrusDBModule( HydrusDBBase.DBBase ):
                 
             
         
+    
+    def SetTemporaryIntegerTableNameCache( self, temporary_integer_table_name_cache: HydrusDBBase.TemporaryIntegerTableNameCache ):
+        
+        self._temporary_integer_table_name_cache = temporary_integer_table_name_cache
+        
+    
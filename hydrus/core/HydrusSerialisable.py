@@ -1,8 +1,10 @@
 import hashlib
 import json
 import os
+import struct
 import typing
 
+import numpy
 import typing_extensions
 
 from hydrus.core import HydrusCompression
@@ -144,8 +146,74 @@ SERIALISABLE_TYPE_FILE_FILTER = 126
 
 SERIALISABLE_TYPES_TO_OBJECT_TYPES = {}
 
+# some big objects can also go over the wire as a packed binary payload rather than zlibbed json
+# the magic's first byte is not a valid zlib header, so we can never confuse it with the legacy format
+BINARY_NETWORK_BYTES_MAGIC = b'\x89HYDRUS\n'
+BINARY_NETWORK_BYTES_VERSION = 1
+
+# format version, serialisable type, serialisable version, compression codec
+BINARY_NETWORK_BYTES_HEADER = struct.Struct( '<BHHB' )
+
+BINARY_INTEGER_DTYPES = ( numpy.dtype( 'u1' ), numpy.dtype( '<u2' ), numpy.dtype( '<u4' ), numpy.dtype( '<i8' ) )
+
+def CreateFromBinaryNetworkBytes( network_bytes: bytes, allowed_serialisable_types ) -> "SerialisableBase":
+    
+    # only a few types have a binary form, and callers say which they will accept, so odd bytes from a request body or the clipboard can never get in here
+    
+    if not network_bytes.startswith( BINARY_NETWORK_BYTES_MAGIC ):
+        
+        raise HydrusExceptions.SerialisationException( 'This was not a binary object!' )
+        
+    
+    header_start = len( BINARY_NETWORK_BYTES_MAGIC )
+    payload_start = header_start + BINARY_NETWORK_BYTES_HEADER.size
+    
+    try:
+        
+        ( binary_version, serialisable_type, version, codec ) = BINARY_NETWORK_BYTES_HEADER.unpack_from( network_bytes, header_start )
+        
+    except struct.error:
+        
+        raise HydrusExceptions.SerialisationException( 'This binary object was truncated!' )
+        
+    
+    if binary_version > BINARY_NETWORK_BYTES_VERSION:
+        
+        raise HydrusExceptions.SerialisationException( 'This object uses binary format version {}, but we only support up to version {}! Please update your client/server to load it.'.format( binary_version, BINARY_NETWORK_BYTES_VERSION ) )
+        
+    
+    if serialisable_type not in allowed_serialisable_types or serialisable_type not in SERIALISABLE_TYPES_TO_OBJECT_TYPES:
+        
+        raise HydrusExceptions.SerialisationException( 'Binary object type {} is not supported here!'.format( serialisable_type ) )
+        
+    
+    try:
+        
+        payload = HydrusCompression.DecompressCodecBytesToBytes( codec, network_bytes[ payload_start : ] )
+        
+        obj = SERIALISABLE_TYPES_TO_OBJECT_TYPES[ serialisable_type ]()
+        
+        obj.InitialiseFromBinaryPayload( version, BinaryPayloadReader( payload ) )
+        
+    except HydrusExceptions.SerialisationException:
+        
+        raise
+        
+    except Exception as e:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not load a binary object of type {}: {}'.format( serialisable_type, e ) ) from e
+        
+    
+    return obj
+    
+
 def CreateFromNetworkBytes( network_bytes: bytes, raise_error_on_future_version = False ):
     
+    if network_bytes.startswith( BINARY_NETWORK_BYTES_MAGIC ):
+        
+        raise HydrusExceptions.SerialisationException( 'This is a binary object, which is not supported here!' )
+        
+    
     obj_string = HydrusCompression.DecompressBytesToString( network_bytes )
     
     return CreateFromString( obj_string, raise_error_on_future_version = raise_error_on_future_version )
@@ -223,6 +291,195 @@ def ObjectVersionIsFromTheFuture( obj_tuple ):
     return SERIALISABLE_TYPES_TO_OBJECT_TYPES[ serialisable_type ].SERIALISABLE_VERSION > version
     
 
+class BinaryPayloadReader( object ):
+    
+    def __init__( self, payload: bytes ):
+        
+        self._payload = payload
+        self._position = 0
+        
+    
+    def _ReadStruct( self, fmt: str ):
+        
+        try:
+            
+            result = struct.unpack_from( fmt, self._payload, self._position )
+            
+        except struct.error:
+            
+            raise HydrusExceptions.SerialisationException( 'This binary payload was truncated!' )
+            
+        
+        self._position += struct.calcsize( fmt )
+        
+        return result
+        
+    
+    def CheckFinished( self ):
+        
+        if self._position != len( self._payload ):
+            
+            raise HydrusExceptions.SerialisationException( 'This binary payload had unexpected trailing data!' )
+            
+        
+    
+    def ReadBytes( self ) -> bytes:
+        
+        ( num_bytes, ) = self._ReadStruct( '<Q' )
+        
+        if self._position + num_bytes > len( self._payload ):
+            
+            raise HydrusExceptions.SerialisationException( 'This binary payload was truncated!' )
+            
+        
+        result = self._payload[ self._position : self._position + num_bytes ]
+        
+        self._position += num_bytes
+        
+        return result
+        
+    
+    def ReadBytesList( self ) -> typing.List[ bytes ]:
+        
+        lengths = self.ReadIntegers()
+        blob = self.ReadBytes()
+        
+        ends = numpy.cumsum( lengths ).tolist()
+        starts = [ 0 ] + ends[ : -1 ]
+        
+        return [ blob[ start : end ] for ( start, end ) in zip( starts, ends ) ]
+        
+    
+    def ReadInteger( self ) -> int:
+        
+        ( integer, ) = self._ReadStruct( '<q' )
+        
+        return integer
+        
+    
+    def ReadIntegers( self ) -> numpy.ndarray:
+        
+        ( dtype_index, count ) = self._ReadStruct( '<BQ' )
+        
+        if dtype_index >= len( BINARY_INTEGER_DTYPES ):
+            
+            raise HydrusExceptions.SerialisationException( 'Did not understand binary integer type {}!'.format( dtype_index ) )
+            
+        
+        dtype = BINARY_INTEGER_DTYPES[ dtype_index ]
+        
+        num_bytes = count * dtype.itemsize
+        
+        if self._position + num_bytes > len( self._payload ):
+            
+            raise HydrusExceptions.SerialisationException( 'This binary payload was truncated!' )
+            
+        
+        byte_planes = numpy.frombuffer( self._payload, dtype = 'u1', count = num_bytes, offset = self._position ).reshape( dtype.itemsize, count )
+        
+        # this copies, so we do not keep the whole payload alive through a view
+        integers = byte_planes.T.copy().view( dtype ).reshape( count ).astype( numpy.int64 )
+        
+        self._position += num_bytes
+        
+        return integers
+        
+    
+    def ReadJSON( self ):
+        
+        return json.loads( str( self.ReadBytes(), 'utf-8' ) )
+        
+    
+    def ReadSignedIntegers( self ) -> numpy.ndarray:
+        
+        zigzags = self.ReadIntegers().view( numpy.uint64 )
+        
+        return ( ( zigzags >> numpy.uint64( 1 ) ) ^ ( numpy.uint64( 0 ) - ( zigzags & numpy.uint64( 1 ) ) ) ).view( numpy.int64 )
+        
+    
+
+class BinaryPayloadWriter( object ):
+    
+    def __init__( self ):
+        
+        self._chunks = []
+        
+    
+    def AddBytes( self, b: bytes ):
+        
+        self._chunks.append( struct.pack( '<Q', len( b ) ) )
+        self._chunks.append( b )
+        
+    
+    def AddBytesList( self, bs: typing.Collection[ bytes ] ):
+        
+        self.AddIntegers( [ len( b ) for b in bs ] )
+        self.AddBytes( b''.join( bs ) )
+        
+    
+    def AddInteger( self, integer: int ):
+        
+        self._chunks.append( struct.pack( '<q', integer ) )
+        
+    
+    def AddIntegers( self, integers ):
+        
+        integers = numpy.asarray( integers, dtype = numpy.int64 )
+        
+        # store each column in the narrowest type that holds it
+        
+        dtype_index = len( BINARY_INTEGER_DTYPES ) - 1
+        
+        if len( integers ) == 0:
+            
+            dtype_index = 0
+            
+        elif integers.min() >= 0:
+            
+            biggest = int( integers.max() )
+            
+            for ( i, dtype ) in enumerate( BINARY_INTEGER_DTYPES[ : -1 ] ):
+                
+                if biggest <= numpy.iinfo( dtype ).max:
+                    
+                    dtype_index = i
+                    
+                    break
+                    
+                
+            
+        
+        dtype = BINARY_INTEGER_DTYPES[ dtype_index ]
+        
+        # we write all the low bytes, then all the next bytes, and so on. ids and small gaps then line up into long runs the compressor can eat
+        byte_planes = integers.astype( dtype ).view( 'u1' ).reshape( len( integers ), dtype.itemsize ).T
+        
+        self._chunks.append( struct.pack( '<BQ', dtype_index, len( integers ) ) )
+        self._chunks.append( byte_planes.tobytes() )
+        
+    
+    def AddJSON( self, obj ):
+        
+        self.AddBytes( bytes( json.dumps( obj ), 'utf-8' ) )
+        
+    
+    def AddSignedIntegers( self, integers ):
+        
+        # zigzag, so small negative numbers are small positive ones rather than forcing the whole column up to eight bytes
+        
+        integers = numpy.asarray( integers, dtype = numpy.int64 )
+        
+        zigzags = ( integers.view( numpy.uint64 ) << numpy.uint64( 1 ) ) ^ ( integers >> 63 ).view( numpy.uint64 )
+        
+        self.AddIntegers( zigzags.view( numpy.int64 ) )
+        
+    
+    def GetPayload( self ) -> bytes:
+        
+        return b''.join( self._chunks )
+        
+    
+
 SerialisableBaseSubclass = typing.TypeVar( 'SerialisableBaseSubclass', bound = 'SerialisableBase' )
 
 class SerialisableBase( object ):
@@ -238,6 +495,11 @@ class SerialisableBase( object ):
         raise NotImplementedError()
         
     
+    def _InitialiseFromBinaryPayload( self, reader: BinaryPayloadReader ):
+        
+        raise NotImplementedError()
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         raise NotImplementedError()
@@ -248,6 +510,24 @@ class SerialisableBase( object ):
         return old_serialisable_info
         
     
+    def _WriteBinaryPayload( self, writer: BinaryPayloadWriter ):
+        
+        raise NotImplementedError()
+        
+    
+    def DumpToBinaryNetworkBytes( self ):
+        
+        writer = BinaryPayloadWriter()
+        
+        self._WriteBinaryPayload( writer )
+        
+        ( codec, compressed_payload ) = HydrusCompression.CompressBytesToCodecBytes( writer.GetPayload() )
+        
+        header = BINARY_NETWORK_BYTES_HEADER.pack( BINARY_NETWORK_BYTES_VERSION, self.SERIALISABLE_TYPE, self.SERIALISABLE_VERSION, codec )
+        
+        return BINARY_NETWORK_BYTES_MAGIC + header + compressed_payload
+        
+    
     def DumpToNetworkBytes( self ):
         
         obj_string = self.DumpToString()
@@ -291,6 +571,19 @@ class SerialisableBase( object ):
         return ( self.SERIALISABLE_TYPE, self.SERIALISABLE_VERSION, serialisable_info )
         
     
+    def InitialiseFromBinaryPayload( self, version, reader: BinaryPayloadReader ):
+        
+        # unlike json, we have no way to update an old binary payload, so it has to match exactly
+        if version != self.SERIALISABLE_VERSION:
+            
+            raise HydrusExceptions.SerialisationException( 'Could not load a binary object of type {}, version {}! We only support version {} here.'.format( self.SERIALISABLE_NAME, version, self.SERIALISABLE_VERSION ) )
+            
+        
+        self._InitialiseFromBinaryPayload( reader )
+        
+        reader.CheckFinished()
+        
+    
     def InitialiseFromSerialisableInfo( self, original_version, serialisable_info, raise_error_on_future_version = False ):
         
         object_is_newer = original_version > self.SERIALISABLE_VERSION
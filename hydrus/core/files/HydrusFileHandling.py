@@ -7,7 +7,6 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusPaths
-from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTemp
 from hydrus.core import HydrusText
 from hydrus.core import HydrusTime
@@ -87,9 +86,9 @@ mimes_to_default_thumbnail_paths[ HC.APPLICATION_PROCREATE ] = os.path.join( HC.
 mimes_to_default_thumbnail_paths[ HC.APPLICATION_RTF ] = os.path.join( HC.STATIC_DIR, 'rtf.png' )
 mimes_to_default_thumbnail_paths[ HC.IMAGE_SVG ] = os.path.join( HC.STATIC_DIR, 'svg.png' )
 
-def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in = 35 ):
+def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in = 35, keyframe_timestamps_us = None ):
     
-    thumbnail_numpy = GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in )
+    thumbnail_numpy = GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in, keyframe_timestamps_us = keyframe_timestamps_us )
 
     return HydrusImageHandling.GenerateThumbnailBytesFromNumPy( thumbnail_numpy )
     
@@ -109,7 +108,7 @@ def PrintMoreThumbErrorInfo( e: Exception, message, extra_description: typing.Op
         
     
 
-def GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames, percentage_in = 35, extra_description = None ):
+def GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames, percentage_in = 35, extra_description = None, numpy_image = None, keyframe_timestamps_us = None ):
     
     if mime == HC.APPLICATION_CBZ:
         
@@ -290,7 +289,7 @@ def GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames,
         
         try:
             
-            thumbnail_numpy = HydrusImageHandling.GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime )
+            thumbnail_numpy = HydrusImageHandling.GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime, numpy_image = numpy_image )
             
         except Exception as e:
             
@@ -334,9 +333,17 @@ def GenerateThumbnailNumPy( path, target_resolution, mime, duration, num_frames,
         
         desired_thumb_frame_index = int( ( percentage_in / 100.0 ) * ( num_frames - 1 ) )
         
+        if keyframe_timestamps_us is not None and mime in HC.VIDEO and duration is not None and duration > 0 and num_frames > 0:
+            
+            # a keyframe decodes by itself, so the one nearest where we wanted is a much quicker thumbnail
+            keyframe_index = HydrusVideoHandling.KeyframeIndex( keyframe_timestamps_us, duration, num_frames )
+            
+            desired_thumb_frame_index = min( keyframe_index.GetNearestKeyframeIndex( desired_thumb_frame_index ), num_frames - 1 )
+            
+        
         try:
             
-            renderer = HydrusVideoHandling.VideoRendererFFMPEG( path, mime, duration, num_frames, target_resolution, start_pos = desired_thumb_frame_index )
+            renderer = HydrusVideoHandling.VideoRendererFFMPEG( path, mime, duration, num_frames, target_resolution, start_pos = desired_thumb_frame_index, keyframe_timestamps_us = keyframe_timestamps_us )
             
             numpy_image = renderer.read_frame()
             
@@ -416,6 +423,34 @@ def GetExtraHashesFromPath( path ):
     return ( md5, sha1, sha512 )
     
 
+def GetAllHashesFromPath( path ):
+    
+    # one read of the file for all four, rather than one for sha256 and then another for the rest
+    
+    h_sha256 = hashlib.sha256()
+    h_md5 = hashlib.md5()
+    h_sha1 = hashlib.sha1()
+    h_sha512 = hashlib.sha512()
+    
+    with open( path, 'rb' ) as f:
+        
+        for block in HydrusPaths.ReadFileLikeAsBlocks( f ):
+            
+            h_sha256.update( block )
+            h_md5.update( block )
+            h_sha1.update( block )
+            h_sha512.update( block )
+            
+        
+    
+    sha256 = h_sha256.digest()
+    md5 = h_md5.digest()
+    sha1 = h_sha1.digest()
+    sha512 = h_sha512.digest()
+    
+    return ( sha256, md5, sha1, sha512 )
+    
+
 def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False ):
     
     size = os.path.getsize( path )
@@ -725,7 +760,7 @@ def GetMime( path, ok_to_look_for_hydrus_updates = False ):
         
         try:
             
-            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
             
             if isinstance( update, HydrusNetwork.ContentUpdate ):
                 
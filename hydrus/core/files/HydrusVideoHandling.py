@@ -1,9 +1,11 @@
+import bisect
 import typing
 
 import numpy
 import os
 import re
 import subprocess
+import threading
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
@@ -301,6 +303,34 @@ def GetFFMPEGVideoProperties( path, force_count_frames_manually = False ):
     return ( resolution, duration_in_ms, num_frames, has_audio )
     
 
+def GetKeyframeTimestampsUS( path ) -> typing.List[ int ]:
+    
+    # decoding only the keyframes is quick, and showinfo tells us the exact timestamp of each one
+    
+    cmd = [ FFMPEG_PATH, '-skip_frame', 'nokey', '-i', path, '-map', '0:v:0', '-an', '-vf', 'showinfo', '-f', 'null', '-' ]
+    
+    sbp_kwargs = HydrusData.GetSubprocessKWArgs()
+    
+    HydrusData.CheckProgramIsNotShuttingDown()
+    
+    try:
+        
+        process = subprocess.Popen( cmd, bufsize = 10**5, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE, **sbp_kwargs )
+        
+    except FileNotFoundError as e:
+        
+        raise FileNotFoundError( 'Cannot interact with video because FFMPEG not found--are you sure it is installed? Full error: ' + str( e ) )
+        
+    
+    ( stdout, stderr ) = HydrusThreading.SubprocessCommunicate( process )
+    
+    ( text, encoding ) = HydrusText.NonFailingUnicodeDecode( stderr, 'utf-8' )
+    
+    lines = text.splitlines()
+    
+    return ParseFFMPEGKeyframeTimestampsUS( lines )
+    
+
 def GetMime( path ):
     
     lines = GetFFMPEGInfoLines( path )
@@ -739,6 +769,59 @@ def ParseFFMPEGHasVideo( lines ) -> bool:
     
     return True
     
+def ParseFFMPEGKeyframeTimestampsUS( lines ) -> typing.List[ int ]:
+    
+    # [Parsed_showinfo_0 @ 0x5581c0c0c0c0] config in time_base: 1/12800, frame_rate: 25/1
+    # [Parsed_showinfo_0 @ 0x5581c0c0c0c0] n:   1 pts:  25600 pts_time:2       duration:    512 duration_time:0.04 ...
+    # pts_time is only printed to six significant figures, so we work from the pts and time base
+    
+    time_base = None
+    keyframe_timestamps_us = set()
+    
+    for line in lines:
+        
+        if 'Parsed_showinfo' not in line:
+            
+            continue
+            
+        
+        if time_base is None:
+            
+            match = re.search( r'config in time_base: (\d+)/(\d+)', line )
+            
+            if match is not None and int( match.group( 2 ) ) > 0:
+                
+                time_base = ( int( match.group( 1 ) ), int( match.group( 2 ) ) )
+                
+            
+            continue
+            
+        
+        match = re.search( r' pts: *(-?\d+) ', line )
+        
+        if match is not None:
+            
+            pts = int( match.group( 1 ) )
+            
+            ( numerator, denominator ) = time_base
+            
+            # rounded up, since seeking to even a hair before a keyframe makes ffmpeg decode the whole group of frames before it
+            timestamp_us = - ( ( - pts * numerator * 1000000 ) // denominator )
+            
+            if timestamp_us >= 0:
+                
+                keyframe_timestamps_us.add( timestamp_us )
+                
+            
+        
+    
+    if len( keyframe_timestamps_us ) == 0:
+        
+        raise HydrusExceptions.DamagedOrUnusualFileException( 'Could not find any keyframes in that video!' )
+        
+    
+    return sorted( keyframe_timestamps_us )
+    
 def ParseFFMPEGMetadataContainer( lines ) -> str:
     
     #  Metadata:
@@ -993,10 +1076,62 @@ def VideoHasAudio( path, info_lines ) -> bool:
         process.stderr.close()
         
     
+class KeyframeIndex( object ):
+    
+    # maps a video's keyframe timestamps onto the same constant-rate frame indices the renderers use
+    
+    def __init__( self, keyframe_timestamps_us: typing.List[ int ], duration_ms, num_frames ):
+        
+        self._keyframe_timestamps_us = keyframe_timestamps_us
+        self._frame_duration_us = ( duration_ms * 1000 ) / num_frames
+        
+        self._keyframe_indices = [ round( keyframe_timestamp_us / self._frame_duration_us ) for keyframe_timestamp_us in self._keyframe_timestamps_us ]
+        
+    
+    def GetKeyframeIndexAtOrBefore( self, frame_index ) -> int:
+        
+        i = bisect.bisect_right( self._keyframe_indices, frame_index )
+        
+        if i == 0:
+            
+            return 0
+            
+        
+        return self._keyframe_indices[ i - 1 ]
+        
+    
+    def GetNearestKeyframeIndex( self, frame_index ) -> int:
+        
+        i = bisect.bisect_left( self._keyframe_indices, frame_index )
+        
+        candidates = self._keyframe_indices[ max( 0, i - 1 ) : i + 1 ]
+        
+        if len( candidates ) == 0:
+            
+            return frame_index
+            
+        
+        return min( candidates, key = lambda keyframe_index: abs( keyframe_index - frame_index ) )
+        
+    
+    def GetSeekTimestampS( self, frame_index ) -> float:
+        
+        # ffmpeg seeks back to the keyframe at or before the time we give it, so a keyframe gets its true timestamp, not our constant-rate guess that may land just before it
+        
+        i = bisect.bisect_left( self._keyframe_indices, frame_index )
+        
+        if i < len( self._keyframe_indices ) and self._keyframe_indices[ i ] == frame_index:
+            
+            return self._keyframe_timestamps_us[ i ] / 1000000
+            
+        
+        return ( frame_index * self._frame_duration_us ) / 1000000
+        
+    
 # This was built from moviepy's FFMPEG_VideoReader
 class VideoRendererFFMPEG( object ):
     
-    def __init__( self, path, mime, duration, num_frames, target_resolution, clip_rect = None, start_pos = None ):
+    def __init__( self, path, mime, duration, num_frames, target_resolution, clip_rect = None, start_pos = None, num_frame_buffers = None, keyframe_timestamps_us = None ):
         
         if duration <= 0 or duration is None:
             
@@ -1021,6 +1156,13 @@ class VideoRendererFFMPEG( object ):
         
         self.lastread = None
         
+        # frames are read straight into numpy buffers. if num_frame_buffers is set, a caller that is done with a frame can hand it back with ReleaseFrameBuffer and it'll be decoded into again
+        # buffers can come back from any thread, whenever the last thing using their frame lets go of it
+        self._num_frame_buffers = num_frame_buffers
+        self._free_frame_buffers = []
+        self._free_frame_buffers_lock = threading.Lock()
+        self._skip_frame_buffer = None
+        
         self.fps = self._num_frames / self._duration
         
         if self.fps == 0:
@@ -1028,6 +1170,13 @@ class VideoRendererFFMPEG( object ):
             self.fps = 24
             
         
+        self._keyframe_index = None
+        
+        if keyframe_timestamps_us is not None and self._mime in HC.VIDEO and self._num_frames > 0:
+            
+            self._keyframe_index = KeyframeIndex( keyframe_timestamps_us, self._duration * 1000, self._num_frames )
+            
+        
         if self.pix_fmt == 'rgba':
             
             self.depth = 4
@@ -1053,6 +1202,42 @@ class VideoRendererFFMPEG( object ):
         self.initialize( start_index = start_pos )
         
     
+    def _GetFreeFrameBuffer( self ) -> numpy.ndarray:
+        
+        with self._free_frame_buffers_lock:
+            
+            if len( self._free_frame_buffers ) > 0:
+                
+                return self._free_frame_buffers.pop()
+                
+            
+        
+        ( w, h ) = self._target_resolution
+        
+        return numpy.empty( ( h, w, self.depth ), dtype = 'uint8' )
+        
+    
+    def _ReadInto( self, frame_buffer: numpy.ndarray ) -> int:
+        
+        view = memoryview( frame_buffer ).cast( 'B' )
+        
+        num_bytes_read = 0
+        
+        while num_bytes_read < len( view ):
+            
+            num_bytes_read_this_time = self.process.stdout.readinto( view[ num_bytes_read : ] )
+            
+            if not num_bytes_read_this_time:
+                
+                break
+                
+            
+            num_bytes_read += num_bytes_read_this_time
+            
+        
+        return num_bytes_read
+        
+    
     def close( self ) -> None:
         
         if self.process is not None:
@@ -1088,7 +1273,15 @@ class VideoRendererFFMPEG( object ):
                 do_ss = True
                 
             
-            ss = start_index / self.fps
+            if self._keyframe_index is None:
+                
+                ss = start_index / self.fps
+                
+            else:
+                
+                ss = self._keyframe_index.GetSeekTimestampS( start_index )
+                
+            
             self.pos = start_index
             skip_frames = 0
             
@@ -1101,14 +1294,14 @@ class VideoRendererFFMPEG( object ):
         
         if do_ss and do_fast_seek: # fast seek
             
-            cmd.extend( [ '-ss', "%.03f" % ss ] )
+            cmd.extend( [ '-ss', "%.06f" % ss ] )
             
         
         cmd.extend( [ '-i', self._path ] )
         
         if do_ss and not do_fast_seek: # slow seek
             
-            cmd.extend( [ '-ss', "%.03f" % ss ] )
+            cmd.extend( [ '-ss', "%.06f" % ss ] )
             
         
         if self._clip_rect is not None:
@@ -1160,7 +1353,12 @@ class VideoRendererFFMPEG( object ):
             
             if self.process is not None:
                 
-                self.process.stdout.read( self.depth * w * h )
+                if self._skip_frame_buffer is None:
+                    
+                    self._skip_frame_buffer = numpy.empty( ( h, w, self.depth ), dtype = 'uint8' )
+                    
+                
+                self._ReadInto( self._skip_frame_buffer )
                 
                 self.process.stdout.flush()
                 
@@ -1178,7 +1376,8 @@ class VideoRendererFFMPEG( object ):
         
         if self.process is None:
             
-            result = self.lastread
+            # a copy, so no two frames we hand out ever share a buffer
+            result = None if self.lastread is None else self.lastread.copy()
             
         else:
             
@@ -1186,9 +1385,13 @@ class VideoRendererFFMPEG( object ):
             
             nbytes = self.depth * w * h
             
-            s = self.process.stdout.read( nbytes )
+            frame_buffer = self._GetFreeFrameBuffer()
+            
+            num_bytes_read = self._ReadInto( frame_buffer )
             
-            if len( s ) != nbytes:
+            if num_bytes_read != nbytes:
+                
+                self.ReleaseFrameBuffer( frame_buffer )
                 
                 if self.lastread is None:
                     
@@ -1209,13 +1412,13 @@ class VideoRendererFFMPEG( object ):
                     raise HydrusExceptions.DamagedOrUnusualFileException( 'Unable to render that video! Please send it to hydrus dev so he can look at it!' )
                     
                 
-                result = self.lastread
+                result = self.lastread.copy()
                 
                 self.close()
                 
             else:
                 
-                result = numpy.fromstring( s, dtype = 'uint8' ).reshape( ( h, w, self.depth ) )
+                result = frame_buffer
                 
                 self.lastread = result
                 
@@ -1226,10 +1429,47 @@ class VideoRendererFFMPEG( object ):
         return result
         
     
+    def ReleaseFrameBuffer( self, frame_buffer: numpy.ndarray ) -> None:
+        
+        # the caller must no longer be using this frame, since we'll write the next one over it
+        # the last frame read is never recycled, as we may hand it out again if the video ends early
+        
+        if self._num_frame_buffers is None or frame_buffer is self.lastread:
+            
+            return
+            
+        
+        ( w, h ) = self._target_resolution
+        
+        if frame_buffer.shape != ( h, w, self.depth ):
+            
+            return
+            
+        
+        with self._free_frame_buffers_lock:
+            
+            if len( self._free_frame_buffers ) < self._num_frame_buffers:
+                
+                self._free_frame_buffers.append( frame_buffer )
+                
+            
+        
+    
     def set_position( self, pos ) -> None:
         
         rewind = pos < self.pos
-        jump_a_long_way_ahead = pos > self.pos + 60
+        
+        if self._keyframe_index is None:
+            
+            jump_a_long_way_ahead = pos > self.pos + 60
+            
+        else:
+            
+            # skipping ahead decodes every frame in between, so it is only worth a new seek if there is a keyframe a good way past us
+            # and if there isn't, a new seek would have to decode from a keyframe behind us anyway
+            jump_a_long_way_ahead = self._keyframe_index.GetKeyframeIndexAtOrBefore( pos ) > self.pos + 24
+            
+        
         
         if rewind or jump_a_long_way_ahead:
             
@@ -64,6 +64,9 @@ if cv2.__version__.startswith( '2' ):
     CV_JPEG_THUMBNAIL_ENCODE_PARAMS = []
     CV_PNG_THUMBNAIL_ENCODE_PARAMS = []
     
+    CV_IMREAD_REDUCED_FLAGS_COLOUR = {}
+    CV_IMREAD_REDUCED_FLAGS_GREYSCALE = {}
+    
 else:
     
     # allows alpha channel
@@ -76,6 +79,10 @@ else:
     CV_JPEG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_JPEG_QUALITY, 92 ]
     CV_PNG_THUMBNAIL_ENCODE_PARAMS = [ cv2.IMWRITE_PNG_COMPRESSION, 9 ]
     
+    # libjpeg can do 1/2, 1/4, and 1/8 scaling in the DCT, which saves most of the decode time and memory of a big photo
+    CV_IMREAD_REDUCED_FLAGS_COLOUR = { 2 : cv2.IMREAD_REDUCED_COLOR_2, 4 : cv2.IMREAD_REDUCED_COLOR_4, 8 : cv2.IMREAD_REDUCED_COLOR_8 }
+    CV_IMREAD_REDUCED_FLAGS_GREYSCALE = { 2 : cv2.IMREAD_REDUCED_GRAYSCALE_2, 4 : cv2.IMREAD_REDUCED_GRAYSCALE_4, 8 : cv2.IMREAD_REDUCED_GRAYSCALE_8 }
+    
 
 PIL_ONLY_MIMETYPES = { HC.ANIMATION_GIF, HC.IMAGE_ICON, HC.IMAGE_WEBP, HC.IMAGE_QOI, HC.IMAGE_BMP }.union( HC.PIL_HEIF_MIMES )
 
@@ -125,7 +132,69 @@ def ClipPILImage( pil_image: PILImage.Image, clip_rect ):
     return pil_image.crop( box = ( x, y, x + clip_width, y + clip_height ) )
     
 
-def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
+def GenerateImageBytesNumPy( numpy_image, mime, quality = None ) -> bytes:
+    
+    # quality is 0-100 for jpeg and webp, 0-9 compression level for png
+    
+    if mime == HC.IMAGE_PNG:
+        
+        ext = '.png'
+        
+        params = [] if quality is None else [ cv2.IMWRITE_PNG_COMPRESSION, quality ]
+        
+    elif mime == HC.IMAGE_JPEG:
+        
+        ext = '.jpg'
+        
+        params = [ cv2.IMWRITE_JPEG_QUALITY, 92 if quality is None else quality ]
+        
+    elif mime == HC.IMAGE_WEBP:
+        
+        ext = '.webp'
+        
+        params = [ cv2.IMWRITE_WEBP_QUALITY, 85 if quality is None else quality ]
+        
+    else:
+        
+        raise HydrusExceptions.UnsupportedFileException( 'Cannot encode images to {}!'.format( HC.mime_string_lookup[ mime ] ) )
+        
+    
+    if len( numpy_image.shape ) == 2:
+        
+        numpy_image = cv2.cvtColor( numpy_image, cv2.COLOR_GRAY2RGB )
+        
+    
+    numpy_image = HydrusImageNormalisation.StripOutAnyUselessAlphaChannel( numpy_image )
+    
+    ( im_height, im_width, depth ) = numpy_image.shape
+    
+    if depth == 4:
+        
+        # jpeg has no alpha channel, so we just drop it
+        convert = cv2.COLOR_RGBA2BGR if mime == HC.IMAGE_JPEG else cv2.COLOR_RGBA2BGRA
+        
+    else:
+        
+        convert = cv2.COLOR_RGB2BGR
+        
+    
+    numpy_image = cv2.cvtColor( numpy_image, convert )
+    
+    ( result_success, result_byte_array ) = cv2.imencode( ext, numpy_image, params )
+    
+    if result_success:
+        
+        return result_byte_array.tobytes()
+        
+    else:
+        
+        raise HydrusExceptions.CantRenderWithCVException( 'Image failed to encode!' )
+        
+    
+
+def GenerateNumPyImage( path, mime, force_pil = False, target_resolution = None ) -> numpy.array:
+    
+    # if you give a target_resolution, the result may be smaller than the file's real resolution, but it will not be smaller than the target
     
     if HG.media_load_report_mode:
         
@@ -188,7 +257,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
             HydrusData.ShowText( 'Loading with PIL' )
             
         
-        pil_image = GeneratePILImage( path )
+        pil_image = GeneratePILImage( path, target_resolution = target_resolution )
         
         numpy_image = GenerateNumPyImageFromPILImage( pil_image )
         
@@ -212,6 +281,23 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
             flags = CV_IMREAD_FLAGS_WEIRD
             
         
+        if target_resolution is not None:
+            
+            reduction = GetPILImageDecodeReduction( pil_image, target_resolution )
+            
+            reduced_flags_lookup = CV_IMREAD_REDUCED_FLAGS_GREYSCALE if pil_image.mode == 'L' else CV_IMREAD_REDUCED_FLAGS_COLOUR
+            
+            if reduction in reduced_flags_lookup:
+                
+                if HG.media_load_report_mode:
+                    
+                    HydrusData.ShowText( 'Decoding at 1/{} size'.format( reduction ) )
+                    
+                
+                flags = reduced_flags_lookup[ reduction ]
+                
+            
+        
         numpy_image = cv2.imread( path, flags = flags )
         
         if numpy_image is None: # doesn't support some random stuff
@@ -221,7 +307,7 @@ def GenerateNumPyImage( path, mime, force_pil = False ) -> numpy.array:
                 HydrusData.ShowText( 'OpenCV Failed, loading with PIL' )
                 
             
-            pil_image = GeneratePILImage( path )
+            pil_image = GeneratePILImage( path, target_resolution = target_resolution )
             
             numpy_image = GenerateNumPyImageFromPILImage( pil_image )
             
@@ -260,12 +346,25 @@ def GenerateNumPyImageFromPILImage( pil_image: PILImage.Image, strip_useless_alp
     return numpy_image
     
 
-def GeneratePILImage( path: typing.Union[ str, typing.BinaryIO ], dequantize = True ) -> PILImage.Image:
+def GeneratePILImage( path: typing.Union[ str, typing.BinaryIO ], dequantize = True, target_resolution = None ) -> PILImage.Image:
     
     pil_image = HydrusImageOpening.RawOpenPILImage( path )
     
     try:
         
+        if target_resolution is not None:
+            
+            reduction = GetPILImageDecodeReduction( pil_image, target_resolution )
+            
+            if reduction > 1:
+                
+                ( width, height ) = pil_image.size
+                
+                # draft picks the biggest DCT scale that still gives at least this size
+                pil_image.draft( pil_image.mode, ( width // reduction, height // reduction ) )
+                
+            
+        
         pil_image = HydrusImageNormalisation.RotateEXIFPILImage( pil_image )
         
         if dequantize:
@@ -332,9 +431,12 @@ def GeneratePILImageFromNumPyImage( numpy_image: numpy.array ) -> PILImage.Image
     return pil_image
     
 
-def GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime ):
+def GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime, numpy_image = None ):
     
-    numpy_image = GenerateNumPyImage( path, mime )
+    if numpy_image is None:
+        
+        numpy_image = GenerateNumPyImage( path, mime, target_resolution = target_resolution )
+        
     
     thumbnail_numpy_image = ResizeNumPyImage( numpy_image, target_resolution )
     
@@ -447,9 +549,55 @@ def GeneratePNGBytesNumPy( numpy_image ) -> bytes:
         
     
 
-def GetImagePixelHash( path, mime ) -> bytes:
+def GetDecodeReduction( image_resolution, target_resolution ) -> int:
+    
+    # the 1/2, 1/4, or 1/8 we can decode a jpeg at and still be at least as big as the target
+    
+    ( image_width, image_height ) = image_resolution
+    ( target_width, target_height ) = target_resolution
+    
+    ratio = min( image_width / max( 1, target_width ), image_height / max( 1, target_height ) )
+    
+    for reduction in ( 8, 4, 2 ):
+        
+        if ratio >= reduction:
+            
+            return reduction
+            
+        
+    
+    return 1
+    
+
+def GetPILImageDecodeReduction( pil_image: PILImage.Image, target_resolution ) -> int:
+    
+    if pil_image.format != 'JPEG':
+        
+        return 1
+        
+    
+    exif_dict = HydrusImageMetadata.GetEXIFDict( pil_image )
+    
+    EXIF_ORIENTATION = 274
     
-    numpy_image = GenerateNumPyImage( path, mime )
+    if exif_dict is not None and exif_dict.get( EXIF_ORIENTATION, 1 ) in ( 5, 6, 7, 8 ):
+        
+        # the target is the right way up, but the stored image is on its side
+        
+        ( target_width, target_height ) = target_resolution
+        
+        target_resolution = ( target_height, target_width )
+        
+    
+    return GetDecodeReduction( pil_image.size, target_resolution )
+    
+
+def GetImagePixelHash( path, mime, numpy_image = None ) -> bytes:
+    
+    if numpy_image is None:
+        
+        numpy_image = GenerateNumPyImage( path, mime )
+        
     
     return GetImagePixelHashNumPy( numpy_image )
     
@@ -1,8 +1,11 @@
 import collections
+import itertools
 import threading
 import time
 import typing
 
+import numpy
+
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
@@ -20,6 +23,31 @@ MAX_UPDATE_PERIOD = 100000 * 100 # three months or so jej
 MIN_NULLIFICATION_PERIOD = 86400
 MAX_NULLIFICATION_PERIOD = 86400 * 365 * 5
 
+CONTENT_UPDATE_BINARY_BLOCK_JSON = 0
+CONTENT_UPDATE_BINARY_BLOCK_INTEGERS = 1
+CONTENT_UPDATE_BINARY_BLOCK_TUPLES = 2
+CONTENT_UPDATE_BINARY_BLOCK_MAPPINGS = 3
+
+# updates are the only objects we accept in the binary form
+UPDATE_BINARY_SERIALISABLE_TYPES = ( HydrusSerialisable.SERIALISABLE_TYPE_CONTENT_UPDATE, HydrusSerialisable.SERIALISABLE_TYPE_DEFINITIONS_UPDATE )
+
+def CreateUpdateFromNetworkBytes( network_bytes: bytes ):
+    
+    # repository updates can be in the legacy form or, if the client asked for it, the columnar binary form
+    
+    if network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_MAGIC ):
+        
+        return HydrusSerialisable.CreateFromBinaryNetworkBytes( network_bytes, UPDATE_BINARY_SERIALISABLE_TYPES )
+        
+    
+    return HydrusSerialisable.CreateFromNetworkBytes( network_bytes )
+    
+
+def IsPackableInteger( x ):
+    
+    return isinstance( x, int ) and not isinstance( x, bool ) and -2 ** 63 <= x < 2 ** 63
+    
+
 def GenerateDefaultServiceDictionary( service_type ):
     
     # don't store bytes key/value data here until ~version 537
@@ -1517,6 +1545,274 @@ class Content( HydrusSerialisable.SerialisableBase ):
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_CONTENT ] = Content
 
+class ContentUpdateColumnarRows( object ):
+    
+    # rows that came in a binary update. they stay as compact numpy columns until something iterates over them
+    
+    def __iter__( self ):
+        
+        raise NotImplementedError()
+        
+    
+    def __len__( self ):
+        
+        raise NotImplementedError()
+        
+    
+    def GetNumRows( self ):
+        
+        return len( self )
+        
+    
+
+class ContentUpdateColumnarIntegerRows( ContentUpdateColumnarRows ):
+    
+    def __init__( self, integers: numpy.ndarray ):
+        
+        self._integers = integers
+        
+    
+    def __iter__( self ):
+        
+        return iter( self._integers.tolist() )
+        
+    
+    def __len__( self ):
+        
+        return len( self._integers )
+        
+    
+    @staticmethod
+    def CanPack( rows ):
+        
+        return all( ( IsPackableInteger( row ) for row in rows ) )
+        
+    
+    @staticmethod
+    def ReadFromPayload( reader: HydrusSerialisable.BinaryPayloadReader ):
+        
+        return ContentUpdateColumnarIntegerRows( reader.ReadIntegers() )
+        
+    
+    @staticmethod
+    def WriteToPayload( writer: HydrusSerialisable.BinaryPayloadWriter, rows ):
+        
+        writer.AddIntegers( rows )
+        
+    
+
+class ContentUpdateColumnarMappingRows( ContentUpdateColumnarRows ):
+    
+    def __init__( self, tag_ids: numpy.ndarray, counts: numpy.ndarray, hash_ids: numpy.ndarray ):
+        
+        self._tag_ids = tag_ids
+        self._counts = counts
+        self._hash_ids = hash_ids
+        
+    
+    def __iter__( self ):
+        
+        ends = numpy.cumsum( self._counts ).tolist()
+        
+        start = 0
+        
+        for ( tag_id, end ) in zip( self._tag_ids.tolist(), ends ):
+            
+            yield ( tag_id, self._hash_ids[ start : end ].tolist() )
+            
+            start = end
+            
+        
+    
+    def __len__( self ):
+        
+        return len( self._tag_ids )
+        
+    
+    def GetNumRows( self ):
+        
+        return len( self._hash_ids )
+        
+    
+    @staticmethod
+    def CanPack( rows ):
+        
+        for row in rows:
+            
+            if not isinstance( row, ( tuple, list ) ) or len( row ) != 2:
+                
+                return False
+                
+            
+            ( tag_id, hash_ids ) = row
+            
+            if not IsPackableInteger( tag_id ) or not isinstance( hash_ids, ( tuple, list ) ):
+                
+                return False
+                
+            
+            if not all( ( IsPackableInteger( hash_id ) for hash_id in hash_ids ) ):
+                
+                return False
+                
+            
+        
+        return True
+        
+    
+    @staticmethod
+    def ReadFromPayload( reader: HydrusSerialisable.BinaryPayloadReader ):
+        
+        tag_ids = reader.ReadIntegers()
+        counts = reader.ReadIntegers()
+        deltas = reader.ReadSignedIntegers()
+        
+        if len( tag_ids ) != len( counts ) or int( counts.sum() ) != len( deltas ):
+            
+            raise HydrusExceptions.SerialisationException( 'This binary mappings block was malformed!' )
+            
+        
+        running_totals = numpy.cumsum( deltas )
+        
+        starts = numpy.cumsum( counts ) - counts
+        
+        # each row's deltas start again from its first hash_id, so take off whatever the previous rows summed to
+        previous_totals = numpy.concatenate( ( numpy.zeros( 1, dtype = numpy.int64 ), running_totals ) )[ starts ]
+        
+        hash_ids = running_totals - numpy.repeat( previous_totals, counts )
+        
+        return ContentUpdateColumnarMappingRows( tag_ids, counts, hash_ids )
+        
+    
+    @staticmethod
+    def WriteToPayload( writer: HydrusSerialisable.BinaryPayloadWriter, rows ):
+        
+        tag_ids = [ tag_id for ( tag_id, hash_ids ) in rows ]
+        counts = numpy.array( [ len( hash_ids ) for ( tag_id, hash_ids ) in rows ], dtype = numpy.int64 )
+        
+        flat_hash_ids = numpy.fromiter( itertools.chain.from_iterable( ( hash_ids for ( tag_id, hash_ids ) in rows ) ), dtype = numpy.int64, count = int( counts.sum() ) )
+        
+        # we store the gaps between the hash_ids in each row rather than the whole ids. they are usually sorted, so the gaps are small
+        # the order is kept as-is, so the client can rebuild the legacy form byte for byte and check it against the update hash
+        
+        deltas = numpy.diff( flat_hash_ids, prepend = 0 )
+        
+        starts = ( numpy.cumsum( counts ) - counts )[ counts > 0 ]
+        
+        deltas[ starts ] = flat_hash_ids[ starts ]
+        
+        writer.AddIntegers( tag_ids )
+        writer.AddIntegers( counts )
+        writer.AddSignedIntegers( deltas )
+        
+    
+
+class ContentUpdateColumnarTupleRows( ContentUpdateColumnarRows ):
+    
+    def __init__( self, num_rows: int, columns: typing.List[ numpy.ndarray ], null_masks: typing.List[ numpy.ndarray ] ):
+        
+        self._num_rows = num_rows
+        self._columns = columns
+        self._null_masks = null_masks
+        
+    
+    def __iter__( self ):
+        
+        column_lists = []
+        
+        for ( column, null_mask ) in zip( self._columns, self._null_masks ):
+            
+            column_list = column.tolist()
+            
+            for i in numpy.flatnonzero( null_mask ).tolist():
+                
+                column_list[ i ] = None
+                
+            
+            column_lists.append( column_list )
+            
+        
+        return zip( *column_lists )
+        
+    
+    def __len__( self ):
+        
+        return self._num_rows
+        
+    
+    @staticmethod
+    def CanPack( rows ):
+        
+        widths = set()
+        
+        for row in rows:
+            
+            if not isinstance( row, ( tuple, list ) ):
+                
+                return False
+                
+            
+            if not all( ( x is None or IsPackableInteger( x ) for x in row ) ):
+                
+                return False
+                
+            
+            widths.add( len( row ) )
+            
+        
+        return len( widths ) == 1 and 0 not in widths
+        
+    
+    @staticmethod
+    def ReadFromPayload( reader: HydrusSerialisable.BinaryPayloadReader ):
+        
+        num_rows = reader.ReadInteger()
+        width = reader.ReadInteger()
+        
+        columns = []
+        null_masks = []
+        
+        for i in range( width ):
+            
+            column = reader.ReadIntegers()
+            null_mask = reader.ReadIntegers().astype( bool )
+            
+            if len( column ) != num_rows or len( null_mask ) != num_rows:
+                
+                raise HydrusExceptions.SerialisationException( 'This binary row block was malformed!' )
+                
+            
+            columns.append( column )
+            null_masks.append( null_mask )
+            
+        
+        return ContentUpdateColumnarTupleRows( num_rows, columns, null_masks )
+        
+    
+    @staticmethod
+    def WriteToPayload( writer: HydrusSerialisable.BinaryPayloadWriter, rows ):
+        
+        width = len( rows[0] )
+        
+        writer.AddInteger( len( rows ) )
+        writer.AddInteger( width )
+        
+        for i in range( width ):
+            
+            column = [ row[ i ] for row in rows ]
+            
+            writer.AddIntegers( [ 0 if x is None else x for x in column ] )
+            writer.AddIntegers( [ x is None for x in column ] )
+            
+        
+    
+
+CONTENT_UPDATE_BINARY_BLOCK_TYPES_TO_COLUMNAR_CLASSES = {
+    CONTENT_UPDATE_BINARY_BLOCK_INTEGERS : ContentUpdateColumnarIntegerRows,
+    CONTENT_UPDATE_BINARY_BLOCK_TUPLES : ContentUpdateColumnarTupleRows,
+    CONTENT_UPDATE_BINARY_BLOCK_MAPPINGS : ContentUpdateColumnarMappingRows
+}
+
 class ContentUpdate( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_CONTENT_UPDATE
@@ -1549,7 +1845,7 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         
         for ( content_type, actions_to_datas ) in list(self._content_data.items()):
             
-            serialisable_actions_to_datas = list(actions_to_datas.items())
+            serialisable_actions_to_datas = [ ( action, list( data ) ) for ( action, data ) in actions_to_datas.items() ]
             
             serialisable_info.append( ( content_type, serialisable_actions_to_datas ) )
             
@@ -1557,6 +1853,43 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         return serialisable_info
         
     
+    def _InitialiseFromBinaryPayload( self, reader: HydrusSerialisable.BinaryPayloadReader ):
+        
+        num_blocks = reader.ReadInteger()
+        
+        if num_blocks < 0:
+            
+            raise HydrusExceptions.SerialisationException( 'This binary content update was malformed!' )
+            
+        
+        for i in range( num_blocks ):
+            
+            content_type = reader.ReadInteger()
+            action = reader.ReadInteger()
+            block_type = reader.ReadInteger()
+            
+            if block_type == CONTENT_UPDATE_BINARY_BLOCK_JSON:
+                
+                data = reader.ReadJSON()
+                
+            elif block_type in CONTENT_UPDATE_BINARY_BLOCK_TYPES_TO_COLUMNAR_CLASSES:
+                
+                data = CONTENT_UPDATE_BINARY_BLOCK_TYPES_TO_COLUMNAR_CLASSES[ block_type ].ReadFromPayload( reader )
+                
+            else:
+                
+                raise HydrusExceptions.SerialisationException( 'Did not understand content update block type {}!'.format( block_type ) )
+                
+            
+            if content_type not in self._content_data:
+                
+                self._content_data[ content_type ] = {}
+                
+            
+            self._content_data[ content_type ][ action ] = data
+            
+        
+    
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         for ( content_type, serialisable_actions_to_datas ) in serialisable_info:
@@ -1567,6 +1900,46 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def _WriteBinaryPayload( self, writer: HydrusSerialisable.BinaryPayloadWriter ):
+        
+        blocks = [ ( content_type, action, list( data ) ) for ( content_type, actions_to_datas ) in self._content_data.items() for ( action, data ) in actions_to_datas.items() ]
+        
+        writer.AddInteger( len( blocks ) )
+        
+        for ( content_type, action, data ) in blocks:
+            
+            if content_type == HC.CONTENT_TYPE_MAPPINGS and ContentUpdateColumnarMappingRows.CanPack( data ):
+                
+                block_type = CONTENT_UPDATE_BINARY_BLOCK_MAPPINGS
+                
+            elif ContentUpdateColumnarIntegerRows.CanPack( data ):
+                
+                block_type = CONTENT_UPDATE_BINARY_BLOCK_INTEGERS
+                
+            elif ContentUpdateColumnarTupleRows.CanPack( data ):
+                
+                block_type = CONTENT_UPDATE_BINARY_BLOCK_TUPLES
+                
+            else:
+                
+                block_type = CONTENT_UPDATE_BINARY_BLOCK_JSON
+                
+            
+            writer.AddInteger( content_type )
+            writer.AddInteger( action )
+            writer.AddInteger( block_type )
+            
+            if block_type == CONTENT_UPDATE_BINARY_BLOCK_JSON:
+                
+                writer.AddJSON( data )
+                
+            else:
+                
+                CONTENT_UPDATE_BINARY_BLOCK_TYPES_TO_COLUMNAR_CLASSES[ block_type ].WriteToPayload( writer, data )
+                
+            
+        
+    
     def AddRow( self, row ):
         
         ( content_type, action, data ) = row
@@ -1581,6 +1954,11 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
             self._content_data[ content_type ][ action ] = []
             
         
+        if isinstance( self._content_data[ content_type ][ action ], ContentUpdateColumnarRows ):
+            
+            self._content_data[ content_type ][ action ] = list( self._content_data[ content_type ][ action ] )
+            
+        
         self._content_data[ content_type ][ action ].append( data )
         
     
@@ -1639,7 +2017,11 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
                 
                 data = self._content_data[ content_type ][ action ]
                 
-                if content_type == HC.CONTENT_TYPE_MAPPINGS:
+                if isinstance( data, ContentUpdateColumnarRows ):
+                    
+                    num_rows = data.GetNumRows()
+                    
+                elif content_type == HC.CONTENT_TYPE_MAPPINGS:
                     
                     num_rows = sum( ( len( hash_ids ) for ( tag_id, hash_ids ) in data ) )
                     
@@ -1913,6 +2295,39 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def _InitialiseFromBinaryPayload( self, reader: HydrusSerialisable.BinaryPayloadReader ):
+        
+        hash_ids = numpy.cumsum( reader.ReadSignedIntegers() ).tolist()
+        hashes = reader.ReadBytesList()
+        
+        tag_ids = numpy.cumsum( reader.ReadSignedIntegers() ).tolist()
+        tags = [ str( tag, 'utf-8' ) for tag in reader.ReadBytesList() ]
+        
+        if len( hash_ids ) != len( hashes ) or len( tag_ids ) != len( tags ):
+            
+            raise HydrusExceptions.SerialisationException( 'This binary definitions update was malformed!' )
+            
+        
+        self._hash_ids_to_hashes = dict( zip( hash_ids, hashes ) )
+        self._tag_ids_to_tags = dict( zip( tag_ids, tags ) )
+        
+    
+    def _WriteBinaryPayload( self, writer: HydrusSerialisable.BinaryPayloadWriter ):
+        
+        # definitions are usually a contiguous run of ids, so the gaps between them are nearly all 1
+        # we keep them in their original order, so the legacy form can be rebuilt byte for byte
+        
+        hash_ids = list( self._hash_ids_to_hashes.keys() )
+        
+        writer.AddSignedIntegers( numpy.diff( numpy.array( hash_ids, dtype = numpy.int64 ), prepend = 0 ) )
+        writer.AddBytesList( [ self._hash_ids_to_hashes[ hash_id ] for hash_id in hash_ids ] )
+        
+        tag_ids = list( self._tag_ids_to_tags.keys() )
+        
+        writer.AddSignedIntegers( numpy.diff( numpy.array( tag_ids, dtype = numpy.int64 ), prepend = 0 ) )
+        writer.AddBytesList( [ bytes( self._tag_ids_to_tags[ tag_id ], 'utf-8' ) for tag_id in tag_ids ] )
+        
+    
     def AddRow( self, row ):
         
         ( definitions_type, key, value ) = row
@@ -0,0 +1,247 @@
+import bisect
+import threading
+import typing
+
+# always-on request instrumentation. each finished request costs one lock and a handful of bisects, so it is cheap enough to leave running under real load
+
+# fixed bucket upper bounds, as in a prometheus histogram. anything above the last goes in +Inf
+LATENCY_BUCKETS = ( 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0 )
+SIZE_BUCKETS = ( 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456, 1073741824 )
+
+QUANTILES = ( 0.5, 0.95, 0.99 )
+
+STATUS_DISCONNECTED = 'disconnected'
+
+class Histogram( object ):
+    
+    def __init__( self, bucket_bounds ):
+        
+        self._bucket_bounds = bucket_bounds
+        
+        self._bucket_counts = [ 0 ] * ( len( bucket_bounds ) + 1 )
+        self._count = 0
+        self._sum = 0.0
+        
+    
+    def AddValue( self, value ):
+        
+        self._bucket_counts[ bisect.bisect_left( self._bucket_bounds, value ) ] += 1
+        self._count += 1
+        self._sum += value
+        
+    
+    def GetCount( self ):
+        
+        return self._count
+        
+    
+    def GetPrometheusLines( self, name, labels_text ):
+        
+        lines = []
+        
+        cumulative_count = 0
+        
+        for ( bound, bucket_count ) in zip( self._bucket_bounds, self._bucket_counts ):
+            
+            cumulative_count += bucket_count
+            
+            lines.append( '{}_bucket{{{},le="{}"}} {}'.format( name, labels_text, ConvertNumberToPrometheusText( bound ), cumulative_count ) )
+            
+        
+        lines.append( '{}_bucket{{{},le="+Inf"}} {}'.format( name, labels_text, self._count ) )
+        lines.append( '{}_sum{{{}}} {}'.format( name, labels_text, ConvertNumberToPrometheusText( self._sum ) ) )
+        lines.append( '{}_count{{{}}} {}'.format( name, labels_text, self._count ) )
+        
+        return lines
+        
+    
+    def GetQuantile( self, quantile ) -> typing.Optional[ float ]:
+        
+        # estimated by linear interpolation within the bucket the quantile lands in, the same way prometheus's histogram_quantile does it
+        
+        if self._count == 0:
+            
+            return None
+            
+        
+        target = quantile * self._count
+        
+        cumulative_count = 0
+        
+        for ( i, bucket_count ) in enumerate( self._bucket_counts ):
+            
+            if cumulative_count + bucket_count >= target and bucket_count > 0:
+                
+                lower_bound = 0.0 if i == 0 else self._bucket_bounds[ i - 1 ]
+                
+                if i == len( self._bucket_bounds ):
+                    
+                    # we don't know how far past the top bucket it went
+                    return lower_bound
+                    
+                
+                upper_bound = self._bucket_bounds[ i ]
+                
+                return lower_bound + ( upper_bound - lower_bound ) * ( ( target - cumulative_count ) / bucket_count )
+                
+            
+            cumulative_count += bucket_count
+            
+        
+        return self._bucket_bounds[ -1 ]
+        
+    
+
+class EndpointMetrics( object ):
+    
+    def __init__( self ):
+        
+        self.status_counts = {}
+        
+        self.latency = Histogram( LATENCY_BUCKETS )
+        self.db_wait = Histogram( LATENCY_BUCKETS )
+        self.bytes_out = Histogram( SIZE_BUCKETS )
+        
+    
+
+def ConvertNumberToPrometheusText( number ):
+    
+    if number is None:
+        
+        return 'NaN'
+        
+    
+    if isinstance( number, int ):
+        
+        return str( number )
+        
+    
+    return repr( float( number ) )
+    
+
+def EscapeLabelValue( value: str ):
+    
+    return value.replace( '\\', '\\\\' ).replace( '"', '\\"' ).replace( '\n', '\\n' )
+    
+
+metrics_lock = threading.Lock()
+keys_to_endpoint_metrics: typing.Dict[ tuple, EndpointMetrics ] = {}
+
+thread_local_db_wait = threading.local()
+
+def CallTrackingDBWait( request, func, *args, **kwargs ):
+    
+    # any db waits this thread reports while func runs are added to the request
+    
+    previous_db_wait_time = getattr( thread_local_db_wait, 'db_wait_time', None )
+    
+    thread_local_db_wait.db_wait_time = 0.0
+    
+    try:
+        
+        return func( *args, **kwargs )
+        
+    finally:
+        
+        db_wait_time = thread_local_db_wait.db_wait_time
+        
+        request.db_wait_time += db_wait_time
+        
+        thread_local_db_wait.db_wait_time = None if previous_db_wait_time is None else previous_db_wait_time + db_wait_time
+        
+    
+
+def GetPrometheusText() -> str:
+    
+    with metrics_lock:
+        
+        items = sorted( keys_to_endpoint_metrics.items() )
+        
+        requests_lines = []
+        latency_lines = []
+        quantile_lines = []
+        db_wait_lines = []
+        bytes_out_lines = []
+        
+        for ( ( service_name, method, endpoint ), endpoint_metrics ) in items:
+            
+            labels_text = 'service="{}",method="{}",endpoint="{}"'.format( EscapeLabelValue( service_name ), EscapeLabelValue( method ), EscapeLabelValue( endpoint ) )
+            
+            for ( status, count ) in sorted( endpoint_metrics.status_counts.items() ):
+                
+                requests_lines.append( 'hydrus_requests_total{{{},status="{}"}} {}'.format( labels_text, status, count ) )
+                
+            
+            latency_lines.extend( endpoint_metrics.latency.GetPrometheusLines( 'hydrus_request_duration_seconds', labels_text ) )
+            
+            for quantile in QUANTILES:
+                
+                quantile_lines.append( 'hydrus_request_duration_quantile_seconds{{{},quantile="{}"}} {}'.format( labels_text, quantile, ConvertNumberToPrometheusText( endpoint_metrics.latency.GetQuantile( quantile ) ) ) )
+                
+            
+            db_wait_lines.extend( endpoint_metrics.db_wait.GetPrometheusLines( 'hydrus_request_db_wait_seconds', labels_text ) )
+            bytes_out_lines.extend( endpoint_metrics.bytes_out.GetPrometheusLines( 'hydrus_response_size_bytes', labels_text ) )
+            
+        
+    
+    lines = []
+    
+    lines.append( '# HELP hydrus_requests_total Finished requests, by status code.' )
+    lines.append( '# TYPE hydrus_requests_total counter' )
+    lines.extend( requests_lines )
+    
+    lines.append( '# HELP hydrus_request_duration_seconds Time from receiving a request to sending the last byte of its response.' )
+    lines.append( '# TYPE hydrus_request_duration_seconds histogram' )
+    lines.extend( latency_lines )
+    
+    lines.append( '# HELP hydrus_request_duration_quantile_seconds Request duration quantiles, estimated from the histogram buckets.' )
+    lines.append( '# TYPE hydrus_request_duration_quantile_seconds gauge' )
+    lines.extend( quantile_lines )
+    
+    lines.append( '# HELP hydrus_request_db_wait_seconds Time a request spent waiting on the database.' )
+    lines.append( '# TYPE hydrus_request_db_wait_seconds histogram' )
+    lines.extend( db_wait_lines )
+    
+    lines.append( '# HELP hydrus_response_size_bytes Response body bytes sent.' )
+    lines.append( '# TYPE hydrus_response_size_bytes histogram' )
+    lines.extend( bytes_out_lines )
+    
+    return '\n'.join( lines ) + '\n'
+    
+
+def RecordRequest( service_name, method, endpoint, status, duration, db_wait_time, num_bytes_out ):
+    
+    key = ( service_name, method, endpoint )
+    
+    with metrics_lock:
+        
+        if key not in keys_to_endpoint_metrics:
+            
+            keys_to_endpoint_metrics[ key ] = EndpointMetrics()
+            
+        
+        endpoint_metrics = keys_to_endpoint_metrics[ key ]
+        
+        endpoint_metrics.status_counts[ status ] = endpoint_metrics.status_counts.get( status, 0 ) + 1
+        
+        endpoint_metrics.latency.AddValue( duration )
+        endpoint_metrics.db_wait.AddValue( db_wait_time )
+        endpoint_metrics.bytes_out.AddValue( num_bytes_out )
+        
+    
+
+def ReportDBWaitTime( duration ):
+    
+    if getattr( thread_local_db_wait, 'db_wait_time', None ) is not None:
+        
+        thread_local_db_wait.db_wait_time += duration
+        
+    
+
+def ResetMetrics():
+    
+    with metrics_lock:
+        
+        keys_to_endpoint_metrics.clear()
+        
+    
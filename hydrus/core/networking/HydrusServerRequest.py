@@ -19,6 +19,8 @@ class HydrusRequest( Request ):
         self.disconnect_callables = []
         self.preferred_mime = HC.APPLICATION_JSON
         self.disconnected = False
+        self.db_wait_time = 0.0
+        self.num_bytes_out = 0
         
     
     def IsGET( self ):
@@ -5,6 +5,8 @@ import time
 import twisted.internet.error
 from twisted.internet import reactor, defer
 from twisted.internet.threads import deferToThread
+from twisted.python.failure import Failure
+from twisted.web.http import datetimeToString, stringToDatetime
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.resource import Resource
 from twisted.web.static import File as FileResource, NoRangeStaticProducer, SingleRangeStaticProducer, MultipleRangeStaticProducer
@@ -17,7 +19,11 @@ from hydrus.core import HydrusProfiling
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
+from hydrus.core.networking import HydrusServerMetrics
 from hydrus.core.networking import HydrusServerRequest
+from hydrus.core.networking import HydrusServerThreadPools
+
+MAX_NUM_RANGES = 64
 
 def GetServerSummaryTexts( service ):
     
@@ -372,6 +378,22 @@ def GenerateNormieEris( service ):
     )
     
 
+def GenerateETagForDerivedFile( hash: bytes, path: str ) -> str:
+    
+    # thumbnails and so on can be regenerated under the same hash, so we include what is on disk right now
+    
+    try:
+        
+        stat_result = os.stat( path )
+        
+    except OSError:
+        
+        return None # the missing file will be dealt with when we try to send it
+        
+    
+    return '{}-{:x}-{:x}'.format( hash.hex(), stat_result.st_mtime_ns, stat_result.st_size )
+    
+
 hydrus_favicon = FileResource( os.path.join( HC.STATIC_DIR, 'hydrus.ico' ), defaultType = 'image/x-icon' )
 
 class HydrusDomain( object ):
@@ -427,6 +449,8 @@ class HydrusDomain( object ):
     
 class HydrusResource( Resource ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_DEFAULT
+    
     def __init__( self, service, domain ):
         
         Resource.__init__( self )
@@ -461,14 +485,9 @@ class HydrusResource( Resource ):
             return request
             
         
-        if HG.profile_mode:
-            
-            d = deferToThread( self._profileJob, self._threadDoGETJob, request )
-            
-        else:
-            
-            d = deferToThread( self._threadDoGETJob, request )
-            
+        thread_pool = HydrusServerThreadPools.GetThreadPool( self.THREAD_POOL )
+        
+        d = thread_pool.DeferToThread( self._threadDoJob, self._threadDoGETJob, request )
         
         d.addCallback( wrap_thread_result )
         
@@ -484,14 +503,7 @@ class HydrusResource( Resource ):
             return request
             
         
-        if HG.profile_mode:
-            
-            d = deferToThread( self._profileJob, self._threadDoOPTIONSJob, request )
-            
-        else:
-            
-            d = deferToThread( self._threadDoOPTIONSJob, request )
-            
+        d = deferToThread( self._threadDoJob, self._threadDoOPTIONSJob, request )
         
         d.addCallback( wrap_thread_result )
         
@@ -507,14 +519,9 @@ class HydrusResource( Resource ):
             return request
             
         
-        if HG.profile_mode:
-            
-            d = deferToThread( self._profileJob, self._threadDoPOSTJob, request )
-            
-        else:
-            
-            d = deferToThread( self._threadDoPOSTJob, request )
-            
+        thread_pool = HydrusServerThreadPools.GetThreadPool( self.THREAD_POOL )
+        
+        d = thread_pool.DeferToThread( self._threadDoJob, self._threadDoPOSTJob, request )
         
         d.addCallback( wrap_thread_result )
         
@@ -574,16 +581,36 @@ class HydrusResource( Resource ):
             
             filesize = os.path.getsize( path )
             
-            offset_and_block_size_pairs = self._parseRangeHeader( request, filesize )
+            last_modified = int( os.path.getmtime( path ) )
             
         else:
             
-            offset_and_block_size_pairs = []
+            last_modified = None
             
         
         status_code = response_context.GetStatusCode()
         
-        if status_code == 200 and response_context.HasPath() and len( offset_and_block_size_pairs ) > 0:
+        not_modified = False
+        
+        if status_code == 200:
+            
+            not_modified = self._checkNotModified( request, response_context.GetETag(), last_modified )
+            
+        
+        if response_context.HasPath() and not not_modified:
+            
+            offset_and_block_size_pairs = self._parseRangeHeader( request, filesize )
+            
+        else:
+            
+            offset_and_block_size_pairs = []
+            
+        
+        if not_modified:
+            
+            status_code = 304
+            
+        elif status_code == 200 and response_context.HasPath() and len( offset_and_block_size_pairs ) > 0:
             
             status_code = 206
             
@@ -614,7 +641,12 @@ class HydrusResource( Resource ):
             
             request.setHeader( 'Cache-Control', 'max-age={}'.format( max_age ) )
             
-        if response_context.HasPath():
+        if status_code == 304:
+            
+            # the client already has it, so no body or content headers
+            content_length = 0
+            
+        elif response_context.HasPath():
             
             path = response_context.GetPath()
             
@@ -631,6 +663,7 @@ class HydrusResource( Resource ):
             content_disposition = f'{content_disposition_type}; filename="{filename}"'
             
             request.setHeader( 'Content-Disposition', str( content_disposition ) )
+            request.setHeader( 'Accept-Ranges', 'bytes' )
             
             if len( offset_and_block_size_pairs ) <= 1:
                 
@@ -648,12 +681,9 @@ class HydrusResource( Resource ):
                     
                     ( range_start, range_end, offset, block_size ) = offset_and_block_size_pairs[0]
                     
-                    header_range_end = filesize - 1 if range_end is None else range_end
-                    
                     content_length = block_size
                     
-                    request.setHeader( 'Accept-Ranges', 'bytes' )
-                    request.setHeader( 'Content-Range', 'bytes {}-{}/{}'.format( offset, header_range_end, filesize ) )
+                    request.setHeader( 'Content-Range', 'bytes {}-{}/{}'.format( offset, offset + block_size - 1, filesize ) )
                     request.setHeader( 'Content-Length', str( content_length ) )
                     
                     producer = SingleRangeStaticProducer( request, fileObject, offset, block_size )
@@ -661,17 +691,53 @@ class HydrusResource( Resource ):
                 
             else:
                 
-                # hey, what a surprise, an http data transmission standard turned out to be a massive PITA
-                # MultipleRangeStaticProducer is the lad to use, but you have to figure out your own separation bits, which have even more finicky rules. more than I can deal with with the current time I have
-                # if/when you want to do this, check out the FileResource, it does it in its internal gubbins
+                # a multipart/byteranges body, each part with its own little header
+                
+                boundary = os.urandom( 16 ).hex()
+                
+                range_info = []
+                
+                for ( range_start, range_end, offset, block_size ) in offset_and_block_size_pairs:
+                    
+                    part_header = '\r\n--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n'.format( boundary, content_type, offset, offset + block_size - 1, filesize )
+                    
+                    range_info.append( ( bytes( part_header, 'utf-8' ), offset, block_size ) )
+                    
+                
+                closing_bytes = bytes( '\r\n--{}--\r\n'.format( boundary ), 'utf-8' )
+                
+                content_length = sum( ( len( part_header_bytes ) + block_size for ( part_header_bytes, offset, block_size ) in range_info ) ) + len( closing_bytes )
+                
+                request.setHeader( 'Content-Type', 'multipart/byteranges; boundary={}'.format( boundary ) )
+                request.setHeader( 'Content-Length', str( content_length ) )
                 
-                raise HydrusExceptions.RangeNotSatisfiableException( 'Can only support Single Range requests at the moment!' )
+                producer = MultipleRangeStaticProducer( request, fileObject, range_info + [ ( closing_bytes, 0, 0 ) ] )
                 
             
             producer.start()
             
             do_finish = False
             
+        elif response_context.HasBodyGenerator():
+            
+            mime = response_context.GetMime()
+            
+            content_type = HC.mime_mimetype_string_lookup[ mime ]
+            
+            request.setHeader( 'Content-Type', content_type )
+            request.setHeader( 'Content-Disposition', content_disposition_type )
+            
+            # no Content-Length, so twisted will send this chunked. the producer reports the data used when it is done
+            content_length = 0
+            
+            thread_pool = HydrusServerThreadPools.GetThreadPool( self.THREAD_POOL )
+            
+            producer = BodyGeneratorProducer( request, response_context.GetBodyGenerator(), self._reportDataUsed, thread_pool )
+            
+            producer.start()
+            
+            do_finish = False
+            
         elif response_context.HasBody():
             
             mime = response_context.GetMime()
@@ -705,6 +771,8 @@ class HydrusResource( Resource ):
                 
         
         
+        request.num_bytes_out += content_length
+        
         self._reportDataUsed( request, content_length )
         self._reportRequestUsed( request )
         
@@ -714,6 +782,74 @@ class HydrusResource( Resource ):
             
         
     
+    def _checkNotModified( self, request: HydrusServerRequest.HydrusRequest, etag, last_modified ) -> bool:
+        
+        # sets the validators for this response and returns True if the client's copy is still good
+        
+        if etag is not None:
+            
+            request.setHeader( 'ETag', '"{}"'.format( etag ) )
+            
+        
+        if last_modified is not None:
+            
+            request.setHeader( 'Last-Modified', datetimeToString( last_modified ) )
+            
+        
+        if request.method not in ( b'GET', b'HEAD' ):
+            
+            return False
+            
+        
+        if request.requestHeaders.hasHeader( 'If-None-Match' ):
+            
+            # if this is present, If-Modified-Since is ignored
+            
+            if etag is None:
+                
+                return False
+                
+            
+            client_etags = set()
+            
+            for if_none_match in request.requestHeaders.getRawHeaders( 'If-None-Match' ):
+                
+                for client_etag in if_none_match.split( ',' ):
+                    
+                    client_etag = client_etag.strip()
+                    
+                    # weak comparison is correct for If-None-Match
+                    if client_etag.startswith( 'W/' ):
+                        
+                        client_etag = client_etag[2:]
+                        
+                    
+                    client_etags.add( client_etag )
+                    
+                
+            
+            return '*' in client_etags or '"{}"'.format( etag ) in client_etags
+            
+        
+        if last_modified is not None and request.requestHeaders.hasHeader( 'If-Modified-Since' ):
+            
+            if_modified_since = request.requestHeaders.getRawHeaders( 'If-Modified-Since' )[0]
+            
+            try:
+                
+                client_timestamp = stringToDatetime( if_modified_since.encode( 'utf-8' ) )
+                
+            except:
+                
+                return False # a bad date means we just send the whole thing
+                
+            
+            return last_modified <= client_timestamp
+            
+        
+        return False
+        
+    
     def _checkService( self, request: HydrusServerRequest.HydrusRequest ):
         
         return request
@@ -986,7 +1122,12 @@ class HydrusResource( Resource ):
                 raise HydrusExceptions.RangeNotSatisfiableException( 'Did not understand the Range header\'s range pair(s)!' )
                 
             
-            range_pairs = [ range_pair_string.strip().split( '-' ) for range_pair_string in range_pair_strings ]
+            if len( range_pair_strings ) > MAX_NUM_RANGES:
+                
+                raise HydrusExceptions.RangeNotSatisfiableException( 'Too many ranges in the Range header!' )
+                
+            
+            range_pairs = [ range_pair_string.strip().split( '-', 1 ) for range_pair_string in range_pair_strings ]
             
             offset_and_block_size_pairs = []
             
@@ -1020,10 +1161,17 @@ class HydrusResource( Resource ):
                     raise HydrusExceptions.RangeNotSatisfiableException( 'The Range header had an invalid pair!' )
                     
                 
+                if range_start is not None and range_start >= filesize:
+                    
+                    # this one starts past the end, but the others may still be fine
+                    
+                    continue
+                    
+                
                 if range_start is None:
                     
-                    offset = filesize - range_end
-                    block_size = range_end
+                    offset = max( 0, filesize - range_end )
+                    block_size = filesize - offset
                     
                 elif range_end is None:
                     
@@ -1032,14 +1180,7 @@ class HydrusResource( Resource ):
                     
                 else:
                     
-                    if range_start > filesize:
-                        
-                        offset_and_block_size_pairs = []
-                        
-                        break
-                        
-                    
-                    if range_end > filesize:
+                    if range_end >= filesize:
                         
                         range_end = filesize - 1
                         
@@ -1048,9 +1189,44 @@ class HydrusResource( Resource ):
                     block_size = ( range_end + 1 ) - range_start
                     
                 
+                if block_size <= 0:
+                    
+                    continue
+                    
+                
                 offset_and_block_size_pairs.append( ( range_start, range_end, offset, block_size ) )
                 
             
+            if len( offset_and_block_size_pairs ) == 0:
+                
+                request.setHeader( 'Content-Range', 'bytes */{}'.format( filesize ) )
+                
+                raise HydrusExceptions.RangeNotSatisfiableException( 'None of the ranges in the Range header could be satisfied!' )
+                
+            
+            if len( offset_and_block_size_pairs ) > 1:
+                
+                # overlapping or touching ranges are merged, so however the header is written, we send each byte of the file at most once
+                
+                merged_offset_and_end_pairs = []
+                
+                for ( offset, end ) in sorted( ( offset, offset + block_size ) for ( range_start, range_end, offset, block_size ) in offset_and_block_size_pairs ):
+                    
+                    if len( merged_offset_and_end_pairs ) > 0 and offset <= merged_offset_and_end_pairs[-1][1]:
+                        
+                        ( previous_offset, previous_end ) = merged_offset_and_end_pairs[-1]
+                        
+                        merged_offset_and_end_pairs[-1] = ( previous_offset, max( previous_end, end ) )
+                        
+                    else:
+                        
+                        merged_offset_and_end_pairs.append( ( offset, end ) )
+                        
+                    
+                
+                offset_and_block_size_pairs = [ ( offset, end - 1, offset, end - offset ) for ( offset, end ) in merged_offset_and_end_pairs ]
+                
+            
         
         return offset_and_block_size_pairs
         
@@ -1062,6 +1238,26 @@ class HydrusResource( Resource ):
         HG.controller.ReportDataUsed( num_bytes )
         
     
+    def _recordRequestMetrics( self, result, request: HydrusServerRequest.HydrusRequest ):
+        
+        # fires once the last byte of the response has gone out, or the connection drops
+        
+        if isinstance( result, Failure ):
+            
+            status = HydrusServerMetrics.STATUS_DISCONNECTED
+            
+        else:
+            
+            status = str( request.code )
+            
+        
+        endpoint = '/' + '/'.join( ( str( segment, 'utf-8', errors = 'replace' ) for segment in request.prepath ) )
+        
+        duration = HydrusTime.GetNowPrecise() - request.start_time
+        
+        HydrusServerMetrics.RecordRequest( self._service.GetName(), str( request.method, 'utf-8', errors = 'replace' ), endpoint, status, duration, request.db_wait_time, request.num_bytes_out )
+        
+    
     def _reportRequestStarted( self, request: HydrusServerRequest.HydrusRequest ):
         
         pass
@@ -1074,6 +1270,18 @@ class HydrusResource( Resource ):
         HG.controller.ReportRequestUsed()
         
     
+    def _threadDoJob( self, call, request: HydrusServerRequest.HydrusRequest ):
+        
+        if HG.profile_mode:
+            
+            return HydrusServerMetrics.CallTrackingDBWait( request, self._profileJob, call, request )
+            
+        else:
+            
+            return HydrusServerMetrics.CallTrackingDBWait( request, call, request )
+            
+        
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         raise HydrusExceptions.NotFoundException( 'This service does not support that request!' )
@@ -1165,6 +1373,7 @@ class HydrusResource( Resource ):
         d.addErrback( self._errbackHandleProcessingError, request )
         
         request.notifyFinish().addErrback( self._errbackDisconnected, request, d )
+        request.notifyFinish().addBoth( self._recordRequestMetrics, request )
         
         reactor.callLater( 0, d.callback, request )
         
@@ -1186,6 +1395,7 @@ class HydrusResource( Resource ):
         d.addErrback( self._errbackHandleProcessingError, request )
         
         request.notifyFinish().addErrback( self._errbackDisconnected, request, d )
+        request.notifyFinish().addBoth( self._recordRequestMetrics, request )
         
         reactor.callLater( 0, d.callback, request )
         
@@ -1215,6 +1425,7 @@ class HydrusResource( Resource ):
         d.addErrback( self._errbackHandleProcessingError, request )
         
         request.notifyFinish().addErrback( self._errbackDisconnected, request, d )
+        request.notifyFinish().addBoth( self._recordRequestMetrics, request )
         
         reactor.callLater( 0, d.callback, request )
         
@@ -1244,9 +1455,152 @@ class HydrusResourceWelcome( HydrusResource ):
         return response_context
         
     
+class BodyGeneratorProducer( object ):
+    
+    # pulls chunks of a response body off a generator in a worker thread and writes them as they come in
+    # the generator can do slow db work without blocking the reactor, and we back off when the client is slow to read
+    # the chunks are pulled on the resource's own thread pool, so a big stream is held to the same limits as the request that started it
+    
+    def __init__( self, request: HydrusServerRequest.HydrusRequest, body_generator, report_data_used_callable, thread_pool: HydrusServerThreadPools.ResourceThreadPool ):
+        
+        self._request = request
+        self._body_generator = iter( body_generator )
+        self._report_data_used_callable = report_data_used_callable
+        self._thread_pool = thread_pool
+        
+        self._paused = False
+        self._working = False
+        self._stopped = False
+        
+        self._num_bytes_written = 0
+        
+    
+    def _callbackWriteChunk( self, chunk ):
+        
+        self._working = False
+        
+        if self._stopped:
+            
+            self._CloseGenerator()
+            
+            return
+            
+        
+        if chunk is None:
+            
+            self._Finish()
+            
+            return
+            
+        
+        if len( chunk ) > 0:
+            
+            self._request.write( chunk )
+            
+            self._num_bytes_written += len( chunk )
+            self._request.num_bytes_out += len( chunk )
+            
+        
+        self._FetchNextChunk()
+        
+    
+    def _CloseGenerator( self ):
+        
+        close = getattr( self._body_generator, 'close', None )
+        
+        if close is not None:
+            
+            try:
+                
+                close()
+                
+            except:
+                
+                pass
+                
+            
+        
+    
+    def _errbackAbort( self, failure ):
+        
+        self._working = False
+        
+        if self._stopped:
+            
+            return
+            
+        
+        self._stopped = True
+        
+        HydrusData.Print( 'A streamed response failed partway through:' )
+        HydrusData.Print( failure.getTraceback() )
+        
+        self._report_data_used_callable( self._request, self._num_bytes_written )
+        
+        # the status and headers are long gone, so the only honest thing to do is drop the connection before the body looks complete
+        self._request.unregisterProducer()
+        self._request.loseConnection()
+        
+    
+    def _FetchNextChunk( self ):
+        
+        if self._paused or self._working or self._stopped:
+            
+            return
+            
+        
+        self._working = True
+        
+        d = self._thread_pool.DeferContinuationToThread( HydrusServerMetrics.CallTrackingDBWait, self._request, next, self._body_generator, None )
+        
+        d.addCallbacks( self._callbackWriteChunk, self._errbackAbort )
+        
+    
+    def _Finish( self ):
+        
+        self._stopped = True
+        
+        self._report_data_used_callable( self._request, self._num_bytes_written )
+        
+        self._request.unregisterProducer()
+        self._request.finish()
+        
+    
+    def pauseProducing( self ):
+        
+        self._paused = True
+        
+    
+    def resumeProducing( self ):
+        
+        self._paused = False
+        
+        self._FetchNextChunk()
+        
+    
+    def start( self ):
+        
+        self._request.registerProducer( self, True )
+        
+        self._FetchNextChunk()
+        
+    
+    def stopProducing( self ):
+        
+        # the connection went away
+        
+        self._stopped = True
+        
+        if not self._working:
+            
+            self._CloseGenerator()
+            
+        
+    
+
 class ResponseContext( object ):
     
-    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, is_attachment = False, max_age = None ):
+    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, is_attachment = False, max_age = None, body_generator = None, etag = None ):
         
         if body is None:
             
@@ -1276,7 +1630,7 @@ class ResponseContext( object ):
         
         if max_age is None:
             
-            if body is not None:
+            if body is not None or body_generator is not None:
                 
                 max_age = 4
                 
@@ -1289,10 +1643,12 @@ class ResponseContext( object ):
         self._status_code = status_code
         self._mime = mime
         self._body_bytes = body_bytes
+        self._body_generator = body_generator
         self._path = path
         self._cookies = cookies
         self._is_attachment = is_attachment
         self._max_age = max_age
+        self._etag = etag
         
     
     def GetBodyBytes( self ):
@@ -1300,11 +1656,21 @@ class ResponseContext( object ):
         return self._body_bytes
         
     
+    def GetBodyGenerator( self ):
+        
+        return self._body_generator
+        
+    
     def GetCookies( self ):
         
         return self._cookies
         
     
+    def GetETag( self ):
+        
+        return self._etag
+        
+    
     def GetMime( self ):
         
         return self._mime
@@ -1335,6 +1701,11 @@ class ResponseContext( object ):
         return self._body_bytes is not None
         
     
+    def HasBodyGenerator( self ):
+        
+        return self._body_generator is not None
+        
+    
     def HasPath( self ):
         
         return self._path is not None
@@ -0,0 +1,193 @@
+import threading
+import typing
+
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusTime
+
+# resources pick one of these, so a burst of slow requests in one group cannot starve the quick requests in another
+
+THREAD_POOL_DEFAULT = 'default'
+THREAD_POOL_METADATA = 'metadata'
+THREAD_POOL_FILES = 'files'
+THREAD_POOL_WRITES = 'writes'
+THREAD_POOL_RENDERING = 'rendering'
+
+THREAD_POOL_NAMES = ( THREAD_POOL_DEFAULT, THREAD_POOL_METADATA, THREAD_POOL_FILES, THREAD_POOL_WRITES, THREAD_POOL_RENDERING )
+
+# ( max threads, max queue depth ), None queue depth for unlimited
+DEFAULT_THREAD_POOL_LIMITS = {
+    THREAD_POOL_DEFAULT : ( 10, None ),
+    THREAD_POOL_METADATA : ( 8, 64 ),
+    THREAD_POOL_FILES : ( 8, 256 ),
+    THREAD_POOL_WRITES : ( 2, 32 ),
+    THREAD_POOL_RENDERING : ( 2, 16 )
+}
+
+class ResourceThreadPool( object ):
+    
+    def __init__( self, name, max_threads, max_queue_depth ):
+        
+        self._name = name
+        self._max_threads = max_threads
+        self._max_queue_depth = max_queue_depth
+        
+        self._lock = threading.Lock()
+        
+        self._num_active = 0
+        self._num_waiting = 0
+        self._peak_num_outstanding = 0
+        self._num_completed = 0
+        self._num_rejected = 0
+        self._total_wait_time = 0.0
+        self._total_work_time = 0.0
+        
+        self._thread_pool = ThreadPool( minthreads = 0, maxthreads = max_threads, name = 'resource thread pool: {}'.format( name ) )
+        
+        self._thread_pool.start()
+        
+        reactor.addSystemEventTrigger( 'during', 'shutdown', self._thread_pool.stop )
+        
+    
+    def _WorkJob( self, queued_time, func, *args, **kwargs ):
+        
+        started_time = HydrusTime.GetNowPrecise()
+        
+        with self._lock:
+            
+            self._num_waiting -= 1
+            self._num_active += 1
+            
+            self._total_wait_time += started_time - queued_time
+            
+        
+        try:
+            
+            return func( *args, **kwargs )
+            
+        finally:
+            
+            with self._lock:
+                
+                self._num_active -= 1
+                self._num_completed += 1
+                
+                self._total_work_time += HydrusTime.GetNowPrecise() - started_time
+                
+            
+        
+    
+    def DeferContinuationToThread( self, func, *args, **kwargs ):
+        
+        # more work for a request we already let in, like the next chunk of a streamed body
+        # it waits its turn on the same threads, but it is never rejected, since the response has already started
+        
+        with self._lock:
+            
+            self._num_waiting += 1
+            
+            self._peak_num_outstanding = max( self._peak_num_outstanding, self._num_waiting + self._num_active )
+            
+        
+        return deferToThreadPool( reactor, self._thread_pool, self._WorkJob, HydrusTime.GetNowPrecise(), func, *args, **kwargs )
+        
+    
+    def DeferToThread( self, func, *args, **kwargs ):
+        
+        with self._lock:
+            
+            if self._max_queue_depth is not None and self._num_waiting + self._num_active >= self._max_threads + self._max_queue_depth:
+                
+                self._num_rejected += 1
+                
+                raise HydrusExceptions.ServerBusyException( 'This server is busy with other "{}" requests, please try again later.'.format( self._name ) )
+                
+            
+        
+        return self.DeferContinuationToThread( func, *args, **kwargs )
+        
+    
+    def GetMetrics( self ) -> dict:
+        
+        with self._lock:
+            
+            return {
+                'name' : self._name,
+                'max_threads' : self._max_threads,
+                'max_queue_depth' : self._max_queue_depth,
+                'num_active' : self._num_active,
+                'num_waiting' : self._num_waiting,
+                'peak_num_outstanding' : self._peak_num_outstanding,
+                'num_completed' : self._num_completed,
+                'num_rejected' : self._num_rejected,
+                'total_wait_time' : self._total_wait_time,
+                'total_work_time' : self._total_work_time
+            }
+            
+        
+    
+    def ResetMetrics( self ):
+        
+        with self._lock:
+            
+            self._peak_num_outstanding = self._num_waiting + self._num_active
+            self._num_completed = 0
+            self._num_rejected = 0
+            self._total_wait_time = 0.0
+            self._total_work_time = 0.0
+            
+        
+    
+    def SetLimits( self, max_threads, max_queue_depth ):
+        
+        with self._lock:
+            
+            self._max_threads = max_threads
+            self._max_queue_depth = max_queue_depth
+            
+        
+        reactor.callFromThread( self._thread_pool.adjustPoolsize, 0, max_threads )
+        
+    
+
+thread_pools_lock = threading.Lock()
+names_to_thread_pools: typing.Dict[ str, ResourceThreadPool ] = {}
+names_to_thread_pool_limits = dict( DEFAULT_THREAD_POOL_LIMITS )
+
+def GetThreadPool( name ) -> ResourceThreadPool:
+    
+    with thread_pools_lock:
+        
+        if name not in names_to_thread_pools:
+            
+            ( max_threads, max_queue_depth ) = names_to_thread_pool_limits[ name ]
+            
+            names_to_thread_pools[ name ] = ResourceThreadPool( name, max_threads, max_queue_depth )
+            
+        
+        return names_to_thread_pools[ name ]
+        
+    
+
+def GetThreadPoolMetrics() -> typing.List[ dict ]:
+    
+    return [ GetThreadPool( name ).GetMetrics() for name in THREAD_POOL_NAMES ]
+    
+
+def SetThreadPoolLimits( name, max_threads, max_queue_depth ):
+    
+    with thread_pools_lock:
+        
+        names_to_thread_pool_limits[ name ] = ( max_threads, max_queue_depth )
+        
+        thread_pool = names_to_thread_pools.get( name, None )
+        
+    
+    if thread_pool is not None:
+        
+        thread_pool.SetLimits( max_threads, max_queue_depth )
+        
+    
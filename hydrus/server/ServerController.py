@@ -223,6 +223,13 @@ class Controller( HydrusController.HydrusController ):
                     num_files_deleted += 1
                     
                 
+                binary_update_path = ServerFiles.GetExpectedBinaryUpdatePath( file_hash )
+                
+                if os.path.exists( binary_update_path ):
+                    
+                    HydrusPaths.RecyclePath( binary_update_path )
+                    
+                
             
             if thumbnail_hash is not None:
                 
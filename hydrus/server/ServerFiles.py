@@ -1,14 +1,53 @@
 import os
+import threading
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTime
 
+binary_update_lock = threading.Lock()
+
 def GetAllHashes( file_type ):
     
     return { bytes.fromhex( os.path.split( path )[1] ) for path in IterateAllPaths( file_type ) }
     
+def GetBinaryUpdatePath( update_hash ):
+    
+    path = GetExpectedBinaryUpdatePath( update_hash )
+    
+    with binary_update_lock:
+        
+        if not os.path.exists( path ):
+            
+            with open( GetFilePath( update_hash ), 'rb' ) as f:
+                
+                update_network_bytes = f.read()
+                
+            
+            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            
+            temp_path = path + '.tmp'
+            
+            with open( temp_path, 'wb' ) as f:
+                
+                f.write( update.DumpToBinaryNetworkBytes() )
+                
+            
+            # so a request that sees the path always sees the whole thing
+            os.replace( temp_path, path )
+            
+        
+    
+    return path
+    
+def GetExpectedBinaryUpdatePath( update_hash ):
+    
+    # the columnar binary form of an update, cached next to it the first time a client asks for it
+    
+    return GetExpectedFilePath( update_hash ) + '.binary'
+    
 def GetExpectedFilePath( hash ):
     
     files_dir = HG.server_controller.GetFilesDir()
@@ -67,7 +106,11 @@ def IterateAllPaths( file_type ):
         
         for filename in filenames:
             
-            if file_type == 'file' and filename.endswith( '.thumbnail' ):
+            if filename.endswith( '.binary' ) or filename.endswith( '.tmp' ):
+                
+                continue
+                
+            elif file_type == 'file' and filename.endswith( '.thumbnail' ):
                 
                 continue
                 
@@ -15,8 +15,10 @@ from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetwork
 from hydrus.core.networking import HydrusNetworkVariableHandling
 from hydrus.core.networking import HydrusNetworking
+from hydrus.core.networking import HydrusServerMetrics
 from hydrus.core.networking import HydrusServerRequest
 from hydrus.core.networking import HydrusServerResources
+from hydrus.core.networking import HydrusServerThreadPools
 
 from hydrus.server import ServerFiles
 
@@ -1030,6 +1032,8 @@ class HydrusResourceRestrictedRegistrationKeys( HydrusResourceRestricted ):
     
 class HydrusResourceRestrictedRepositoryFile( HydrusResourceRestricted ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _checkAccountPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         # everyone with a functional account can read files
@@ -1069,7 +1073,7 @@ class HydrusResourceRestrictedRepositoryFile( HydrusResourceRestricted ):
         
         path = ServerFiles.GetFilePath( hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, etag = hash.hex() )
         
         return response_context
         
@@ -1094,6 +1098,8 @@ class HydrusResourceRestrictedRepositoryFile( HydrusResourceRestricted ):
     
 class HydrusResourceRestrictedRepositoryThumbnail( HydrusResourceRestricted ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _checkAccountPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         # everyone with a functional account can read thumbs
@@ -1123,7 +1129,23 @@ class HydrusResourceRestrictedRepositoryThumbnail( HydrusResourceRestricted ):
         
         path = ServerFiles.GetThumbnailPath( hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path, etag = HydrusServerResources.GenerateETagForDerivedFile( hash, path ) )
+        
+        return response_context
+        
+    
+class HydrusResourceRestrictedRequestMetrics( HydrusResourceRestricted ):
+    
+    def _checkAccountPermissions( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        request.hydrus_account.CheckPermission( HC.CONTENT_TYPE_SERVICES, HC.PERMISSION_ACTION_MODERATE )
+        
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        body = HydrusServerMetrics.GetPrometheusText()
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.TEXT_PLAIN, body = body )
         
         return response_context
         
@@ -1262,6 +1284,8 @@ class HydrusResourceRestrictedTagFilter( HydrusResourceRestricted ):
 
 class HydrusResourceRestrictedUpdate( HydrusResourceRestricted ):
     
+    THREAD_POOL = HydrusServerThreadPools.THREAD_POOL_FILES
+    
     def _checkAccountPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         # everyone with a functional account can read updates
@@ -1289,7 +1313,18 @@ class HydrusResourceRestrictedUpdate( HydrusResourceRestricted ):
         
         path = ServerFiles.GetFilePath( update_hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
+        if request.parsed_request_args.GetValue( 'binary', int, default_value = 0 ) == 1:
+            
+            # the client can read the columnar binary form. we store the legacy form, since that is what the update hash is of, and transcode it the first time it is asked for
+            
+            binary_update_path = ServerFiles.GetBinaryUpdatePath( update_hash )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = binary_update_path, etag = update_hash.hex() + '-binary' )
+            
+        else:
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path, etag = update_hash.hex() )
+            
         
         return response_context
         
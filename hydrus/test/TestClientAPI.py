@@ -1,13 +1,17 @@
 import hashlib
 import http.client
+import io
 import json
 import os
 import random
+import threading
 import time
 import unittest
 import urllib
 import urllib.parse
 
+from PIL import Image as PILImage
+
 from twisted.internet import reactor
 
 from hydrus.core import HydrusConstants as HC
@@ -19,6 +23,8 @@ from hydrus.core import HydrusTags
 from hydrus.core import HydrusText
 from hydrus.core import HydrusTime
 from hydrus.core.files.images import HydrusImageHandling
+from hydrus.core.networking import HydrusServerMetrics
+from hydrus.core.networking import HydrusServerThreadPools
 
 from hydrus.client import ClientAPI
 from hydrus.client import ClientConstants as CC
@@ -3931,6 +3937,116 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( len( file_search_context.GetPredicates() ), 2 )
         
+        #
+        
+        path = '/manage_database/get_cache_metrics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        cache_metrics = d[ 'cache_metrics' ]
+        
+        self.assertEqual( { metrics[ 'name' ] for metrics in cache_metrics }, { 'thumbnail cache', 'image cache', 'image tile cache', 'encoded image cache' } )
+        
+        for metrics in cache_metrics:
+            
+            self.assertIn( 'hit_rate', metrics )
+            self.assertIn( 'churn_bytes_per_second', metrics )
+            self.assertLessEqual( metrics[ 'size' ], metrics[ 'size_limit' ] )
+            
+        
+        #
+        
+        path = '/manage_database/get_thread_pool_metrics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        thread_pool_metrics = d[ 'thread_pool_metrics' ]
+        
+        self.assertEqual( { metrics[ 'name' ] for metrics in thread_pool_metrics }, { 'default', 'metadata', 'files', 'writes', 'rendering' } )
+        
+        for metrics in thread_pool_metrics:
+            
+            self.assertIn( 'num_rejected', metrics )
+            self.assertGreaterEqual( metrics[ 'num_active' ], 0 )
+            
+        
+        # a full pool says no straight away
+        
+        thread_pool = HydrusServerThreadPools.ResourceThreadPool( 'test', 1, 0 )
+        
+        job_can_finish = threading.Event()
+        
+        thread_pool.DeferToThread( job_can_finish.wait, 5 )
+        
+        with self.assertRaises( HydrusExceptions.ServerBusyException ):
+            
+            thread_pool.DeferToThread( job_can_finish.wait, 5 )
+            
+        
+        # but more work for a request it already let in, like the next chunk of a stream, waits its turn
+        
+        thread_pool.DeferContinuationToThread( lambda: 'chunk' )
+        
+        self.assertEqual( thread_pool.GetMetrics()[ 'num_waiting' ] + thread_pool.GetMetrics()[ 'num_active' ], 2 )
+        
+        job_can_finish.set()
+        
+        self.assertEqual( thread_pool.GetMetrics()[ 'num_rejected' ], 1 )
+        
+        #
+        
+        path = '/manage_database/get_request_metrics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( response.headers[ 'Content-Type' ], 'text/plain' )
+        
+        self.assertIn( '# TYPE hydrus_request_duration_seconds histogram', text )
+        
+        labels_text = 'service="client api",method="GET",endpoint="/manage_database/get_thread_pool_metrics"'
+        
+        self.assertIn( 'hydrus_requests_total{{{},status="200"}} '.format( labels_text ), text )
+        self.assertIn( 'hydrus_request_duration_seconds_bucket{{{},le="+Inf"}} '.format( labels_text ), text )
+        self.assertIn( 'hydrus_request_duration_quantile_seconds{{{},quantile="0.99"}} '.format( labels_text ), text )
+        self.assertIn( 'hydrus_response_size_bytes_count{{{}}} '.format( labels_text ), text )
+        
+        histogram = HydrusServerMetrics.Histogram( ( 1.0, 2.0, 4.0 ) )
+        
+        for value in ( 0.5, 1.5, 1.5, 3.0 ):
+            
+            histogram.AddValue( value )
+            
+        
+        self.assertEqual( histogram.GetQuantile( 0.5 ), 1.5 )
+        self.assertEqual( histogram.GetQuantile( 1.0 ), 4.0 )
+        
     
     def _test_manage_duplicates( self, connection, set_up_permissions ):
         
@@ -4700,6 +4816,45 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( set( hash_ids ), sample_hash_ids )
         
+        # search files and stream the results
+        
+        HG.test_controller.ClearReads( 'file_query_ids' )
+        HG.test_controller.ClearReads( 'hash_ids_to_hashes' )
+        
+        sample_hash_ids = set( random.sample( list( hash_ids ), 3 ) )
+        
+        hash_ids_to_hashes = { hash_id : os.urandom( 32 ) for hash_id in sample_hash_ids }
+        
+        HG.test_controller.SetRead( 'file_query_ids', set( sample_hash_ids ) )
+        
+        HG.test_controller.SetRead( 'hash_ids_to_hashes', hash_ids_to_hashes )
+        
+        tags = [ 'kino', 'green' ]
+        
+        path = '/get_files/search_files?tags={}&return_hashes=true&stream=true'.format( urllib.parse.quote( json.dumps( tags ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( response.getheader( 'Transfer-Encoding' ), 'chunked' )
+        self.assertIsNone( response.getheader( 'Content-Length' ) )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'version' ], HC.CLIENT_API_VERSION )
+        
+        self.assertEqual( set( d[ 'hashes' ] ), { hash.hex() for hash in hash_ids_to_hashes.values() } )
+        self.assertEqual( set( d[ 'file_ids' ] ), sample_hash_ids )
+        
+        self.assertEqual( [ hash_ids_to_hashes[ hash_id ].hex() for hash_id in d[ 'file_ids' ] ], d[ 'hashes' ] )
+        
         # sort
         
         # this just tests if it parses, we don't have a full test for read params yet
@@ -5813,6 +5968,26 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( d, expected_metadata_result )
         
+        # same, streamed
+        
+        path = '/get_files/file_metadata?hashes={}&stream=true'.format( urllib.parse.quote( json.dumps( [ file_ids_to_hashes[ hash_id ].hex() for hash_id in [ 1, 2, 3 ] ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( response.getheader( 'Transfer-Encoding' ), 'chunked' )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d, expected_metadata_result )
+        
         # same but diff order
         
         path = '/get_files/file_metadata?hashes={}'.format( urllib.parse.quote( json.dumps( [ file_ids_to_hashes[ hash_id ].hex() for hash_id in expected_order ] ) ) )
@@ -6068,6 +6243,45 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertIn( 'inline', response.headers[ 'Content-Disposition' ] )
         
+        self.assertEqual( response.headers[ 'ETag' ], '"{}"'.format( hash_hex ) )
+        
+        last_modified = response.headers[ 'Last-Modified' ]
+        
+        # conditional requests
+        
+        for ( conditional_headers, expected_status ) in [
+            ( { 'If-None-Match' : '"{}"'.format( hash_hex ) }, 304 ),
+            ( { 'If-None-Match' : '"abcdef", W/"{}"'.format( hash_hex ) }, 304 ),
+            ( { 'If-None-Match' : '*' }, 304 ),
+            ( { 'If-None-Match' : '"abcdef"' }, 200 ),
+            ( { 'If-Modified-Since' : last_modified }, 304 ),
+            ( { 'If-Modified-Since' : 'Thu, 01 Jan 1998 00:00:00 GMT' }, 200 ),
+            ( { 'If-None-Match' : '"abcdef"', 'If-Modified-Since' : last_modified }, 200 ),
+            ( { 'If-None-Match' : '"{}"'.format( hash_hex ), 'Range' : 'bytes=100-199' }, 304 )
+        ]:
+            
+            conditional_request_headers = dict( headers )
+            conditional_request_headers.update( conditional_headers )
+            
+            connection.request( 'GET', path, headers = conditional_request_headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, expected_status )
+            
+            if expected_status == 304:
+                
+                self.assertEqual( data, b'' )
+                self.assertEqual( response.headers[ 'ETag' ], '"{}"'.format( hash_hex ) )
+                
+            else:
+                
+                self.assertEqual( hashlib.sha256( data ).digest(), hash )
+                
+            
+        
         # succeed with attachment
         
         path = '/get_files/file?file_id={}&download=true'.format( 1 )
@@ -6169,12 +6383,72 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( response.status, 416 )
         
-        # multi range request, not currently supported
+        # multi range request
         
         path = '/get_files/file?file_id={}'.format( 1 )
         
         partial_headers = dict( headers )
-        partial_headers[ 'Range' ] = 'bytes=100-199,300-399'
+        partial_headers[ 'Range' ] = 'bytes=100-199,300-399,-50'
+        
+        with open( file_path, 'rb' ) as f:
+            
+            file_bytes = f.read()
+            
+        
+        filesize = len( file_bytes )
+        
+        expected_parts = [
+            ( 'bytes 100-199/{}'.format( filesize ), file_bytes[ 100 : 200 ] ),
+            ( 'bytes 300-399/{}'.format( filesize ), file_bytes[ 300 : 400 ] ),
+            ( 'bytes {}-{}/{}'.format( filesize - 50, filesize - 1, filesize ), file_bytes[ -50 : ] )
+        ]
+        
+        # overlapping and touching ranges are merged
+        
+        for ( range_header, expected_parts ) in [
+            ( 'bytes=100-199,300-399,-50', expected_parts ),
+            ( 'bytes=300-399,100-149,150-199,120-130,-50', expected_parts ),
+            ( 'bytes=0-99,50-149,{}-'.format( filesize - 50 ), [ ( 'bytes 0-149/{}'.format( filesize ), file_bytes[ : 150 ] ), expected_parts[2] ] )
+        ]:
+            
+            partial_headers[ 'Range' ] = range_header
+            
+            connection.request( 'GET', path, headers = partial_headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, 206 )
+            
+            ( multipart_type, boundary ) = response.headers[ 'Content-Type' ].split( '; boundary=' )
+            
+            self.assertEqual( multipart_type, 'multipart/byteranges' )
+            
+            parts = data.split( bytes( '\r\n--{}'.format( boundary ), 'utf-8' ) )
+            
+            self.assertEqual( parts[0], b'' )
+            self.assertEqual( parts[-1], b'--\r\n' )
+            
+            results = []
+            
+            for part in parts[ 1 : -1 ]:
+                
+                ( part_headers, part_body ) = part.split( b'\r\n\r\n', 1 )
+                
+                part_headers = dict( line.split( ': ', 1 ) for line in str( part_headers, 'utf-8' ).split( '\r\n' ) if line != '' )
+                
+                self.assertEqual( part_headers[ 'Content-Type' ], 'image/png' )
+                
+                results.append( ( part_headers[ 'Content-Range' ], part_body ) )
+                
+            
+            self.assertEqual( results, expected_parts )
+            
+        
+        # a range past the end is dropped and the rest are sent as normal
+        
+        partial_headers[ 'Range' ] = 'bytes=100-199,{}-{}'.format( filesize, filesize + 100 )
         
         connection.request( 'GET', path, headers = partial_headers )
         
@@ -6182,7 +6456,56 @@ class TestClientAPI( unittest.TestCase ):
         
         data = response.read()
         
-        self.assertEqual( response.status, 416 )
+        self.assertEqual( response.status, 206 )
+        
+        self.assertEqual( response.headers[ 'Content-Range' ], 'bytes 100-199/{}'.format( filesize ) )
+        
+        self.assertEqual( data, file_bytes[ 100 : 200 ] )
+        
+        # but if nothing can be satisfied, that's a 416
+        
+        for range_header in ( 'bytes={}-'.format( filesize ), 'bytes={}-{},-0'.format( filesize + 10, filesize + 20 ) ):
+            
+            partial_headers[ 'Range' ] = range_header
+            
+            connection.request( 'GET', path, headers = partial_headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, 416 )
+            
+            self.assertEqual( response.headers[ 'Content-Range' ], 'bytes */{}'.format( filesize ) )
+            
+        
+        # the same range many times over is only sent once
+        
+        partial_headers[ 'Range' ] = 'bytes=' + ','.join( [ '0-' ] * 64 )
+        
+        connection.request( 'GET', path, headers = partial_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 206 )
+        
+        self.assertEqual( response.headers[ 'Content-Range' ], 'bytes 0-{}/{}'.format( filesize - 1, filesize ) )
+        
+        self.assertEqual( data, file_bytes )
+        
+        # and a plain one
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( data, file_bytes )
         
         #
         
@@ -6198,6 +6521,22 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( hashlib.sha256( data ).digest(), thumb_hash )
         
+        thumb_etag = response.headers[ 'ETag' ]
+        
+        self.assertTrue( thumb_etag.startswith( '"{}-'.format( hash_hex ) ) )
+        
+        conditional_request_headers = dict( headers )
+        conditional_request_headers[ 'If-None-Match' ] = thumb_etag
+        
+        connection.request( 'GET', path, headers = conditional_request_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 304 )
+        self.assertEqual( data, b'' )
+        
         #
         
         api_permissions = set_up_permissions[ 'everything' ]
@@ -6248,6 +6587,87 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( hashlib.sha256( data ).digest(), thumb_hash )
         
+        # render
+        
+        path = '/get_files/render?hash={}'.format( hash_hex )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( response.headers[ 'Content-Type' ], HC.mime_mimetype_string_lookup[ HC.IMAGE_PNG ] )
+        
+        original_resolution = PILImage.open( io.BytesIO( data ) ).size
+        
+        #
+        
+        path = '/get_files/render?hash={}&render_format={}&render_quality=80&width=10&height=12'.format( hash_hex, HC.IMAGE_WEBP )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( response.headers[ 'Content-Type' ], HC.mime_mimetype_string_lookup[ HC.IMAGE_WEBP ] )
+        
+        pil_image = PILImage.open( io.BytesIO( data ) )
+        
+        self.assertEqual( pil_image.format, 'WEBP' )
+        self.assertEqual( pil_image.size, ( 10, 12 ) )
+        
+        self.assertIsNotNone( HG.test_controller.GetCache( 'encoded_images' ).GetEncodedImage( hash, ( 10, 12 ), HC.IMAGE_WEBP, 80 ) )
+        
+        # second time comes out of the cache
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        cached_data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( cached_data, data )
+        
+        #
+        
+        path = '/get_files/render?hash={}&render_format={}'.format( hash_hex, HC.IMAGE_JPEG )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        pil_image = PILImage.open( io.BytesIO( data ) )
+        
+        self.assertEqual( pil_image.format, 'JPEG' )
+        self.assertEqual( pil_image.size, original_resolution )
+        
+        # bad requests
+        
+        for args in ( 'width=10', 'width=0&height=10', 'width=21&height=10', 'width=10&height=100000', 'render_format={}'.format( HC.IMAGE_GIF ), 'render_format={}&render_quality=50'.format( HC.IMAGE_PNG ) ):
+            
+            path = '/get_files/render?hash={}&{}'.format( hash_hex, args )
+            
+            connection.request( 'GET', path, headers = headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, 400 )
+            
+        
         # now 404
         
         hash_404 = os.urandom( 32 )
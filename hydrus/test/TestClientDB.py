@@ -1,9 +1,15 @@
+import hashlib
 import os
+import sqlite3
+import threading
 import time
 import unittest
 
+from mock import patch
+
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTime
@@ -12,11 +18,13 @@ from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientDefaults
+from hydrus.client import ClientFiles
 from hydrus.client import ClientFilesPhysical
 from hydrus.client import ClientImageHandling
 from hydrus.client import ClientLocation
 from hydrus.client import ClientServices
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBRepositories
 from hydrus.client.exporting import ClientExportingFiles
 from hydrus.client.gui.pages import ClientGUIManagementController
 from hydrus.client.gui.pages import ClientGUISession
@@ -1391,6 +1399,21 @@ class TestClientDB( unittest.TestCase ):
             
         
     
+    def test_keyframe_timestamps( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = HydrusData.GenerateKey()
+        
+        self.assertEqual( self._read( 'keyframe_timestamps', hash ), None )
+        
+        keyframe_timestamps_us = [ 0, 2002000, 4004000, 6006000, 8008001 ]
+        
+        self._write( 'file_maintenance_clear_jobs', [ ( hash, ClientFiles.REGENERATE_FILE_DATA_JOB_KEYFRAME_INDEX, keyframe_timestamps_us ) ] )
+        
+        self.assertEqual( self._read( 'keyframe_timestamps', hash ), keyframe_timestamps_us )
+        
+    
     def test_hash_status( self ):
         
         TestClientDB._clear_db()
@@ -1596,6 +1619,128 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( mr_num_words, None )
         
     
+    def test_read_replicas( self ):
+        
+        TestClientDB._clear_db()
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        file_import_options = FileImportOptions.FileImportOptions()
+        file_import_options.SetIsDefault( True )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        TestClientDB._db.SetNumReadReplicas( 2 )
+        
+        try:
+            
+            # the main loop commits when it goes idle, after which the replicas can see the import
+            
+            for i in range( 20 ):
+                
+                if not TestClientDB._db._cursor_transaction_wrapper.InTransactionWithWrites():
+                    
+                    break
+                    
+                
+                time.sleep( 0.25 )
+                
+            
+            with open( path, 'rb' ) as f:
+                
+                md5 = hashlib.md5( f.read() ).digest()
+                
+            
+            location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_LOCAL_MEDIA_SERVICE_KEY )
+            tag_context = ClientSearch.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+            
+            file_search_context = ClientSearch.FileSearchContext( location_context = location_context, tag_context = tag_context )
+            
+            # the main loop gets stuck on a slow read. the replicas should keep serving everything they can while it is
+            
+            db = TestClientDB._db
+            
+            main_loop_is_stuck = threading.Event()
+            main_loop_can_continue = threading.Event()
+            
+            get_service_id = db.modules_services.GetServiceId
+            
+            def slow_get_service_id( *args, **kwargs ):
+                
+                main_loop_is_stuck.set()
+                
+                main_loop_can_continue.wait( 30 )
+                
+                return get_service_id( *args, **kwargs )
+                
+            
+            with patch.object( db, '_ReadFromReadReplica', wraps = db._ReadFromReadReplica ) as read_from_read_replica:
+                
+                with patch.object( db.modules_services, 'GetServiceId', side_effect = slow_get_service_id ):
+                    
+                    slow_read_thread = threading.Thread( target = self._read, args = ( 'service_id', CC.COMBINED_LOCAL_MEDIA_SERVICE_KEY ) )
+                    
+                    slow_read_thread.start()
+                    
+                    try:
+                        
+                        self.assertTrue( main_loop_is_stuck.wait( 10 ) )
+                        
+                        for i in range( 5 ):
+                            
+                            hash_ids_to_hashes = self._read( 'hash_ids_to_hashes', hashes = ( hash, ) )
+                            
+                            self.assertEqual( list( hash_ids_to_hashes.values() ), [ hash ] )
+                            
+                            self.assertEqual( self._read( 'hash_ids_to_hashes', hash_ids = list( hash_ids_to_hashes.keys() ) ), hash_ids_to_hashes )
+                            
+                            self.assertEqual( self._read( 'file_hashes', ( hash, ), 'sha256', 'md5' ), { hash : md5 } )
+                            self.assertEqual( self._read( 'file_hashes', ( md5, ), 'md5', 'sha256' ), { md5 : hash } )
+                            
+                            self.assertEqual( set( self._read( 'file_query_ids', file_search_context ) ), set( hash_ids_to_hashes.keys() ) )
+                            
+                            media_result = self._read( 'media_result', hash )
+                            
+                            self.assertEqual( media_result.GetHash(), hash )
+                            self.assertIn( CC.COMBINED_LOCAL_MEDIA_SERVICE_KEY, media_result.GetLocationsManager().GetCurrent() )
+                            
+                            self.assertEqual( self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, file_search_context, search_text = 'c*' ), [] )
+                            
+                        
+                        # all of that happened while the main loop was still stuck
+                        
+                        self.assertTrue( slow_read_thread.is_alive() )
+                        
+                    finally:
+                        
+                        main_loop_can_continue.set()
+                        
+                        slow_read_thread.join()
+                        
+                    
+                
+            
+            replica_actions = [ call.args[1] for call in read_from_read_replica.call_args_list ]
+            
+            for action in ( 'hash_ids_to_hashes', 'file_hashes', 'file_query_ids', 'media_result', 'autocomplete_predicates' ):
+                
+                self.assertEqual( replica_actions.count( action ), 10 if action in ( 'hash_ids_to_hashes', 'file_hashes' ) else 5 )
+                
+            
+        finally:
+            
+            TestClientDB._db.SetNumReadReplicas( 0 )
+            
+        
+    
     def test_mr_bones( self ):
         
         TestClientDB._clear_db()
@@ -2064,3 +2209,64 @@ class TestClientDB( unittest.TestCase ):
             
         
     
+
+class TestRepositoryDefinitionIdCache( unittest.TestCase ):
+    
+    def test_cache( self ):
+        
+        cache = ClientDBRepositories.RepositoryDefinitionIdCache( max_num_pages = 2 )
+        
+        page_size = ClientDBRepositories.RepositoryDefinitionIdCache.PAGE_SIZE
+        
+        self.assertEqual( cache.GetLocalIds( [ 1, 2 ] ), ( {}, { 1, 2 } ) )
+        
+        cache.SetLocalIds( { 1 : 101, 2 : 102, page_size + 5 : 105 } )
+        
+        self.assertEqual( cache.GetLocalIds( [ 1, 2, 3, page_size + 5 ] ), ( { 1 : 101, 2 : 102, page_size + 5 : 105 }, { 3 } ) )
+        
+        # a third page pushes out the least recently used one
+        
+        cache.GetLocalIds( [ 1 ] )
+        
+        cache.SetLocalIds( { page_size * 2 : 200 } )
+        
+        self.assertEqual( cache.GetLocalIds( [ 1, page_size + 5, page_size * 2 ] ), ( { 1 : 101, page_size * 2 : 200 }, { page_size + 5 } ) )
+        
+        cache.Clear()
+        
+        self.assertEqual( cache.GetLocalIds( [ 1 ] ), ( {}, { 1 } ) )
+        
+    
+    def test_rollback_clears( self ):
+        
+        db = sqlite3.connect( ':memory:', isolation_level = None )
+        
+        c = db.cursor()
+        
+        try:
+            
+            cursor_transaction_wrapper = HydrusDBBase.DBCursorTransactionWrapper( c, 30 )
+            
+            modules_repositories = ClientDBRepositories.ClientDBRepositories( c, cursor_transaction_wrapper, None, None, None, None, None, None, None )
+            
+            cursor_transaction_wrapper.BeginImmediate()
+            
+            modules_repositories._GetDefinitionIdCache( 1, HC.CONTENT_TYPE_HASH ).SetLocalIds( { 5 : 50 } )
+            
+            self.assertEqual( modules_repositories._GetDefinitionIdCache( 1, HC.CONTENT_TYPE_HASH ).GetLocalIds( [ 5 ] ), ( { 5 : 50 }, set() ) )
+            
+            cursor_transaction_wrapper.Save()
+            
+            self.assertEqual( modules_repositories._GetDefinitionIdCache( 1, HC.CONTENT_TYPE_HASH ).GetLocalIds( [ 5 ] ), ( { 5 : 50 }, set() ) )
+            
+            cursor_transaction_wrapper.Rollback()
+            
+            self.assertEqual( modules_repositories._GetDefinitionIdCache( 1, HC.CONTENT_TYPE_HASH ).GetLocalIds( [ 5 ] ), ( {}, { 5 } ) )
+            
+        finally:
+            
+            c.close()
+            db.close()
+            
+        
+    
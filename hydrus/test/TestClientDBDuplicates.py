@@ -1,15 +1,19 @@
 import os
+import random
+import sqlite3
 import time
 import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDBBase
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTime
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientLocation
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBSimilarFiles
 from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing.options import FileImportOptions
 from hydrus.client.metadata import ClientContentUpdates
@@ -1108,3 +1112,141 @@ class TestClientDBDuplicates( unittest.TestCase ):
         self._test_dissolve()
         
     
+
+class TestPerceptualHashBitArrayIndex( unittest.TestCase ):
+    
+    def test_search( self ):
+        
+        search_perceptual_hash = os.urandom( 8 )
+        
+        search_int = int.from_bytes( search_perceptual_hash, 'big' )
+        
+        rows = []
+        
+        for i in range( 1, 257 ):
+            
+            # flip i % 12 random bits so we have a spread of distances
+            
+            flip_mask = 0
+            
+            for bit in random.sample( range( 64 ), i % 12 ):
+                
+                flip_mask |= 1 << bit
+                
+            
+            rows.append( ( i, ( search_int ^ flip_mask ).to_bytes( 8, 'big' ) ) )
+            
+        
+        index = ClientDBSimilarFiles.PerceptualHashBitArrayIndex()
+        
+        index.AddPerceptualHashes( rows[ 128 : ] )
+        index.AddPerceptualHashes( rows[ : 128 ] ) # out of order, forces a resort
+        index.AddPerceptualHashes( rows[ : 10 ] ) # already in
+        
+        self.assertEqual( len( index ), 256 )
+        
+        for max_hamming_distance in ( 0, 4, 8, 64 ):
+            
+            expected = { perceptual_hash_id : HydrusData.Get64BitHammingDistance( search_perceptual_hash, perceptual_hash ) for ( perceptual_hash_id, perceptual_hash ) in rows }
+            expected = { perceptual_hash_id : distance for ( perceptual_hash_id, distance ) in expected.items() if distance <= max_hamming_distance }
+            
+            self.assertEqual( index.Search( search_perceptual_hash, max_hamming_distance ), expected )
+            
+            ( result_1, result_2, result_3 ) = index.SearchMany( ( search_perceptual_hash, b'bad', search_perceptual_hash ), max_hamming_distance )
+            
+            self.assertEqual( result_1, expected )
+            self.assertEqual( result_2, {} )
+            self.assertEqual( result_3, expected )
+            
+        
+        removees = { perceptual_hash_id for ( perceptual_hash_id, perceptual_hash ) in rows[ 50 : 100 ] }
+        
+        index.RemovePerceptualHashIds( removees )
+        
+        self.assertEqual( len( index ), 206 )
+        
+        result = index.Search( search_perceptual_hash, 64 )
+        
+        self.assertEqual( set( result.keys() ), { perceptual_hash_id for ( perceptual_hash_id, perceptual_hash ) in rows if perceptual_hash_id not in removees } )
+        
+    
+    def test_rollback_clears( self ):
+        
+        db = sqlite3.connect( ':memory:', isolation_level = None )
+        
+        c = db.cursor()
+        
+        try:
+            
+            cursor_transaction_wrapper = HydrusDBBase.DBCursorTransactionWrapper( c, 30 )
+            
+            modules_similar_files = ClientDBSimilarFiles.ClientDBSimilarFiles( c, cursor_transaction_wrapper, None, None )
+            
+            cursor_transaction_wrapper.BeginImmediate()
+            
+            cursor_transaction_wrapper.Save()
+            
+            index = ClientDBSimilarFiles.PerceptualHashBitArrayIndex()
+            
+            index.AddPerceptualHashes( [ ( 1, os.urandom( 8 ) ) ] )
+            
+            modules_similar_files._perceptual_hash_bit_array_index = index
+            modules_similar_files._perceptual_hash_id_to_vp_tree_node_cache[ 1 ] = ( os.urandom( 8 ), 0, None, None )
+            modules_similar_files._root_node_perceptual_hash_id = 1
+            
+            cursor_transaction_wrapper.Rollback()
+            
+            self.assertIsNone( modules_similar_files._perceptual_hash_bit_array_index )
+            self.assertEqual( modules_similar_files._perceptual_hash_id_to_vp_tree_node_cache, {} )
+            self.assertIsNone( modules_similar_files._root_node_perceptual_hash_id )
+            
+        finally:
+            
+            c.close()
+            db.close()
+            
+        
+    
+
+class TestPerceptualHashMultiIndex( unittest.TestCase ):
+    
+    def test_probes( self ):
+        
+        search_perceptual_hash = os.urandom( 8 )
+        
+        search_int = int.from_bytes( search_perceptual_hash, 'big' )
+        
+        self.assertEqual( len( ClientDBSimilarFiles.GetMultiIndexBlockSubstrings( search_perceptual_hash ) ), 4 )
+        self.assertEqual( ClientDBSimilarFiles.GetMultiIndexBlockSubstrings( b'bad' ), [] )
+        
+        self.assertEqual( len( ClientDBSimilarFiles.GetMultiIndexProbes( search_perceptual_hash, 0 ) ), 4 )
+        self.assertEqual( len( ClientDBSimilarFiles.GetMultiIndexProbes( search_perceptual_hash, 8 ) ), 4 * ( 1 + 16 + 120 ) )
+        
+        for i in range( 256 ):
+            
+            flip_mask = 0
+            
+            for bit in random.sample( range( 64 ), i % 16 ):
+                
+                flip_mask |= 1 << bit
+                
+            
+            perceptual_hash = ( search_int ^ flip_mask ).to_bytes( 8, 'big' )
+            
+            distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, perceptual_hash )
+            
+            block_substrings = set( ClientDBSimilarFiles.GetMultiIndexBlockSubstrings( perceptual_hash ) )
+            
+            for search_radius in range( ClientDBSimilarFiles.MULTI_INDEX_MAX_SEARCH_RADIUS + 1 ):
+                
+                probes = ClientDBSimilarFiles.GetMultiIndexProbes( search_perceptual_hash, search_radius )
+                
+                if distance <= search_radius:
+                    
+                    # pigeonhole, we must never miss a file within the radius
+                    self.assertTrue( len( block_substrings.intersection( probes ) ) > 0 )
+                    
+                
+            
+        
+    
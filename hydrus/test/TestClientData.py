@@ -1,6 +1,196 @@
+import numpy
+import os
+import tempfile
 import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusGlobals as HG
 
 from hydrus.client import ClientConstants as CC
+from hydrus.client.caches import ClientCaches
+from hydrus.client.caches import ClientCachesBase
+
+class FakeCacheableObject( ClientCachesBase.CacheableObject ):
+    
+    def __init__( self, size ):
+        
+        self._size = size
+        
+    
+    def GetEstimatedMemoryFootprint( self ) -> int:
+        
+        return self._size
+        
+    
+    def SetSize( self, size ):
+        
+        self._size = size
+        
+    
+
+class TestDataCache( unittest.TestCase ):
+    
+    def test_budget( self ):
+        
+        data_cache = ClientCachesBase.DataCache( HG.test_controller, 'test cache', 1000 )
+        
+        for i in range( 10 ):
+            
+            data_cache.AddData( i, FakeCacheableObject( 300 ) )
+            
+            metrics = data_cache.GetMetrics()
+            
+            self.assertLessEqual( metrics[ 'size' ], 1000 )
+            
+        
+        self.assertFalse( data_cache.HasData( 6 ) )
+        self.assertTrue( data_cache.HasData( 7 ) )
+        self.assertTrue( data_cache.HasData( 9 ) )
+        
+        # touching 7 makes 8 the oldest
+        
+        self.assertIsNotNone( data_cache.GetIfHasData( 7 ) )
+        
+        data_cache.AddData( 10, FakeCacheableObject( 300 ) )
+        
+        self.assertTrue( data_cache.HasData( 7 ) )
+        self.assertFalse( data_cache.HasData( 8 ) )
+        
+        # a single item bigger than the whole budget is kept, but only on its own
+        
+        data_cache.AddData( 11, FakeCacheableObject( 5000 ) )
+        
+        self.assertTrue( data_cache.HasData( 11 ) )
+        self.assertEqual( data_cache.GetMetrics()[ 'num_items' ], 1 )
+        
+        # growing on access pushes the others out
+        
+        data_cache.Clear()
+        
+        data_cache.AddData( 0, FakeCacheableObject( 300 ) )
+        
+        growing_object = FakeCacheableObject( 300 )
+        
+        data_cache.AddData( 1, growing_object )
+        
+        growing_object.SetSize( 900 )
+        
+        data_cache.GetData( 1 )
+        
+        self.assertFalse( data_cache.HasData( 0 ) )
+        self.assertTrue( data_cache.HasData( 1 ) )
+        
+    
+    def test_metrics( self ):
+        
+        data_cache = ClientCachesBase.DataCache( HG.test_controller, 'test cache', 1000 )
+        
+        data_cache.AddData( 0, FakeCacheableObject( 400 ) )
+        data_cache.AddData( 1, FakeCacheableObject( 400 ) )
+        
+        self.assertIsNotNone( data_cache.GetIfHasData( 0 ) )
+        self.assertIsNotNone( data_cache.GetIfHasData( 1 ) )
+        self.assertIsNotNone( data_cache.GetIfHasData( 1 ) )
+        self.assertIsNone( data_cache.GetIfHasData( 2 ) )
+        
+        data_cache.AddData( 2, FakeCacheableObject( 400 ) )
+        
+        metrics = data_cache.GetMetrics()
+        
+        self.assertEqual( metrics[ 'name' ], 'test cache' )
+        self.assertEqual( metrics[ 'num_items' ], 2 )
+        self.assertEqual( metrics[ 'size' ], 800 )
+        self.assertEqual( metrics[ 'num_hits' ], 3 )
+        self.assertEqual( metrics[ 'num_misses' ], 1 )
+        self.assertEqual( metrics[ 'hit_rate' ], 0.75 )
+        self.assertEqual( metrics[ 'num_evictions' ], 1 )
+        self.assertEqual( metrics[ 'num_bytes_added' ], 1200 )
+        self.assertEqual( metrics[ 'num_bytes_evicted' ], 400 )
+        self.assertGreater( metrics[ 'churn_bytes_per_second' ], 0 )
+        
+        data_cache.ResetMetrics()
+        
+        metrics = data_cache.GetMetrics()
+        
+        self.assertEqual( metrics[ 'num_items' ], 2 )
+        self.assertEqual( metrics[ 'num_hits' ], 0 )
+        self.assertEqual( metrics[ 'num_evictions' ], 0 )
+        self.assertEqual( metrics[ 'churn_bytes_per_second' ], 0 )
+        
+    
+
+
+class TestThumbnailDiskCache( unittest.TestCase ):
+    
+    def test_pack( self ):
+        
+        path = os.path.join( tempfile.mkdtemp(), 'client_thumbnails.pack' )
+        
+        thumbnail_settings = ( 150, 125, 0, 100 )
+        
+        hash_1 = os.urandom( 32 )
+        hash_2 = os.urandom( 32 )
+        
+        numpy_image_1 = numpy.random.randint( 0, 256, size = ( 120, 150, 3 ), dtype = 'uint8' )
+        numpy_image_2 = numpy.random.randint( 0, 256, size = ( 125, 90, 4 ), dtype = 'uint8' )
+        
+        disk_cache = ClientCaches.ThumbnailDiskCache( path, 1024 * 1024, thumbnail_settings )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_1 ) )
+        
+        disk_cache.StoreThumbnail( hash_1, numpy_image_1 )
+        disk_cache.StoreThumbnail( hash_2, numpy_image_2 )
+        
+        self.assertEqual( disk_cache.GetThumbnail( hash_1 ), ( ( 150, 120 ), 3, numpy_image_1.tobytes() ) )
+        self.assertEqual( disk_cache.GetThumbnail( hash_2 ), ( ( 90, 125 ), 4, numpy_image_2.tobytes() ) )
+        
+        disk_cache.DeleteThumbnails( [ hash_1 ] )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_1 ) )
+        
+        disk_cache.Close()
+        
+        # a half-written record on the end gets trimmed
+        
+        with open( path, 'ab' ) as f:
+            
+            f.write( b'broken' )
+            
+        
+        disk_cache = ClientCaches.ThumbnailDiskCache( path, 1024 * 1024, thumbnail_settings )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_1 ) )
+        self.assertEqual( disk_cache.GetThumbnail( hash_2 ), ( ( 90, 125 ), 4, numpy_image_2.tobytes() ) )
+        
+        disk_cache.StoreThumbnail( hash_1, numpy_image_1 )
+        
+        self.assertEqual( disk_cache.GetThumbnail( hash_1 ), ( ( 150, 120 ), 3, numpy_image_1.tobytes() ) )
+        
+        # new thumbnail settings clear it
+        
+        disk_cache.SetThumbnailSettings( ( 200, 200, 0, 100 ) )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_2 ) )
+        
+        disk_cache.StoreThumbnail( hash_2, numpy_image_2 )
+        
+        disk_cache.Close()
+        
+        disk_cache = ClientCaches.ThumbnailDiskCache( path, 1024 * 1024, thumbnail_settings )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_2 ) )
+        
+        # going over the size limit clears it
+        
+        disk_cache.SetSizeLimit( 60000 )
+        
+        disk_cache.StoreThumbnail( hash_1, numpy_image_1 )
+        disk_cache.StoreThumbnail( hash_2, numpy_image_2 )
+        
+        self.assertIsNone( disk_cache.GetThumbnail( hash_1 ) )
+        self.assertEqual( disk_cache.GetThumbnail( hash_2 ), ( ( 90, 125 ), 4, numpy_image_2.tobytes() ) )
+        
+        disk_cache.Close()
+        
+    
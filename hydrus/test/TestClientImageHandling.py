@@ -1,10 +1,14 @@
+import concurrent.futures
 import os
 import unittest
 
 from hydrus.core import HydrusConstants as HC
+from hydrus.core.files.images import HydrusImageHandling
 
 from hydrus.client import ClientConstants as CC
+from hydrus.client import ClientGlobals as CG
 from hydrus.client import ClientImageHandling
+from hydrus.client.importing import ClientImportFiles
 
 class TestImageHandling( unittest.TestCase ):
     
@@ -22,3 +26,71 @@ class TestImageHandling( unittest.TestCase ):
         
         self.assertEqual( perceptual_hashes, set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
         
+    
+    def test_reduced_decode( self ):
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_jpg.jpg' )
+        
+        self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_JPEG ).shape, ( 498, 392, 3 ) )
+        
+        for force_pil in ( False, True ):
+            
+            self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_JPEG, force_pil = force_pil, target_resolution = ( 150, 125 ) ).shape, ( 249, 196, 3 ) )
+            self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_JPEG, force_pil = force_pil, target_resolution = ( 40, 40 ) ).shape, ( 63, 49, 3 ) )
+            self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_JPEG, force_pil = force_pil, target_resolution = ( 300, 300 ) ).shape, ( 498, 392, 3 ) )
+            
+        
+        # pngs have no reduced decode, so they come back full size
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_png.png' )
+        
+        self.assertEqual( HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_PNG, target_resolution = ( 10, 10 ) ).shape, HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_PNG ).shape )
+        
+    
+
+class TestImportInfo( unittest.TestCase ):
+    
+    def test_worker_process( self ):
+        
+        thumbnail_settings = ( ( 150, 125 ), CG.client_controller.new_options.GetInteger( 'thumbnail_scale_type' ), 100, 35 )
+        
+        file_import_worker_pool = ClientImportFiles.FileImportWorkerPool()
+        
+        CG.client_controller.new_options.SetInteger( 'file_import_worker_processes', 1 )
+        
+        try:
+            
+            self.assertTrue( file_import_worker_pool.IsActive() )
+            
+            for ( filename, mime ) in [ ( 'muh_jpg.jpg', HC.IMAGE_JPEG ), ( 'muh_png.png', HC.IMAGE_PNG ) ]:
+                
+                path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+                
+                import_info = ClientImportFiles.GenerateImportInfo( path, mime, thumbnail_settings, False )
+                
+                future = file_import_worker_pool.SubmitGenerateImportInfo( path, mime, thumbnail_settings, False )
+                
+                self.assertEqual( future.result( timeout = 60 ), import_info )
+                
+            
+            # kill the worker. the pool is now broken, and the next submit should start a new one
+            
+            with self.assertRaises( concurrent.futures.BrokenExecutor ):
+                
+                file_import_worker_pool._GetExecutor( 1 ).submit( os._exit, 1 ).result( timeout = 60 )
+                
+            
+            future = file_import_worker_pool.SubmitGenerateImportInfo( path, mime, thumbnail_settings, True )
+            
+            self.assertEqual( future.result( timeout = 60 ), ClientImportFiles.GenerateImportInfo( path, mime, thumbnail_settings, True ) )
+            
+        finally:
+            
+            CG.client_controller.new_options.SetInteger( 'file_import_worker_processes', 0 )
+            
+            file_import_worker_pool.Shutdown()
+            
+        
+        self.assertFalse( file_import_worker_pool.IsActive() )
+        
+    
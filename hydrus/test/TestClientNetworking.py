@@ -1,3 +1,6 @@
+import hashlib
+import os
+import threading
 import time
 import unittest
 
@@ -8,6 +11,7 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetworking
 
@@ -553,9 +557,9 @@ class TestNetworkingEngine( unittest.TestCase ):
     
 class TestNetworkingJob( unittest.TestCase ):
     
-    def _GetJob( self, for_login = False ):
+    def _GetJob( self, for_login = False, temp_path = None ):
         
-        job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL )
+        job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL, temp_path = temp_path )
         
         job.SetForLogin( for_login )
         
@@ -760,6 +764,49 @@ class TestNetworkingJob( unittest.TestCase ):
         pass
         
     
+    def test_hash_while_downloading( self ):
+        
+        ( os_file_handle, temp_path ) = HydrusTemp.GetTempPath()
+        
+        try:
+            
+            with HTTMock( catch_all ):
+                
+                with HTTMock( catch_wew_ok ):
+                    
+                    job = self._GetJob( temp_path = temp_path )
+                    
+                    job.Start()
+                    
+                    self.assertFalse( job.HasError() )
+                    
+                    self.assertEqual( job.GetDownloadedFileHashes(), None )
+                    
+                    job = self._GetJob( temp_path = temp_path )
+                    
+                    job.SetHashWhileDownloading( True )
+                    
+                    job.Start()
+                    
+                    self.assertFalse( job.HasError() )
+                    
+                    expected_hashes = tuple( ( hashlib.new( name, GOOD_RESPONSE ).digest() for name in ( 'sha256', 'md5', 'sha1', 'sha512' ) ) )
+                    
+                    self.assertEqual( job.GetDownloadedFileHashes(), expected_hashes )
+                    
+                    with open( temp_path, 'rb' ) as f:
+                        
+                        self.assertEqual( f.read(), GOOD_RESPONSE )
+                        
+                    
+                
+            
+        finally:
+            
+            HydrusTemp.CleanUpTempPath( os_file_handle, temp_path )
+            
+        
+    
     def test_needs_login( self ):
         
         # test for both normal and login
@@ -922,3 +969,128 @@ class TestNetworkingJobHydrus( unittest.TestCase ):
         pass
         
     
+
+class TestRepositoryUpdateLoader( unittest.TestCase ):
+    
+    def _GetLoader( self, update_hashes, bad_update_hashes = None ):
+        
+        if bad_update_hashes is None:
+            
+            bad_update_hashes = set()
+            
+        
+        test = self
+        
+        class TestLoader( ClientServices.RepositoryUpdateLoader ):
+            
+            def __init__( self, *args, **kwargs ):
+                
+                self.loaded_update_hashes = []
+                self.release_event = threading.Event()
+                
+                ClientServices.RepositoryUpdateLoader.__init__( self, *args, **kwargs )
+                
+            
+            def _LoadUpdate( self, update_hash, mime ):
+                
+                self.loaded_update_hashes.append( update_hash )
+                
+                test.assertTrue( self.release_event.wait( 10 ) )
+                
+                if update_hash in bad_update_hashes:
+                    
+                    raise HydrusExceptions.SerialisationException( 'bad update' )
+                    
+                
+                return 'update ' + update_hash.hex()
+                
+            
+        
+        return TestLoader( [ ( update_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) for update_hash in update_hashes ] )
+        
+    
+    def test_order_and_cap( self ):
+        
+        update_hashes = [ os.urandom( 32 ) for i in range( 6 ) ]
+        
+        loader = self._GetLoader( update_hashes )
+        
+        try:
+            
+            # nothing is loaded until we ask
+            
+            self.assertEqual( loader.loaded_update_hashes, [] )
+            
+            loader.release_event.set()
+            
+            for ( i, update_hash ) in enumerate( update_hashes ):
+                
+                self.assertEqual( loader.GetUpdate( update_hash ), 'update ' + update_hash.hex() )
+                
+                # the one we just got, plus no more than the cap waiting behind it, loaded or not
+                
+                self.assertLessEqual( len( loader._pending ), ClientServices.RepositoryUpdateLoader.MAX_NUM_UPDATES_AHEAD )
+                self.assertEqual( loader._next_index, min( len( update_hashes ), i + 1 + ClientServices.RepositoryUpdateLoader.MAX_NUM_UPDATES_AHEAD ) )
+                
+            
+            self.assertEqual( sorted( loader.loaded_update_hashes ), sorted( update_hashes ) )
+            
+        finally:
+            
+            loader.Shutdown()
+            
+        
+    
+    def test_cap_counts_unfinished_loads( self ):
+        
+        update_hashes = [ os.urandom( 32 ) for i in range( 6 ) ]
+        
+        loader = self._GetLoader( update_hashes )
+        
+        try:
+            
+            loader._TopUp()
+            loader._TopUp()
+            
+            # none of these have finished, but they still count
+            
+            self.assertEqual( len( loader._pending ), ClientServices.RepositoryUpdateLoader.MAX_NUM_UPDATES_AHEAD )
+            
+        finally:
+            
+            loader.release_event.set()
+            
+            loader.Shutdown()
+            
+        
+    
+    def test_errors( self ):
+        
+        update_hashes = [ os.urandom( 32 ) for i in range( 3 ) ]
+        
+        loader = self._GetLoader( update_hashes, bad_update_hashes = { update_hashes[1] } )
+        
+        try:
+            
+            loader.release_event.set()
+            
+            with self.assertRaises( Exception ):
+                
+                loader.GetUpdate( update_hashes[1] )
+                
+            
+            self.assertEqual( loader.GetUpdate( update_hashes[0] ), 'update ' + update_hashes[0].hex() )
+            
+            with self.assertRaises( HydrusExceptions.SerialisationException ):
+                
+                loader.GetUpdate( update_hashes[1] )
+                
+            
+            self.assertEqual( loader.GetUpdate( update_hashes[2] ), 'update ' + update_hashes[2].hex() )
+            
+        finally:
+            
+            loader.Shutdown()
+            
+        
+    
@@ -63,6 +63,7 @@ from hydrus.test import TestClientTags
 from hydrus.test import TestClientThreading
 from hydrus.test import TestDialogs
 from hydrus.test import TestHydrusData
+from hydrus.test import TestHydrusDBBase
 from hydrus.test import TestHydrusNATPunch
 from hydrus.test import TestHydrusNetworking
 from hydrus.test import TestHydrusPaths
@@ -71,6 +72,7 @@ from hydrus.test import TestHydrusServer
 from hydrus.test import TestHydrusSessions
 from hydrus.test import TestHydrusTags
 from hydrus.test import TestHydrusTime
+from hydrus.test import TestHydrusVideoHandling
 from hydrus.test import TestServerDB
 
 DB_DIR = None
@@ -286,6 +288,8 @@ class Controller( object ):
         self.services_manager = ClientServices.ServicesManager( self )
         self.client_files_manager = ClientFiles.ClientFilesManager( self )
         
+        self.file_import_worker_pool = ClientImportFiles.FileImportWorkerPool()
+        
         self.parsing_cache = ClientCaches.ParsingCache()
         
         bandwidth_manager = ClientNetworkingBandwidth.NetworkBandwidthManager()
@@ -308,6 +312,7 @@ class Controller( object ):
         
         self._caches[ 'images' ] = ClientCaches.ImageRendererCache( self )
         self._caches[ 'image_tiles' ] = ClientCaches.ImageTileCache( self )
+        self._caches[ 'encoded_images' ] = ClientCaches.EncodedImageCache( self )
         self._caches[ 'thumbnail' ] = ClientCaches.ThumbnailCache( self )
         
         self.server_session_manager = HydrusSessions.HydrusSessionManagerServer()
@@ -789,6 +794,7 @@ class Controller( object ):
             TestServerDB,
             TestClientDBDuplicates,
             TestClientDBTags,
+            TestHydrusDBBase,
             TestHydrusData,
             TestHydrusPaths,
             TestHydrusTime,
@@ -797,6 +803,7 @@ class Controller( object ):
             TestHydrusNetworking,
             TestClientImportSubscriptions,
             TestClientImageHandling,
+            TestHydrusVideoHandling,
             TestClientMetadataMigration,
             TestClientMigration,
             TestHydrusTags,
@@ -851,7 +858,8 @@ class Controller( object ):
         
         module_lookup[ 'db' ] = [
             TestClientDB,
-            TestServerDB
+            TestServerDB,
+            TestHydrusDBBase
         ]
         
         module_lookup[ 'db_duplicates' ] = [
@@ -879,6 +887,10 @@ class Controller( object ):
             TestClientImageHandling
         ]
         
+        module_lookup[ 'video' ] = [
+            TestHydrusVideoHandling
+        ]
+        
         module_lookup[ 'metadata_migration' ] = [
             TestClientMetadataMigration
         ]
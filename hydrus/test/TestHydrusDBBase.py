@@ -0,0 +1,115 @@
+import os
+import random
+import sqlite3
+import time
+import unittest
+
+from hydrus.core import HydrusData
+from hydrus.core import HydrusDBBase
+
+class TestTemporaryIntegerTable( unittest.TestCase ):
+    
+    @classmethod
+    def setUpClass( cls ):
+        
+        cls._db = sqlite3.connect( ':memory:', isolation_level = None )
+        
+        cls._c = cls._db.cursor()
+        
+        cls._c.execute( 'ATTACH ":memory:" AS mem;' )
+        
+        cls._temporary_integer_table_name_cache = HydrusDBBase.TemporaryIntegerTableNameCache( register_instance = False )
+        
+    
+    @classmethod
+    def tearDownClass( cls ):
+        
+        cls._c.close()
+        cls._db.close()
+        
+    
+    def test_bulk_insert( self ):
+        
+        if not HydrusDBBase.CanBulkInsertIntegers( self._c ):
+            
+            self.skipTest( 'This sqlite has no json_each.' )
+            
+        
+        for integers in ( set(), { 1 }, set( range( 1, 1001 ) ), set( random.sample( range( 1, 10 ** 12 ), 1000 ) ), { -( 2 ** 63 ), -1, 0, 2 ** 63 - 1 } ):
+            
+            results = []
+            
+            for insert_call in ( HydrusDBBase.InsertIntegers, HydrusDBBase.InsertIntegersBulk ):
+                
+                self._c.execute( 'CREATE TABLE mem.temp_insert_test ( hash_id INTEGER PRIMARY KEY );' )
+                
+                insert_call( self._c, 'mem.temp_insert_test', 'hash_id', integers )
+                
+                results.append( self._c.execute( 'SELECT hash_id, typeof( hash_id ) FROM mem.temp_insert_test ORDER BY hash_id;' ).fetchall() )
+                
+                self._c.execute( 'DROP TABLE mem.temp_insert_test;' )
+                
+            
+            ( executemany_result, json_each_result ) = results
+            
+            self.assertEqual( json_each_result, executemany_result )
+            self.assertEqual( json_each_result, [ ( i, 'integer' ) for i in sorted( integers ) ] )
+            
+        
+    
+    @unittest.skipUnless( os.environ.get( 'HYDRUS_BENCHMARK' ), 'Set HYDRUS_BENCHMARK to run the benchmarks.' )
+    def test_bulk_insert_benchmark( self ):
+        
+        if not HydrusDBBase.CanBulkInsertIntegers( self._c ):
+            
+            self.skipTest( 'This sqlite has no json_each.' )
+            
+        
+        for num_ids in ( 1000, 100000, 5000000 ):
+            
+            integers = set( random.sample( range( num_ids * 10 ), num_ids ) )
+            
+            results = {}
+            
+            for ( name, insert_call ) in ( ( 'executemany', HydrusDBBase.InsertIntegers ), ( 'json_each', HydrusDBBase.InsertIntegersBulk ) ):
+                
+                self._c.execute( 'CREATE TABLE mem.temp_benchmark ( hash_id INTEGER PRIMARY KEY );' )
+                
+                started = time.perf_counter()
+                
+                insert_call( self._c, 'mem.temp_benchmark', 'hash_id', integers )
+                
+                time_took = time.perf_counter() - started
+                
+                results[ name ] = time_took
+                
+                ( count, ) = self._c.execute( 'SELECT COUNT( * ) FROM mem.temp_benchmark;' ).fetchone()
+                
+                self.assertEqual( count, num_ids )
+                
+                self._c.execute( 'DROP TABLE mem.temp_benchmark;' )
+                
+            
+            HydrusData.Print( 'temp integer table, {} ids: executemany {:.3f}s, json_each {:.3f}s'.format( HydrusData.ToHumanInt( num_ids ), results[ 'executemany' ], results[ 'json_each' ] ) )
+            
+        
+    
+    def test_table( self ):
+        
+        for num_ids in ( 0, 5, HydrusDBBase.BULK_INTEGER_INSERT_THRESHOLD, 10000 ):
+            
+            integers = set( range( 1, num_ids + 1 ) )
+            
+            with HydrusDBBase.TemporaryIntegerTable( self._c, integers, 'hash_id', temporary_integer_table_name_cache = self._temporary_integer_table_name_cache ) as temp_table_name:
+                
+                result = { hash_id for ( hash_id, ) in self._c.execute( 'SELECT hash_id FROM {};'.format( temp_table_name ) ) }
+                
+                self.assertEqual( result, integers )
+                
+            
+            ( count, ) = self._c.execute( 'SELECT COUNT( * ) FROM {};'.format( temp_table_name ) ).fetchone()
+            
+            self.assertEqual( count, 0 )
+            
+        
+    
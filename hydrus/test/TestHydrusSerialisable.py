@@ -1,10 +1,14 @@
 import unittest
+import zlib
 
+from hydrus.core import HydrusCompression
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusTime
+from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientApplicationCommand as CAC
 from hydrus.client import ClientConstants as CC
@@ -158,6 +162,118 @@ class TestSerialisables( unittest.TestCase ):
             
         
     
+    def test_SERIALISABLE_TYPE_CONTENT_UPDATE( self ):
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( dupe_obj.GetNumRows(), obj.GetNumRows() )
+            
+            self.assertEqual( [ ( tag_id, list( hash_ids ) ) for ( tag_id, hash_ids ) in dupe_obj.GetNewMappings() ], [ ( tag_id, list( hash_ids ) ) for ( tag_id, hash_ids ) in obj.GetNewMappings() ] )
+            self.assertEqual( [ tuple( row ) for row in dupe_obj.GetNewFiles() ], [ tuple( row ) for row in obj.GetNewFiles() ] )
+            self.assertEqual( list( dupe_obj.GetDeletedFiles() ), list( obj.GetDeletedFiles() ) )
+            self.assertEqual( [ tuple( row ) for row in dupe_obj.GetNewTagParents() ], [ tuple( row ) for row in obj.GetNewTagParents() ] )
+            self.assertEqual( [ tuple( row ) for row in dupe_obj.GetDeletedTagSiblings() ], [ tuple( row ) for row in obj.GetDeletedTagSiblings() ] )
+            
+        
+        content_update = HydrusNetwork.ContentUpdate()
+        
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 5, [ 300, 2, 70000, 1 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 6, [] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 2 ** 40, [ 2 ** 40, 3 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 1, 65536, HC.IMAGE_PNG, 1700000000, 640, 480, None, None, None ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 2, 1048576, HC.VIDEO_WEBM, 1700000001, 1920, 1080, 30000, 900, None ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, 3 ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 7, 8 ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, ( 'not an id', 8 ) ) )
+        
+        self._dump_and_load_and_test( content_update, test )
+        
+        network_bytes = content_update.DumpToBinaryNetworkBytes()
+        
+        self.assertTrue( network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_MAGIC ) )
+        
+        dupe_content_update = HydrusNetwork.CreateUpdateFromNetworkBytes( network_bytes )
+        
+        test( content_update, dupe_content_update )
+        
+        self.assertEqual( list( dupe_content_update.GetNewMappings() ), [ ( 5, [ 300, 2, 70000, 1 ] ), ( 6, [] ), ( 2 ** 40, [ 2 ** 40, 3 ] ) ] )
+        self.assertEqual( dupe_content_update.GetNumRows( ( HC.CONTENT_TYPE_MAPPINGS, ) ), 6 )
+        
+        # and it can go back to json, byte for byte, so a client can check it against the update hash
+        
+        test( content_update, HydrusSerialisable.CreateFromString( dupe_content_update.DumpToString() ) )
+        
+        self.assertEqual( dupe_content_update.DumpToNetworkBytes(), content_update.DumpToNetworkBytes() )
+        
+        legacy_content_update = HydrusSerialisable.CreateFromNetworkBytes( content_update.DumpToNetworkBytes() )
+        
+        self.assertEqual( HydrusNetwork.CreateUpdateFromNetworkBytes( legacy_content_update.DumpToBinaryNetworkBytes() ).DumpToNetworkBytes(), content_update.DumpToNetworkBytes() )
+        
+        with self.assertRaises( HydrusExceptions.SerialisationException ):
+            
+            HydrusNetwork.CreateUpdateFromNetworkBytes( network_bytes[ : 20 ] )
+            
+        
+        # the binary form is only for the update path
+        
+        with self.assertRaises( HydrusExceptions.SerialisationException ):
+            
+            HydrusSerialisable.CreateFromNetworkBytes( network_bytes )
+            
+        
+        def make_binary_network_bytes( serialisable_type, version, payload ):
+            
+            header = HydrusSerialisable.BINARY_NETWORK_BYTES_HEADER.pack( HydrusSerialisable.BINARY_NETWORK_BYTES_VERSION, serialisable_type, version, HydrusCompression.COMPRESSION_CODEC_ZLIB )
+            
+            return HydrusSerialisable.BINARY_NETWORK_BYTES_MAGIC + header + zlib.compress( payload )
+            
+        
+        for serialisable_type in ( HydrusSerialisable.SERIALISABLE_TYPE_CONTENT, HydrusSerialisable.SERIALISABLE_TYPE_ACCOUNT_TYPE ):
+            
+            with self.assertRaises( HydrusExceptions.SerialisationException ):
+                
+                HydrusNetwork.CreateUpdateFromNetworkBytes( make_binary_network_bytes( serialisable_type, 1, b'' ) )
+                
+            
+        
+        for payload in ( b'', b'\xff' * 64, network_bytes[ 20 : ] ):
+            
+            with self.assertRaises( HydrusExceptions.SerialisationException ):
+                
+                HydrusNetwork.CreateUpdateFromNetworkBytes( make_binary_network_bytes( HydrusSerialisable.SERIALISABLE_TYPE_CONTENT_UPDATE, HydrusNetwork.ContentUpdate.SERIALISABLE_VERSION, payload ) )
+                
+            
+        
+    
+    def test_SERIALISABLE_TYPE_DEFINITIONS_UPDATE( self ):
+        
+        def test( obj, dupe_obj ):
+            
+            self.assertEqual( dupe_obj.GetHashIdsToHashes(), obj.GetHashIdsToHashes() )
+            self.assertEqual( dupe_obj.GetTagIdsToTags(), obj.GetTagIdsToTags() )
+            
+        
+        definitions_update = HydrusNetwork.DefinitionsUpdate()
+        
+        for i in range( 100, 200 ):
+            
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, i, 'series:test ' + str( i ) ) )
+            definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, i + 500, HydrusData.GenerateKey() ) )
+            
+        
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 1000, 'character:r\u00e9mi' ) )
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 50, 'out of order' ) )
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, 3, HydrusData.GenerateKey() ) )
+        
+        self._dump_and_load_and_test( definitions_update, test )
+        
+        dupe_definitions_update = HydrusNetwork.CreateUpdateFromNetworkBytes( definitions_update.DumpToBinaryNetworkBytes() )
+        
+        test( definitions_update, dupe_definitions_update )
+        
+        self.assertEqual( dupe_definitions_update.DumpToNetworkBytes(), definitions_update.DumpToNetworkBytes() )
+        
+    
     def test_SERIALISABLE_TYPE_DUPLICATE_CONTENT_MERGE_OPTIONS( self ):
         
         def test( obj, dupe_obj ):
@@ -14,6 +14,7 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusEncryption
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
+from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetwork
 from hydrus.core.networking import HydrusNetworking
@@ -478,10 +479,33 @@ class TestServer( unittest.TestCase ):
         
         response = service.Request( HC.GET, 'update', { 'update_hash' : content_update_hash } )
         
+        self.assertEqual( response, content_update_network_bytes )
+        
+        binary_response = service.Request( HC.GET, 'update', { 'update_hash' : content_update_hash, 'binary' : 1 } )
+        
+        binary_update_path = ServerFiles.GetExpectedBinaryUpdatePath( content_update_hash )
+        
+        # it is transcoded once and then served from disk
+        
+        self.assertTrue( os.path.exists( binary_update_path ) )
+        
+        self.assertEqual( service.Request( HC.GET, 'update', { 'update_hash' : content_update_hash, 'binary' : 1 } ), binary_response )
+        
         try: os.remove( path )
         except: pass
         
-        self.assertEqual( response, content_update_network_bytes )
+        try: os.remove( binary_update_path )
+        except: pass
+        
+        self.assertTrue( binary_response.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_MAGIC ) )
+        
+        binary_content_update = HydrusNetwork.CreateUpdateFromNetworkBytes( binary_response )
+        
+        self.assertEqual( binary_content_update.GetNumRows(), content_update.GetNumRows() )
+        
+        # and the client can rebuild the legacy form to check it
+        
+        self.assertEqual( hashlib.sha256( binary_content_update.DumpToNetworkBytes() ).digest(), content_update_hash )
         
         # metadata
         
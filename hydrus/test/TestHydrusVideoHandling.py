@@ -0,0 +1,318 @@
+import gc
+import os
+import types
+import unittest
+import weakref
+
+import numpy
+
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusExceptions
+from hydrus.core.files import HydrusVideoHandling
+
+from hydrus.client import ClientRendering
+
+class TrickleReader( object ):
+    
+    # a pipe that gives back at most a few bytes at a time, like ffmpeg's stdout can
+    
+    def __init__( self, data, max_read_size ):
+        
+        self._data = data
+        self._max_read_size = max_read_size
+        
+    
+    def readinto( self, view ):
+        
+        num_bytes = min( len( view ), len( self._data ), self._max_read_size )
+        
+        view[ : num_bytes ] = self._data[ : num_bytes ]
+        
+        self._data = self._data[ num_bytes : ]
+        
+        return num_bytes
+        
+    
+
+class TestVideoRendererFrameBuffers( unittest.TestCase ):
+    
+    def _GetRenderer( self, num_frame_buffers ):
+        
+        path = os.path.join( HC.STATIC_DIR, 'testing', 'muh_mp4.mp4' )
+        
+        ( resolution, duration, num_frames, has_audio ) = HydrusVideoHandling.GetFFMPEGVideoProperties( path )
+        
+        return HydrusVideoHandling.VideoRendererFFMPEG( path, HC.VIDEO_MP4, duration, num_frames, resolution, num_frame_buffers = num_frame_buffers )
+        
+    
+    def test_buffer_pool( self ):
+        
+        renderer = self._GetRenderer( 2 )
+        
+        try:
+            
+            frame_1 = renderer.read_frame()
+            frame_2 = renderer.read_frame()
+            
+            self.assertIsNot( frame_1, frame_2 )
+            
+            # frame_2 is the last read, so it may be handed out again and is never recycled
+            
+            renderer.ReleaseFrameBuffer( frame_2 )
+            
+            self.assertIsNot( renderer.read_frame(), frame_2 )
+            
+            # a released buffer is decoded into again
+            
+            renderer.ReleaseFrameBuffer( frame_1 )
+            
+            frame_4 = renderer.read_frame()
+            
+            self.assertIs( frame_4, frame_1 )
+            
+            # the wrong shape is ignored, and the pool does not grow beyond its size
+            
+            renderer.ReleaseFrameBuffer( numpy.zeros( ( 5, 5, 3 ), dtype = 'uint8' ) )
+            
+            for i in range( 5 ):
+                
+                renderer.ReleaseFrameBuffer( numpy.empty_like( frame_4 ) )
+                
+            
+            self.assertEqual( len( renderer._free_frame_buffers ), 2 )
+            
+        finally:
+            
+            renderer.Stop()
+            
+        
+    
+    def test_no_pool( self ):
+        
+        renderer = self._GetRenderer( None )
+        
+        try:
+            
+            frame_1 = renderer.read_frame()
+            
+            renderer.read_frame()
+            
+            renderer.ReleaseFrameBuffer( frame_1 )
+            
+            self.assertIsNot( renderer.read_frame(), frame_1 )
+            
+        finally:
+            
+            renderer.Stop()
+            
+        
+    
+    def test_release_when_frame_unreferenced( self ):
+        
+        renderer = self._GetRenderer( 2 )
+        
+        try:
+            
+            numpy_image = renderer.read_frame()
+            
+            renderer.read_frame()
+            
+            # this is how the video container hands buffers back
+            
+            frame = ClientRendering.GenerateHydrusBitmapFromNumPyImage( numpy_image, compressed = False )
+            
+            weakref.finalize( frame, renderer.ReleaseFrameBuffer, numpy_image )
+            
+            del numpy_image
+            
+            qt_image = frame.GetQtImage()
+            
+            self.assertEqual( len( renderer._free_frame_buffers ), 0 )
+            
+            del frame
+            del qt_image
+            
+            gc.collect()
+            
+            self.assertEqual( len( renderer._free_frame_buffers ), 1 )
+            
+        finally:
+            
+            renderer.Stop()
+            
+        
+    
+    def test_read_into_short_reads( self ):
+        
+        frame_buffer = numpy.zeros( ( 4, 5, 3 ), dtype = 'uint8' )
+        
+        data = bytes( range( 60 ) )
+        
+        for max_read_size in ( 1, 7, 60, 1000 ):
+            
+            frame_buffer[:] = 0
+            
+            fake_renderer = types.SimpleNamespace( process = types.SimpleNamespace( stdout = TrickleReader( data, max_read_size ) ) )
+            
+            num_bytes_read = HydrusVideoHandling.VideoRendererFFMPEG._ReadInto( fake_renderer, frame_buffer )
+            
+            self.assertEqual( num_bytes_read, 60 )
+            self.assertEqual( frame_buffer.tobytes(), data )
+            
+        
+        # the pipe ends early, so we get what there was
+        
+        frame_buffer[:] = 0
+        
+        fake_renderer = types.SimpleNamespace( process = types.SimpleNamespace( stdout = TrickleReader( data[ : 25 ], 7 ) ) )
+        
+        num_bytes_read = HydrusVideoHandling.VideoRendererFFMPEG._ReadInto( fake_renderer, frame_buffer )
+        
+        self.assertEqual( num_bytes_read, 25 )
+        self.assertEqual( frame_buffer.tobytes()[ : 25 ], data[ : 25 ] )
+        self.assertEqual( frame_buffer.tobytes()[ 25 : ], bytes( 35 ) )
+        
+    
+class TestKeyframes( unittest.TestCase ):
+    
+    def _GetShowInfoLines( self, time_base, ptss ):
+        
+        lines = []
+        
+        lines.append( 'Input #0, mov,mp4,m4a,3gp,3g2,mj2, from \'video.mp4\':' )
+        lines.append( '[Parsed_showinfo_0 @ 0x5581c0c0c0c0] config in time_base: {}, frame_rate: 25/1'.format( time_base ) )
+        
+        for ( n, pts ) in enumerate( ptss ):
+            
+            lines.append( '[Parsed_showinfo_0 @ 0x5581c0c0c0c0] n: {:>3} pts: {:>6} pts_time:0       duration:    512 duration_time:0.04 fmt:yuv420p'.format( n, pts ) )
+            
+        
+        lines.append( 'frame=    3 fps=0.0 q=-0.0 Lsize=N/A time=00:00:04.00 bitrate=N/A speed= 100x' )
+        
+        return lines
+        
+    
+    def test_keyframe_index( self ):
+        
+        # 10 seconds, 250 frames, so 40ms a frame, and keyframes at 0, 2, and 4 seconds
+        
+        keyframe_index = HydrusVideoHandling.KeyframeIndex( [ 0, 2000000, 4000000 ], 10000, 250 )
+        
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 0 ), 0 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 49 ), 0 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 50 ), 50 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 99 ), 50 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 100 ), 100 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 249 ), 100 )
+        
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 0 ), 0 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 20 ), 0 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 30 ), 50 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 50 ), 50 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 80 ), 100 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 249 ), 100 )
+        
+        # no keyframes, so everything is at the start or left where it is
+        
+        keyframe_index = HydrusVideoHandling.KeyframeIndex( [], 10000, 250 )
+        
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 120 ), 0 )
+        self.assertEqual( keyframe_index.GetNearestKeyframeIndex( 120 ), 120 )
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 120 ), 4.8 )
+        
+    
+    def test_keyframe_seek_timestamp( self ):
+        
+        # these keyframes are a hair off our constant-rate guess, either side
+        
+        keyframe_index = HydrusVideoHandling.KeyframeIndex( [ 0, 2000001, 3999999 ], 10000, 250 )
+        
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 75 ), 50 )
+        self.assertEqual( keyframe_index.GetKeyframeIndexAtOrBefore( 100 ), 100 )
+        
+        # keyframes get their true timestamp
+        
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 0 ), 0.0 )
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 50 ), 2.000001 )
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 100 ), 3.999999 )
+        
+        # anything else gets the constant-rate guess
+        
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 75 ), 3.0 )
+        self.assertEqual( keyframe_index.GetSeekTimestampS( 99 ), 3.96 )
+        
+    
+    def test_parse_keyframe_timestamps( self ):
+        
+        lines = self._GetShowInfoLines( '1/12800', [ 0, 25600, 51200 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 2000000, 4000000 ] )
+        
+        # the time base is used, not a fixed one
+        
+        lines = self._GetShowInfoLines( '1/1000', [ 0, 2000, 4000 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 2000000, 4000000 ] )
+        
+        # out of order and duplicate pts are sorted and merged
+        
+        lines = self._GetShowInfoLines( '1/1000', [ 4000, 0, 2000, 2000 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 2000000, 4000000 ] )
+        
+    
+    def test_parse_keyframe_timestamps_rounding( self ):
+        
+        # 1/12800s is 78.125us, which rounds up to 79
+        
+        lines = self._GetShowInfoLines( '1/12800', [ 0, 1 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 79 ] )
+        
+        # ntsc, 1001/30000s is 33366.67us, which rounds up to 33367, and so on
+        
+        lines = self._GetShowInfoLines( '1001/30000', [ 0, 1, 2, 3 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 33367, 66734, 100100 ] )
+        
+    
+    def test_parse_keyframe_timestamps_negative( self ):
+        
+        # edit lists can give keyframes before the start, which we cannot seek to
+        
+        lines = self._GetShowInfoLines( '1/12800', [ -1024, -512, 0, 25600 ] )
+        
+        self.assertEqual( HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines ), [ 0, 2000000 ] )
+        
+        lines = self._GetShowInfoLines( '1/12800', [ -1024, -512 ] )
+        
+        with self.assertRaises( HydrusExceptions.DamagedOrUnusualFileException ):
+            
+            HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines )
+            
+        
+    
+    def test_parse_keyframe_timestamps_none( self ):
+        
+        lines = self._GetShowInfoLines( '1/12800', [] )
+        
+        with self.assertRaises( HydrusExceptions.DamagedOrUnusualFileException ):
+            
+            HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines )
+            
+        
+        # no time base line means we cannot trust anything
+        
+        lines = [ line for line in self._GetShowInfoLines( '1/12800', [ 0, 25600 ] ) if 'time_base' not in line ]
+        
+        with self.assertRaises( HydrusExceptions.DamagedOrUnusualFileException ):
+            
+            HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( lines )
+            
+        
+        with self.assertRaises( HydrusExceptions.DamagedOrUnusualFileException ):
+            
+            HydrusVideoHandling.ParseFFMPEGKeyframeTimestampsUS( [] )
+            
+        
+    